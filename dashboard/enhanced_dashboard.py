@@ -330,6 +330,66 @@ if FASTAPI_AVAILABLE:
         finally:
             await websocket.close()
 
+    @app.websocket("/ws/chains/{symbol}")
+    async def chain_stream(websocket: WebSocket, symbol: str):
+        """Options chain stream: the full chain once, then only diffs"""
+        from src.options.chain_diff import get_chain_cache
+
+        cache = get_chain_cache()
+        await websocket.accept()
+        subscription = cache.subscribe([symbol])
+        try:
+            await websocket.send_json({"type": "chain_snapshot", "data": cache.snapshot(symbol)})
+            while True:
+                diff = await subscription.get()
+                if diff is None:  # fell behind: start over from the full chain
+                    await websocket.send_json({"type": "chain_snapshot", "data": cache.snapshot(symbol)})
+                elif not diff.empty:
+                    await websocket.send_json({"type": "chain_diff", "data": diff.to_dict()})
+
+        except Exception as e:
+            logger.error(f"Chain WebSocket error: {e}")
+        finally:
+            subscription.close()
+            await websocket.close()
+
+    # Streamed bars: the process-wide ingester runs next to the server when enabled
+    app.state.stream_bars = os.getenv("EMO_DASHBOARD_STREAM", "0") == "1"
+    app.state.stream_task = None
+
+    @app.on_event("startup")
+    async def start_bar_stream():
+        """Start the stream ingester so /ws/bars clients get live bars"""
+        if app.state.stream_bars:
+            from src.database.stream_ingester import get_stream_ingester
+            app.state.stream_task = asyncio.ensure_future(get_stream_ingester().run())
+
+    @app.on_event("shutdown")
+    async def stop_bar_stream():
+        """Write buffered bars and close the stream"""
+        if app.state.stream_task is not None:
+            from src.database.stream_ingester import get_stream_ingester
+            await get_stream_ingester().stop()
+            await asyncio.gather(app.state.stream_task, return_exceptions=True)
+
+    @app.websocket("/ws/bars")
+    async def bar_stream(websocket: WebSocket, symbols: Optional[str] = None):
+        """Live bars: the latest bar per symbol once, then every new bar"""
+        from src.database.stream_ingester import get_stream_ingester
+
+        wanted = [s.strip().upper() for s in symbols.split(",") if s.strip()] if symbols else None
+        await websocket.accept()
+        feed = get_stream_ingester().bar_feed(wanted)
+        try:
+            async for message in feed:
+                await websocket.send_json(message)
+
+        except Exception as e:
+            logger.error(f"Bar WebSocket error: {e}")
+        finally:
+            await feed.aclose()
+            await websocket.close()
+
 class SimpleDashboardGenerator:
     """Generates static HTML dashboard when FastAPI not available"""
     
@@ -584,6 +644,8 @@ def main():
     parser.add_argument("--host", default="127.0.0.1", help="Host to bind to")
     parser.add_argument("--port", type=int, default=8000, help="Port to bind to")
     parser.add_argument("--output", help="Output file for static generation")
+    parser.add_argument("--stream", action="store_true",
+                       help="Run the bar stream ingester for /ws/bars (default: EMO_DASHBOARD_STREAM=1)")
     
     args = parser.parse_args()
     
@@ -601,6 +663,7 @@ def main():
     
     if args.mode == "serve" and FASTAPI_AVAILABLE:
         logger.info(f"Starting dashboard server on http://{args.host}:{args.port}")
+        app.state.stream_bars = app.state.stream_bars or args.stream
         uvicorn.run(app, host=args.host, port=args.port, log_level="info")
         
     elif args.mode == "generate" or not FASTAPI_AVAILABLE:
@@ -12,6 +12,7 @@ Features:
 - Configurable symbol lists and timeframes
 - Robust error handling and retry logic
 - Rate limiting and API quota management
+- Multi-symbol batch requests over one keep-alive session
 - Integration with enhanced database router
 - Performance metrics and health monitoring
 - Runner system integration hooks
@@ -24,6 +25,7 @@ Environment Variables:
   EMO_LIVE_LOGGER_ENABLED=1                      # Enable live logging
   EMO_LIVE_LOGGER_TIMEOUT=30                     # API request timeout
   EMO_LIVE_LOGGER_RETRY_COUNT=3                  # Retry attempts on failure
+  EMO_LIVE_LOGGER_BATCH_SIZE=100                 # Symbols per batch request
 """
 
 import os
@@ -79,6 +81,9 @@ except Exception:
         logger.error(f"❌ Database router not available: {e}")
         DB = None
 
+from src.database.bulk_writer import bulk_writer
+from src.utils.http_client import HttpClient, get_http_client
+
 # Configuration
 ALPACA_DATA_URL = config.get("ALPACA_DATA_URL", "https://data.alpaca.markets/v2")
 KEY = config.get("ALPACA_KEY_ID", "")
@@ -88,6 +93,7 @@ ENABLED = config.as_bool("EMO_LIVE_LOGGER_ENABLED", True)
 TIMEOUT = config.as_int("EMO_LIVE_LOGGER_TIMEOUT", 30)
 RETRY_COUNT = config.as_int("EMO_LIVE_LOGGER_RETRY_COUNT", 3)
 RATE_LIMIT_DELAY = config.as_int("EMO_LIVE_LOGGER_RATE_LIMIT", 1)  # seconds between requests
+BATCH_SIZE = config.as_int("EMO_LIVE_LOGGER_BATCH_SIZE", 100)  # symbols per request
 
 # Performance tracking
 _performance_metrics = {
@@ -95,12 +101,23 @@ _performance_metrics = {
     "successful_requests": 0,
     "failed_requests": 0,
     "symbols_processed": 0,
+    "symbols_failed": 0,
     "bars_stored": 0,
     "last_run_time": None,
     "last_error": None,
     "start_time": time.time()
 }
 
+# Shared pooled HTTP client (bound on first use)
+_session: Optional[HttpClient] = None
+
+def _get_session() -> HttpClient:
+    """Get the shared HTTP client, reusing pooled connections across requests."""
+    global _session
+    if _session is None:
+        _session = get_http_client()
+    return _session
+
 def _get_headers() -> Dict[str, str]:
     """Get authenticated headers for Alpaca API requests."""
     return {
@@ -122,6 +139,25 @@ def validate_credentials() -> bool:
     
     return True
 
+def _format_bar(symbol: str, bar: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Validate an Alpaca bar and convert it to the stored format (None if incomplete)."""
+    required_fields = ["t", "o", "h", "l", "c", "v"]
+    if not isinstance(bar, dict) or not all(field in bar for field in required_fields):
+        logger.warning(f"⚠️ Incomplete bar data for {symbol}: {bar}")
+        return None
+    
+    return {
+        "symbol": symbol,
+        "ts": bar.get("t") or bar.get("timestamp") or bar.get("time"),
+        "open": float(bar.get("o", 0)),
+        "high": float(bar.get("h", 0)),
+        "low": float(bar.get("l", 0)),
+        "close": float(bar.get("c", 0)),
+        "volume": int(bar.get("v", 0)),
+        "data_source": "alpaca_live",
+        "fetched_at": dt.datetime.now().isoformat()
+    }
+
 def fetch_latest_bar(symbol: str, retry_count: int = None) -> Optional[Dict[str, Any]]:
     """
     Fetch latest 1-minute bar for a symbol with robust error handling.
@@ -149,11 +185,14 @@ def fetch_latest_bar(symbol: str, retry_count: int = None) -> Optional[Dict[str,
             
             logger.debug(f"📡 Fetching {symbol} data (attempt {attempt + 1}/{retry_count + 1})")
             
-            response = requests.get(
+            # retries=0: this loop owns the retry policy (and the request metrics)
+            response = _get_session().get(
                 url, 
+                endpoint="alpaca.bars",
                 headers=_get_headers(), 
                 params=params, 
-                timeout=TIMEOUT
+                timeout=TIMEOUT,
+                retries=0
             )
             
             # Handle rate limiting
@@ -172,27 +211,10 @@ def fetch_latest_bar(symbol: str, retry_count: int = None) -> Optional[Dict[str,
                 logger.debug(f"ℹ️ No bars returned for {symbol}")
                 return None
             
-            bar = bars[-1]  # Get latest bar
-            
-            # Validate bar data
-            required_fields = ["t", "o", "h", "l", "c", "v"]
-            if not all(field in bar for field in required_fields):
-                logger.warning(f"⚠️ Incomplete bar data for {symbol}: {bar}")
+            formatted_bar = _format_bar(symbol, bars[-1])  # Get latest bar
+            if formatted_bar is None:
                 return None
             
-            # Format bar data
-            formatted_bar = {
-                "symbol": symbol,
-                "ts": bar.get("t") or bar.get("timestamp") or bar.get("time"),
-                "open": float(bar.get("o", 0)),
-                "high": float(bar.get("h", 0)),
-                "low": float(bar.get("l", 0)),
-                "close": float(bar.get("c", 0)),
-                "volume": int(bar.get("v", 0)),
-                "data_source": "alpaca_live",
-                "fetched_at": dt.datetime.now().isoformat()
-            }
-            
             _performance_metrics["successful_requests"] += 1
             logger.debug(f"✅ Successfully fetched {symbol}: {formatted_bar['close']} @ {formatted_bar['ts']}")
             
@@ -221,6 +243,93 @@ def fetch_latest_bar(symbol: str, retry_count: int = None) -> Optional[Dict[str,
     _performance_metrics["last_error"] = f"Failed to fetch {symbol} after {retry_count + 1} attempts"
     return None
 
+def _fetch_bar_batch(symbols: List[str], retry_count: int) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Fetch the latest bar of up to BATCH_SIZE symbols in one request.
+    
+    Retries follow fetch_latest_bar: 429 waits for Retry-After, network errors
+    back off exponentially, parsing errors are not retried. A symbol that is
+    missing from the response or has an incomplete bar maps to None.
+    """
+    url = f"{ALPACA_DATA_URL}/stocks/bars/latest"
+    params = {"symbols": ",".join(symbols)}
+    label = f"{len(symbols)} symbols ({symbols[0]}..{symbols[-1]})"
+    
+    for attempt in range(retry_count + 1):
+        try:
+            _performance_metrics["total_requests"] += 1
+            
+            logger.debug(f"📡 Fetching {label} (attempt {attempt + 1}/{retry_count + 1})")
+            
+            response = _get_session().get(url, endpoint="alpaca.bars_latest", headers=_get_headers(),
+                                          params=params, timeout=TIMEOUT, retries=0)
+            
+            # Handle rate limiting
+            if response.status_code == 429:
+                retry_after = int(response.headers.get("Retry-After", 60))
+                logger.warning(f"⏱️ Rate limited for {label}, waiting {retry_after}s")
+                time.sleep(retry_after)
+                continue
+            
+            response.raise_for_status()
+            bars = response.json().get("bars") or {}
+            
+            # Parse the combined response in one pass
+            result = {symbol: None for symbol in symbols}
+            for symbol, bar in bars.items():
+                if symbol in result:
+                    result[symbol] = _format_bar(symbol, bar)
+            
+            _performance_metrics["successful_requests"] += 1
+            return result
+            
+        except requests.exceptions.Timeout:
+            logger.warning(f"⏱️ Timeout fetching {label} (attempt {attempt + 1})")
+            if attempt < retry_count:
+                time.sleep(min(2 ** attempt, 10))  # Exponential backoff
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"🌐 Network error fetching {label}: {e}")
+            if attempt < retry_count:
+                time.sleep(min(2 ** attempt, 10))
+            
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.error(f"📊 Data parsing error for {label}: {e}")
+            break  # Don't retry on data errors
+            
+        except Exception as e:
+            logger.error(f"❌ Unexpected error fetching {label}: {e}")
+            if attempt < retry_count:
+                time.sleep(min(2 ** attempt, 10))
+    
+    _performance_metrics["failed_requests"] += 1
+    _performance_metrics["last_error"] = f"Failed to fetch {label} after {retry_count + 1} attempts"
+    return {symbol: None for symbol in symbols}
+
+def fetch_latest_bars(symbols: List[str], retry_count: int = None,
+                      batch_size: int = None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Fetch the latest 1-minute bar of many symbols with multi-symbol requests.
+    
+    Args:
+        symbols: Stock symbols to fetch
+        retry_count: Number of retries per request (defaults to global RETRY_COUNT)
+        batch_size: Symbols per request (defaults to global BATCH_SIZE)
+        
+    Returns:
+        Dictionary of symbol -> bar data, or None for symbols that failed
+    """
+    if retry_count is None:
+        retry_count = RETRY_COUNT
+    batch_size = max(1, batch_size or BATCH_SIZE)
+    
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    for i in range(0, len(symbols), batch_size):
+        if i and RATE_LIMIT_DELAY > 0:
+            time.sleep(RATE_LIMIT_DELAY)  # Rate limiting between requests
+        results.update(_fetch_bar_batch(symbols[i:i + batch_size], retry_count))
+    return results
+
 def store_bars_to_database(bars: List[Dict[str, Any]]) -> int:
     """
     Store bars to database with error handling.
@@ -244,31 +353,14 @@ def store_bars_to_database(bars: List[Dict[str, Any]]) -> int:
                 # Use enhanced database method if available
                 stored_count = db.upsert_bars(bars)
             else:
-                # Fallback for legacy database
-                stored_count = 0
-                with db.cursor() as cursor:
-                    for bar in bars:
-                        try:
-                            if db.kind == "sqlite":
-                                cursor.execute("""
-                                    INSERT OR REPLACE INTO bars(symbol, ts, open, high, low, close, volume, data_source)
-                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                                """, (bar["symbol"], bar["ts"], bar["open"], bar["high"], 
-                                     bar["low"], bar["close"], bar["volume"], bar.get("data_source", "alpaca")))
-                            else:
-                                cursor.execute("""
-                                    INSERT INTO bars(symbol, ts, open, high, low, close, volume, data_source)
-                                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                                    ON CONFLICT (symbol, ts) DO UPDATE SET
-                                      open=EXCLUDED.open, high=EXCLUDED.high, low=EXCLUDED.low,
-                                      close=EXCLUDED.close, volume=EXCLUDED.volume, data_source=EXCLUDED.data_source
-                                """, (bar["symbol"], bar["ts"], bar["open"], bar["high"], 
-                                     bar["low"], bar["close"], bar["volume"], bar.get("data_source", "alpaca")))
-                            stored_count += 1
-                        except Exception as e:
-                            logger.error(f"❌ Failed to store bar for {bar['symbol']}: {e}")
-                    
-                    db.conn.commit()
+                # Fallback for legacy database: one bulk upsert for the whole batch
+                columns = ("symbol", "ts", "open", "high", "low", "close", "volume", "data_source")
+                rows = [(bar["symbol"], bar["ts"], bar["open"], bar["high"], bar["low"], bar["close"],
+                         bar["volume"], bar.get("data_source", "alpaca")) for bar in bars]
+                writer = bulk_writer(db.conn, columns=columns, kind="sqlite" if db.kind == "sqlite" else "postgres")
+                with writer.buffer() as buffer:
+                    buffer.extend(rows)
+                stored_count = buffer.rows_written
             
             _performance_metrics["bars_stored"] += stored_count
             logger.info(f"💾 Stored {stored_count}/{len(bars)} bars to database")
@@ -318,27 +410,23 @@ def main_once() -> Dict[str, Any]:
     processed_symbols = []
     failed_symbols = []
     
-    for i, symbol in enumerate(SYMBOLS):
-        try:
-            logger.debug(f"📊 Processing {symbol} ({i+1}/{len(SYMBOLS)})")
-            
-            bar = fetch_latest_bar(symbol)
-            if bar:
-                bars.append(bar)
-                processed_symbols.append(symbol)
-            else:
-                failed_symbols.append(symbol)
-            
-            # Rate limiting between requests
-            if i < len(SYMBOLS) - 1 and RATE_LIMIT_DELAY > 0:
-                time.sleep(RATE_LIMIT_DELAY)
-                
-        except Exception as e:
-            logger.error(f"❌ Error processing {symbol}: {e}")
+    try:
+        latest = fetch_latest_bars(SYMBOLS)
+    except Exception as e:
+        logger.error(f"❌ Error fetching latest bars: {e}")
+        _performance_metrics["last_error"] = str(e)
+        latest = {}
+    
+    for symbol in SYMBOLS:
+        bar = latest.get(symbol)
+        if bar:
+            bars.append(bar)
+            processed_symbols.append(symbol)
+        else:
             failed_symbols.append(symbol)
-            _performance_metrics["last_error"] = str(e)
     
     _performance_metrics["symbols_processed"] += len(processed_symbols)
+    _performance_metrics["symbols_failed"] += len(failed_symbols)
     
     # Store to database
     stored_count = 0
@@ -386,6 +474,7 @@ def reset_metrics():
         "successful_requests": 0,
         "failed_requests": 0,
         "symbols_processed": 0,
+        "symbols_failed": 0,
         "bars_stored": 0,
         "last_run_time": None,
         "last_error": None,
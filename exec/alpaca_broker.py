@@ -6,6 +6,8 @@ Handles paper and live trading through Alpaca API
 import os
 from typing import Dict, Any, Optional
 
+from src.utils.http_client import get_http_client
+
 class AlpacaBroker:
     """
     Alpaca broker client for options trading.
@@ -41,6 +43,8 @@ class AlpacaBroker:
                 self.base_url,
                 api_version='v2'
             )
+            # Send SDK calls over the shared keep-alive pool, retry policy and metrics
+            self.client._session = get_http_client().as_session()
             print(f"✅ Alpaca client initialized ({'paper' if self.paper else 'live'} mode)")
         except ImportError:
             print("⚠️ alpaca-trade-api not installed, using mock client")
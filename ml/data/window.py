@@ -4,19 +4,59 @@ from typing import Iterator, Tuple
 def sliding_windows(X: np.ndarray, y: np.ndarray, lookback: int) -> Tuple[np.ndarray, np.ndarray]:
     """
     Convert tabular (T, F) -> stacked sequences (N, lookback, F), aligned to predict y[t].
+    Returns read-only strided views of X and y (no copies); values match the
+    stacked-copy layout element for element.
     """
-    seqs, targets = [], []
-    for t in range(lookback, len(X)):
-        seqs.append(X[t-lookback:t])
-        targets.append(y[t])
-    return np.array(seqs), np.array(targets)
+    X = np.asarray(X)
+    y = np.asarray(y)
+    n = len(X) - lookback
+    if n <= 0:
+        return np.array([]), np.array([])
+    windows = np.lib.stride_tricks.sliding_window_view(X, lookback, axis=0)[:n]
+    seqs = np.moveaxis(windows, -1, 1)
+    targets = y[lookback:lookback + n].view()
+    targets.flags.writeable = False
+    return seqs, targets
 
-def train_val_test_split(n: int, test=0.2, val=0.1, seed=42):
+def iter_window_batches(
+    X: np.ndarray,
+    y: np.ndarray,
+    lookback: int,
+    batch_size: int = 256,
+    shuffle: bool = False,
+    seed: int = 42,
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Yield contiguous (batch, lookback, F) mini-batches without materializing all windows.
+    Peak memory is O(batch_size * lookback * F).
+    """
+    seqs, targets = sliding_windows(X, y, lookback)
+    n = len(targets)
+    order = np.arange(n)
+    if shuffle:
+        np.random.default_rng(seed).shuffle(order)
+    for start in range(0, n, batch_size):
+        idx = order[start:start + batch_size]
+        if shuffle:
+            yield seqs[idx], targets[idx]
+        else:
+            sl = slice(idx[0], idx[-1] + 1)
+            yield np.ascontiguousarray(seqs[sl]), np.array(targets[sl])
+
+def train_val_test_split(n: int, test=0.2, val=0.1, seed=42, shuffle=True, gap=0):
+    """shuffle=False gives chronological train/val/test blocks with ``gap`` samples purged before val and test."""
+    n_test = int(n * test)
+    n_val  = int(n * val)
+    if not shuffle:
+        test_start = n - n_test
+        val_start  = test_start - n_val
+        test_idx  = np.arange(test_start, n)
+        val_idx   = np.arange(val_start, max(val_start, test_start - gap)) if n_val else np.arange(0)
+        train_idx = np.arange(0, max(0, val_start - gap if n_val else test_start - gap))
+        return train_idx, val_idx, test_idx
     rng = np.random.default_rng(seed)
     idx = np.arange(n)
     rng.shuffle(idx)
-    n_test = int(n * test)
-    n_val  = int(n * val)
     test_idx  = idx[:n_test]
     val_idx   = idx[n_test:n_test+n_val]
     train_idx = idx[n_test+n_val:]
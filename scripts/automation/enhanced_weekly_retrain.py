@@ -11,9 +11,9 @@ import json
 import smtplib
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional, Any
-from email.mime.text import MimeText
-from email.mime.multipart import MimeMultipart
+from typing import Dict, List, Optional, Any, Tuple
+from email.mime.text import MIMEText as MimeText
+from email.mime.multipart import MIMEMultipart as MimeMultipart
 from dataclasses import dataclass
 
 # Add project root to path
@@ -21,6 +21,10 @@ ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(ROOT))
 
 from src.database.enhanced_router import DBRouter
+from src.ml.drift import drift_status
+from src.ml.registry import get_registry
+from src.ml.scheduler import RetrainScheduler, default_memory_budget_mb
+from src.ml.validation import PurgedCV
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +40,17 @@ class RetrainConfig:
     backup_models: bool = True
     cleanup_old_models: bool = True
     max_model_age_days: int = 30
+    registry_versions_kept: int = 5  # newest registry versions kept per model (plus production)
+    parallel: bool = True  # train on a process pool instead of one subprocess per model
+    max_workers: int = 0  # 0 = one worker per CPU
+    memory_budget_mb: float = 0.0  # 0 = 70% of available memory
+    force: bool = False  # retrain models whose performance is acceptable too
+    cv_folds: int = 5  # purged out-of-sample folds per model/horizon (< 2 disables)
+    cv_mode: str = "expanding"  # expanding | rolling | blocked
+    cv_embargo: int = 0  # extra bars dropped next to each test block
+    drift_dir: Optional[str] = "data/ml_drift"  # online monitor status written by the outlook engine
+    model_registry_dir: Optional[str] = "data/models/registry"  # same registry the outlook engine writes
+    targeted: bool = False  # retrain only models the online monitor flags
 
 @dataclass
 class RetrainResult:
@@ -51,8 +66,31 @@ class RetrainResult:
 class ModelPerformanceMonitor:
     """Monitor ML model performance over time"""
     
-    def __init__(self):
-        pass
+    def __init__(self, drift_dir: Optional[str] = None):
+        self.drift_dir = drift_dir
+        self._drift: Optional[Dict[str, Any]] = None
+    
+    def drift(self) -> Dict[str, Any]:
+        """Online monitor status (read once from the outlook engine's status file)"""
+        if self._drift is None:
+            self._drift = drift_status(self.drift_dir) if self.drift_dir else {"models": {}}
+        return self._drift
+    
+    def drift_flags(self, symbol: str, model: str) -> Optional[List[str]]:
+        """
+        Online monitor reasons to retrain ``symbol``/``model``
+        
+        Returns None when the monitor has not resolved enough of the model's
+        predictions to judge it, so the caller falls back to the database.
+        """
+        status = self.drift()
+        min_samples = status.get("thresholds", {}).get("min_samples", 0)
+        judged = [entry for entry in status.get("models", {}).values()
+                  if entry.get("symbol") == symbol and entry.get("model") == model
+                  and (entry.get("directional", 0) >= min_samples or entry.get("reasons"))]
+        if not judged:
+            return None
+        return [f"{entry['horizon']}: {reason}" for entry in judged for reason in entry.get("reasons", [])]
     
     def get_model_performance(self, symbol: str, model: str, days: int = 7) -> Dict[str, Any]:
         """Get recent model performance metrics"""
@@ -95,8 +133,29 @@ class ModelPerformanceMonitor:
             logger.error(f"Failed to get performance for {symbol}_{model}: {e}")
             return {"performance_score": 0.0}
     
+    def get_online_status(self) -> Dict[str, Dict]:
+        """Per model/horizon status from the online monitor, shaped like get_all_model_status"""
+        return {
+            key: {
+                "hit_rate": entry.get("hit_rate"),
+                "calibration_error": entry.get("calibration_error"),
+                "max_psi": entry.get("drift", {}).get("max_psi"),
+                "prediction_count": entry.get("resolved_total", 0),
+                "needs_retraining": bool(entry.get("reasons")),
+                "reasons": entry.get("reasons", []),
+            }
+            for key, entry in self.drift().get("models", {}).items()
+        }
+    
     def needs_retraining(self, symbol: str, model: str, threshold: float = 0.6) -> bool:
         """Determine if model needs retraining based on performance"""
+        # Live accuracy/drift statistics, when available, replace the prediction history query
+        reasons = self.drift_flags(symbol, model)
+        if reasons is not None:
+            logger.info(f"{symbol}_{model} online monitor: {'; '.join(reasons) or 'ok'}, "
+                        f"needs_retrain: {bool(reasons)}")
+            return bool(reasons)
+        
         performance = self.get_model_performance(symbol, model)
         
         # Check multiple criteria
@@ -258,7 +317,7 @@ class WeeklyRetrainEngine:
     def __init__(self, config: RetrainConfig):
         self.config = config
         self.config.models = config.models or ["rf", "lstm"]
-        self.performance_monitor = ModelPerformanceMonitor()
+        self.performance_monitor = ModelPerformanceMonitor(config.drift_dir)
         self.email_notifier = EmailNotifier(config)
         
         # Create directories
@@ -266,6 +325,8 @@ class WeeklyRetrainEngine:
         self.log_dir = Path("logs")
         self.backup_dir.mkdir(parents=True, exist_ok=True)
         self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.schedule_stats: Dict[str, Any] = {}
+        self.cv_reports: Dict[str, Any] = {}
     
     def run_weekly_retrain(self) -> Dict[str, Any]:
         """Run complete weekly retraining process"""
@@ -276,32 +337,33 @@ class WeeklyRetrainEngine:
         performance_status = {}
         
         try:
-            # Get current performance status
-            performance_status = self.performance_monitor.get_all_model_status(
-                self.config.symbols, self.config.models
-            )
+            # Get current performance status (targeted runs only look at the online monitor)
+            if self.config.targeted:
+                performance_status = self.performance_monitor.get_online_status()
+            else:
+                performance_status = self.performance_monitor.get_all_model_status(
+                    self.config.symbols, self.config.models
+                )
+            
+            # Retrain models that need it, flagged ones first
+            plan = self._plan_retrains()
             
             # Backup existing models
-            if self.config.backup_models:
+            if self.config.backup_models and (plan or not self.config.targeted):
                 self._backup_models()
             
-            # Retrain models that need it
-            for symbol in self.config.symbols:
-                for model in self.config.models:
-                    if self.performance_monitor.needs_retraining(
-                        symbol, model, self.config.performance_threshold
-                    ):
-                        result = self._retrain_model(symbol, model)
-                        results.append(result)
-                    else:
-                        logger.info(f"Skipping {symbol}_{model} - performance acceptable")
+            if self.config.parallel:
+                results = self._retrain_parallel(plan)
+            else:
+                results = [self._retrain_model(symbol, model) for symbol, model, _ in plan]
             
             # Cleanup old models
             if self.config.cleanup_old_models:
                 self._cleanup_old_models()
             
             # Send notifications
-            self.email_notifier.send_notification(results, performance_status)
+            if results or not self.config.targeted:
+                self.email_notifier.send_notification(results, performance_status)
             
             # Generate summary
             duration = (datetime.now(timezone.utc) - start_time).total_seconds()
@@ -310,10 +372,13 @@ class WeeklyRetrainEngine:
             summary = {
                 "start_time": start_time.isoformat(),
                 "duration_seconds": duration,
+                "targeted": self.config.targeted,
                 "total_models_retrained": len(results),
                 "successful_retrains": successful,
                 "failed_retrains": len(results) - successful,
                 "results": [r.__dict__ for r in results],
+                "scheduler": self.schedule_stats,
+                "cross_validation": {key: report.to_dict() for key, report in self.cv_reports.items()},
                 "performance_status": performance_status
             }
             
@@ -332,6 +397,150 @@ class WeeklyRetrainEngine:
                 "duration_seconds": (datetime.now(timezone.utc) - start_time).total_seconds()
             }
     
+    def _plan_retrains(self) -> List[Tuple[str, str, int]]:
+        """(symbol, model, priority) to retrain; models flagged by the monitor get priority 1"""
+        if self.config.targeted:
+            return self._plan_targeted()
+        plan = []
+        for symbol in self.config.symbols:
+            for model in self.config.models:
+                flagged = self.performance_monitor.needs_retraining(
+                    symbol, model, self.config.performance_threshold
+                )
+                if flagged or self.config.force:
+                    plan.append((symbol, model, 1 if flagged else 0))
+                else:
+                    logger.info(f"Skipping {symbol}_{model} - performance acceptable")
+        plan.sort(key=lambda item: -item[2])  # stable: config order within a priority
+        return plan
+    
+    def _plan_targeted(self) -> List[Tuple[str, str, int]]:
+        """
+        Models the online monitor flags, most flagged horizons first
+        
+        A model whose production version changed since the monitor judged it
+        has already been retrained and is skipped until it is judged again.
+        """
+        registry = get_registry(self.config.model_registry_dir) if self.config.model_registry_dir else None
+        flagged: Dict[Tuple[str, str], int] = {}
+        for key, entry in self.performance_monitor.drift().get("models", {}).items():
+            pair = (entry.get("symbol"), entry.get("model"))
+            if not entry.get("reasons") or pair[0] not in self.config.symbols or pair[1] not in self.config.models:
+                continue
+            current = registry.production_version(key) if registry is not None else None
+            if current and entry.get("version") and current != entry["version"]:
+                logger.info(f"Skipping {key} - retrained since it was flagged")
+                continue
+            logger.info(f"{key} flagged by online monitor: {'; '.join(entry['reasons'])}")
+            flagged[pair] = flagged.get(pair, 0) + 1
+        plan = [(symbol, model, horizons) for (symbol, model), horizons in flagged.items()]
+        plan.sort(key=lambda item: -item[2])
+        return plan
+    
+    def _retrain_parallel(self, plan: List[Tuple[str, str, int]]) -> List[RetrainResult]:
+        """
+        Retrain the plan on a process pool
+        
+        Each symbol's training data is loaded once in this process and shared
+        read-only with the workers; every (symbol, model, horizon) is a separate
+        scheduler job. Afterwards predictions are regenerated and saved for each
+        retrained symbol, as the subprocess path does with --save-db.
+        """
+        from scripts.ml.enhanced_ml_outlook import MLOutlookEngine, create_config_from_env as outlook_config
+        
+        if not plan:
+            return []
+        start_time = datetime.now(timezone.utc)
+        ml_config = outlook_config()
+        ml_config.symbols = list(dict.fromkeys(symbol for symbol, _, _ in plan))
+        ml_config.models = list(self.config.models)
+        ml_config.model_registry_dir = self.config.model_registry_dir
+        engine = MLOutlookEngine(ml_config)
+        scheduler = RetrainScheduler(
+            max_workers=self.config.max_workers or None,
+            memory_budget_mb=self.config.memory_budget_mb or default_memory_budget_mb(),
+        )
+        
+        cv = None
+        if self.config.cv_folds >= 2:
+            cv = PurgedCV(n_splits=self.config.cv_folds, mode=self.config.cv_mode,
+                          embargo=self.config.cv_embargo, min_train_size=ml_config.min_data_points)
+        
+        by_symbol: Dict[str, Dict[str, int]] = {}
+        for symbol, model, priority in plan:
+            by_symbol.setdefault(symbol, {})[model] = priority
+        
+        jobs, shared, load_errors = [], [], {}
+        job_results = {}
+        try:
+            for symbol, priorities in by_symbol.items():
+                try:
+                    features_df, targets_df = engine.prepare_training_data(symbol)
+                    symbol_jobs, symbol_shared = engine.build_training_jobs(
+                        symbol, features_df, targets_df, models=list(priorities), priorities=priorities, cv=cv
+                    )
+                    jobs.extend(symbol_jobs)
+                    shared.extend(symbol_shared)
+                except Exception as e:
+                    logger.error(f"❌ Could not prepare training data for {symbol}: {e}")
+                    load_errors[symbol] = str(e)
+            
+            logger.info(f"⏳ Running {len(jobs)} training and CV fold jobs on {scheduler.max_workers} workers")
+            job_results = scheduler.run(jobs)
+        finally:
+            for matrix in shared:
+                matrix.close()
+        engine.collect_training_results(job_results)
+        self.cv_reports = engine.collect_cv_results(job_results)
+        self.schedule_stats = dict(scheduler.stats)
+        
+        results = []
+        for symbol, priorities in by_symbol.items():
+            retrained = []
+            for model in priorities:
+                prefix = f"{symbol}_{model}_"
+                runs = [r for key, r in job_results.items() if key.startswith(prefix) and "/cv" not in key]
+                errors = [r.error for r in runs if not r.success]
+                if symbol in load_errors:
+                    errors.append(load_errors[symbol])
+                elif not runs:
+                    errors.append(f"Model {model} not available")
+                success = not errors
+                if success:
+                    retrained.append(model)
+                results.append(RetrainResult(
+                    symbol=symbol,
+                    model=model,
+                    success=success,
+                    training_time_seconds=sum(r.seconds for r in runs),
+                    error_message="; ".join(errors)[:200],
+                    timestamp=start_time,
+                ))
+            
+            if retrained:
+                try:
+                    engine.config.models = retrained
+                    engine.save_predictions_to_db(engine.generate_outlook(symbol))
+                except Exception as e:
+                    logger.warning(f"Failed to refresh predictions for {symbol}: {e}")
+                finally:
+                    engine.config.models = list(self.config.models)
+        
+        for result in results:
+            if result.success:
+                performance = self.performance_monitor.get_model_performance(result.symbol, result.model, days=1)
+                result.performance_score = performance.get("performance_score", 0.0)
+                logger.info(f"✅ {result.symbol}_{result.model} retrained successfully "
+                            f"(score: {result.performance_score:.3f})")
+            else:
+                logger.error(f"❌ {result.symbol}_{result.model} retraining failed: {result.error_message}")
+        
+        stats = self.schedule_stats
+        if stats:
+            logger.info(f"Scheduler: {stats['jobs']} jobs in {stats['wall_seconds']:.1f}s "
+                        f"({stats['job_seconds']:.1f}s of training, {stats['speedup']:.1f}x)")
+        return results
+    
     def _retrain_model(self, symbol: str, model: str) -> RetrainResult:
         """Retrain a single model"""
         start_time = datetime.now(timezone.utc)
@@ -439,8 +648,17 @@ class WeeklyRetrainEngine:
             logger.warning(f"Model backup failed: {e}")
     
     def _cleanup_old_models(self):
-        """Remove old model backups"""
+        """Remove old model backups and registry versions"""
         try:
+            registry_root = Path(self.config.model_registry_dir) if self.config.model_registry_dir else None
+            if registry_root is not None and registry_root.exists():
+                registry = get_registry(registry_root)
+                for key_dir in registry_root.iterdir():
+                    if key_dir.is_dir():
+                        removed = registry.prune(key_dir.name, keep=self.config.registry_versions_kept)
+                        if removed:
+                            logger.info(f"Pruned {len(removed)} old versions of {key_dir.name}")
+            
             cutoff_date = datetime.now() - timedelta(days=self.config.max_model_age_days)
             
             for backup_dir in self.backup_dir.glob("models_backup_*"):
@@ -492,7 +710,16 @@ def create_config_from_env() -> RetrainConfig:
         email_recipients=email_recipients,
         backup_models=os.getenv("EMO_BACKUP_MODELS", "true").lower() == "true",
         cleanup_old_models=os.getenv("EMO_CLEANUP_OLD_MODELS", "true").lower() == "true",
-        max_model_age_days=int(os.getenv("EMO_MAX_MODEL_AGE_DAYS", "30"))
+        max_model_age_days=int(os.getenv("EMO_MAX_MODEL_AGE_DAYS", "30")),
+        parallel=os.getenv("EMO_RETRAIN_PARALLEL", "true").lower() == "true",
+        max_workers=int(os.getenv("EMO_RETRAIN_WORKERS", "0")),
+        memory_budget_mb=float(os.getenv("EMO_RETRAIN_MEMORY_MB", "0")),
+        cv_folds=int(os.getenv("EMO_RETRAIN_CV_FOLDS", "5")),
+        cv_mode=os.getenv("EMO_RETRAIN_CV_MODE", "expanding"),
+        cv_embargo=int(os.getenv("EMO_RETRAIN_CV_EMBARGO", "0")),
+        drift_dir=os.getenv("EMO_ML_DRIFT_DIR", "data/ml_drift") or None,
+        model_registry_dir=os.getenv("EMO_ML_REGISTRY_DIR", "data/models/registry") or None,
+        targeted=os.getenv("EMO_RETRAIN_TARGETED", "false").lower() == "true"
     )
 
 def main():
@@ -503,6 +730,10 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="Show what would be done")
     parser.add_argument("--force", action="store_true", help="Force retrain all models")
     parser.add_argument("--status", action="store_true", help="Show model status only")
+    parser.add_argument("--workers", type=int, help="Training worker processes (default: EMO_RETRAIN_WORKERS or CPU count)")
+    parser.add_argument("--serial", action="store_true", help="Retrain one model at a time in subprocesses")
+    parser.add_argument("--targeted", action="store_true",
+                        help="Retrain only models flagged by the online accuracy/drift monitor")
     
     args = parser.parse_args()
     
@@ -525,6 +756,13 @@ def main():
     
     # Create config
     config = create_config_from_env()
+    config.force = args.force
+    if args.workers is not None:
+        config.max_workers = args.workers
+    if args.serial:
+        config.parallel = False
+    if args.targeted:
+        config.targeted = True
     
     # Create retraining engine
     engine = WeeklyRetrainEngine(config)
@@ -540,19 +778,21 @@ def main():
         elif args.dry_run:
             # Show what would be retrained
             logger.info("DRY RUN - Models that would be retrained:")
-            for symbol in config.symbols:
-                for model in config.models:
-                    needs_retrain = engine.performance_monitor.needs_retraining(
-                        symbol, model, config.performance_threshold
-                    )
-                    status = "RETRAIN" if needs_retrain else "SKIP"
-                    logger.info(f"  {symbol}_{model}: {status}")
+            if config.targeted:
+                for symbol, model, _ in engine._plan_retrains():
+                    logger.info(f"  {symbol}_{model}: RETRAIN")
+            else:
+                for symbol in config.symbols:
+                    for model in config.models:
+                        needs_retrain = engine.performance_monitor.needs_retraining(
+                            symbol, model, config.performance_threshold
+                        )
+                        status = "RETRAIN" if needs_retrain else "SKIP"
+                        logger.info(f"  {symbol}_{model}: {status}")
             
         else:
             # Run actual retraining
             if args.force:
-                # Override performance monitoring
-                engine.performance_monitor.needs_retraining = lambda s, m, t=None: True
                 logger.info("FORCE MODE - All models will be retrained")
             
             summary = engine.run_weekly_retrain()
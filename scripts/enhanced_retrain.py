@@ -18,81 +18,200 @@ sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from src.logic.risk_manager import RiskManager, OrderIntent
 from src.database.enhanced_data_collector import EnhancedDataCollector
+from src.ml.bulk import BarBlock, Cumulative, FeatureTensor, lag, load_bar_block, rolling_max, rolling_min
+from src.ml.feature_store import FeatureSet, FeatureStore
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA = ROOT / "data"
 DB = DATA / "emo.sqlite"
 ML_OUTPUT = DATA / "ml_outlook.json"
+FEATURES = DATA / "features"
+
+def compute_enhanced_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Technical features on 1Min bars with o/h/l/c/v columns (adds columns in place)."""
+    # Basic technical indicators
+    df["returns"] = df["c"].pct_change()
+    df["log_returns"] = np.log(df["c"] / df["c"].shift(1))
+
+    # Moving averages
+    df["sma_5"] = df["c"].rolling(5).mean()
+    df["sma_10"] = df["c"].rolling(10).mean()
+    df["sma_20"] = df["c"].rolling(20).mean()
+    df["sma_50"] = df["c"].rolling(50).mean()
+
+    # Volatility measures
+    df["volatility_5"] = df["returns"].rolling(5).std()
+    df["volatility_20"] = df["returns"].rolling(20).std()
+    df["volatility_ratio"] = df["volatility_5"] / df["volatility_20"]
+
+    # Volume indicators
+    df["volume_sma"] = df["v"].rolling(20).mean()
+    df["volume_ratio"] = df["v"] / df["volume_sma"]
+
+    # Price position indicators
+    df["price_position"] = (df["c"] - df["l"].rolling(20).min()) / (df["h"].rolling(20).max() - df["l"].rolling(20).min())
+
+    # Momentum indicators
+    df["momentum_5"] = (df["c"] / df["c"].shift(5)) - 1
+    df["momentum_10"] = (df["c"] / df["c"].shift(10)) - 1
+
+    # RSI approximation
+    gain = df["returns"].where(df["returns"] > 0, 0)
+    loss = -df["returns"].where(df["returns"] < 0, 0)
+    avg_gain = gain.rolling(14).mean()
+    avg_loss = loss.rolling(14).mean()
+    rs = avg_gain / avg_loss
+    df["rsi"] = 100 - (100 / (1 + rs))
+
+    # Trend strength
+    df["trend_strength"] = (df["sma_5"] - df["sma_20"]) / df["sma_20"]
+
+    return df
+
+ENHANCED_FEATURES = [
+    "returns", "log_returns", "sma_5", "sma_10", "sma_20", "sma_50",
+    "volatility_5", "volatility_20", "volatility_ratio", "volume_sma", "volume_ratio",
+    "price_position", "momentum_5", "momentum_10", "rsi", "trend_strength",
+]
+
+def enhanced_feature_tensor(block: BarBlock) -> FeatureTensor:
+    """compute_enhanced_features for every symbol of a BarBlock in one vectorized pass.
+
+    Each input gets one shared cumulative sum (the four SMAs come from the same
+    price prefix sums) and every feature is written straight into its column of
+    a preallocated (rows, features) matrix.
+    """
+    pos = block.position
+    c, h, l, v = block.c, block.h, block.l, block.v
+    values = np.empty((len(block), len(ENHANCED_FEATURES)), order="F")
+    col = {name: values[:, j] for j, name in enumerate(ENHANCED_FEATURES)}
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Basic technical indicators
+        prev = lag(c, pos, 1)
+        np.divide(c, prev, out=col["returns"])
+        col["log_returns"][:] = np.log(col["returns"])
+        col["returns"] -= 1
+
+        # Moving averages
+        price = Cumulative(c, pos)
+        for w in (5, 10, 20, 50):
+            col[f"sma_{w}"][:] = price.mean(w)
+
+        # Volatility measures
+        returns = Cumulative(col["returns"], pos, squares=True)
+        col["volatility_5"][:] = returns.std(5)
+        col["volatility_20"][:] = returns.std(20)
+        np.divide(col["volatility_5"], col["volatility_20"], out=col["volatility_ratio"])
+
+        # Volume indicators
+        col["volume_sma"][:] = Cumulative(v, pos).mean(20)
+        np.divide(v, col["volume_sma"], out=col["volume_ratio"])
+
+        # Price position indicators
+        low = rolling_min(l, pos, 20)
+        col["price_position"][:] = (c - low) / (rolling_max(h, pos, 20) - low)
+
+        # Momentum indicators
+        col["momentum_5"][:] = c / lag(c, pos, 5) - 1
+        col["momentum_10"][:] = c / lag(c, pos, 10) - 1
+
+        # RSI approximation (a NaN return counts as neither gain nor loss)
+        r = col["returns"]
+        avg_gain = Cumulative(np.where(r > 0, r, 0.0), pos, centre=False).mean(14)
+        avg_loss = Cumulative(np.where(r < 0, -r, 0.0), pos, centre=False).mean(14)
+        col["rsi"][:] = 100 - 100 / (1 + avg_gain / avg_loss)
+
+        # Trend strength
+        col["trend_strength"][:] = (col["sma_5"] - col["sma_20"]) / col["sma_20"]
+
+    return FeatureTensor(block, list(ENHANCED_FEATURES), values)
+
+ENHANCED_FEATURE_SET = FeatureSet(
+    name="enhanced_retrain",
+    version="v1",
+    compute=lambda bars: compute_enhanced_features(bars.copy()),
+    warmup=60,      # sma_50 plus the 20-bar windows on returns
+    dropna=True,
+)
 
 class EnhancedMLTrainer:
     """Enhanced ML trainer with risk management integration."""
     
-    def __init__(self):
+    def __init__(self, feature_store: Optional[FeatureStore] = None, use_feature_store: bool = True):
         self.risk_manager = RiskManager()
         self.data_collector = EnhancedDataCollector()
+        self.feature_store = (feature_store or FeatureStore(FEATURES)) if use_feature_store else None
         self.symbols = ["SPY", "QQQ", "IWM", "DIA", "AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "NVDA"]
     
     def load_enhanced_features(self, symbol: str, limit: int = 1000) -> pd.DataFrame:
         """Load price data with enhanced technical features."""
+        if self.feature_store is not None:
+            try:
+                return self._load_stored_features(symbol, limit)
+            except Exception as e:
+                print(f"[ml] Feature store unavailable for {symbol}, computing directly: {e}")
         try:
-            with sqlite3.connect(DB) as conn:
-                # Get price and volume data
-                df = pd.read_sql_query("""
+            return self.load_feature_tensor([symbol], limit).frame(symbol)
+        except Exception as e:
+            print(f"[ml] Error loading features for {symbol}: {e}")
+            return pd.DataFrame()
+    
+    def load_feature_tensor(self, symbols: List[str], limit: int = 1000) -> FeatureTensor:
+        """Latest `limit` 1Min bars of every symbol from one query, featurized in one pass."""
+        with sqlite3.connect(DB) as conn:
+            block = load_bar_block(conn, symbols, limit=limit, timeframe="1Min")
+        return enhanced_feature_tensor(block)
+    
+    def refresh_feature_store(self, symbols: List[str], limit: int = 1000) -> Dict[str, pd.DataFrame]:
+        """Bring stored features of every symbol up to date from one bar query.
+
+        Rows past each symbol's high-water mark are appended from the bulk
+        feature tensor. A symbol whose mark is older than its first complete
+        row (bars the block does not reach) is left to the per-symbol loader.
+        Returns the stored tail of every refreshed symbol.
+        """
+        fset = ENHANCED_FEATURE_SET
+        tensor = self.load_feature_tensor(symbols, limit=limit)
+        frames: Dict[str, pd.DataFrame] = {}
+        for symbol in symbols:
+            rows = tensor.frame(symbol)
+            if rows.empty:
+                continue
+            hw = self.feature_store.high_water(symbol, "1Min", fset)
+            if hw is not None and rows["ts"].iloc[0] > hw:
+                continue
+            self.feature_store.append(symbol, "1Min", fset, rows.set_index("ts"))
+            frames[symbol] = self.feature_store.read(symbol, "1Min", fset, tail=limit).reset_index()
+        return frames
+
+    def _load_stored_features(self, symbol: str, limit: int) -> pd.DataFrame:
+        """Extend the stored feature rows with bars past the high-water mark, then read the tail."""
+        fset = ENHANCED_FEATURE_SET
+        hw = self.feature_store.high_water(symbol, "1Min", fset)
+        with sqlite3.connect(DB) as conn:
+            if hw is None:
+                bars = pd.read_sql_query("""
                     SELECT t, o, h, l, c, v FROM bars
                     WHERE symbol=? AND tf='1Min'
                     ORDER BY t DESC
                     LIMIT ?
-                """, conn, params=[symbol, limit])
-                
-                if df.empty:
-                    return df
-                
-                # Sort chronologically
-                df = df.sort_values("t").reset_index(drop=True)
-                df["ts"] = pd.to_datetime(df["t"], unit="ms", utc=True)
-                
-                # Basic technical indicators
-                df["returns"] = df["c"].pct_change()
-                df["log_returns"] = np.log(df["c"] / df["c"].shift(1))
-                
-                # Moving averages
-                df["sma_5"] = df["c"].rolling(5).mean()
-                df["sma_10"] = df["c"].rolling(10).mean()
-                df["sma_20"] = df["c"].rolling(20).mean()
-                df["sma_50"] = df["c"].rolling(50).mean()
-                
-                # Volatility measures
-                df["volatility_5"] = df["returns"].rolling(5).std()
-                df["volatility_20"] = df["returns"].rolling(20).std()
-                df["volatility_ratio"] = df["volatility_5"] / df["volatility_20"]
-                
-                # Volume indicators
-                df["volume_sma"] = df["v"].rolling(20).mean()
-                df["volume_ratio"] = df["v"] / df["volume_sma"]
-                
-                # Price position indicators
-                df["price_position"] = (df["c"] - df["l"].rolling(20).min()) / (df["h"].rolling(20).max() - df["l"].rolling(20).min())
-                
-                # Momentum indicators
-                df["momentum_5"] = (df["c"] / df["c"].shift(5)) - 1
-                df["momentum_10"] = (df["c"] / df["c"].shift(10)) - 1
-                
-                # RSI approximation
-                gain = df["returns"].where(df["returns"] > 0, 0)
-                loss = -df["returns"].where(df["returns"] < 0, 0)
-                avg_gain = gain.rolling(14).mean()
-                avg_loss = loss.rolling(14).mean()
-                rs = avg_gain / avg_loss
-                df["rsi"] = 100 - (100 / (1 + rs))
-                
-                # Trend strength
-                df["trend_strength"] = (df["sma_5"] - df["sma_20"]) / df["sma_20"]
-                
-                return df.dropna()
-                
-        except Exception as e:
-            print(f"[ml] Error loading features for {symbol}: {e}")
-            return pd.DataFrame()
+                """, conn, params=[symbol, limit]).sort_values("t")
+            else:
+                # New bars plus `warmup` bars at or before the mark for the rolling windows
+                hw_ms = int(hw.timestamp() * 1000)
+                bars = pd.read_sql_query("""
+                    SELECT t, o, h, l, c, v FROM bars
+                    WHERE symbol=? AND tf='1Min' AND t >= COALESCE((
+                        SELECT t FROM bars WHERE symbol=? AND tf='1Min' AND t <= ?
+                        ORDER BY t DESC LIMIT 1 OFFSET ?), 0)
+                    ORDER BY t
+                """, conn, params=[symbol, symbol, hw_ms, fset.warmup])
+        
+        if not bars.empty:
+            bars.index = pd.to_datetime(bars["t"], unit="ms", utc=True).rename("ts")
+            self.feature_store.refresh(symbol, "1Min", fset, bars)
+        return self.feature_store.read(symbol, "1Min", fset, tail=limit).reset_index()
     
     def get_market_regime_features(self) -> Dict[str, float]:
         """Get current market regime features."""
@@ -357,11 +476,22 @@ class EnhancedMLTrainer:
         
         predictions = []
         
+        # Load and featurize every symbol at once (refreshing the feature store
+        # when there is one); symbols left out are loaded one by one below
+        frames: Dict[str, pd.DataFrame] = {}
+        try:
+            if self.feature_store is None:
+                frames = self.load_feature_tensor(self.symbols, limit=1000).frames()
+            else:
+                frames = self.refresh_feature_store(self.symbols, limit=1000)
+        except Exception as e:
+            print(f"[ml] Bulk feature load failed, loading per symbol: {e}")
+        
         for symbol in self.symbols:
             print(f"[ml] Processing {symbol}...")
             
             # Load enhanced features
-            features = self.load_enhanced_features(symbol, limit=1000)
+            features = frames[symbol] if symbol in frames else self.load_enhanced_features(symbol, limit=1000)
             
             if features.empty:
                 print(f"[ml] No data for {symbol}, skipping")
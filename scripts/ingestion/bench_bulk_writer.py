@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Bulk Bar Writer Benchmark
+Rows/sec for upserting synthetic 1-minute bars, old write paths vs the bulk writer.
+
+SQLite paths compared (each on a fresh database file), in two regimes:
+- cycle:    rows arrive --cycle at a time (one collector cycle) and each cycle
+            is committed, as the collectors do
+- backfill: rows are written --batch at a time
+Old paths run with the default rollback journal and synchronous=FULL:
+- per-row commit: one execute and one commit per bar (the old live_logger
+  fallback); runs on --legacy-rows
+- executemany:    one executemany + commit per cycle / batch (the old upsert_bars)
+New path: SQLiteBulkWriter (WAL, synchronous=NORMAL), through a BarBuffer for
+the backfill regime.
+
+Each path writes the rows twice, so the second pass measures the update branch
+of the upsert. With EMO_PG_DSN set and psycopg2 installed, the Postgres COPY +
+merge writer is measured against execute_batch as well.
+
+Usage:
+    python scripts/ingestion/bench_bulk_writer.py --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from src.database.bulk_writer import BAR_COLUMNS, PostgresBulkWriter, SQLiteBulkWriter
+
+SCHEMA = """
+CREATE TABLE bars (
+    symbol TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    open REAL, high REAL, low REAL, close REAL,
+    volume INTEGER,
+    PRIMARY KEY(symbol, ts)
+)
+"""
+UPSERT = """
+INSERT INTO bars(symbol, ts, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(symbol, ts) DO UPDATE SET
+    open=excluded.open, high=excluded.high, low=excluded.low, close=excluded.close, volume=excluded.volume
+"""
+
+
+def synthetic_bars(n: int, symbols: int = 100, seed: int = 0) -> List[Tuple]:
+    """``n`` bars spread over ``symbols`` symbols, interleaved by time as a live feed delivers them"""
+    rng = np.random.default_rng(seed)
+    minute = np.arange(n) // symbols
+    sym = np.arange(n) % symbols
+    close = 100 + rng.normal(0, 1, n).cumsum() / 100
+    ts = (np.datetime64("2024-01-02T14:30") + minute.astype("timedelta64[m]")).astype(str)
+    names = [f"S{i:03d}" for i in range(symbols)]
+    return list(zip([names[i] for i in sym], [t + ":00Z" for t in ts], close.tolist(), (close * 1.001).tolist(),
+                    (close * 0.999).tolist(), close.tolist(), rng.integers(100, 10_000, n).tolist()))
+
+
+def sqlite_db(path: Path, tuned: bool) -> sqlite3.Connection:
+    if path.exists():
+        path.unlink()
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    conn.commit()
+    if not tuned:
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute("PRAGMA synchronous=FULL")
+    return conn
+
+
+def per_row(conn: sqlite3.Connection, rows: List[Tuple], batch: int):
+    for row in rows:
+        conn.execute(UPSERT, row)
+        conn.commit()
+
+
+def executemany(conn: sqlite3.Connection, rows: List[Tuple], batch: int):
+    for i in range(0, len(rows), batch):
+        conn.executemany(UPSERT, rows[i:i + batch])
+        conn.commit()
+
+
+def bulk(conn: sqlite3.Connection, rows: List[Tuple], batch: int):
+    writer = SQLiteBulkWriter(conn)
+    for i in range(0, len(rows), batch):
+        writer.write(rows[i:i + batch])
+
+
+def buffered(conn: sqlite3.Connection, rows: List[Tuple], batch: int):
+    with SQLiteBulkWriter(conn).buffer(batch) as buffer:
+        buffer.extend(rows)
+
+
+def timed(fn: Callable, conn, rows, batch) -> float:
+    t0 = time.perf_counter()
+    fn(conn, rows, batch)
+    return time.perf_counter() - t0
+
+
+def bench_postgres(dsn: str, rows: List[Tuple], batch: int):
+    try:
+        import psycopg2
+        import psycopg2.extras
+    except ImportError:
+        print("postgres: psycopg2 not installed, skipped")
+        return
+    conn = psycopg2.connect(dsn)
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS bench_bars")
+        cur.execute(SCHEMA.replace("CREATE TABLE bars", "CREATE TABLE bench_bars").replace("TEXT NOT NULL,\n    ts TEXT",
+                                                                                             "TEXT NOT NULL,\n    ts TIMESTAMPTZ"))
+    conn.commit()
+    sql = UPSERT.replace("bars(", "bench_bars(").replace("?", "%s")
+    t0 = time.perf_counter()
+    for i in range(0, len(rows), batch):
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_batch(cur, sql, rows[i:i + batch], page_size=100)
+        conn.commit()
+    legacy = time.perf_counter() - t0
+    writer = PostgresBulkWriter(conn, "bench_bars", BAR_COLUMNS)
+    t0 = time.perf_counter()
+    for i in range(0, len(rows), batch):
+        writer.write(rows[i:i + batch])
+    copy = time.perf_counter() - t0
+    print(f"postgres execute_batch: {len(rows) / legacy:>12,.0f} rows/s")
+    print(f"postgres COPY + merge:  {len(rows) / copy:>12,.0f} rows/s")
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE bench_bars")
+    conn.commit()
+    conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark bulk bar upserts")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy-rows", type=int, default=5_000, help="Rows for the per-row commit path")
+    parser.add_argument("--cycle", type=int, default=100, help="Rows per collector cycle")
+    parser.add_argument("--batch", type=int, default=50_000, help="Rows per backfill transaction")
+    parser.add_argument("--dir", help="Directory for the benchmark databases (default: a temp dir)")
+    args = parser.parse_args()
+
+    rows = synthetic_bars(args.rows)
+    print(f"{args.rows:,} synthetic bars; cycles of {args.cycle:,}, backfill batches of {args.batch:,}")
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        path = Path(tmp) / "bench.sqlite"
+        results = []
+        for name, fn, tuned, n, batch in (("per-row commit", per_row, False, args.legacy_rows, 1),
+                                          ("cycle executemany", executemany, False, args.rows, args.cycle),
+                                          ("cycle bulk writer", bulk, True, args.rows, args.cycle),
+                                          ("backfill executemany", executemany, False, args.rows, args.batch),
+                                          ("backfill bulk buffer", buffered, True, args.rows, args.batch)):
+            conn = sqlite_db(path, tuned)
+            insert = timed(fn, conn, rows[:n], batch)
+            update = timed(fn, conn, rows[:n], batch)
+            stored = conn.execute("SELECT COUNT(*) FROM bars").fetchone()[0]
+            conn.close()
+            assert stored == n, (name, stored, n)
+            results.append((name, n, n / insert, n / update))
+
+        print(f"{'sqlite path':<22}{'rows':>11}{'insert rows/s':>16}{'update rows/s':>16}")
+        for name, n, ins, upd in results:
+            print(f"{name:<22}{n:>11,}{ins:>16,.0f}{upd:>16,.0f}")
+        for regime, old, new in (("cycle", results[1], results[2]), ("backfill", results[3], results[4])):
+            print(f"{regime}: bulk writer {new[2] / old[2]:.2f}x insert, {new[3] / old[3]:.2f}x update vs executemany")
+        print(f"per-cycle bulk writer vs per-row commit: {results[2][2] / results[0][2]:.0f}x insert")
+
+    dsn = os.getenv("EMO_PG_DSN")
+    if dsn:
+        bench_postgres(dsn, rows, args.batch)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
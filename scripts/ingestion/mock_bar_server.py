@@ -0,0 +1,214 @@
+"""
+Mock Market Data Server
+Local HTTP stand-in for the Alpaca v2 bars endpoint, for tests and offline runs.
+
+Serves GET /v2/stocks/{symbol}/bars and the multi-symbol
+GET /v2/stocks/bars/latest?symbols=... with the same JSON shapes as Alpaca.
+Bars are a deterministic function of (symbol, timeframe, bar time), so any
+two requests that overlap return identical rows. The server can add latency,
+enforce its own rate limit (HTTP 429) and withhold bars in given time ranges,
+and records request and connection counts and the peak number of requests
+in flight.
+
+Usage:
+    with MockBarServer(latency=0.05) as server:
+        os.environ["ALPACA_DATA_URL"] = server.url
+        ...
+"""
+import json
+import math
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+TIMEFRAME_SECONDS = {"1Min": 60, "5Min": 300, "15Min": 900, "1Hour": 3600, "1Day": 86400}
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc)
+
+def _format_time(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def mock_bar(symbol: str, ts: datetime, step: int) -> Dict:
+    """Deterministic Alpaca-style bar for ``symbol`` at ``ts``"""
+    k = int(ts.timestamp()) // step
+    base = 50 + zlib.crc32(symbol.encode()) % 400
+    close = base * (1 + 0.01 * math.sin(k / 37.0) + 0.002 * math.sin(k * 1.7))
+    open_ = base * (1 + 0.01 * math.sin((k - 1) / 37.0) + 0.002 * math.sin((k - 1) * 1.7))
+    return {
+        "t": _format_time(ts),
+        "o": round(open_, 4),
+        "h": round(max(open_, close) * 1.0005, 4),
+        "l": round(min(open_, close) * 0.9995, 4),
+        "c": round(close, 4),
+        "v": 1000 + zlib.crc32(f"{symbol}{k}".encode()) % 9000,
+        "n": 10 + k % 50,
+        "vw": round((open_ + close) / 2, 4),
+    }
+
+class MockBarServer:
+    """Threaded mock bars server on 127.0.0.1 (an ephemeral port by default)"""
+
+    def __init__(self, port: int = 0, latency: float = 0.0, rate_limit: Optional[int] = None,
+                 rate_window: float = 60.0, now: Optional[datetime] = None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.now = now  # bars are served up to this time (default: the real clock)
+        self.holes: List[Tuple[datetime, datetime]] = []  # bars in these ranges are withheld (an outage)
+        self.unknown_symbols: set = set()  # left out of multi-symbol responses
+        self.requests = 0
+        self.throttled = 0
+        self.connections = 0  # TCP connections accepted (keep-alive clients reuse them)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.log: List[Dict] = []
+        self._times: List[float] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as ALPACA_DATA_URL"""
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v2"
+
+    def start(self) -> "MockBarServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-bar-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockBarServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def bars(self, symbol: str, timeframe: str, start: datetime, end: Optional[datetime] = None,
+             limit: int = 1000) -> List[Dict]:
+        """Bars the endpoint returns for these parameters"""
+        step = TIMEFRAME_SECONDS[timeframe]
+        stop = min(end or datetime.max.replace(tzinfo=timezone.utc), self.now or datetime.now(timezone.utc))
+        first = math.ceil(start.timestamp() / step) * step
+        out = []
+        ts = datetime.fromtimestamp(first, timezone.utc)
+        while ts <= stop and len(out) < limit:
+            if not any(lo <= ts <= hi for lo, hi in self.holes):
+                out.append(mock_bar(symbol, ts, step))
+            ts += timedelta(seconds=step)
+        return out
+
+    def latest_bar(self, symbol: str, timeframe: str = "1Min") -> Dict:
+        """Bar the latest-bars endpoint returns for ``symbol``"""
+        step = TIMEFRAME_SECONDS[timeframe]
+        now = (self.now or datetime.now(timezone.utc)).timestamp()
+        return mock_bar(symbol, datetime.fromtimestamp(now // step * step, timezone.utc), step)
+
+    def _enter(self) -> bool:
+        """Count a request; False if it exceeds the server's own rate limit"""
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            if self.rate_limit is not None:
+                self._times = [t for t in self._times if now - t < self.rate_window]
+                if len(self._times) >= self.rate_limit:
+                    self.throttled += 1
+                    return False
+                self._times.append(now)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return True
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def log_message(self, format, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def _send(self, code: int, body: Dict):
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if code == 429:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                latest = parts == ["v2", "stocks", "bars", "latest"]
+                if not latest and (len(parts) != 4 or parts[:2] != ["v2", "stocks"] or parts[3] != "bars"):
+                    self._send(404, {"message": "not found"})
+                    return
+                if not server._enter():
+                    self._send(429, {"message": "too many requests"})
+                    return
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                    if latest:
+                        symbols = [s for s in query.get("symbols", "").split(",") if s]
+                        bars = {s: server.latest_bar(s) for s in symbols if s not in server.unknown_symbols}
+                        with server._lock:
+                            server.log.append({"symbols": symbols, "bars": len(bars)})
+                        self._send(200, {"bars": bars})
+                        return
+                    symbol, timeframe = parts[2], query.get("timeframe", "1Min")
+                    if timeframe not in TIMEFRAME_SECONDS:
+                        self._send(422, {"message": f"invalid timeframe {timeframe}"})
+                        return
+                    start = _parse_time(query["start"])
+                    end = _parse_time(query["end"]) if "end" in query else None
+                    bars = server.bars(symbol, timeframe, start, end, int(query.get("limit", 1000)))
+                    with server._lock:
+                        server.log.append({"symbol": symbol, "timeframe": timeframe, **query, "bars": len(bars)})
+                    self._send(200, {"symbol": symbol, "bars": bars, "next_page_token": None})
+                finally:
+                    server._exit()
+
+        return Handler
+
+def main():
+    """Serve mock bars until interrupted"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mock Alpaca bars server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--rate-limit", type=int, help="Requests per minute before answering 429")
+    args = parser.parse_args()
+
+    server = MockBarServer(args.port, latency=args.latency, rate_limit=args.rate_limit).start()
+    print(f"Mock bars server on {server.url} (set ALPACA_DATA_URL to this)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
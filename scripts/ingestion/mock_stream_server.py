@@ -0,0 +1,197 @@
+"""
+Mock Market Data Stream
+Local websocket stand-in for the Alpaca v2 market-data stream, for tests and offline runs.
+
+Speaks the stream protocol: sends ``[{"T":"success","msg":"connected"}]`` on
+connect, answers ``auth`` with ``authenticated`` (or error 402 for wrong
+credentials) and ``subscribe`` / ``unsubscribe`` with the connection's
+current ``subscription``. Bars and quotes pushed through ``push_bar`` /
+``push_quote`` go to every connection subscribed to the symbol; bar values
+come from ``mock_bar`` so they match the REST mock server. ``drop`` aborts
+every connection without a close handshake, as a network failure would.
+
+Runs on the caller's event loop:
+
+    async with MockStreamServer() as server:
+        config = StreamConfig(url=server.url, key_id="key", secret_key="secret")
+        ...
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.ingestion.mock_bar_server import mock_bar
+from src.database.stream_ingester import MiniWebSocket, WebSocketClosed
+
+
+class _Client:
+    def __init__(self, ws: MiniWebSocket, number: int):
+        self.ws = ws
+        self.number = number
+        self.authenticated = False
+        self.bars: set = set()
+        self.quotes: set = set()
+
+
+class MockStreamServer:
+    """Asyncio websocket server on 127.0.0.1 (an ephemeral port by default)"""
+
+    def __init__(self, key: str = "key", secret: str = "secret", port: int = 0):
+        self.key = key
+        self.secret = secret
+        self.port = port
+        self.clients: List[_Client] = []
+        self.connections = 0
+        self.log: List[Dict] = []  # every client action, with the connection number
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def url(self) -> str:
+        """URL to use as ALPACA_STREAM_URL"""
+        return f"ws://127.0.0.1:{self.port}/v2/iex"
+
+    async def start(self) -> "MockStreamServer":
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.drop()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self) -> "MockStreamServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _send(self, client: _Client, msgs: List[Dict]):
+        await client.ws.send(json.dumps(msgs))
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            ws = await MiniWebSocket.accept(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        self.connections += 1
+        client = _Client(ws, self.connections)
+        self.clients.append(client)
+        try:
+            await self._send(client, [{"T": "success", "msg": "connected"}])
+            while True:
+                msg = json.loads(await ws.recv())
+                self.log.append(dict(msg, connection=client.number))
+                await self._action(client, msg)
+                await self._notify()
+        except (WebSocketClosed, ConnectionError, ValueError):
+            pass
+        finally:
+            self.clients.remove(client)
+            writer.close()
+            await self._notify()
+
+    async def _action(self, client: _Client, msg: Dict):
+        action = msg.get("action")
+        if action == "auth":
+            if msg.get("key") == self.key and msg.get("secret") == self.secret:
+                client.authenticated = True
+                await self._send(client, [{"T": "success", "msg": "authenticated"}])
+            else:
+                await self._send(client, [{"T": "error", "code": 402, "msg": "auth failed"}])
+                await client.ws.close()
+        elif not client.authenticated:
+            await self._send(client, [{"T": "error", "code": 401, "msg": "not authenticated"}])
+        elif action in ("subscribe", "unsubscribe"):
+            update = set.update if action == "subscribe" else set.difference_update
+            update(client.bars, msg.get("bars", []))
+            update(client.quotes, msg.get("quotes", []))
+            await self._send(client, [{"T": "subscription", "bars": sorted(client.bars),
+                                       "quotes": sorted(client.quotes)}])
+        else:
+            await self._send(client, [{"T": "error", "code": 400, "msg": "invalid syntax"}])
+
+    async def wait_for(self, predicate, timeout: float = 5.0):
+        """Wait until ``predicate(server)`` holds (checked after every client action)"""
+        async with self._changed:
+            await asyncio.wait_for(self._changed.wait_for(lambda: predicate(self)), timeout)
+
+    async def wait_subscribed(self, bars=(), quotes=(), timeout: float = 5.0):
+        """Wait for an authenticated connection subscribed to all of ``bars`` and ``quotes``"""
+        await self.wait_for(lambda s: any(c.authenticated and c.bars >= set(bars) and c.quotes >= set(quotes)
+                                          for c in s.clients), timeout)
+
+    async def _broadcast(self, kind: str, symbol: str, msg: Dict) -> int:
+        sent = 0
+        for client in list(self.clients):
+            if symbol in getattr(client, kind):
+                try:
+                    await self._send(client, [msg])
+                    sent += 1
+                except ConnectionError:
+                    pass
+        return sent
+
+    async def push_bar(self, symbol: str, ts: Optional[datetime] = None, correction: bool = False, **fields) -> int:
+        """Send a 1Min bar to the subscribed connections; returns how many received it"""
+        ts = ts or datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        msg = dict(mock_bar(symbol, ts, 60), T="u" if correction else "b", S=symbol, **fields)
+        return await self._broadcast("bars", symbol, msg)
+
+    async def push_quote(self, symbol: str, bid: float, ask: float, ts: Optional[datetime] = None,
+                         size: int = 100) -> int:
+        ts = ts or datetime.now(timezone.utc)
+        msg = {"T": "q", "S": symbol, "bp": bid, "bs": size, "ap": ask, "as": size,
+               "t": ts.isoformat().replace("+00:00", "Z")}
+        return await self._broadcast("quotes", symbol, msg)
+
+    async def push_raw(self, payload: str):
+        """Send ``payload`` as-is to every connection"""
+        for client in list(self.clients):
+            await client.ws.send(payload)
+
+    def drop(self):
+        """Abort every connection (no close frame)"""
+        for client in list(self.clients):
+            client.ws.closed = True
+            client.ws.writer.transport.abort()
+
+
+async def _serve_forever(port: int, interval: float):
+    async with MockStreamServer(port=port) as server:
+        print(f"Mock stream on {server.url} (set ALPACA_STREAM_URL to this; key/secret: key/secret)")
+        while True:
+            await asyncio.sleep(interval)
+            ts = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+            for symbol in sorted({s for c in server.clients for s in c.bars}):
+                await server.push_bar(symbol, ts)
+
+
+def main():
+    """Serve a bar per subscribed symbol every --interval seconds until interrupted"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mock Alpaca market-data stream")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between bar pushes")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve_forever(args.port, args.interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
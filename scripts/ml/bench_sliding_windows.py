@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Sliding Window Benchmark
+Compares the stacked-copy window builder with the strided-view implementation.
+
+Reports wall time and peak traced memory for building windows and for one
+full pass of mini-batches. The legacy copy path allocates N*lookback*F values,
+so it runs on --legacy-rows (default 100k) and is extrapolated linearly to
+--rows for the comparison table.
+
+Usage:
+    python scripts/ml/bench_sliding_windows.py --rows 1000000 --features 8 --lookback 60
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from src.ml.features import iter_window_batches, sliding_windows
+
+
+def legacy_sliding_windows(X: np.ndarray, y: np.ndarray, lookback: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Previous list-of-slices implementation, kept here for comparison"""
+    seqs, targets = [], []
+    for t in range(lookback, len(X)):
+        seqs.append(X[t - lookback:t])
+        targets.append(y[t])
+    return np.array(seqs), np.array(targets)
+
+
+def measure(fn: Callable[[], object]) -> Tuple[float, float]:
+    """Return (seconds, peak MiB) for one call"""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak / 2**20
+
+
+def consume_batches(X, y, lookback, batch_size) -> int:
+    n = 0
+    for xb, yb in iter_window_batches(X, y, lookback, batch_size):
+        n += len(yb)
+    return n
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark sliding window construction")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy-rows", type=int, default=100_000)
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--lookback", type=int, default=60)
+    parser.add_argument("--batch-size", type=int, default=512)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((args.rows, args.features)).astype(np.float32)
+    y = rng.standard_normal(args.rows).astype(np.float32)
+    input_mib = (X.nbytes + y.nbytes) / 2**20
+
+    # Correctness on a slice small enough for the legacy path
+    k = min(args.rows, 5_000)
+    a, b = sliding_windows(X[:k], y[:k], args.lookback)
+    c, d = legacy_sliding_windows(X[:k], y[:k], args.lookback)
+    assert a.shape == c.shape and np.array_equal(a, c) and np.array_equal(b, d)
+
+    lr = min(args.rows, args.legacy_rows)
+    legacy_t, legacy_mem = measure(lambda: legacy_sliding_windows(X[:lr], y[:lr], args.lookback))
+    scale = args.rows / lr
+    view_t, view_mem = measure(lambda: sliding_windows(X, y, args.lookback))
+    batch_t, batch_mem = measure(lambda: consume_batches(X, y, args.lookback, args.batch_size))
+
+    print(f"rows={args.rows:,} features={args.features} lookback={args.lookback} "
+          f"input={input_mib:,.1f} MiB")
+    print(f"{'method':<34}{'time (s)':>12}{'peak MiB':>14}")
+    print(f"{'legacy copy (extrapolated)':<34}{legacy_t * scale:>12.3f}{legacy_mem * scale:>14.1f}")
+    print(f"{'strided view':<34}{view_t:>12.4f}{view_mem:>14.3f}")
+    print(f"{'mini-batches, full pass':<34}{batch_t:>12.3f}{batch_mem:>14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
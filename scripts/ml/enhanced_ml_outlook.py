@@ -22,10 +22,18 @@ ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(ROOT))
 
 from src.database.enhanced_router import DBRouter
+from src.ml.incremental import CORE_FEATURES, IncrementalFeatureEngine
+from src.ml.feature_store import FeatureSet, FeatureStore
+from src.ml.forest import FlatForest, export_forest
+from src.ml.drift import FeatureProfile, get_drift_monitor
+from src.ml.registry import ModelRegistry, get_registry
+from src.ml.scheduler import JobResult, RetrainScheduler, SharedMatrix, TrainJob
+from src.ml.validation import CVReport, PurgedCV, build_fold_jobs, collect_reports
 
 # ML imports (with fallbacks)
 try:
     from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import make_pipeline
     from sklearn.preprocessing import StandardScaler
     from sklearn.model_selection import TimeSeriesSplit
     from sklearn.metrics import mean_squared_error, mean_absolute_error
@@ -54,6 +62,9 @@ class MLOutlookConfig:
     retrain_threshold_days: int = 7
     confidence_threshold: float = 0.6
     feature_windows: List[int] = None  # [5, 10, 20] periods
+    feature_store_dir: Optional[str] = "data/features"  # None disables the feature store
+    model_registry_dir: Optional[str] = "data/models/registry"  # None keeps flat pickles in data/models
+    drift_dir: Optional[str] = "data/ml_drift"  # online accuracy/drift monitor state; None disables it
 
 @dataclass
 class MLPrediction:
@@ -74,9 +85,37 @@ class FeatureEngineer:
     def __init__(self, config: MLOutlookConfig):
         self.config = config
         self.feature_windows = config.feature_windows or [5, 10, 20]
+        self.store = FeatureStore(config.feature_store_dir) if config.feature_store_dir else None
+        # Windows are part of the version so changing them rematerializes the store
+        self.feature_set = FeatureSet(
+            name="outlook",
+            version="v1-w" + "-".join(str(w) for w in self.feature_windows),
+            compute=self._compute_features,
+            warmup=max(self.feature_windows + [20]) + 2,
+        )
     
-    def create_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Create technical features from price data"""
+    def create_features(self, df: pd.DataFrame, symbol: Optional[str] = None,
+                        timeframe: str = "1Min") -> pd.DataFrame:
+        """Create technical features, served from the feature store when a symbol is given"""
+        if df.empty or self.store is None or symbol is None:
+            return self._compute_features(df)
+        
+        try:
+            # Only bars past the store's high-water mark are computed
+            self.store.refresh(symbol, timeframe, self.feature_set, df)
+            stored = self.store.read(symbol, timeframe, self.feature_set, start=df.index[0], end=df.index[-1])
+            if len(stored) == len(df):
+                for col in df.columns:  # non-numeric inputs (e.g. symbol) are not stored
+                    if col not in stored.columns:
+                        stored[col] = df[col]
+                return stored
+        except Exception as e:
+            logger.warning(f"Feature store unavailable for {symbol}: {e}")
+        
+        return self._compute_features(df)
+    
+    def _compute_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Compute technical features from price data"""
         if df.empty:
             return df
         
@@ -136,19 +175,10 @@ class FeatureEngineer:
         targets_df = pd.DataFrame(index=df.index)
         
         for horizon in horizons:
-            # Parse horizon (e.g., "1h", "1d", "5d")
-            if horizon.endswith('h'):
-                periods = int(horizon[:-1])
-                # For hour horizons, assume we have minute data
-                target_col = f'target_{horizon}'
-            elif horizon.endswith('d'):
-                periods = int(horizon[:-1])
-                # For day horizons, shift by days worth of periods
-                # Assume 390 minutes per trading day (6.5 hours)
-                periods = periods * 390
-                target_col = f'target_{horizon}'
-            else:
+            periods = horizon_periods(horizon)
+            if periods is None:
                 continue
+            target_col = f'target_{horizon}'
             
             # Future return target
             future_return = df['close'].shift(-periods) / df['close'] - 1
@@ -163,14 +193,28 @@ class FeatureEngineer:
         
         return targets_df
 
+def horizon_periods(horizon: str) -> Optional[int]:
+    """Bars ahead for a horizon label (e.g. "1h", "1d", "5d"), None if unsupported"""
+    if horizon.endswith('h'):
+        # For hour horizons, assume we have minute data
+        return int(horizon[:-1])
+    if horizon.endswith('d'):
+        # For day horizons, shift by days worth of periods
+        # Assume 390 minutes per trading day (6.5 hours)
+        return int(horizon[:-1]) * 390
+    return None
+
 class RandomForestModel:
     """Random Forest model for market prediction"""
     
+    PARAMS = dict(n_estimators=100, max_depth=10, min_samples_split=10, min_samples_leaf=5, random_state=42)
+    
     def __init__(self, config: MLOutlookConfig):
         self.config = config
         self.model = None
         self.scaler = StandardScaler()
         self.feature_names = []
+        self.feature_profile = None
         self.model_version = "rf_v1.0"
         
     def train(self, features_df: pd.DataFrame, targets_df: pd.DataFrame, 
@@ -196,16 +240,11 @@ class RandomForestModel:
         X_scaled = self.scaler.fit_transform(X)
         
         # Train model
-        self.model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=10,
-            min_samples_leaf=5,
-            random_state=42
-        )
+        self.model = RandomForestRegressor(**self.PARAMS)
         
         self.model.fit(X_scaled, y)
         self.feature_names = feature_cols
+        self.feature_profile = FeatureProfile.fit(X.to_numpy(dtype=np.float64), feature_cols)
         
         # Calculate performance metrics
         y_pred = self.model.predict(X_scaled)
@@ -237,24 +276,72 @@ class RandomForestModel:
         X_scaled = self.scaler.transform(latest_features)
         prediction = self.model.predict(X_scaled)[0]
         
-        # Convert to signal (-1 to 1)
-        signal = np.clip(prediction, -1, 1)
-        
-        # Estimate confidence based on feature quality and model certainty
-        # This is a simplified confidence estimation
-        confidence = min(0.95, abs(signal) + 0.3)
-        
-        return float(signal), float(confidence)
+        return _signal_confidence(prediction)
+    
+    def compact(self) -> "CompactRandomForestModel":
+        """Inference-only copy with the forest flattened into NumPy arrays"""
+        if self.model is None:
+            raise ValueError("Model not trained")
+        return CompactRandomForestModel(
+            forest=export_forest(self.model),
+            mean=np.asarray(self.scaler.mean_, dtype=np.float64),
+            scale=np.asarray(self.scaler.scale_, dtype=np.float64),
+            feature_names=list(self.feature_names),
+            model_version=self.model_version,
+            feature_profile=self.feature_profile,
+        )
     
     def _select_features(self, df: pd.DataFrame) -> List[str]:
         """Select relevant features for training"""
-        # Exclude target columns and non-numeric columns
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        feature_cols = [col for col in numeric_cols 
-                       if not col.startswith('target_') 
-                       and col not in ['open', 'high', 'low', 'close', 'volume']]
+        return select_feature_columns(df)
+
+class CompactRandomForestModel:
+    """
+    Trained RandomForestModel reduced to flat node arrays and scaler statistics
+    
+    Gives the same predictions without sklearn, in a fraction of the memory
+    and single-row latency. This is what the model registry stores.
+    """
+    
+    def __init__(self, forest: FlatForest, mean: np.ndarray, scale: np.ndarray,
+                 feature_names: List[str], model_version: str,
+                 feature_profile: Optional[FeatureProfile] = None):
+        self.forest = forest
+        self.mean = mean
+        self.scale = scale
+        self.feature_names = feature_names
+        self.model_version = model_version
+        self.feature_profile = feature_profile  # training feature distribution, for drift monitoring
+    
+    def predict(self, features_df: pd.DataFrame) -> Tuple[float, float]:
+        """Make prediction and return (signal, confidence)"""
+        latest_features = features_df[self.feature_names].iloc[-1:].dropna()
+        if latest_features.empty:
+            return 0.0, 0.0
+        
+        # Same arithmetic as StandardScaler.transform
+        X_scaled = (latest_features.to_numpy(dtype=np.float64) - self.mean) / self.scale
+        prediction = self.forest.predict(X_scaled)[0]
         
-        return feature_cols
+        return _signal_confidence(prediction)
+
+def _signal_confidence(prediction: float) -> Tuple[float, float]:
+    """Model output -> (signal, confidence)"""
+    # Convert to signal (-1 to 1)
+    signal = np.clip(prediction, -1, 1)
+    
+    # Estimate confidence based on feature quality and model certainty
+    # This is a simplified confidence estimation
+    confidence = min(0.95, abs(signal) + 0.3)
+    
+    return float(signal), float(confidence)
+
+def select_feature_columns(df: pd.DataFrame) -> List[str]:
+    """Numeric feature columns used for training (no targets, no raw OHLCV)"""
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    return [col for col in numeric_cols
+            if not col.startswith('target_')
+            and col not in ['open', 'high', 'low', 'close', 'volume']]
 
 class MockLSTMModel:
     """Mock LSTM model when TensorFlow not available"""
@@ -287,6 +374,62 @@ class MockLSTMModel:
             
         return float(signal), float(confidence)
 
+def rf_estimator():
+    """Unfitted scaler + forest with RandomForestModel's settings (cross-validation folds)"""
+    return make_pipeline(StandardScaler(), RandomForestRegressor(**RandomForestModel.PARAMS))
+
+# Models that can be cross-validated, by name -> picklable estimator factory
+CV_ESTIMATORS = {"rf": rf_estimator}
+
+def create_model(model_name: str, config: MLOutlookConfig):
+    """Model instance for a configured model name, or None when unavailable"""
+    if model_name == "rf" and SKLEARN_AVAILABLE:
+        return RandomForestModel(config)
+    if model_name == "lstm":
+        return MockLSTMModel(config)  # Use mock for now
+    return None
+
+def training_window(features_df: pd.DataFrame) -> Dict[str, Any]:
+    """Start/end/rows of a training frame, recorded with each registered model"""
+    if features_df.empty:
+        return {"rows": 0}
+    return {"start": str(features_df.index[0]), "end": str(features_df.index[-1]), "rows": len(features_df)}
+
+def store_model(model, model_key: str, model_dir: Path, registry: Optional[ModelRegistry] = None,
+                metrics: Optional[Dict[str, Any]] = None, window: Optional[Dict[str, Any]] = None):
+    """Register a trained model, or write a flat pickle when no registry is configured"""
+    if hasattr(model, "compact"):
+        model = model.compact()
+    if registry is not None:
+        registry.register(model_key, model, metrics=metrics, training_window=window)
+        return
+    # Write then rename so a reader never sees a half-written pickle
+    cache_path = Path(model_dir) / f"{model_key}.pkl"
+    tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        pickle.dump(model, f)
+    os.replace(tmp, cache_path)
+
+def train_model_job(arrays: Dict[str, np.ndarray], config: MLOutlookConfig, model_key: str,
+                    model_name: str, target_col: str, feature_names: List[str],
+                    target_names: List[str], model_dir: str,
+                    window: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Train one (symbol, model, horizon) on shared matrices and cache the model
+
+    Runs inside a RetrainScheduler worker. ``arrays`` holds the read-only
+    feature matrix "X" and target matrix "y" published by build_training_jobs.
+    """
+    features_df = pd.DataFrame(arrays["X"], columns=feature_names, copy=False)
+    targets_df = pd.DataFrame(arrays["y"], columns=target_names, copy=False)
+    model = create_model(model_name, config)
+    if model is None:
+        raise ValueError(f"Model {model_name} not available")
+    result = model.train(features_df, targets_df, target_col)
+    registry = ModelRegistry(config.model_registry_dir, cache_size=0) if config.model_registry_dir else None
+    store_model(model, model_key, Path(model_dir), registry, metrics=result, window=window)
+    return result
+
 class MLOutlookEngine:
     """Main ML outlook engine"""
     
@@ -299,14 +442,17 @@ class MLOutlookEngine:
         self.models = {}
         self.model_cache_dir = Path("data/models")
         self.model_cache_dir.mkdir(parents=True, exist_ok=True)
+        self.registry = get_registry(config.model_registry_dir) if config.model_registry_dir else None
+        self.drift = get_drift_monitor(config.drift_dir) if config.drift_dir else None
         
-    def get_market_data(self, symbol: str, days: int = None) -> pd.DataFrame:
-        """Get market data for symbol"""
-        days = days or self.config.lookback_days
-        start_date = datetime.now(timezone.utc) - timedelta(days=days)
+        # Bars already read per symbol, trimmed to the widest window asked for:
+        # symbol -> (earliest ts the cache is complete from, bars)
+        self._bars: Dict[str, Tuple[pd.Timestamp, pd.DataFrame]] = {}
+        self._bar_window: Dict[str, int] = {}
+        # Core ML features continue each symbol's history as the window slides
+        self.feature_engine = IncrementalFeatureEngine()
         
-        try:
-            sql = """
+    BARS_SQL = """
             SELECT ts, symbol, open, high, low, close, volume
             FROM bars 
             WHERE symbol = :symbol 
@@ -314,32 +460,239 @@ class MLOutlookEngine:
                 AND timeframe = '1Min'
             ORDER BY ts
             """
+    BARS_AFTER_SQL = """
+            SELECT ts, symbol, open, high, low, close, volume
+            FROM bars 
+            WHERE symbol = :symbol 
+                AND ts > :after
+                AND timeframe = '1Min'
+            ORDER BY ts
+            """
+        
+    def get_market_data(self, symbol: str, days: int = None) -> pd.DataFrame:
+        """
+        Get market data for symbol, with the core ML features appended
+        
+        Bars of earlier calls are kept per symbol, so a repeat call only reads
+        bars newer than the cache; the cache is trimmed to the widest window
+        requested, so each call costs the window, not all history seen. The
+        core features are extended by the incremental engine, which computes
+        only the bars it has not seen.
+        """
+        days = days or self.config.lookback_days
+        start_date = datetime.now(timezone.utc) - timedelta(days=days)
+        
+        try:
+            self._bar_window[symbol] = max(days, self._bar_window.get(symbol, 0))
+            covered, cached = self._bars.get(symbol, (None, None))
+            if cached is not None and not cached.empty and covered <= self._as_index_ts(start_date, cached.index):
+                # Cache is complete for the window: only read bars after the last one
+                new = DBRouter.fetch_df(self.BARS_AFTER_SQL, symbol=symbol,
+                                        after=cached.index[-1].to_pydatetime())
+                if not new.empty:
+                    new['ts'] = pd.to_datetime(new['ts'])
+                    cached = pd.concat([cached, new.set_index('ts')])
+            else:
+                cached = DBRouter.fetch_df(self.BARS_SQL, symbol=symbol, start_date=start_date)
+                if cached.empty:
+                    return cached
+                cached['ts'] = pd.to_datetime(cached['ts'])
+                cached = cached.set_index('ts')
+                covered = self._as_index_ts(start_date, cached.index)
             
-            df = DBRouter.fetch_df(sql, symbol=symbol, start_date=start_date)
-            
-            if not df.empty:
-                df['ts'] = pd.to_datetime(df['ts'])
-                df = df.set_index('ts')
+            keep_from = self._as_index_ts(
+                datetime.now(timezone.utc) - timedelta(days=self._bar_window[symbol]), cached.index)
+            if not cached.empty and cached.index[0] < keep_from:
+                cached = cached[cached.index >= keep_from]
+            self._bars[symbol] = (max(covered, keep_from), cached)
             
+            df = cached[cached.index >= self._as_index_ts(start_date, cached.index)].copy()
+            df[CORE_FEATURES] = self.feature_engine.update(symbol, df)[CORE_FEATURES]
             return df
             
         except Exception as e:
             logger.error(f"Failed to get market data for {symbol}: {e}")
             return pd.DataFrame()
     
-    def train_models(self, symbol: str) -> Dict[str, Any]:
-        """Train all models for a symbol"""
-        logger.info(f"Training models for {symbol}")
-        
-        # Get market data
+    @staticmethod
+    def _as_index_ts(value: datetime, index: pd.Index) -> pd.Timestamp:
+        """Convert an aware UTC datetime to the timezone convention of ``index``"""
+        ts = pd.Timestamp(value)
+        tz = getattr(index, 'tz', None)
+        if tz is None:
+            return ts.tz_convert('UTC').tz_localize(None)
+        return ts.tz_convert(tz)
+    
+    def prepare_training_data(self, symbol: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Features and targets for training ``symbol``"""
         df = self.get_market_data(symbol, days=self.config.lookback_days * 2)  # Extra data for training
         
         if len(df) < self.config.min_data_points:
             raise ValueError(f"Insufficient data for {symbol}: {len(df)} < {self.config.min_data_points}")
         
-        # Feature engineering
-        features_df = self.feature_engineer.create_features(df)
+        features_df = self.feature_engineer.create_features(df, symbol=symbol)
         targets_df = self.feature_engineer.create_targets(df, self.config.forecast_horizons)
+        return features_df, targets_df
+    
+    def build_training_jobs(self, symbol: str, features_df: pd.DataFrame, targets_df: pd.DataFrame,
+                            models: Optional[List[str]] = None,
+                            priorities: Optional[Dict[str, int]] = None,
+                            cv: Optional[PurgedCV] = None) -> Tuple[List[TrainJob], List[SharedMatrix]]:
+        """
+        Scheduler jobs for every (model, horizon) of a symbol
+        
+        The feature and target matrices are published once into shared memory
+        and attached read-only by every job. The caller owns the returned
+        SharedMatrix objects and must close them after the jobs have run.
+        
+        Args:
+            symbol: Symbol to train
+            features_df: Output of prepare_training_data
+            targets_df: Output of prepare_training_data
+            models: Model names to train (default: config.models)
+            priorities: Optional model name -> job priority (higher runs first)
+            cv: Also add purged cross-validation fold jobs (keys "<model key>/cv<k>")
+                that slice the same shared matrices
+        
+        Returns:
+            (jobs, shared matrices)
+        """
+        priorities = priorities or {}
+        feature_names = select_feature_columns(features_df)
+        target_names = list(targets_df.columns)
+        shared = [SharedMatrix(features_df[feature_names].to_numpy(dtype=np.float64, na_value=np.nan)),
+                  SharedMatrix(targets_df.to_numpy(dtype=np.float64, na_value=np.nan))]
+        handles = {"X": shared[0].handle, "y": shared[1].handle}
+        # Scaled copy of X plus the forest itself
+        memory_mb = 64.0 + 3 * shared[0].nbytes / 2**20
+        
+        window = training_window(features_df)
+        jobs = []
+        for model_name in models or self.config.models:
+            if create_model(model_name, self.config) is None:
+                continue
+            for horizon in self.config.forecast_horizons:
+                target_col = f"target_{horizon}"
+                if target_col not in targets_df.columns:
+                    continue
+                model_key = f"{symbol}_{model_name}_{horizon}"
+                jobs.append(TrainJob(
+                    key=model_key,
+                    fn=train_model_job,
+                    kwargs={
+                        "config": self.config,
+                        "model_key": model_key,
+                        "model_name": model_name,
+                        "target_col": target_col,
+                        "feature_names": feature_names,
+                        "target_names": target_names,
+                        "model_dir": str(self.model_cache_dir),
+                        "window": window,
+                    },
+                    shared=handles,
+                    priority=priorities.get(model_name, 0),
+                    memory_mb=memory_mb,
+                ))
+        
+        if cv is not None:
+            jobs += self._cv_jobs(symbol, features_df[feature_names], targets_df, handles, cv,
+                                  models or self.config.models, priorities, memory_mb)
+        return jobs, shared
+    
+    def _cv_jobs(self, symbol: str, X: pd.DataFrame, targets_df: pd.DataFrame, handles: Dict[str, Any],
+                 cv: PurgedCV, models: List[str], priorities: Dict[str, int], memory_mb: float) -> List[TrainJob]:
+        """Fold jobs over the shared matrices; rows without features or a realized return are left out"""
+        clean = ~X.isna().any(axis=1).to_numpy()
+        jobs = []
+        for model_name in models:
+            factory = CV_ESTIMATORS.get(model_name)
+            if factory is None or not SKLEARN_AVAILABLE:
+                continue
+            for horizon in self.config.forecast_horizons:
+                target_col = f"target_{horizon}"
+                if target_col not in targets_df.columns:
+                    continue
+                realized = targets_df.get(f"{target_col}_return", targets_df[target_col]).notna().to_numpy()
+                rows = np.flatnonzero(clean & realized)
+                folds = cv.split(rows, horizon=horizon_periods(horizon))
+                jobs += build_fold_jobs(f"{symbol}_{model_name}_{horizon}", factory, handles, folds, rows=rows,
+                                        y_col=targets_df.columns.get_loc(target_col),
+                                        priority=priorities.get(model_name, 0), memory_mb=memory_mb)
+        return jobs
+    
+    def collect_training_results(self, results: Dict[str, JobResult]) -> Dict[str, Any]:
+        """Load models trained by scheduler jobs and return training results by model key"""
+        training_results = {}
+        for model_key, res in results.items():
+            if "/cv" in model_key:  # cross-validation folds, see collect_cv_results
+                continue
+            if not res.success:
+                logger.error(f"❌ Training failed for {model_key}: {res.error}")
+                training_results[model_key] = {"error": res.error}
+                continue
+            model = self._load_model(model_key)
+            if model is not None:
+                self.models[model_key] = model
+            training_results[model_key] = res.result
+            logger.info(f"✅ Trained {model_key}: MAE={res.result['mae']:.3f} ({res.seconds:.1f}s)")
+        return training_results
+    
+    @staticmethod
+    def collect_cv_results(results: Dict[str, JobResult]) -> Dict[str, CVReport]:
+        """Cross-validation reports by model key from scheduler results"""
+        reports = collect_reports(results)
+        for model_key, report in reports.items():
+            stats = report.summary()
+            logger.info(f"📊 CV {model_key}: {stats['folds']} folds, MAE={stats['mae_mean']:.3f}"
+                        f"±{stats['mae_std']:.3f}, hit rate={stats['hit_rate_mean']:.2f}, "
+                        f"fit {stats['fit_seconds']:.1f}s")
+            for error in report.errors:
+                logger.error(f"❌ CV fold failed for {model_key}: {error}")
+        return reports
+    
+    def cross_validate(self, symbol: str, cv: Optional[PurgedCV] = None,
+                       scheduler: Optional[RetrainScheduler] = None) -> Dict[str, CVReport]:
+        """
+        Out-of-sample purged cross-validation of every model/horizon for a symbol
+        
+        Args:
+            symbol: Symbol to evaluate
+            cv: Fold definition (default: 5 expanding folds)
+            scheduler: Pool to run folds on (default: inline)
+        
+        Returns:
+            CVReport by model key
+        """
+        cv = cv or PurgedCV(n_splits=5, min_train_size=self.config.min_data_points)
+        scheduler = scheduler or RetrainScheduler(max_workers=1)
+        features_df, targets_df = self.prepare_training_data(symbol)
+        jobs, shared = self.build_training_jobs(symbol, features_df, targets_df, cv=cv)
+        try:
+            results = scheduler.run([job for job in jobs if "/cv" in job.key])
+        finally:
+            for matrix in shared:
+                matrix.close()
+        return self.collect_cv_results(results)
+    
+    def train_models(self, symbol: str, scheduler: Optional[RetrainScheduler] = None) -> Dict[str, Any]:
+        """
+        Train all models for a symbol
+        
+        With a scheduler, every (model, horizon) pair runs as a separate job on
+        its process pool; otherwise the pairs are trained one after another.
+        """
+        logger.info(f"Training models for {symbol}")
+        
+        features_df, targets_df = self.prepare_training_data(symbol)
+        
+        if scheduler is not None:
+            jobs, shared = self.build_training_jobs(symbol, features_df, targets_df)
+            try:
+                results = scheduler.run(jobs)
+            finally:
+                for matrix in shared:
+                    matrix.close()
+            return self.collect_training_results(results)
         
         training_results = {}
         
@@ -352,20 +705,20 @@ class MLOutlookEngine:
                 
                 try:
                     # Create model
-                    if model_name == "rf" and SKLEARN_AVAILABLE:
-                        model = RandomForestModel(self.config)
-                    elif model_name == "lstm":
-                        model = MockLSTMModel(self.config)  # Use mock for now
-                    else:
+                    model = create_model(model_name, self.config)
+                    if model is None:
                         continue
                     
                     # Train model
                     train_result = model.train(features_df, targets_df, target_col)
                     
-                    # Cache model
+                    # Cache model (flattened for inference)
+                    if hasattr(model, "compact"):
+                        model = model.compact()
                     model_key = f"{symbol}_{model_name}_{horizon}"
                     self.models[model_key] = model
-                    self._save_model(model, model_key)
+                    self._save_model(model, model_key, metrics=train_result,
+                                     window=training_window(features_df))
                     
                     training_results[model_key] = train_result
                     logger.info(f"✅ Trained {model_key}: MAE={train_result['mae']:.3f}")
@@ -387,8 +740,12 @@ class MLOutlookEngine:
             logger.warning(f"No market data available for {symbol}")
             return []
         
+        # Score earlier predictions whose horizon has now elapsed
+        if self.drift is not None:
+            self.drift.observe_bars(symbol, df.index, df['close'].to_numpy(dtype=np.float64))
+        
         # Feature engineering
-        features_df = self.feature_engineer.create_features(df)
+        features_df = self.feature_engineer.create_features(df, symbol=symbol)
         
         predictions = []
         
@@ -405,6 +762,7 @@ class MLOutlookEngine:
                     
                     # Generate prediction
                     signal, confidence = model.predict(features_df)
+                    self._track_prediction(symbol, model_name, horizon, model, features_df, signal, confidence)
                     
                     # Only include high-confidence predictions
                     if confidence >= self.config.confidence_threshold:
@@ -432,8 +790,36 @@ class MLOutlookEngine:
                 except Exception as e:
                     logger.error(f"❌ Prediction failed for {model_key}: {e}")
         
+        if self.drift is not None:
+            try:
+                self.drift.save()
+            except Exception as e:
+                logger.warning(f"Failed to save drift monitor state: {e}")
+        
         return predictions
     
+    def _track_prediction(self, symbol: str, model_name: str, horizon: str, model,
+                          features_df: pd.DataFrame, signal: float, confidence: float):
+        """Queue a prediction (low-confidence ones too) for online accuracy and drift tracking"""
+        periods = horizon_periods(horizon)
+        if self.drift is None or periods is None:
+            return
+        model_key = f"{symbol}_{model_name}_{horizon}"
+        version = getattr(model, 'model_version', None)
+        if self.registry is not None:
+            version = self.registry.production_version(model_key) or version
+        names = [c for c in getattr(model, 'feature_names', []) if c in features_df.columns]
+        try:
+            self.drift.record_prediction(
+                symbol, model_name, horizon, periods, signal, confidence,
+                features=features_df[names].iloc[-1].to_numpy(dtype=np.float64) if names else None,
+                feature_names=names or None,
+                version=version,
+                profile=getattr(model, 'feature_profile', None),
+            )
+        except Exception as e:
+            logger.warning(f"Drift tracking failed for {model_key}: {e}")
+    
     def _load_or_train_model(self, symbol: str, model_name: str, horizon: str):
         """Load cached model or train if needed"""
         model_key = f"{symbol}_{model_name}_{horizon}"
@@ -456,18 +842,26 @@ class MLOutlookEngine:
             logger.error(f"Failed to train model {model_key}: {e}")
             return None
     
-    def _save_model(self, model, model_key: str):
-        """Save model to cache"""
+    def _save_model(self, model, model_key: str, metrics: Optional[Dict[str, Any]] = None,
+                    window: Optional[Dict[str, Any]] = None):
+        """Save model to the registry (or the flat pickle cache)"""
         try:
-            cache_path = self.model_cache_dir / f"{model_key}.pkl"
-            with open(cache_path, 'wb') as f:
-                pickle.dump(model, f)
+            store_model(model, model_key, self.model_cache_dir, self.registry, metrics=metrics, window=window)
         except Exception as e:
             logger.warning(f"Failed to cache model {model_key}: {e}")
     
     def _load_model(self, model_key: str):
-        """Load model from cache"""
+        """Load the production model from the registry, falling back to a flat pickle"""
         try:
+            if self.registry is not None:
+                info = self.registry.info(model_key)
+                if info is not None:
+                    # Check if model is recent enough
+                    created = datetime.fromisoformat(info["created_at"])
+                    if (datetime.now(timezone.utc) - created).days <= self.config.retrain_threshold_days:
+                        return self.registry.load(model_key)
+                    return None
+            
             cache_path = self.model_cache_dir / f"{model_key}.pkl"
             if cache_path.exists():
                 # Check if model is recent enough
@@ -573,7 +967,9 @@ def create_config_from_env() -> MLOutlookConfig:
         models=os.getenv("EMO_ML_MODELS", "rf,lstm").split(","),
         min_data_points=int(os.getenv("EMO_ML_MIN_DATA", "100")),
         retrain_threshold_days=int(os.getenv("EMO_ML_RETRAIN_DAYS", "7")),
-        confidence_threshold=float(os.getenv("EMO_ML_CONFIDENCE_THRESHOLD", "0.6"))
+        confidence_threshold=float(os.getenv("EMO_ML_CONFIDENCE_THRESHOLD", "0.6")),
+        model_registry_dir=os.getenv("EMO_ML_REGISTRY_DIR", "data/models/registry") or None,
+        drift_dir=os.getenv("EMO_ML_DRIFT_DIR", "data/ml_drift") or None
     )
 
 def main():
@@ -585,6 +981,8 @@ def main():
     parser.add_argument("--train", action="store_true", help="Force retrain models")
     parser.add_argument("--export", action="store_true", help="Export outlook to JSON")
     parser.add_argument("--save-db", action="store_true", help="Save predictions to database")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Train model/horizon pairs on a process pool of this size (0 = serial)")
     
     args = parser.parse_args()
     
@@ -613,6 +1011,7 @@ def main():
     
     # Create ML engine
     engine = MLOutlookEngine(config)
+    scheduler = RetrainScheduler(max_workers=args.workers) if args.workers else None
     
     try:
         for symbol in config.symbols:
@@ -620,7 +1019,7 @@ def main():
             
             # Train models if requested
             if args.train:
-                engine.train_models(symbol)
+                engine.train_models(symbol, scheduler=scheduler)
             
             # Generate outlook
             predictions = engine.generate_outlook(symbol)
@@ -0,0 +1,33 @@
+"""
+Backtesting utilities for option strategies.
+"""
+from .engine import BacktestResult, BacktestSettings, STRATEGY_REGISTRY, run_backtest
+from .replay import ReplayConfig, ReplayReport, ReplayHarness, load_bars, run_replay
+from .sweep import (
+    SweepConfig,
+    expand_grid,
+    sample_random,
+    walk_forward_windows,
+    run_sweep,
+    rank_results,
+    walk_forward_selection,
+)
+
+__all__ = [
+    "BacktestResult",
+    "BacktestSettings",
+    "STRATEGY_REGISTRY",
+    "run_backtest",
+    "ReplayConfig",
+    "ReplayReport",
+    "ReplayHarness",
+    "load_bars",
+    "run_replay",
+    "SweepConfig",
+    "expand_grid",
+    "sample_random",
+    "walk_forward_windows",
+    "run_sweep",
+    "rank_results",
+    "walk_forward_selection",
+]
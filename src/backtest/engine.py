@@ -0,0 +1,246 @@
+"""
+Options Strategy Backtest Engine
+Lightweight expiry-payoff simulator for the credit strategies in src/strategies/options.
+
+The engine walks a close-price series, builds the snapshot fields the option
+strategies read (ivr, dte, market_trend, bias), calls ``Strategy.generate`` and
+settles every resulting order at expiry using Black-Scholes credits priced off
+trailing realized volatility. It is intentionally simple - the goal is to rank
+parameter sets against each other, not to produce fill-accurate P&L.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, asdict
+from statistics import NormalDist
+from typing import Any, Callable, Dict, List, Optional, Type
+
+import numpy as np
+
+from ..strategies.base import Strategy, Order
+from ..strategies.options import IronCondor, PutCreditSpread
+
+_N = NormalDist()
+TRADING_DAYS = 252
+
+STRATEGY_REGISTRY: Dict[str, Type[Strategy]] = {
+    "iron_condor": IronCondor,
+    "put_credit_spread": PutCreditSpread,
+}
+
+
+@dataclass
+class BacktestSettings:
+    """Simulation knobs shared by every job of a sweep"""
+    symbol: str = "SPY"
+    entry_every: int = 5          # bars between entry attempts
+    dte: int = 30                 # calendar days to expiration of new trades (``params["dte"]`` overrides)
+    vol_lookback: int = 20        # bars used for realized volatility
+    ivr_lookback: int = 252       # bars used to rank volatility into an IV-rank proxy
+    iv_premium: float = 1.10      # implied / realized volatility ratio
+    trend_lookback: int = 20      # bars used for trend / bias classification
+    risk_free: float = 0.02
+
+
+@dataclass
+class BacktestResult:
+    """Aggregate statistics for one strategy/parameter run over one window"""
+    trades: int = 0
+    total_pnl: float = 0.0
+    avg_pnl: float = 0.0
+    win_rate: float = 0.0
+    max_drawdown: float = 0.0
+    sharpe: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _bs_price(spot: float, strike: float, t: float, vol: float, r: float, right: str) -> float:
+    """Black-Scholes price of a European option"""
+    if t <= 0 or vol <= 0:
+        intrinsic = spot - strike if right == "call" else strike - spot
+        return max(0.0, intrinsic)
+    sq = vol * math.sqrt(t)
+    d1 = (math.log(spot / strike) + (r + 0.5 * vol * vol) * t) / sq
+    d2 = d1 - sq
+    if right == "call":
+        return spot * _N.cdf(d1) - strike * math.exp(-r * t) * _N.cdf(d2)
+    return strike * math.exp(-r * t) * _N.cdf(-d2) - spot * _N.cdf(-d1)
+
+
+def _strike_for_delta(spot: float, t: float, vol: float, r: float, delta: float, right: str) -> float:
+    """Invert the Black-Scholes delta to find the strike with |delta| == delta"""
+    delta = min(max(delta, 1e-4), 0.5)
+    sq = vol * math.sqrt(t)
+    if right == "call":
+        d1 = _N.inv_cdf(delta)
+    else:
+        d1 = -_N.inv_cdf(delta)
+    return spot * math.exp((r + 0.5 * vol * vol) * t - d1 * sq)
+
+
+def _vertical_credit(spot, short_k, long_k, t, vol, r, right) -> float:
+    return _bs_price(spot, short_k, t, vol, r, right) - _bs_price(spot, long_k, t, vol, r, right)
+
+
+def _vertical_loss(settle: float, short_k: float, long_k: float, right: str) -> float:
+    """Intrinsic value owed on a short vertical at expiry (per share)"""
+    width = abs(short_k - long_k)
+    if right == "put":
+        return min(width, max(0.0, short_k - settle))
+    return min(width, max(0.0, settle - short_k))
+
+
+def _realized_vol(closes: np.ndarray, lookback: int) -> np.ndarray:
+    """Annualized trailing realized vol; entry ``i`` only uses closes[:i + 1]"""
+    vol = np.full(len(closes), np.nan)
+    if len(closes) <= lookback:
+        return vol
+    rets = np.diff(np.log(closes))
+    windows = np.lib.stride_tricks.sliding_window_view(rets, lookback)
+    vol[lookback:] = windows.std(axis=1, ddof=1) * math.sqrt(TRADING_DAYS)
+    return vol
+
+
+def _market_state(closes: np.ndarray, vol: np.ndarray, i: int, s: BacktestSettings) -> Optional[Dict[str, float]]:
+    """Realized vol, IV-rank proxy (0-100) and trend return at bar ``i``"""
+    v = vol[i]
+    if not np.isfinite(v) or v <= 0:
+        return None
+
+    # Rank today's realized vol against its own trailing history
+    hist = vol[max(0, i - s.ivr_lookback):i + 1]
+    hist = hist[np.isfinite(hist)]
+    hi, lo = float(hist.max()), float(hist.min())
+    ivr = 50.0 if hi - lo < 1e-12 else 100.0 * (v - lo) / (hi - lo)
+
+    tl = min(s.trend_lookback, i)
+    trend_ret = float(closes[i] / closes[i - tl] - 1.0)
+    return {"vol": float(v), "ivr": ivr, "trend_ret": trend_ret}
+
+
+def _snapshot(closes: np.ndarray, i: int, s: BacktestSettings, state: Dict[str, float],
+              dte: int) -> Dict[str, Any]:
+    tr = state["trend_ret"]
+    band = state["vol"] * math.sqrt(s.trend_lookback / TRADING_DAYS)
+    if tr > band:
+        trend, bias = "strong_bullish", "bullish"
+    elif tr > band / 3:
+        trend, bias = "bullish", "bullish"
+    elif tr < -band:
+        trend, bias = "strong_bearish", "bearish"
+    elif tr < -band / 3:
+        trend, bias = "bearish", "bearish"
+    else:
+        trend, bias = "neutral", "neutral_bullish" if tr >= 0 else "neutral"
+    return {
+        "symbol": s.symbol,
+        "ivr": state["ivr"],
+        "dte": dte,
+        "market_trend": trend,
+        "bias": bias,
+        "current_price": float(closes[i]),
+    }
+
+
+def _settle_iron_condor(order: Order, spot, settle, t, vol, r, min_credit) -> Optional[float]:
+    delta = float(order.meta.get("target_delta", 0.15))
+    width = float(order.meta.get("wing_width", 5))
+    put_k = _strike_for_delta(spot, t, vol, r, delta, "put")
+    call_k = _strike_for_delta(spot, t, vol, r, delta, "call")
+    credit = (_vertical_credit(spot, put_k, put_k - width, t, vol, r, "put")
+              + _vertical_credit(spot, call_k, call_k + width, t, vol, r, "call"))
+    if credit < min_credit:
+        return None
+    loss = (_vertical_loss(settle, put_k, put_k - width, "put")
+            + _vertical_loss(settle, call_k, call_k + width, "call"))
+    return (credit - loss) * 100.0 * order.qty
+
+
+def _settle_put_credit_spread(order: Order, spot, settle, t, vol, r, min_credit) -> Optional[float]:
+    delta = float(order.meta.get("target_delta", 0.20))
+    width = float(order.meta.get("spread_width", 5))
+    put_k = _strike_for_delta(spot, t, vol, r, delta, "put")
+    credit = _vertical_credit(spot, put_k, put_k - width, t, vol, r, "put")
+    if credit < min_credit:
+        return None
+    loss = _vertical_loss(settle, put_k, put_k - width, "put")
+    return (credit - loss) * 100.0 * order.qty
+
+
+SETTLERS: Dict[str, Callable[..., Optional[float]]] = {
+    "iron_condor_open": _settle_iron_condor,
+    "put_credit_spread_open": _settle_put_credit_spread,
+}
+
+
+def run_backtest(
+    strategy_name: str,
+    params: Dict[str, Any],
+    closes: np.ndarray,
+    start: int = 0,
+    end: Optional[int] = None,
+    settings: Optional[BacktestSettings] = None,
+) -> BacktestResult:
+    """
+    Backtest one strategy configuration over ``closes[start:end]``
+
+    Trades are only opened on bars whose expiry also falls inside the window,
+    so train and test windows never share outcomes. A trade's DTE is
+    ``params["dte"]`` (calendar days, default ``settings.dte``); it settles
+    on the close ``dte * 252 / 365`` trading days after entry.
+
+    Args:
+        strategy_name: Key in STRATEGY_REGISTRY
+        params: Strategy config passed to the strategy constructor
+        closes: 1-D array of daily closes
+        start: First bar index of the window
+        end: One past the last bar index of the window (default: len(closes))
+        settings: Simulation settings
+
+    Returns:
+        BacktestResult for the window
+    """
+    if strategy_name not in STRATEGY_REGISTRY:
+        raise KeyError(f"Unknown strategy: {strategy_name}. Available: {', '.join(STRATEGY_REGISTRY)}")
+
+    s = settings or BacktestSettings()
+    end = len(closes) if end is None else min(end, len(closes))
+    strategy = STRATEGY_REGISTRY[strategy_name](dict(params))
+    min_credit = float(params.get("min_credit", getattr(strategy, "min_credit", 0.0)))
+    dte = int(params.get("dte", s.dte))
+    t = dte / 365.0
+    hold = max(1, int(round(dte * TRADING_DAYS / 365.0)))  # bars from entry to expiry
+
+    vol = _realized_vol(closes[:end], s.vol_lookback)
+
+    pnls: List[float] = []
+    for i in range(max(start, s.vol_lookback), end - hold, s.entry_every):
+        state = _market_state(closes, vol, i, s)
+        if state is None:
+            continue
+        iv = state["vol"] * s.iv_premium
+        for order in strategy.generate(_snapshot(closes, i, s, state, dte)):
+            settle_fn = SETTLERS.get(order.type)
+            if settle_fn is None:
+                continue
+            pnl = settle_fn(order, float(closes[i]), float(closes[i + hold]), t, iv, s.risk_free, min_credit)
+            if pnl is not None:
+                pnls.append(pnl)
+
+    if not pnls:
+        return BacktestResult()
+
+    arr = np.asarray(pnls)
+    equity = np.cumsum(arr)
+    drawdown = float(np.max(np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity))
+    std = float(arr.std(ddof=1)) if len(arr) > 1 else 0.0
+    return BacktestResult(
+        trades=len(arr),
+        total_pnl=float(arr.sum()),
+        avg_pnl=float(arr.mean()),
+        win_rate=float((arr > 0).mean()),
+        max_drawdown=drawdown,
+        sharpe=float(arr.mean() / std) if std > 0 else 0.0,
+    )
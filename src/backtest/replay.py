@@ -0,0 +1,362 @@
+"""
+Market Replay Harness
+Pushes recorded bars through the signals pipeline faster than real time.
+
+Pipeline per replayed timestamp:
+    indicators  -> StrategyManager.on_bar for every bar, build market data dicts
+    run_once    -> StrategyManager.run_once(write=False)
+    write       -> StrategyManager.write_signals
+    staging     -> stage_trade for every "enter" signal
+
+Bars come from a SQLite ``bars``-style table or a Parquet file. Replay runs as
+fast as possible (speed=0) or paced at N x the recorded bar spacing. The
+report covers throughput, per-stage latency percentiles and allocation counts,
+plus a digest of all signals and staged plans: two runs with the same data and
+seed produce the same digest, so it can be used for regression comparison.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import random
+import sqlite3
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..staging.writer import stage_trade
+from ..strategies.indicators import SIGNAL_TRENDS, IndicatorSet, trend_from_zscore, ts_key
+from ..strategies.signals.manager import StrategyManager
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+STAGES = ("indicators", "run_once", "write", "staging")
+
+# Indicators the harness derives ivr/trend from when the source has no snapshot columns
+_MD_SPECS = {
+    "zscore_20": ("zscore", {"window": 20}),
+    "realized_vol_20": ("realized_vol", {"window": 20}),
+}
+_VOL_RANK_WINDOW = 60
+
+_COLUMN_ALIASES = {"t": "ts", "timestamp": "ts", "o": "open", "h": "high", "l": "low",
+                   "c": "close", "v": "volume"}
+
+
+@dataclass
+class ReplayConfig:
+    """Replay run configuration"""
+    strategies: Dict[str, Dict[str, Any]] = field(default_factory=lambda: {
+        "IronCondor": {}, "PutCreditSpread": {},
+    })
+    speed: float = 0.0                # 0 = as fast as possible, N = N x real time
+    seed: int = 42
+    iv_noise: float = 0.0             # std of seeded noise added to derived ivr
+    out_dir: Path = Path("data/replay")
+    stage_orders: bool = True
+    trace_allocations: bool = False
+    quiet: bool = True                # swallow pipeline print() output
+
+
+@dataclass
+class ReplayReport:
+    """Replay results"""
+    bars: int = 0
+    steps: int = 0
+    signals: int = 0
+    staged: int = 0
+    wall_seconds: float = 0.0
+    bars_per_sec: float = 0.0
+    steps_per_sec: float = 0.0
+    stage_latency_ms: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    alloc_blocks: Dict[str, int] = field(default_factory=dict)
+    top_allocations: List[Dict[str, Any]] = field(default_factory=list)
+    digest: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def load_bars(source: str | Path, table: str = "bars", symbols: Optional[Sequence[str]] = None,
+              start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+    """
+    Load bars (or snapshots) from a Parquet file or a SQLite table
+
+    Columns are normalized to ts/symbol/open/high/low/close/volume; any extra
+    columns (e.g. ivr, trend) are kept and passed through as market data.
+    """
+    source = Path(source)
+    if source.suffix == ".parquet":
+        if not PARQUET_AVAILABLE:
+            raise ImportError("pyarrow is required to replay Parquet files")
+        df = pd.read_parquet(source)
+    else:
+        with sqlite3.connect(str(source)) as conn:
+            df = pd.read_sql_query(f"SELECT * FROM {table}", conn)
+
+    df = df.rename(columns={k: v for k, v in _COLUMN_ALIASES.items() if k in df.columns})
+    if symbols:
+        df = df[df["symbol"].isin(list(symbols))]
+    df["_ts"] = [ts_key(t) for t in df["ts"]]
+    if start:
+        df = df[df["_ts"] >= ts_key(start)]
+    if end:
+        df = df[df["_ts"] <= ts_key(end)]
+    return df.sort_values(["_ts", "symbol"], kind="mergesort").reset_index(drop=True)
+
+
+def synthetic_bars(symbols: Sequence[str] = ("SPY", "QQQ"), n: int = 500, seed: int = 42,
+                   start: str = "2024-01-02") -> pd.DataFrame:
+    """Deterministic random-walk minute bars for demos and tests"""
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range(start, periods=n, freq="min", tz="UTC")
+    frames = []
+    for k, sym in enumerate(symbols):
+        close = (100.0 + 50 * k) * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+        spread = close * rng.uniform(0.0002, 0.002, n)
+        frames.append(pd.DataFrame({
+            "ts": idx.map(lambda t: t.isoformat()), "symbol": sym,
+            "open": close, "high": close + spread, "low": close - spread, "close": close,
+            "volume": rng.integers(1_000, 50_000, n),
+        }))
+    df = pd.concat(frames, ignore_index=True)
+    df["_ts"] = [ts_key(t) for t in df["ts"]]
+    return df.sort_values(["_ts", "symbol"], kind="mergesort").reset_index(drop=True)
+
+
+def _iter_steps(df: pd.DataFrame) -> Iterator[Tuple[float, List[Dict[str, Any]]]]:
+    """Group consecutive rows sharing a timestamp into one replay step"""
+    records = df.to_dict("records")
+    i = 0
+    while i < len(records):
+        ts = records[i]["_ts"]
+        j = i
+        while j < len(records) and records[j]["_ts"] == ts:
+            j += 1
+        yield ts, records[i:j]
+        i = j
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "mean": 0.0}
+    arr = np.asarray(samples) * 1000.0
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"count": len(arr), "p50": float(p50), "p95": float(p95), "p99": float(p99),
+            "max": float(arr.max()), "mean": float(arr.mean())}
+
+
+class ReplayHarness:
+    """Drives StrategyManager and staging from recorded bars"""
+
+    def __init__(self, config: Optional[ReplayConfig] = None):
+        self.config = config or ReplayConfig()
+        self.rng = random.Random(self.config.seed)
+        out = Path(self.config.out_dir)
+        self.signals_csv = out / "signals.csv"
+        self.staging_dir = out / "staged"
+        self.manager = StrategyManager(self.signals_csv)
+        self._md_state: Dict[str, IndicatorSet] = {}
+        self._vol_hist: Dict[str, List[float]] = {}
+
+    def _setup(self) -> None:
+        if self.signals_csv.exists():
+            self.signals_csv.unlink()
+        for name, cfg in self.config.strategies.items():
+            self.manager.register(name, config=dict(cfg))
+        self.manager.warmup()
+
+    def _market_data(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Use snapshot columns when present, otherwise derive ivr/trend from indicators"""
+        symbol = row["symbol"]
+        iset = self._md_state.setdefault(symbol, IndicatorSet(_MD_SPECS))
+        values = iset.update(row)
+        md = {k: v for k, v in row.items() if not k.startswith("_") and v is not None}
+
+        if "ivr" not in row or row.get("ivr") is None:
+            vol = values["realized_vol_20"]
+            hist = self._vol_hist.setdefault(symbol, [])
+            ivr = 0.0
+            if vol is not None:
+                hist.append(vol)
+                if len(hist) > _VOL_RANK_WINDOW:
+                    del hist[0]
+                lo, hi = min(hist), max(hist)
+                ivr = 0.5 if hi - lo <= 0 else (vol - lo) / (hi - lo)
+            if self.config.iv_noise:
+                ivr += self.rng.gauss(0.0, self.config.iv_noise)
+            md["ivr"] = min(1.0, max(0.0, ivr))
+
+        if "trend" not in row or row.get("trend") is None:
+            md["trend"] = SIGNAL_TRENDS.get(trend_from_zscore(values["zscore_20"]), "sideways")
+        return md
+
+    @staticmethod
+    def _trade_plan(signal, md: Dict[str, Any]) -> Dict[str, Any]:
+        """Minimal defined-risk trade plan around the current price"""
+        close = float(md.get("close", 100.0))
+        step = max(1.0, round(close * 0.01))
+        atm = round(close / step) * step
+        if signal.strategy == "IronCondor":
+            strikes = [("put", atm - 3 * step, 1), ("put", atm - 2 * step, -1),
+                       ("call", atm + 2 * step, -1), ("call", atm + 3 * step, 1)]
+            strategy = "iron_condor"
+        else:
+            strikes = [("put", atm - 3 * step, 1), ("put", atm - 2 * step, -1)]
+            strategy = "put_credit_spread"
+        legs = [{"right": r, "strike": float(k), "qty": q, "price": round(0.1 * step, 2)}
+                for r, k, q in strikes]
+        return {
+            "symbol": signal.symbol,
+            "strategy": strategy,
+            "legs": legs,
+            "risk": {"max_loss": float(step * 100), "max_gain": round(0.1 * step * 100, 2)},
+            "signal_ts": signal.ts,
+            "confidence": signal.confidence,
+        }
+
+    def run(self, bars: pd.DataFrame) -> ReplayReport:
+        """Replay ``bars`` (as returned by load_bars/synthetic_bars) through the pipeline"""
+        cfg = self.config
+        latencies: Dict[str, List[float]] = {s: [] for s in STAGES + ("step",)}
+        alloc: Dict[str, int] = {s: 0 for s in STAGES}
+        digest = hashlib.sha256()
+        report = ReplayReport()
+
+        if cfg.trace_allocations:
+            tracemalloc.start()
+            base_snapshot = tracemalloc.take_snapshot()
+
+        sink = io.StringIO()
+        first_ts: Optional[float] = None
+        wall_start = time.perf_counter()
+        clock = time.perf_counter
+
+        with contextlib.redirect_stdout(sink) if cfg.quiet else contextlib.nullcontext():
+            self._setup()
+            for ts, rows in _iter_steps(bars):
+                if cfg.speed and cfg.speed > 0:
+                    if first_ts is None:
+                        first_ts = ts
+                    target = wall_start + (ts - first_ts) / cfg.speed
+                    delay = target - clock()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                t_step = clock()
+                replay_iso = pd.Timestamp(ts, unit="s", tz="UTC").isoformat()
+
+                b0, t0 = sys.getallocatedblocks(), clock()
+                md_stream = []
+                for row in rows:
+                    self.manager.on_bar(row["symbol"], row)
+                    md_stream.append(self._market_data(row))
+                t1 = clock()
+                latencies["indicators"].append(t1 - t0)
+                alloc["indicators"] += sys.getallocatedblocks() - b0
+
+                b0 = sys.getallocatedblocks()
+                signals = self.manager.run_once(md_stream, write=False, update_indicators=False)
+                for s in signals:
+                    s.ts = replay_iso  # recorded time, not wall time, for determinism
+                t2 = clock()
+                latencies["run_once"].append(t2 - t1)
+                alloc["run_once"] += sys.getallocatedblocks() - b0
+
+                b0 = sys.getallocatedblocks()
+                if signals:
+                    self.manager.write_signals(signals)
+                t3 = clock()
+                latencies["write"].append(t3 - t2)
+                alloc["write"] += sys.getallocatedblocks() - b0
+
+                b0 = sys.getallocatedblocks()
+                md_by_symbol = {md["symbol"]: md for md in md_stream}
+                for s in signals:
+                    digest.update(f"{s.ts}|{s.symbol}|{s.strategy}|{s.action}|"
+                                  f"{s.confidence:.6f}|{s.notes}\n".encode())
+                    if s.action != "enter":
+                        continue
+                    plan = self._trade_plan(s, md_by_symbol.get(s.symbol, {}))
+                    digest.update(json.dumps(plan, sort_keys=True).encode())
+                    if cfg.stage_orders:
+                        stage_trade(plan, meta={"source": "replay", "confidence_score": s.confidence},
+                                    backup=False, staging_dir=self.staging_dir)
+                    report.staged += 1
+                t4 = clock()
+                latencies["staging"].append(t4 - t3)
+                alloc["staging"] += sys.getallocatedblocks() - b0
+
+                latencies["step"].append(t4 - t_step)
+                report.bars += len(rows)
+                report.steps += 1
+                report.signals += len(signals)
+
+        report.wall_seconds = time.perf_counter() - wall_start
+        if report.wall_seconds > 0:
+            report.bars_per_sec = report.bars / report.wall_seconds
+            report.steps_per_sec = report.steps / report.wall_seconds
+        report.stage_latency_ms = {name: _percentiles(v) for name, v in latencies.items()}
+        report.alloc_blocks = alloc
+        report.digest = digest.hexdigest()
+
+        if cfg.trace_allocations:
+            stats = tracemalloc.take_snapshot().compare_to(base_snapshot, "lineno")
+            tracemalloc.stop()
+            stats.sort(key=lambda st: st.count_diff, reverse=True)
+            report.top_allocations = [
+                {"where": str(st.traceback), "count": st.count_diff, "bytes": st.size_diff}
+                for st in stats[:10]
+            ]
+        return report
+
+
+def run_replay(bars: pd.DataFrame, config: Optional[ReplayConfig] = None) -> ReplayReport:
+    """Convenience wrapper: build a harness and replay ``bars``"""
+    return ReplayHarness(config).run(bars)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded bars through the signal pipeline")
+    parser.add_argument("--source", help="SQLite database or .parquet file (default: synthetic bars)")
+    parser.add_argument("--table", default="bars")
+    parser.add_argument("--symbols", nargs="*", default=None)
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--speed", type=float, default=0.0, help="0 = max speed, N = N x real time")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iv-noise", type=float, default=0.0)
+    parser.add_argument("--out-dir", default="data/replay")
+    parser.add_argument("--no-stage", action="store_true")
+    parser.add_argument("--trace-allocations", action="store_true")
+    parser.add_argument("--synthetic-bars", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    if args.source:
+        bars = load_bars(args.source, args.table, args.symbols, args.start, args.end)
+    else:
+        bars = synthetic_bars(args.symbols or ("SPY", "QQQ"), args.synthetic_bars, args.seed)
+
+    cfg = ReplayConfig(speed=args.speed, seed=args.seed, iv_noise=args.iv_noise,
+                       out_dir=Path(args.out_dir), stage_orders=not args.no_stage,
+                       trace_allocations=args.trace_allocations)
+    report = run_replay(bars, cfg)
+    print(json.dumps(report.to_dict(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,532 @@
+"""
+Parallel Walk-Forward Parameter Sweep
+Distributes option-strategy backtests across a process pool.
+
+- Parameter sets come from a full grid, random samples, or an adaptive mode
+  that spends half the budget on random exploration and the rest sampling
+  around the best walk-forward scores so far
+- Market data is published once into shared memory; workers map it read-only
+- Every (parameter set, fold) job is written to SQLite as soon as it finishes,
+  which doubles as the checkpoint: re-running the same run_id skips finished jobs
+- Parameter sets are ranked by their mean in-sample (train) score, stored in
+  the ``sweep_rankings`` table; the test folds never choose the winner
+- The walk-forward result picks, in every fold, the parameter set with the
+  best train score and reports its test score (``sweep_selections`` table),
+  so the out-of-sample figure is for parameters chosen without seeing it
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import random
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, asdict
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..database.cold_storage import TieredBarReader
+from ..database.rollups import bucket_start
+from .engine import BacktestResult, BacktestSettings, STRATEGY_REGISTRY, run_backtest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = Path("data/sweeps.sqlite")
+
+# Default search spaces; lists are sampled as choices, (lo, hi) tuples as ranges
+# (random / adaptive modes only). ``dte`` is in calendar days, within each
+# strategy's min_dte..max_dte.
+DEFAULT_SPACES: Dict[str, Dict[str, Any]] = {
+    "iron_condor": {
+        "dte": [21, 30, 45],
+        "target_delta": [0.10, 0.15, 0.20, 0.25],
+        "wing_width": [2, 5, 10],
+        "min_credit": [0.20, 0.30, 0.50],
+        "min_iv_rank": [0, 20, 30, 50],
+    },
+    "put_credit_spread": {
+        "dte": [14, 30, 45],
+        "target_delta": [0.15, 0.20, 0.25, 0.30],
+        "spread_width": [2, 5, 10],
+        "min_credit": [0.15, 0.25, 0.40],
+        "min_iv_rank": [0, 20, 40],
+    },
+}
+
+
+@dataclass
+class SweepConfig:
+    """Configuration for a parameter sweep run"""
+    strategy: str = "iron_condor"
+    space: Dict[str, Any] = field(default_factory=dict)
+    mode: str = "grid"                # grid | random | adaptive
+    n_samples: int = 50               # random / adaptive budget
+    seed: int = 42
+    train_bars: int = 504
+    test_bars: int = 126
+    step_bars: Optional[int] = None   # defaults to test_bars (non-overlapping test windows)
+    metric: str = "total_pnl"         # any BacktestResult field
+    max_workers: Optional[int] = None
+    db_path: Path = DEFAULT_DB
+    run_id: Optional[str] = None
+    settings: BacktestSettings = field(default_factory=BacktestSettings)
+
+    def resolved_space(self) -> Dict[str, Any]:
+        return self.space or DEFAULT_SPACES.get(self.strategy, {})
+
+    def resolved_run_id(self) -> str:
+        if self.run_id:
+            return self.run_id
+        key = json.dumps(
+            {
+                "strategy": self.strategy, "space": self.resolved_space(), "mode": self.mode,
+                "n": self.n_samples, "seed": self.seed, "train": self.train_bars,
+                "test": self.test_bars, "step": self.step_bars, "settings": asdict(self.settings),
+                "metric": self.metric,
+            },
+            sort_keys=True, default=str,
+        )
+        return f"{self.strategy}_{hashlib.sha1(key.encode()).hexdigest()[:10]}"
+
+
+# ---------------------------------------------------------------------------
+# Parameter generation
+# ---------------------------------------------------------------------------
+
+def expand_grid(space: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Cartesian product of all list-valued parameters; (lo, hi) ranges cannot be gridded"""
+    keys = sorted(space)
+    ranges = [k for k in keys if isinstance(space[k], tuple)]
+    if ranges:
+        raise ValueError(f"Range parameters {ranges} need random or adaptive mode; list the grid values instead")
+    values = [list(space[k]) if isinstance(space[k], list) else [space[k]] for k in keys]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def _draw(spec: Any, rng: random.Random) -> Any:
+    if isinstance(spec, tuple) and len(spec) == 2:
+        lo, hi = spec
+        if isinstance(lo, int) and isinstance(hi, int):
+            return rng.randint(lo, hi)
+        return rng.uniform(float(lo), float(hi))
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    return spec
+
+
+def sample_random(space: Dict[str, Any], n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Draw ``n`` unique parameter sets; lists are choices, (lo, hi) tuples are ranges"""
+    rng = random.Random(seed)
+    seen, out = set(), []
+    for _ in range(n * 20):
+        params = {k: _draw(space[k], rng) for k in sorted(space)}
+        key = param_key(params)
+        if key not in seen:
+            seen.add(key)
+            out.append(params)
+        if len(out) >= n:
+            break
+    return out
+
+
+def sample_neighbors(space: Dict[str, Any], best: Sequence[Dict[str, Any]], n: int,
+                     seed: int = 42) -> List[Dict[str, Any]]:
+    """Perturb the best parameter sets by one step (choices) or 10% (ranges)"""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        params = dict(best[i % len(best)])
+        k = rng.choice(sorted(space))
+        spec = space[k]
+        if isinstance(spec, list) and len(spec) > 1:
+            ordered = sorted(spec) if all(isinstance(v, (int, float)) for v in spec) else list(spec)
+            idx = ordered.index(params[k]) if params[k] in ordered else 0
+            params[k] = ordered[min(len(ordered) - 1, max(0, idx + rng.choice((-1, 1))))]
+        elif isinstance(spec, tuple) and len(spec) == 2:
+            lo, hi = spec
+            span = (hi - lo) * 0.1
+            val = min(hi, max(lo, params[k] + rng.uniform(-span, span)))
+            params[k] = int(round(val)) if isinstance(lo, int) and isinstance(hi, int) else val
+        out.append(params)
+    return out
+
+
+def param_key(params: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def walk_forward_windows(n_bars: int, train_bars: int, test_bars: int,
+                         step_bars: Optional[int] = None) -> List[Tuple[int, int, int]]:
+    """
+    Rolling walk-forward folds as (train_start, train_end, test_end) bar indices
+
+    The test window of each fold is [train_end, test_end).
+    """
+    step = step_bars or test_bars
+    folds = []
+    start = 0
+    while start + train_bars + test_bars <= n_bars:
+        folds.append((start, start + train_bars, start + train_bars + test_bars))
+        start += step
+    return folds
+
+
+# ---------------------------------------------------------------------------
+# Shared memory market data
+# ---------------------------------------------------------------------------
+
+class SharedPriceArray:
+    """Publishes a price array into shared memory for the lifetime of a sweep"""
+
+    def __init__(self, prices: np.ndarray):
+        prices = np.ascontiguousarray(prices, dtype=np.float64)
+        self.shape = prices.shape
+        self.dtype = prices.dtype.str
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, prices.nbytes))
+        np.ndarray(self.shape, dtype=prices.dtype, buffer=self.shm.buf)[:] = prices
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self) -> None:
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SharedPriceArray":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_WORKER_SHM: Optional[shared_memory.SharedMemory] = None
+_WORKER_PRICES: Optional[np.ndarray] = None
+
+
+def _init_worker(shm_name: str, shape: Tuple[int, ...], dtype: str) -> None:
+    global _WORKER_SHM, _WORKER_PRICES
+    _WORKER_SHM = shared_memory.SharedMemory(name=shm_name)
+    arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_WORKER_SHM.buf)
+    arr.flags.writeable = False
+    _WORKER_PRICES = arr
+
+
+def _run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Evaluate one parameter set on one walk-forward fold (runs in a worker)"""
+    closes = _WORKER_PRICES
+    t0 = time.perf_counter()
+    train_start, train_end, test_end = job["fold"]
+    s = job["settings"]
+    # Train/test windows are measured on their own bars but may read earlier
+    # history for volatility and trend estimation
+    train = run_backtest(job["strategy"], job["params"], closes, train_start, train_end, s)
+    test = run_backtest(job["strategy"], job["params"], closes, train_end, test_end, s)
+    return {
+        "param_id": job["param_id"],
+        "fold": job["fold_idx"],
+        "params": job["params"],
+        "train": train.to_dict(),
+        "test": test.to_dict(),
+        "elapsed": time.perf_counter() - t0,
+    }
+
+
+# ---------------------------------------------------------------------------
+# SQLite results / checkpoint store
+# ---------------------------------------------------------------------------
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS sweep_results (
+            run_id TEXT NOT NULL,
+            param_id TEXT NOT NULL,
+            fold INTEGER NOT NULL,
+            strategy TEXT NOT NULL,
+            params TEXT NOT NULL,
+            train_score REAL,
+            test_score REAL,
+            train_metrics TEXT,
+            test_metrics TEXT,
+            elapsed REAL,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_id, param_id, fold)
+        );
+        CREATE TABLE IF NOT EXISTS sweep_rankings (
+            run_id TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            param_id TEXT NOT NULL,
+            strategy TEXT NOT NULL,
+            params TEXT NOT NULL,
+            folds INTEGER,
+            mean_train_score REAL,
+            mean_test_score REAL,
+            min_test_score REAL,
+            test_trades INTEGER,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_id, param_id)
+        );
+        CREATE TABLE IF NOT EXISTS sweep_selections (
+            run_id TEXT NOT NULL,
+            fold INTEGER NOT NULL,
+            param_id TEXT NOT NULL,
+            params TEXT NOT NULL,
+            train_score REAL,
+            test_score REAL,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_id, fold)
+        );
+        """
+    )
+    return conn
+
+
+def _completed_jobs(conn: sqlite3.Connection, run_id: str) -> set:
+    rows = conn.execute("SELECT param_id, fold FROM sweep_results WHERE run_id = ?", (run_id,))
+    return {(pid, fold) for pid, fold in rows}
+
+
+def _record_result(conn, run_id: str, strategy: str, metric: str, res: Dict[str, Any]) -> None:
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO sweep_results
+            (run_id, param_id, fold, strategy, params, train_score, test_score,
+             train_metrics, test_metrics, elapsed)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (run_id, res["param_id"], res["fold"], strategy, json.dumps(res["params"], sort_keys=True),
+         res["train"][metric], res["test"][metric], json.dumps(res["train"]),
+         json.dumps(res["test"]), res["elapsed"]),
+    )
+    conn.commit()
+
+
+def rank_results(conn: sqlite3.Connection, run_id: str) -> List[Dict[str, Any]]:
+    """
+    Aggregate fold scores per parameter set and persist the ranking
+
+    Sets are ordered by mean train score (then worst train fold); test
+    scores are reported alongside but do not affect the order.
+    """
+    rows = conn.execute(
+        """
+        SELECT param_id, strategy, params, COUNT(*), AVG(train_score), AVG(test_score),
+               MIN(test_score), SUM(json_extract(test_metrics, '$.trades'))
+        FROM sweep_results WHERE run_id = ?
+        GROUP BY param_id
+        ORDER BY AVG(train_score) DESC, MIN(train_score) DESC, param_id
+        """,
+        (run_id,),
+    ).fetchall()
+
+    ranked = []
+    conn.execute("DELETE FROM sweep_rankings WHERE run_id = ?", (run_id,))
+    for rank, (pid, strat, params, folds, tr, te, te_min, trades) in enumerate(rows, start=1):
+        conn.execute(
+            """
+            INSERT INTO sweep_rankings
+                (run_id, rank, param_id, strategy, params, folds, mean_train_score,
+                 mean_test_score, min_test_score, test_trades)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (run_id, rank, pid, strat, params, folds, tr, te, te_min, trades),
+        )
+        ranked.append({
+            "rank": rank, "param_id": pid, "params": json.loads(params), "folds": folds,
+            "mean_train_score": tr, "mean_test_score": te, "min_test_score": te_min,
+            "test_trades": trades,
+        })
+    conn.commit()
+    return ranked
+
+
+def walk_forward_selection(conn: sqlite3.Connection, run_id: str) -> List[Dict[str, Any]]:
+    """
+    Per fold, the parameter set with the best train score and its test score
+
+    This is the walk-forward out-of-sample result: each fold's parameters
+    are chosen on its train window only. Persisted in ``sweep_selections``.
+    """
+    rows = conn.execute(
+        """
+        SELECT fold, param_id, params, train_score, test_score FROM (
+            SELECT fold, param_id, params, train_score, test_score,
+                   ROW_NUMBER() OVER (PARTITION BY fold ORDER BY train_score DESC, param_id) AS pick
+            FROM sweep_results WHERE run_id = ?
+        ) WHERE pick = 1 ORDER BY fold
+        """,
+        (run_id,),
+    ).fetchall()
+
+    conn.execute("DELETE FROM sweep_selections WHERE run_id = ?", (run_id,))
+    conn.executemany(
+        "INSERT INTO sweep_selections (run_id, fold, param_id, params, train_score, test_score) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(run_id, *row) for row in rows],
+    )
+    conn.commit()
+    return [{"fold": fold, "param_id": pid, "params": json.loads(params), "train_score": tr, "test_score": te}
+            for fold, pid, params, tr, te in rows]
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def _execute(jobs: List[Dict[str, Any]], shared: SharedPriceArray, cfg: SweepConfig,
+             conn: sqlite3.Connection, run_id: str) -> int:
+    if not jobs:
+        return 0
+    done = 0
+    with ProcessPoolExecutor(max_workers=cfg.max_workers, initializer=_init_worker,
+                             initargs=(shared.name, shared.shape, shared.dtype)) as pool:
+        futures = [pool.submit(_run_job, job) for job in jobs]
+        for fut in as_completed(futures):
+            _record_result(conn, run_id, cfg.strategy, cfg.metric, fut.result())
+            done += 1
+            if done % 25 == 0 or done == len(jobs):
+                logger.info(f"[Sweep] {run_id}: {done}/{len(jobs)} jobs complete")
+    return done
+
+
+def _build_jobs(param_sets: Iterable[Dict[str, Any]], folds, cfg: SweepConfig,
+                completed: set) -> List[Dict[str, Any]]:
+    jobs, seen = [], set()
+    for params in param_sets:
+        pid = param_key(params)
+        if pid in seen:
+            continue
+        seen.add(pid)
+        for fold_idx, fold in enumerate(folds):
+            if (pid, fold_idx) in completed:
+                continue
+            jobs.append({
+                "strategy": cfg.strategy, "params": params, "param_id": pid,
+                "fold": fold, "fold_idx": fold_idx, "settings": cfg.settings,
+            })
+    return jobs
+
+
+def run_sweep(closes: np.ndarray, cfg: SweepConfig) -> List[Dict[str, Any]]:
+    """
+    Run (or resume) a walk-forward parameter sweep
+
+    Args:
+        closes: 1-D array of daily closes for ``cfg.settings.symbol``
+        cfg: Sweep configuration
+
+    Returns:
+        Ranked parameter sets, best first
+    """
+    if cfg.strategy not in STRATEGY_REGISTRY:
+        raise KeyError(f"Unknown strategy: {cfg.strategy}. Available: {', '.join(STRATEGY_REGISTRY)}")
+    if cfg.mode not in ("grid", "random", "adaptive"):
+        raise ValueError(f"Unknown sweep mode: {cfg.mode}")
+    if cfg.metric not in BacktestResult.__dataclass_fields__:
+        raise ValueError(f"Unknown metric: {cfg.metric}")
+
+    closes = np.asarray(closes, dtype=np.float64)
+    folds = walk_forward_windows(len(closes), cfg.train_bars, cfg.test_bars, cfg.step_bars)
+    if not folds:
+        raise ValueError(f"Not enough bars ({len(closes)}) for train={cfg.train_bars} test={cfg.test_bars}")
+
+    space = cfg.resolved_space()
+    run_id = cfg.resolved_run_id()
+    conn = _connect(cfg.db_path)
+    completed = _completed_jobs(conn, run_id)
+    if completed:
+        logger.info(f"[Sweep] Resuming {run_id}: {len(completed)} jobs already checkpointed")
+
+    try:
+        with SharedPriceArray(closes) as shared:
+            if cfg.mode == "grid":
+                param_sets = expand_grid(space)
+                _execute(_build_jobs(param_sets, folds, cfg, completed), shared, cfg, conn, run_id)
+            elif cfg.mode == "random":
+                param_sets = sample_random(space, cfg.n_samples, cfg.seed)
+                _execute(_build_jobs(param_sets, folds, cfg, completed), shared, cfg, conn, run_id)
+            else:
+                explore = sample_random(space, max(1, cfg.n_samples // 2), cfg.seed)
+                _execute(_build_jobs(explore, folds, cfg, completed), shared, cfg, conn, run_id)
+                top = [r["params"] for r in rank_results(conn, run_id)[:5]]
+                refine = sample_neighbors(space, top, cfg.n_samples - len(explore), cfg.seed + 1)
+                # Deduplicate against explored sets; completed jobs are skipped on resume
+                completed = _completed_jobs(conn, run_id)
+                _execute(_build_jobs(refine, folds, cfg, completed), shared, cfg, conn, run_id)
+
+        ranked = rank_results(conn, run_id)
+        selected = walk_forward_selection(conn, run_id)
+        if ranked:
+            oos = float(np.mean([s["test_score"] for s in selected]))
+            logger.info(f"[Sweep] {run_id}: best in-sample {ranked[0]['params']}; "
+                        f"walk-forward mean test {cfg.metric}={oos:.2f} over {len(selected)} folds")
+        return ranked
+    finally:
+        conn.close()
+
+
+def load_closes(db_path: str, symbol: str) -> np.ndarray:
+    """
+    Daily closes of ``symbol`` from a bars table, cold-tiered months included
+
+    ``bars`` holds 1Min bars; each session day (America/New_York) is reduced
+    to its last close, which is what the engine's DTE and volatility
+    scaling assume.
+    """
+    bars = TieredBarReader(db_path).read(symbol).dropna(subset=["close"])
+    closes = bars["close"].to_numpy(dtype=np.float64)
+    if len(closes) == 0:
+        return closes
+    days = bucket_start(bars["t"].to_numpy(dtype=np.int64), "1Day")
+    return closes[np.append(np.flatnonzero(np.diff(days)), len(days) - 1)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Walk-forward parameter sweep for option strategies")
+    parser.add_argument("--strategy", default="iron_condor", choices=sorted(STRATEGY_REGISTRY))
+    parser.add_argument("--symbol", default="SPY")
+    parser.add_argument("--bars-db", default="ops/emo.sqlite", help="SQLite database with a bars table")
+    parser.add_argument("--mode", default="grid", choices=["grid", "random", "adaptive"])
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--train", type=int, default=504)
+    parser.add_argument("--test", type=int, default=126)
+    parser.add_argument("--metric", default="total_pnl")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--db", default=str(DEFAULT_DB), help="SQLite file for results/checkpoints")
+    parser.add_argument("--run-id", default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    closes = load_closes(args.bars_db, args.symbol)
+    cfg = SweepConfig(
+        strategy=args.strategy, mode=args.mode, n_samples=args.samples, seed=args.seed,
+        train_bars=args.train, test_bars=args.test, metric=args.metric,
+        max_workers=args.workers, db_path=Path(args.db), run_id=args.run_id,
+        settings=BacktestSettings(symbol=args.symbol),
+    )
+    ranked = run_sweep(closes, cfg)
+    for row in ranked[:args.top]:
+        print(f"#{row['rank']:>3}  train={row['mean_train_score']:>10.2f}  "
+              f"test={row['mean_test_score']:>10.2f}  {row['params']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
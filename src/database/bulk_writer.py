@@ -0,0 +1,282 @@
+"""
+EMO Options Bot - Bulk Bar Writer
+High-throughput upserts of market bars into SQLite and PostgreSQL/TimescaleDB
+
+Collectors hand rows to a BarBuffer, which flushes them in large batches to a
+writer for the target database:
+
+- SQLite: WAL journal with ``synchronous=NORMAL``, and each batch is a single
+  ``executemany`` of one prepared ``INSERT ... ON CONFLICT`` statement inside
+  one transaction (one fsync per batch instead of one per row).
+- PostgreSQL: the batch is streamed with ``COPY`` into a temporary staging
+  table and merged with one ``INSERT ... SELECT ... ON CONFLICT`` statement,
+  so the server parses one statement per batch instead of one per row.
+
+Within a batch the last row for a key wins, as with row-by-row upserts.
+
+Includes:
+- BarBuffer: shared row buffer with size-triggered flushes
+- SQLiteBulkWriter / PostgresBulkWriter: per-backend batch upserts
+- bulk_writer: writer for an open DB-API connection
+- tune_sqlite: bulk-load pragmas for a SQLite connection
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+BAR_COLUMNS = ("symbol", "ts", "open", "high", "low", "close", "volume")
+BAR_KEY = ("symbol", "ts")
+
+Row = Union[Sequence[Any], Dict[str, Any]]
+
+logger = logging.getLogger(__name__)
+
+
+def tune_sqlite(conn: sqlite3.Connection) -> str:
+    """
+    WAL journal, NORMAL sync and an in-memory temp store (durable at each commit under WAL)
+
+    SQLite silently keeps the old journal mode when ``journal_mode=WAL`` is
+    issued inside an open transaction (and refuses to change ``synchronous``
+    there), so a connection with an open transaction is left untouched with a
+    warning, and the mode SQLite reports back is checked.
+
+    Args:
+        conn: SQLite connection with no open transaction
+
+    Returns:
+        The journal mode in effect afterwards (e.g. "wal"; "memory" for
+        in-memory databases)
+    """
+    if conn.in_transaction:
+        mode = str(conn.execute("PRAGMA journal_mode").fetchone()[0]).lower()
+        logger.warning(f"SQLite connection has an open transaction; journal_mode stays {mode}")
+        return mode
+    mode = str(conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]).lower()
+    if mode not in ("wal", "memory"):
+        logger.warning(f"SQLite kept journal_mode={mode}; bulk writes are not in WAL mode")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MiB page cache
+    return mode
+
+
+class BulkWriter(ABC):
+    """
+    Batch upserts of rows into one table
+
+    Args:
+        conn: Open DB-API connection
+        table: Target table
+        columns: Column order of tuple rows (dict rows are read by name)
+        key: Conflict columns (the table's primary key or a unique index)
+    """
+
+    def __init__(self, conn, table: str = "bars", columns: Sequence[str] = BAR_COLUMNS,
+                 key: Sequence[str] = BAR_KEY):
+        self.conn = conn
+        self.table = table
+        self.columns = tuple(columns)
+        self.key = tuple(key)
+        self.rows_written = 0
+
+    def _tuples(self, rows: Iterable[Row]) -> List[Sequence[Any]]:
+        return [tuple(row[c] for c in self.columns) if isinstance(row, dict) else row for row in rows]
+
+    def _updates(self, excluded: str) -> str:
+        return ", ".join(f"{c}={excluded}.{c}" for c in self.columns if c not in self.key)
+
+    @abstractmethod
+    def write(self, rows: Iterable[Row], commit: bool = True) -> int:
+        """
+        Upsert one batch
+
+        Args:
+            rows: Tuples in ``columns`` order or dicts keyed by column
+            commit: Commit the batch; pass False to leave it in the caller's
+                open transaction
+
+        Returns:
+            Number of rows written
+        """
+
+    def buffer(self, max_rows: Optional[int] = 50_000, commit: bool = True) -> "BarBuffer":
+        """Row buffer that flushes into this writer every ``max_rows`` rows"""
+        return BarBuffer(self, max_rows, commit)
+
+
+class SQLiteBulkWriter(BulkWriter):
+    """Batch upserts for SQLite: one prepared statement, one transaction per batch"""
+
+    def __init__(self, conn: sqlite3.Connection, table: str = "bars", columns: Sequence[str] = BAR_COLUMNS,
+                 key: Sequence[str] = BAR_KEY, tune: bool = True):
+        super().__init__(conn, table, columns, key)
+        if tune:
+            tune_sqlite(conn)
+        updates = self._updates("excluded")
+        self.sql = (f"INSERT INTO {self.table}({', '.join(self.columns)}) "
+                    f"VALUES ({', '.join('?' * len(self.columns))}) "
+                    f"ON CONFLICT({', '.join(self.key)}) "
+                    + (f"DO UPDATE SET {updates}" if updates else "DO NOTHING"))
+
+    def write(self, rows: Iterable[Row], commit: bool = True) -> int:
+        rows = self._tuples(rows)
+        if not rows:
+            return 0
+        try:
+            # The same SQL text reuses the connection's cached prepared statement
+            self.conn.executemany(self.sql, rows)
+            if commit:
+                self.conn.commit()
+        except Exception:
+            if commit:
+                self.conn.rollback()
+            raise
+        self.rows_written += len(rows)
+        return len(rows)
+
+
+class PostgresBulkWriter(BulkWriter):
+    """Batch upserts for PostgreSQL/TimescaleDB: COPY into a staging table, then one merge"""
+
+    def __init__(self, conn, table: str = "bars", columns: Sequence[str] = BAR_COLUMNS,
+                 key: Sequence[str] = BAR_KEY):
+        super().__init__(conn, table, columns, key)
+        cols = ", ".join(self.columns)
+        self.stage = f"_stage_{self.table.replace('.', '_')}"
+        self.create_sql = (f"CREATE TEMP TABLE IF NOT EXISTS {self.stage} "
+                           f"(LIKE {self.table} INCLUDING DEFAULTS, _seq BIGSERIAL) ON COMMIT DELETE ROWS")
+        self.copy_sql = f"COPY {self.stage} ({cols}) FROM STDIN WITH (FORMAT csv)"
+        updates = self._updates("EXCLUDED")
+        # DISTINCT ON keeps the last row per key: ON CONFLICT may not touch a row twice
+        self.merge_sql = (f"INSERT INTO {self.table} ({cols}) "
+                          f"SELECT DISTINCT ON ({', '.join(self.key)}) {cols} FROM {self.stage} "
+                          f"ORDER BY {', '.join(self.key)}, _seq DESC "
+                          f"ON CONFLICT ({', '.join(self.key)}) "
+                          + (f"DO UPDATE SET {updates}" if updates else "DO NOTHING"))
+
+    def _csv(self, rows: List[Sequence[Any]]) -> io.StringIO:
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerows([["" if v is None else v for v in row] for row in rows])  # empty unquoted = NULL
+        buf.seek(0)
+        return buf
+
+    def write(self, rows: Iterable[Row], commit: bool = True) -> int:
+        rows = self._tuples(rows)
+        if not rows:
+            return 0
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(self.create_sql)
+                cur.copy_expert(self.copy_sql, self._csv(rows))
+                cur.execute(self.merge_sql)
+                cur.execute(f"TRUNCATE {self.stage}")  # when the caller keeps the transaction open
+            if commit:
+                self.conn.commit()
+        except Exception:
+            if commit:
+                self.conn.rollback()
+            raise
+        self.rows_written += len(rows)
+        return len(rows)
+
+
+def bulk_writer(conn, table: str = "bars", columns: Sequence[str] = BAR_COLUMNS, key: Sequence[str] = BAR_KEY,
+                kind: Optional[str] = None) -> BulkWriter:
+    """
+    Writer for an open connection
+
+    Args:
+        conn: sqlite3 or psycopg2 connection
+        kind: ``sqlite`` or ``timescale``/``postgres`` (default: detected from ``conn``)
+    """
+    if kind is None:
+        kind = "sqlite" if isinstance(conn, sqlite3.Connection) else "postgres"
+    if kind == "sqlite":
+        return SQLiteBulkWriter(conn, table, columns, key)
+    return PostgresBulkWriter(conn, table, columns, key)
+
+
+class BarBuffer:
+    """
+    Row buffer shared by the collectors
+
+    Rows accumulate in memory and are written in batches of ``max_rows``;
+    use it as a context manager (or call ``flush``) to write the remainder.
+    A batch whose write fails stays buffered for the next flush, keeping at
+    most ``max_pending`` rows (the oldest are dropped first).
+
+    Args:
+        writer: Writer the batches go to (may be set later, before the first flush)
+        max_rows: Batch size; None writes only on ``flush``
+        commit: Commit each batch; False leaves it in the caller's open transaction
+        max_pending: Cap on buffered rows kept after failed writes (default: no cap)
+    """
+
+    def __init__(self, writer: Optional[BulkWriter], max_rows: Optional[int] = 50_000, commit: bool = True,
+                 max_pending: Optional[int] = None):
+        self.writer = writer
+        self.max_rows = max_rows
+        self.commit = commit
+        self.max_pending = max_pending
+        self.rows: List[Row] = []
+        self.rows_written = 0
+        self.rows_dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def append(self, row: Row):
+        self.rows.append(row)
+        if self.max_rows is not None and len(self.rows) >= self.max_rows:
+            self.flush()
+
+    def extend(self, rows: Iterable[Row]):
+        self.rows.extend(rows)
+        while self.max_rows is not None and len(self.rows) >= self.max_rows:
+            batch, self.rows = self.rows[:self.max_rows], self.rows[self.max_rows:]
+            self._write(batch)
+
+    def take(self) -> List[Row]:
+        """Detach the buffered rows, for callers that write them elsewhere (e.g. on a worker thread)"""
+        rows, self.rows = self.rows, []
+        return rows
+
+    def restore(self, rows: List[Row]) -> int:
+        """Put rows whose write failed back in front of newer ones; returns the number dropped"""
+        self.rows[:0] = rows
+        overflow = len(self.rows) - self.max_pending if self.max_pending is not None else 0
+        if overflow <= 0:
+            return 0
+        del self.rows[:overflow]
+        self.rows_dropped += overflow
+        return overflow
+
+    def flush(self) -> int:
+        """Write buffered rows; returns the number written"""
+        if not self.rows:
+            return 0
+        return self._write(self.take())
+
+    def _write(self, rows: List[Row]) -> int:
+        try:
+            written = self.writer.write(rows, commit=self.commit)
+        except Exception:
+            self.restore(rows)
+            raise
+        self.rows_written += written
+        return written
+
+    def __enter__(self) -> "BarBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
@@ -0,0 +1,309 @@
+"""
+EMO Options Bot - Cold Bar Storage
+Compressed columnar month files for bars older than the hot window
+
+The SQLite ``bars`` table kept every minute bar forever, with text
+timestamps, so the database grew without bound and range scans over
+history got slower with it. ``tier_bars`` moves bars older than N days into
+one compressed columnar file per symbol and month, and TieredBarReader
+answers any time range from both tiers: cold files for the old months, the
+SQLite table for the recent rows.
+
+Layout:
+    <root>/<table>/<symbol>/<YYYY-MM>.parquet   (zstd; ``.npz`` without pyarrow)
+        t        int64 UTC epoch ms, ascending and unique
+        open, high, low, close   float64
+        volume   int64
+
+A month file is rewritten atomically (temp file + rename) with the old and
+new rows merged, and the rows are deleted from SQLite only after the file is
+in place. A crash in between leaves the rows in both tiers; readers prefer the
+hot row, and the next tiering run moves them again.
+
+Includes:
+- ColdStore: month files per (table, symbol): merge, read and list
+- tier_bars: move bars older than N days from SQLite into a ColdStore
+- TieredBarReader: one time range across hot SQLite rows and cold files
+- default_cold_root: cold root next to a SQLite database
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .rollups import BARS, BarSource
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+COLUMNS = ("t", "open", "high", "low", "close", "volume")
+DEFAULT_HOT_DAYS = 90
+
+_DAY_MS = 86_400_000
+_SOURCE_NAMES = dict(zip(("t", "o", "h", "l", "c", "v"), COLUMNS))
+
+
+def default_cold_root(db_path: Union[str, Path]) -> Path:
+    """Cold files of a SQLite database live in ``cold/`` beside it"""
+    return Path(db_path).resolve().parent / "cold"
+
+
+def month_start(ms: int) -> int:
+    """Epoch ms of the first instant of the UTC month containing ``ms``"""
+    dt = datetime.fromtimestamp(ms / 1000, timezone.utc)
+    return int(datetime(dt.year, dt.month, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def next_month(ms: int) -> int:
+    """Start of the UTC month after the one containing ``ms``"""
+    return month_start(month_start(ms) + 32 * _DAY_MS)
+
+
+def _month_key(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime("%Y-%m")
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Cold column names and dtypes for a frame of source rows"""
+    df = df.rename(columns=_SOURCE_NAMES)[list(COLUMNS)]
+    # Some collectors leave volume NULL; int64 has no missing value (and npz no nullable ints)
+    df = df.assign(volume=df["volume"].fillna(0))
+    return df.astype({"t": "int64", "open": "float64", "high": "float64", "low": "float64", "close": "float64",
+                      "volume": "int64"})
+
+
+def _merge(older: pd.DataFrame, newer: pd.DataFrame) -> pd.DataFrame:
+    """Union of two frames by ``t``, rows of ``newer`` winning"""
+    if older.empty:
+        return newer.sort_values("t", kind="mergesort").reset_index(drop=True)
+    if newer.empty:
+        return older
+    merged = pd.concat([older, newer], ignore_index=True)
+    merged = merged.drop_duplicates("t", keep="last")
+    return merged.sort_values("t", kind="mergesort").reset_index(drop=True)
+
+
+class ColdStore:
+    """
+    Per-symbol, per-month columnar bar files
+
+    Args:
+        root: Directory holding ``<table>/<symbol>/<YYYY-MM>`` files
+        fmt: ``parquet`` (default when pyarrow is installed) or ``npz``
+    """
+
+    def __init__(self, root: Union[str, Path], fmt: Optional[str] = None):
+        self.root = Path(root)
+        self.fmt = fmt or ("parquet" if PARQUET_AVAILABLE else "npz")
+        if self.fmt == "parquet" and not PARQUET_AVAILABLE:
+            raise ImportError("pyarrow is required for Parquet cold storage")
+
+    def path(self, table: str, symbol: str, month: str, fmt: Optional[str] = None) -> Path:
+        return self.root / table / symbol / f"{month}.{fmt or self.fmt}"
+
+    def months(self, table: str, symbol: str) -> Dict[str, Path]:
+        """Stored month files of a symbol, keyed by ``YYYY-MM``"""
+        d = self.root / table / symbol
+        if not d.is_dir():
+            return {}
+        files = {}
+        for p in sorted(d.iterdir()):
+            if p.suffix in (".parquet", ".npz") and (p.stem not in files or p.suffix == ".parquet"):
+                files[p.stem] = p
+        return files
+
+    def symbols(self, table: str) -> List[str]:
+        d = self.root / table
+        return sorted(p.name for p in d.iterdir() if p.is_dir()) if d.is_dir() else []
+
+    def _load(self, path: Path, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> pd.DataFrame:
+        if path.suffix == ".parquet":
+            filters = [("t", ">=", int(start_ms))] if start_ms is not None else []
+            filters += [("t", "<", int(end_ms))] if end_ms is not None else []
+            return pd.read_parquet(path, filters=filters or None)
+        with np.load(path) as data:
+            t = data["t"]
+            lo = 0 if start_ms is None else int(np.searchsorted(t, start_ms, side="left"))
+            hi = len(t) if end_ms is None else int(np.searchsorted(t, end_ms, side="left"))
+            return pd.DataFrame({c: data[c][lo:hi] for c in COLUMNS})
+
+    def _save(self, path: Path, df: pd.DataFrame):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as fh:
+            if self.fmt == "parquet":
+                df.to_parquet(fh, index=False, compression="zstd")
+            else:
+                np.savez_compressed(fh, **{c: df[c].to_numpy() for c in COLUMNS})
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+
+    def merge(self, table: str, symbol: str, df: pd.DataFrame) -> int:
+        """
+        Add bars of one month to its file, replacing stored bars with the same ``t``
+
+        Args:
+            df: Bars with COLUMNS (or source t/o/h/l/c/v names), all in one UTC month
+
+        Returns:
+            Rows in the month file afterwards
+        """
+        df = _normalize(df)
+        if df.empty:
+            return 0
+        month = _month_key(int(df["t"].iloc[0]))
+        if _month_key(int(df["t"].iloc[-1])) != month:
+            raise ValueError("merge() takes the bars of a single month")
+        existing = self.months(table, symbol).get(month)
+        old = _normalize(self._load(existing)) if existing is not None else df.iloc[:0]
+        merged = _merge(old, df)
+        target = self.path(table, symbol, month)
+        self._save(target, merged)
+        if existing is not None and existing != target:
+            existing.unlink()  # converted to this store's format
+        return len(merged)
+
+    def read(self, table: str, symbol: str, start_ms: Optional[int] = None,
+             end_ms: Optional[int] = None) -> pd.DataFrame:
+        """Cold bars in [start_ms, end_ms), oldest first; only the overlapping month files are opened"""
+        lo = _month_key(start_ms) if start_ms is not None else None
+        hi = _month_key(end_ms - 1) if end_ms is not None else None
+        frames = [self._load(p, start_ms, end_ms) for month, p in self.months(table, symbol).items()
+                  if (lo is None or month >= lo) and (hi is None or month <= hi)]
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return _normalize(pd.DataFrame(columns=list(COLUMNS)))
+        return _normalize(pd.concat(frames, ignore_index=True))
+
+
+def tier_bars(db_path: Union[str, Path], store: Optional[ColdStore] = None, source: BarSource = BARS,
+              older_than_days: int = DEFAULT_HOT_DAYS, now_ms: Optional[int] = None,
+              symbols: Optional[Sequence[str]] = None, vacuum: bool = False) -> Dict[str, int]:
+    """
+    Move bars older than ``older_than_days`` from SQLite into cold month files
+
+    Each (symbol, month) is one step: read the hot rows, merge them into the
+    month file, then delete them in one transaction.
+
+    Args:
+        db_path: SQLite database holding ``source.table``
+        store: Cold store (default: ``default_cold_root(db_path)``)
+        older_than_days: Hot window; older bars are moved
+        now_ms: Current time (default: the clock)
+        symbols: Symbols to tier (default: all)
+        vacuum: VACUUM afterwards so the database file shrinks
+
+    Returns:
+        Rows moved per symbol
+    """
+    store = store or ColdStore(default_cold_root(db_path))
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000) if now_ms is None else int(now_ms)
+    cutoff = now_ms - older_than_days * _DAY_MS
+    moved: Dict[str, int] = {}
+    with closing(sqlite3.connect(db_path, timeout=30)) as conn:
+        if symbols is None:
+            symbols = [s for (s,) in conn.execute(
+                f"SELECT DISTINCT symbol FROM {source.table}" + (f" WHERE {source.where}" if source.where else ""))]
+        for symbol in symbols:
+            where, params = source.range_sql(symbol, None, cutoff)
+            (first,) = conn.execute(f"SELECT MIN({source.time_col}) FROM {source.table} WHERE {where}",
+                                    params).fetchone()
+            moved[symbol] = 0
+            if first is None:
+                continue
+            lo = month_start(source.to_ms(first))
+            total = 0
+            while lo < cutoff:
+                hi = min(next_month(lo), cutoff)
+                rows = source.read(conn, symbol, lo, hi)
+                if len(rows):
+                    store.merge(source.table, symbol, rows)
+                    where, params = source.range_sql(symbol, lo, hi)
+                    with conn:
+                        conn.execute(f"DELETE FROM {source.table} WHERE {where}", params)
+                    total += len(rows)
+                lo = hi
+            moved[symbol] = total
+        if vacuum and any(moved.values()):
+            conn.execute("VACUUM")
+    return moved
+
+
+class TieredBarReader:
+    """
+    Bars of any time range across the hot SQLite table and the cold files
+
+    Args:
+        db_path: SQLite database holding ``source.table``
+        cold_root: Cold store root (default: ``default_cold_root(db_path)``)
+        source: The hot table's layout (default: ``bars``)
+    """
+
+    def __init__(self, db_path: Union[str, Path], cold_root: Optional[Union[str, Path]] = None,
+                 source: BarSource = BARS):
+        self.db_path = Path(db_path)
+        self.source = source
+        root = Path(cold_root) if cold_root is not None else default_cold_root(db_path)
+        self.store = ColdStore(root) if root.is_dir() else None
+
+    def read(self, symbol: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+             conn: Optional[sqlite3.Connection] = None) -> pd.DataFrame:
+        """
+        Bars in [start_ms, end_ms), oldest first
+
+        Returns:
+            DataFrame with COLUMNS (``t`` in epoch ms); where both tiers hold
+            a bar the hot row is used
+        """
+        if conn is not None:
+            hot = _normalize(self.source.read(conn, symbol, start_ms, end_ms))
+        else:
+            with closing(sqlite3.connect(self.db_path, timeout=30)) as own:
+                hot = _normalize(self.source.read(own, symbol, start_ms, end_ms))
+        if self.store is None:
+            return hot
+        cold = self.store.read(self.source.table, symbol, start_ms, end_ms)
+        return _merge(cold, hot)
+
+    def symbols(self) -> List[str]:
+        """Symbols with bars in either tier"""
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            hot = {s for (s,) in conn.execute(f"SELECT DISTINCT symbol FROM {self.source.table}")}
+        cold = set(self.store.symbols(self.source.table)) if self.store is not None else set()
+        return sorted(hot | cold)
+
+
+def main():
+    """Tier old bars from the command line"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Move bars older than N days into cold columnar files")
+    parser.add_argument("--db", default=str(Path(__file__).resolve().parents[2] / "data" / "emo.sqlite"))
+    parser.add_argument("--older-than", type=int, default=DEFAULT_HOT_DAYS, help="Days of bars kept in SQLite")
+    parser.add_argument("--root", help="Cold store root (default: cold/ next to the database)")
+    parser.add_argument("--format", choices=["parquet", "npz"])
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: all)")
+    parser.add_argument("--vacuum", action="store_true", help="Shrink the database file afterwards")
+    args = parser.parse_args()
+
+    store = ColdStore(args.root or default_cold_root(args.db), args.format)
+    symbols = [s.strip().upper() for s in args.symbols.split(",")] if args.symbols else None
+    moved = tier_bars(args.db, store, older_than_days=args.older_than, symbols=symbols, vacuum=args.vacuum)
+    for symbol, rows in moved.items():
+        print(f"{symbol}: {rows} bars moved to {store.root}")
+
+
+if __name__ == "__main__":
+    main()
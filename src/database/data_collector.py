@@ -4,11 +4,11 @@ Real-time market data collection from Alpaca Markets API
 """
 
 import os
-import requests
 import datetime as dt
 import time
 from pathlib import Path
 from .models import DB
+from ..utils.http_client import get_http_client
 
 # Configuration
 ALPACA_DATA_URL = os.getenv("ALPACA_DATA_URL", "https://data.alpaca.markets/v2")
@@ -37,7 +37,7 @@ def fetch_latest_bar(symbol: str):
     params = {"timeframe": "1Min", "limit": 1}
     
     try:
-        r = requests.get(url, headers=_headers(), params=params, timeout=10)
+        r = get_http_client().get(url, endpoint="alpaca.bars", headers=_headers(), params=params, timeout=10)
         r.raise_for_status()
         data = r.json()
         
@@ -8,7 +8,6 @@ from __future__ import annotations
 import os, sqlite3, time, json
 from pathlib import Path
 from typing import List, Dict, Any, Iterable, Tuple, Optional
-import requests
 from datetime import datetime, timezone
 import pandas as pd
 
@@ -18,10 +17,16 @@ sys.path.append(str(Path(__file__).resolve().parents[2]))
 
 from src.logic.risk_manager import RiskManager, PortfolioSnapshot, Position
 from src.database.models import get_db_connection
+from src.database.bulk_writer import SQLiteBulkWriter
+from src.database.watermarks import WatermarkStore, timeframe_ms
+from src.database.rollups import RollupEngine
+from src.utils.http_client import get_http_client
 
 ROOT = Path(__file__).resolve().parents[2]
 DATA = ROOT / "data"
 DB = DATA / "emo.sqlite"
+PROVIDER = "alpaca"
+ENHANCED_BAR_COLUMNS = ("symbol", "t", "o", "h", "l", "c", "v", "tf")
 
 class EnhancedDataCollector:
     """Enhanced data collector with risk management integration."""
@@ -29,6 +34,8 @@ class EnhancedDataCollector:
     def __init__(self):
         self.risk_manager = RiskManager()
         self._ensure_database()
+        self.watermarks = WatermarkStore(DB)
+        self.rollups = RollupEngine(DB)
     
     def _ensure_database(self):
         """Ensure database and tables exist."""
@@ -120,16 +127,23 @@ class EnhancedDataCollector:
         """Get Alpaca data URL."""
         return os.getenv("ALPACA_DATA_URL", "https://data.alpaca.markets/v2").rstrip("/")
     
-    def fetch_bars(self, symbol: str, timeframe: str = "1Min", limit: int = 1000) -> List[Dict[str, Any]]:
-        """Fetch bars from Alpaca API."""
+    def _request_bars(self, symbol: str, timeframe: str, limit: int, start_ms: Optional[int] = None,
+                      end_ms: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Request bars from Alpaca, optionally between two epoch-ms times (inclusive); raises on failure."""
         url = f"{self._alpaca_data_url()}/stocks/{symbol}/bars"
         params = {"timeframe": timeframe, "limit": limit}
+        for key, ms in (("start", start_ms), ("end", end_ms)):
+            if ms is not None:
+                params[key] = datetime.fromtimestamp(ms / 1000, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
         
+        r = get_http_client().get(url, endpoint="alpaca.bars", headers=self._alpaca_headers(), params=params,
+                                  timeout=20, raise_for_status=True)
+        return r.json().get("bars", [])
+    
+    def fetch_bars(self, symbol: str, timeframe: str = "1Min", limit: int = 1000) -> List[Dict[str, Any]]:
+        """Fetch bars from Alpaca API."""
         try:
-            r = requests.get(url, headers=self._alpaca_headers(), params=params, timeout=20)
-            r.raise_for_status()
-            js = r.json()
-            return js.get("bars", [])
+            return self._request_bars(symbol, timeframe, limit)
         except Exception as e:
             print(f"[collector] Error fetching {symbol}: {e}")
             return []
@@ -153,24 +167,44 @@ class EnhancedDataCollector:
                 b.get("v"), timeframe
             )
     
-    def ingest_market_data(self, symbols: List[str], timeframe: str = "1Min", limit: int = 1000) -> int:
-        """Ingest market data with enhanced logging."""
+    def ingest_market_data(self, symbols: List[str], timeframe: str = "1Min", limit: int = 1000,
+                           max_windows: int = 10) -> int:
+        """
+        Ingest market data with enhanced logging.
+        
+        Only bars after each symbol's watermark are requested (the last ``limit``
+        bars on the first run), in windows of at most ``limit`` bars, plus any
+        recorded gaps. Each window's rows, its watermark update and the refreshed
+        5Min-1Day rollups commit in one transaction, so an interrupted run
+        resumes where it stopped.
+        """
         inserted = 0
+        now_ms = int(time.time() * 1000)
+        lookback_ms = (limit - 1) * timeframe_ms(timeframe)  # one window of `limit` bars
         
         with sqlite3.connect(DB) as conn:
+            writer = SQLiteBulkWriter(conn, "enhanced_bars", ENHANCED_BAR_COLUMNS, key=("symbol", "t", "tf"))
             for sym in symbols:
                 try:
-                    bars = self.fetch_bars(sym, timeframe=timeframe, limit=limit)
-                    if bars:
+                    windows = self.watermarks.plan(sym, timeframe, PROVIDER, now_ms, lookback_ms,
+                                                   chunk_bars=limit, max_windows=max_windows, conn=conn)
+                    received = 0
+                    for window in windows:
+                        bars = self._request_bars(sym, timeframe, limit, window.start_ms, window.end_ms)
                         rows = list(self._rows_from_bars(sym, timeframe, bars))
-                        conn.executemany("""
-                            INSERT OR REPLACE INTO enhanced_bars(symbol,t,o,h,l,c,v,tf)
-                            VALUES (?,?,?,?,?,?,?,?)
-                        """, rows)
-                        inserted += len(rows)
-                        print(f"[collector] {sym}: {len(rows)} {timeframe} bars")
+                        with conn:
+                            # The rows join the window's transaction with its watermark and rollups
+                            with writer.buffer(commit=False) as buffer:
+                                buffer.extend(rows)
+                            self.watermarks.commit(sym, timeframe, PROVIDER, window, [r[1] for r in rows], conn)
+                            if rows and timeframe == "1Min":
+                                self.rollups.refresh(sym, min(r[1] for r in rows), max(r[1] for r in rows), conn)
+                        received += len(rows)
+                    inserted += received
+                    if received:
+                        print(f"[collector] {sym}: {received} {timeframe} bars ({len(windows)} requests)")
                     else:
-                        print(f"[collector] {sym}: No data received")
+                        print(f"[collector] {sym}: No new data")
                         
                 except Exception as e:
                     print(f"[collector] {sym} error: {e}")
@@ -10,6 +10,8 @@ import datetime as dt
 from pathlib import Path
 from contextlib import closing
 
+from .bulk_writer import bulk_writer
+
 # Configuration
 EMO_ENV = os.getenv("EMO_ENV", "dev").lower()
 ROOT = Path(__file__).resolve().parents[2]  # src/database/ -> project root
@@ -158,29 +160,12 @@ class DB:
         if not rows:
             return 0
             
-        if self.kind == "sqlite":
-            with contextlib.closing(self.conn.cursor()) as cur:
-                cur.executemany("""
-                INSERT INTO bars(symbol, ts, open, high, low, close, volume)
-                VALUES (:symbol, :ts, :open, :high, :low, :close, :volume)
-                ON CONFLICT(symbol, ts) DO UPDATE SET
-                  open=excluded.open, high=excluded.high, low=excluded.low,
-                  close=excluded.close, volume=excluded.volume
-                """, rows)
-            self.conn.commit()
-            return len(rows)
-        else:
-            import psycopg2.extras
-            with self.conn.cursor() as cur:
-                psycopg2.extras.execute_batch(cur, """
-                INSERT INTO bars(symbol, ts, open, high, low, close, volume)
-                VALUES (%(symbol)s, %(ts)s, %(open)s, %(high)s, %(low)s, %(close)s, %(volume)s)
-                ON CONFLICT (symbol, ts) DO UPDATE SET
-                  open=EXCLUDED.open, high=EXCLUDED.high, low=EXCLUDED.low,
-                  close=EXCLUDED.close, volume=EXCLUDED.volume
-                """, rows, page_size=100)
-                self.conn.commit()
-                return len(rows)
+        # One transaction per batch on SQLite, COPY + merge on PostgreSQL
+        if getattr(self, "_bar_writer", None) is None:
+            self._bar_writer = bulk_writer(self.conn, kind="sqlite" if self.kind == "sqlite" else "postgres")
+        with self._bar_writer.buffer() as buffer:
+            buffer.extend(rows)
+        return buffer.rows_written
     
     # Analysis data methods
     def insert_run(self, ts_utc, regime, info_shock, z_perp, z_vix, z_sent):
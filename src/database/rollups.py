@@ -0,0 +1,395 @@
+"""
+EMO Options Bot - Multi-Timeframe Bar Rollups
+5Min / 15Min / 1Hour / 1Day bars maintained from the stored 1Min bars
+
+The bar tables only hold 1Min bars, so every consumer of a longer horizon
+used to read and resample minutes itself. RollupEngine keeps the longer
+timeframes in a ``<source>_rollups`` table, the SQLite counterpart of
+TimescaleDB continuous aggregates:
+
+- rollups are hierarchical (5Min from 1Min, 15Min from 5Min, 1Hour from
+  15Min, 1Day from 1Hour), so refreshing a bucket reads at most a few dozen
+  child rows
+- ``refresh`` recomputes only the buckets containing a range of 1Min bars,
+  right after they are written and in the same transaction; recomputing whole
+  buckets from their children keeps rollups exact under duplicate, late or
+  corrected bars
+- ``backfill`` builds rollups for history on demand, in day-aligned chunks
+- ``read`` returns any timeframe, from the rollup table for the long ones
+
+Daily buckets start at midnight America/New_York (Alpaca's 1Day bars);
+intraday buckets are aligned to the clock. Rollup times are epoch ms.
+On TimescaleDB, ``timescale_aggregates_sql`` creates real continuous
+aggregates with refresh policies instead.
+
+Includes:
+- BarSource: a 1Min bars table (``enhanced_bars``/ENHANCED_BARS or ``bars``/BARS)
+- RollupEngine: incremental refresh, backfill and reads
+- bucket_start: bucket of epoch-ms timestamps for a timeframe
+- timescale_aggregates_sql: continuous aggregate DDL for TimescaleDB
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .bulk_writer import SQLiteBulkWriter
+from .watermarks import timeframe_ms
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_DB = ROOT / "data" / "emo.sqlite"
+
+ROLLUPS = ("5Min", "15Min", "1Hour", "1Day")
+PARENT = {"5Min": "1Min", "15Min": "5Min", "1Hour": "15Min", "1Day": "1Hour"}
+SESSION_TZ = "America/New_York"
+ROLLUP_COLUMNS = ("symbol", "tf", "t", "o", "h", "l", "c", "v", "n")
+
+_DAY_MS = 86_400_000
+_ALIASES = {"1H": "1Hour", "60Min": "1Hour", "1D": "1Day"}
+
+
+@dataclass(frozen=True)
+class BarSource:
+    """A table of 1Min bars and how its columns are stored"""
+    table: str = "enhanced_bars"
+    time_col: str = "t"
+    time_kind: str = "ms"                                # "ms" epoch-ms integers, "iso" ISO-8601 UTC text
+    columns: Tuple[str, ...] = ("o", "h", "l", "c", "v")  # open, high, low, close, volume
+    where: str = "tf='1Min'"                             # extra filter selecting 1Min rows
+
+    @property
+    def rollup_table(self) -> str:
+        return f"{self.table}_rollups"
+
+    def bound(self, ms: int):
+        """``ms`` as a value comparable with the time column"""
+        if self.time_kind == "iso":
+            return pd.Timestamp(ms, unit="ms", tz="UTC").strftime("%Y-%m-%dT%H:%M:%S")
+        return int(ms)
+
+    def to_ms(self, value) -> int:
+        """A stored time value in epoch ms"""
+        return _to_ms(value)
+
+    def range_sql(self, symbol: str, start_ms: Optional[int] = None,
+                  end_ms: Optional[int] = None) -> Tuple[str, List]:
+        """WHERE clause and parameters selecting ``symbol``'s 1Min bars in [start_ms, end_ms)"""
+        where, params = ["symbol=?"], [symbol]
+        if self.where:
+            where.append(self.where)
+        if start_ms is not None:
+            where.append(f"{self.time_col} >= ?")
+            params.append(self.bound(start_ms))
+        if end_ms is not None:
+            where.append(f"{self.time_col} < ?")
+            params.append(self.bound(end_ms))
+        return " AND ".join(where), params
+
+    def read(self, conn: sqlite3.Connection, symbol: str, start_ms: Optional[int] = None,
+             end_ms: Optional[int] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """1Min bars as t (epoch ms), o, h, l, c, v, oldest first (``limit`` keeps the newest)"""
+        where, params = self.range_sql(symbol, start_ms, end_ms)
+        sql = (f"SELECT {self.time_col}, {', '.join(self.columns)} FROM {self.table} WHERE {where} "
+               f"ORDER BY {self.time_col}" + (f" DESC LIMIT {int(limit)}" if limit else ""))
+        df = pd.read_sql_query(sql, conn, params=params)
+        df.columns = ["t", "o", "h", "l", "c", "v"]
+        if self.time_kind == "iso":
+            df["t"] = pd.to_datetime(df["t"], utc=True, format="ISO8601").dt.as_unit("ms").astype("int64")
+        return df.iloc[::-1].reset_index(drop=True) if limit else df
+
+
+ENHANCED_BARS = BarSource()
+BARS = BarSource("bars", "ts", "iso", ("open", "high", "low", "close", "volume"), "")
+
+
+def canonical_timeframe(timeframe: str) -> str:
+    """``1H`` -> ``1Hour``, ``1D`` -> ``1Day``; other names unchanged"""
+    return _ALIASES.get(timeframe, timeframe)
+
+
+def bucket_start(ts_ms: Union[int, Sequence[int], np.ndarray], timeframe: str) -> np.ndarray:
+    """Start (epoch ms) of the ``timeframe`` bucket of each timestamp"""
+    ts = np.asarray(ts_ms, dtype=np.int64)
+    timeframe = canonical_timeframe(timeframe)
+    if timeframe != "1Day":
+        step = timeframe_ms(timeframe)
+        return ts - ts % step
+    local = pd.DatetimeIndex(pd.to_datetime(ts.ravel(), unit="ms", utc=True)).tz_convert(SESSION_TZ).normalize()
+    return local.tz_convert("UTC").as_unit("ms").asi8.reshape(ts.shape)
+
+
+def _next_bucket(start_ms: int, timeframe: str) -> int:
+    if timeframe == "1Day":  # 23 to 25 hours around DST changes
+        return int(bucket_start(start_ms + 26 * 3_600_000, timeframe))
+    return start_ms + timeframe_ms(timeframe)
+
+
+def _to_ms(ts) -> int:
+    if isinstance(ts, str):
+        stamp = pd.Timestamp(ts)
+        stamp = stamp.tz_localize("UTC") if stamp.tzinfo is None else stamp.tz_convert("UTC")
+        return stamp.value // 1_000_000
+    return int(ts)
+
+
+def aggregate(t: np.ndarray, o: np.ndarray, h: np.ndarray, l: np.ndarray, c: np.ndarray, v: np.ndarray,
+              n: np.ndarray, timeframe: str) -> Dict[str, np.ndarray]:
+    """
+    Roll time-sorted bars up into ``timeframe`` buckets
+
+    Open is the first bar's, close the last bar's, high/low the extremes
+    (missing values ignored), volume and bar count the sums.
+    """
+    if len(t) == 0:
+        return {k: np.empty(0) for k in ("t", "o", "h", "l", "c", "v", "n")}
+    buckets = bucket_start(t, timeframe)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(buckets)) + 1])
+    ends = np.concatenate([starts[1:], [len(t)]]) - 1
+    return {
+        "t": buckets[starts],
+        "o": o[starts],
+        "h": np.fmax.reduceat(h, starts),
+        "l": np.fmin.reduceat(l, starts),
+        "c": c[ends],
+        "v": np.add.reduceat(np.nan_to_num(v), starts),
+        "n": np.add.reduceat(n, starts),
+    }
+
+
+class RollupEngine:
+    """
+    Rollups of one 1Min source table, kept in ``<source>_rollups``
+
+    Like WatermarkStore, every method takes an optional open connection so
+    writers can refresh rollups in the transaction that stores the bars.
+    """
+
+    def __init__(self, db_path: Union[str, Path] = DEFAULT_DB, source: BarSource = ENHANCED_BARS,
+                 timeframes: Sequence[str] = ROLLUPS):
+        self.db_path = Path(db_path)
+        self.source = source
+        self.timeframes = [tf for tf in ROLLUPS if tf in {canonical_timeframe(t) for t in timeframes}]
+        self.table = source.rollup_table
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self.connect()) as conn, conn:
+            self.ensure(conn)
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def ensure(self, conn: sqlite3.Connection):
+        """Create the rollup table"""
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                symbol TEXT NOT NULL,
+                tf TEXT NOT NULL,
+                t INTEGER NOT NULL,            -- bucket start, epoch ms
+                o REAL, h REAL, l REAL, c REAL,
+                v INTEGER,
+                n INTEGER NOT NULL,            -- 1Min bars in the bucket
+                PRIMARY KEY (symbol, tf, t)
+            )
+        """)
+
+    def _with_conn(self, conn: Optional[sqlite3.Connection], fn, *args):
+        if conn is not None:
+            return fn(conn, *args)
+        with closing(self.connect()) as own, own:
+            return fn(own, *args)
+
+    def _read_source(self, conn: sqlite3.Connection, symbol: str, start_ms: Optional[int], end_ms: Optional[int],
+                     limit: Optional[int] = None) -> pd.DataFrame:
+        df = self.source.read(conn, symbol, start_ms, end_ms, limit)
+        df["n"] = 1
+        return df
+
+    def _read_rollup(self, conn: sqlite3.Connection, symbol: str, timeframe: str, start_ms: Optional[int],
+                     end_ms: Optional[int], limit: Optional[int] = None) -> pd.DataFrame:
+        where, params = ["symbol=?", "tf=?"], [symbol, timeframe]
+        if start_ms is not None:
+            where.append("t >= ?")
+            params.append(int(start_ms))
+        if end_ms is not None:
+            where.append("t < ?")
+            params.append(int(end_ms))
+        sql = (f"SELECT t, o, h, l, c, v, n FROM {self.table} WHERE {' AND '.join(where)} ORDER BY t"
+               + (f" DESC LIMIT {int(limit)}" if limit else ""))
+        df = pd.read_sql_query(sql, conn, params=params)
+        return df.iloc[::-1].reset_index(drop=True) if limit else df
+
+    def _refresh(self, conn: sqlite3.Connection, symbol: str, start_ms: int, end_ms: int) -> Dict[str, int]:
+        writer = SQLiteBulkWriter(conn, self.table, ROLLUP_COLUMNS, key=("symbol", "tf", "t"), tune=False)
+        written = {}
+        lo, hi = int(start_ms), int(end_ms)  # touched child range, inclusive
+        for tf in self.timeframes:
+            lo = int(bucket_start(lo, tf))
+            hi = _next_bucket(int(bucket_start(hi, tf)), tf)  # exclusive
+            parent = PARENT[tf]
+            if parent == "1Min":
+                children = self._read_source(conn, symbol, lo, hi)
+            else:
+                children = self._read_rollup(conn, symbol, parent, lo, hi)
+            cols = {k: children[k].to_numpy(dtype=np.int64 if k in ("t", "n") else np.float64)
+                    for k in ("t", "o", "h", "l", "c", "v", "n")}
+            rolled = aggregate(*(cols[k] for k in ("t", "o", "h", "l", "c", "v", "n")), timeframe=tf)
+            conn.execute(f"DELETE FROM {self.table} WHERE symbol=? AND tf=? AND t >= ? AND t < ?",
+                         (symbol, tf, lo, hi))
+            rows = [(symbol, tf, int(t), *(None if np.isnan(x) else float(x) for x in (o, h, l, c)), int(v), int(n))
+                    for t, o, h, l, c, v, n in zip(*(rolled[k] for k in ("t", "o", "h", "l", "c", "v", "n")))]
+            written[tf] = writer.write(rows, commit=False)
+            hi -= 1
+        return written
+
+    def refresh(self, symbol: str, start_ms: int, end_ms: int,
+                conn: Optional[sqlite3.Connection] = None) -> Dict[str, int]:
+        """
+        Recompute every rollup bucket containing 1Min bars from ``start_ms`` to ``end_ms``
+
+        Call after the 1Min bars are written (in the same transaction when
+        ``conn`` is given; otherwise committed on a connection of its own).
+
+        Returns:
+            Rollup rows written per timeframe
+        """
+        return self._with_conn(conn, self._refresh, symbol, start_ms, end_ms)
+
+    def refresh_bars(self, bars: Iterable[Tuple[str, Union[int, str]]],
+                     conn: Optional[sqlite3.Connection] = None) -> int:
+        """
+        Refresh the buckets touched by newly written bars
+
+        Args:
+            bars: (symbol, bar time) pairs; times in epoch ms or ISO-8601 text
+
+        Returns:
+            Rollup rows written
+        """
+        spans: Dict[str, List[int]] = {}
+        for symbol, ts in bars:
+            ms = _to_ms(ts)
+            span = spans.setdefault(symbol, [ms, ms])
+            span[0], span[1] = min(span[0], ms), max(span[1], ms)
+
+        def run(c):
+            return sum(sum(self._refresh(c, s, lo, hi).values()) for s, (lo, hi) in spans.items())
+        return self._with_conn(conn, run)
+
+    def backfill(self, symbols: Optional[Sequence[str]] = None, start_ms: Optional[int] = None,
+                 end_ms: Optional[int] = None, chunk_days: int = 7) -> Dict[str, int]:
+        """
+        Build rollups for stored history, one committed chunk of days at a time
+
+        Args:
+            symbols: Symbols to roll up (default: every symbol in the source)
+            start_ms / end_ms: Range of 1Min bars (default: all stored)
+            chunk_days: Days of 1Min bars per transaction
+
+        Returns:
+            Rollup rows written per symbol
+        """
+        src = self.source
+        with closing(self.connect()) as conn:
+            if symbols is None:
+                symbols = [s for (s,) in conn.execute(
+                    f"SELECT DISTINCT symbol FROM {src.table}" + (f" WHERE {src.where}" if src.where else ""))]
+            written = {}
+            for symbol in symbols:
+                first, last = conn.execute(
+                    f"SELECT MIN({src.time_col}), MAX({src.time_col}) FROM {src.table} WHERE symbol=?"
+                    + (f" AND {src.where}" if src.where else ""), (symbol,)).fetchone()
+                if first is None:
+                    continue
+                lo = max(_to_ms(first), start_ms) if start_ms is not None else _to_ms(first)
+                hi = min(_to_ms(last), end_ms) if end_ms is not None else _to_ms(last)
+                total = 0
+                chunk = chunk_days * _DAY_MS
+                while lo <= hi:
+                    with conn:
+                        total += sum(self._refresh(conn, symbol, lo, min(lo + chunk - 1, hi)).values())
+                    lo += chunk
+                written[symbol] = total
+        return written
+
+    def read(self, symbol: str, timeframe: str = "1Min", start_ms: Optional[int] = None,
+             end_ms: Optional[int] = None, limit: Optional[int] = None,
+             conn: Optional[sqlite3.Connection] = None) -> pd.DataFrame:
+        """
+        Bars of any timeframe, oldest first
+
+        1Min bars come from the source table, the rollup timeframes from the
+        rollup table; ``limit`` keeps the newest bars.
+
+        Returns:
+            DataFrame with t (epoch ms), o, h, l, c, v and, for rollups, n
+        """
+        timeframe = canonical_timeframe(timeframe)
+        if timeframe == "1Min":
+            return self._with_conn(conn, lambda c: self._read_source(c, symbol, start_ms, end_ms, limit)
+                                   .drop(columns="n"))
+        if timeframe not in self.timeframes:
+            raise ValueError(f"No rollup for timeframe {timeframe} (have {', '.join(self.timeframes)})")
+        return self._with_conn(conn, self._read_rollup, symbol, timeframe, start_ms, end_ms, limit)
+
+
+TIMESCALE_BUCKETS = {"5Min": "5 minutes", "15Min": "15 minutes", "1Hour": "1 hour", "1Day": "1 day"}
+
+
+def timescale_aggregates_sql(table: str = "market_bars", time_col: str = "ts",
+                             timeframes: Sequence[str] = ROLLUPS) -> List[str]:
+    """
+    Continuous aggregate and refresh policy statements for a TimescaleDB 1Min hypertable
+
+    Each view is ``<table>_<timeframe>`` (e.g. ``market_bars_5min``) and
+    answers queries in real time: materialized buckets plus the newest raw
+    rows. Daily buckets use the session time zone.
+    """
+    statements = []
+    for tf in timeframes:
+        interval = TIMESCALE_BUCKETS[canonical_timeframe(tf)]
+        view = f"{table}_{canonical_timeframe(tf).lower()}"
+        tz = f", '{SESSION_TZ}'" if tf == "1Day" else ""
+        count, unit = interval.split()
+        statements.append(f"""
+            CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+            WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+            SELECT symbol, time_bucket(INTERVAL '{interval}', {time_col}{tz}) AS bucket,
+                   first(open, {time_col}) AS open, max(high) AS high, min(low) AS low,
+                   last(close, {time_col}) AS close, sum(volume) AS volume, count(*) AS n
+            FROM {table}
+            GROUP BY symbol, bucket
+            WITH NO DATA
+        """)
+        statements.append(f"""
+            SELECT add_continuous_aggregate_policy('{view}',
+                start_offset => INTERVAL '{3 * int(count)} {unit}', end_offset => INTERVAL '{interval}',
+                schedule_interval => INTERVAL '{interval}', if_not_exists => TRUE)
+        """)
+    return statements
+
+
+def main():
+    """Backfill rollups from the command line"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build 5Min/15Min/1Hour/1Day rollups from stored 1Min bars")
+    parser.add_argument("--db", default=str(DEFAULT_DB))
+    parser.add_argument("--source", choices=["enhanced_bars", "bars"], default="enhanced_bars")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: all)")
+    parser.add_argument("--chunk-days", type=int, default=7)
+    args = parser.parse_args()
+
+    engine = RollupEngine(args.db, ENHANCED_BARS if args.source == "enhanced_bars" else BARS)
+    symbols = [s.strip().upper() for s in args.symbols.split(",")] if args.symbols else None
+    for symbol, rows in engine.backfill(symbols, chunk_days=args.chunk_days).items():
+        print(f"{symbol}: {rows} rollup rows")
+
+
+if __name__ == "__main__":
+    main()
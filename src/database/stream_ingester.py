@@ -0,0 +1,686 @@
+"""
+EMO Options Bot - Streaming Bar/Quote Ingester
+Websocket market-data feed with batched writes and in-process fan-out
+
+The REST collectors poll on a sleep loop, so a bar reaches the database up to
+one polling interval after it closes and most requests return nothing new.
+StreamIngester instead holds one websocket to an Alpaca-style market-data
+stream (``auth`` and ``subscribe`` actions; messages are JSON arrays of
+events tagged by ``T``) and:
+
+- buffers bars and writes them through the bulk writer every ``flush_rows``
+  bars or ``flush_interval`` seconds, on a writer thread so the event loop
+  never waits on the database
+- reconnects with exponential backoff and resubscribes to the current symbol
+  sets, including symbols added while it was disconnected
+- publishes every bar and quote to in-process subscribers: bounded asyncio
+  queues for coroutines (signals) and callbacks for synchronous consumers,
+  plus a latest-bar/quote snapshot per symbol (dashboard)
+
+The transport is the ``websockets`` package when it is installed, otherwise
+MiniWebSocket, a small RFC 6455 implementation on asyncio streams (text and
+binary frames, fragmentation, ping/pong, close handshake). The stand-in
+server in ``scripts/ingestion/mock_stream_server.py`` speaks the same protocol.
+
+Includes:
+- StreamConfig: feed URL, credentials, symbols, batching and backoff
+- StreamIngester: connection loop, batched writes and fan-out
+- Subscription: bounded event queue of one in-process subscriber
+- MiniWebSocket / connect_websocket: websocket transport
+- get_stream_ingester: process-wide ingester
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import ssl
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlparse
+
+from .bulk_writer import BarBuffer, BulkWriter, bulk_writer
+
+try:
+    import websockets
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    WEBSOCKETS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_URL = "wss://stream.data.alpaca.markets/v2/iex"
+DATA_SOURCE = "alpaca_stream"
+
+Event = Dict[str, Any]
+
+
+# --- Websocket transport ----------------------------------------------------
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+class WebSocketClosed(ConnectionError):
+    """The websocket was closed by the peer or dropped"""
+
+    def __init__(self, code: int = 1006, reason: str = ""):
+        super().__init__(f"websocket closed ({code}{': ' + reason if reason else ''})")
+        self.code = code
+        self.reason = reason
+
+
+def accept_key(key: str) -> str:
+    """``Sec-WebSocket-Accept`` value for a client's ``Sec-WebSocket-Key``"""
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+def _apply_mask(data: bytes, mask: bytes) -> bytes:
+    n = len(data)
+    if not n:
+        return data
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, "big") ^ int.from_bytes(key, "big")).to_bytes(n, "big")
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool, fin: bool = True) -> bytes:
+    """One websocket frame; clients must mask, servers must not"""
+    head = bytearray([(0x80 if fin else 0) | opcode])
+    bit = 0x80 if mask else 0
+    n = len(payload)
+    if n < 126:
+        head.append(bit | n)
+    elif n < 1 << 16:
+        head.append(bit | 126)
+        head += struct.pack("!H", n)
+    else:
+        head.append(bit | 127)
+        head += struct.pack("!Q", n)
+    if mask:
+        key = os.urandom(4)
+        return bytes(head) + key + _apply_mask(payload, key)
+    return bytes(head) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[bool, int, bytes]:
+    """Next frame as (fin, opcode, unmasked payload)"""
+    b1, b2 = await reader.readexactly(2)
+    n = b2 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if b2 & 0x80 else None
+    payload = await reader.readexactly(n)
+    return bool(b1 & 0x80), b1 & 0x0F, _apply_mask(payload, mask) if mask else payload
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[str, Dict[str, str]]:
+    lines = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+class MiniWebSocket:
+    """
+    Minimal websocket endpoint over asyncio streams
+
+    Same ``send`` / ``recv`` / ``close`` interface as a ``websockets``
+    connection. ``recv`` reassembles fragmented messages and answers pings;
+    it raises WebSocketClosed once the peer closes or the connection drops.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client: bool = True):
+        self.reader = reader
+        self.writer = writer
+        self.client = client  # clients mask their frames
+        self.closed = False
+
+    @classmethod
+    async def connect(cls, url: str, timeout: float = 10.0) -> "MiniWebSocket":
+        """Open a client connection to a ``ws://`` or ``wss://`` URL"""
+        parts = urlparse(url)
+        secure = parts.scheme == "wss"
+        port = parts.port or (443 if secure else 80)
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, port, ssl=ssl.create_default_context() if secure else None),
+            timeout)
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        writer.write((f"GET {path} HTTP/1.1\r\nHost: {parts.hostname}:{port}\r\n"
+                      "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        await writer.drain()
+        try:
+            status, headers = await asyncio.wait_for(_read_head(reader), timeout)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            writer.close()
+            raise WebSocketClosed(1006, "no handshake response")
+        if " 101 " not in f"{status} " or headers.get("sec-websocket-accept") != accept_key(key):
+            writer.close()
+            raise ConnectionError(f"websocket handshake rejected: {status}")
+        return cls(reader, writer, client=True)
+
+    @classmethod
+    async def accept(cls, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> "MiniWebSocket":
+        """Complete the server side of the opening handshake"""
+        _, headers = await _read_head(reader)
+        key = headers.get("sec-websocket-key")
+        if not key or headers.get("upgrade", "").lower() != "websocket":
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+            writer.close()
+            raise ConnectionError("not a websocket upgrade request")
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n").encode())
+        await writer.drain()
+        return cls(reader, writer, client=False)
+
+    async def _send_frame(self, opcode: int, payload: bytes):
+        if self.closed:
+            raise WebSocketClosed(1006, "send on a closed websocket")
+        self.writer.write(encode_frame(opcode, payload, mask=self.client))
+        await self.writer.drain()
+
+    async def send(self, message: Union[str, bytes]):
+        if isinstance(message, str):
+            await self._send_frame(OP_TEXT, message.encode())
+        else:
+            await self._send_frame(OP_BINARY, bytes(message))
+
+    async def ping(self, payload: bytes = b""):
+        await self._send_frame(OP_PING, payload)
+
+    async def recv(self) -> Union[str, bytes]:
+        """Next complete message (``str`` for text, ``bytes`` for binary)"""
+        parts: List[bytes] = []
+        opcode = None
+        while True:
+            try:
+                fin, op, payload = await read_frame(self.reader)
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                self.closed = True
+                raise WebSocketClosed(1006, "connection dropped") from e
+            if op == OP_PING:
+                await self._send_frame(OP_PONG, payload)
+                continue
+            if op == OP_PONG:
+                continue
+            if op == OP_CLOSE:
+                code = struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else 1005
+                if not self.closed:
+                    await self._close_transport(payload[:2])
+                raise WebSocketClosed(code, payload[2:].decode(errors="replace"))
+            if op != OP_CONTINUATION:
+                opcode = op
+            parts.append(payload)
+            if fin:
+                data = b"".join(parts)
+                return data.decode() if opcode == OP_TEXT else data
+
+    async def _close_transport(self, payload: bytes):
+        try:
+            self.writer.write(encode_frame(OP_CLOSE, payload, mask=self.client))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+        self.closed = True
+        self.writer.close()
+
+    async def close(self, code: int = 1000):
+        if not self.closed:
+            await self._close_transport(struct.pack("!H", code))
+
+
+async def connect_websocket(url: str, timeout: float = 10.0):
+    """Client connection to ``url``, through ``websockets`` when it is installed"""
+    if WEBSOCKETS_AVAILABLE:
+        return await asyncio.wait_for(websockets.connect(url, max_size=None), timeout)
+    return await MiniWebSocket.connect(url, timeout)
+
+
+# --- Ingester ---------------------------------------------------------------
+
+class StreamError(RuntimeError):
+    """Error message from the stream"""
+
+
+class StreamAuthError(StreamError):
+    """The stream rejected the credentials; reconnecting will not help"""
+
+
+def _symbols(env: str, default: str) -> List[str]:
+    return [s.strip().upper() for s in os.getenv(env, default).split(",") if s.strip()]
+
+
+@dataclass
+class StreamConfig:
+    """Feed, subscriptions and write batching of a StreamIngester"""
+    url: str = field(default_factory=lambda: os.getenv("ALPACA_STREAM_URL", DEFAULT_STREAM_URL))
+    key_id: str = field(default_factory=lambda: os.getenv("ALPACA_KEY_ID", ""))
+    secret_key: str = field(default_factory=lambda: os.getenv("ALPACA_SECRET_KEY", ""))
+    bars: List[str] = field(default_factory=lambda: _symbols("EMO_STREAM_BARS", "SPY,QQQ"))
+    quotes: List[str] = field(default_factory=lambda: _symbols("EMO_STREAM_QUOTES", ""))
+    flush_rows: int = 500                # bars per bulk write
+    flush_interval: float = 1.0          # seconds before a partial batch is written
+    max_pending: int = 100_000           # bars kept for retry while the database is failing
+    reconnect_initial: float = 1.0       # seconds; doubles per failed attempt
+    reconnect_max: float = 60.0
+    connect_timeout: float = 10.0
+    queue_size: int = 1000               # events buffered per subscriber before the oldest is dropped
+
+
+class Subscription:
+    """
+    Bounded queue of events for one in-process subscriber
+
+    A subscriber that falls behind loses its oldest events (counted in
+    ``dropped``) rather than stalling the feed. Iterate it with ``async for``.
+    """
+
+    def __init__(self, owner: "StreamIngester", kinds: Optional[Iterable[str]], symbols: Optional[Iterable[str]],
+                 maxsize: int):
+        self.owner = owner
+        self.kinds = frozenset(kinds) if kinds else None
+        self.symbols = frozenset(s.upper() for s in symbols) if symbols else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def matches(self, event: Event) -> bool:
+        return ((self.kinds is None or event["type"] in self.kinds)
+                and (self.symbols is None or event["symbol"] in self.symbols))
+
+    def put(self, event: Event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Event:
+        return await self.queue.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Event:
+        return await self.queue.get()
+
+    def close(self):
+        self.owner.unsubscribe(self)
+
+
+def bar_event(msg: Dict[str, Any]) -> Event:
+    """Stream bar (``T`` = ``b``, or ``u`` for a corrected bar) in the stored bar format"""
+    return {
+        "type": "bar",
+        "symbol": msg["S"],
+        "ts": msg["t"],
+        "open": float(msg["o"]),
+        "high": float(msg["h"]),
+        "low": float(msg["l"]),
+        "close": float(msg["c"]),
+        "volume": int(msg["v"]),
+        "data_source": DATA_SOURCE,
+    }
+
+
+def quote_event(msg: Dict[str, Any]) -> Event:
+    """Stream quote (``T`` = ``q``)"""
+    return {
+        "type": "quote",
+        "symbol": msg["S"],
+        "ts": msg["t"],
+        "bid": float(msg.get("bp", 0)),
+        "bid_size": int(msg.get("bs", 0)),
+        "ask": float(msg.get("ap", 0)),
+        "ask_size": int(msg.get("as", 0)),
+    }
+
+
+def default_writer() -> BulkWriter:
+    """Bulk writer into the ``bars`` table of the configured database"""
+    from .models import DB
+
+    db = DB("bars")
+    db.connect()
+    return bulk_writer(db.conn, kind="sqlite" if db.kind == "sqlite" else "postgres")
+
+
+class StreamIngester:
+    """
+    Websocket bar/quote ingester
+
+    Args:
+        config: Feed and batching settings (default: from the environment)
+        writer_factory: Returns the BulkWriter bars are stored with; called
+            on the writer thread, which then owns the connection
+        rollups: Refreshes 5Min-1Day rollups of the written bars (SQLite
+            writer only; on TimescaleDB continuous aggregates do this)
+    """
+
+    def __init__(self, config: Optional[StreamConfig] = None,
+                 writer_factory: Optional[Callable[[], BulkWriter]] = None, rollups=None):
+        self.config = config or StreamConfig()
+        self.rollups = rollups
+        self.bar_symbols = {s.upper() for s in self.config.bars}
+        self.quote_symbols = {s.upper() for s in self.config.quotes}
+        self.latest_bars: Dict[str, Event] = {}
+        self.latest_quotes: Dict[str, Event] = {}
+        self.connected = False
+        self.stats: Dict[str, Any] = {
+            "connects": 0, "reconnects": 0, "messages": 0, "bars": 0, "quotes": 0,
+            "rows_written": 0, "write_errors": 0, "rows_dropped": 0, "last_message_at": None,
+        }
+        self._writer_factory = writer_factory or default_writer
+        self._writer: Optional[BulkWriter] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-writer")
+        # Written from the worker thread, so flushes take the rows and write them there
+        self._pending = BarBuffer(None, max_rows=None, max_pending=self.config.max_pending)
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._subscribers: List[Subscription] = []
+        self._listeners: List[Tuple[Callable[[Event], Any], Optional[frozenset], Optional[frozenset]]] = []
+        self._ws = None
+        self._stop: Optional[asyncio.Event] = None
+
+    # Subscribers
+
+    def subscribe(self, kinds: Optional[Sequence[str]] = None, symbols: Optional[Sequence[str]] = None,
+                  maxsize: Optional[int] = None) -> Subscription:
+        """
+        Queue of published events for a coroutine consumer
+
+        Args:
+            kinds: ``bar`` and/or ``quote`` (default: both)
+            symbols: Only these symbols (default: all)
+            maxsize: Queue bound (default: ``config.queue_size``)
+        """
+        sub = Subscription(self, kinds, symbols, maxsize or self.config.queue_size)
+        self._subscribers.append(sub)
+        return sub
+
+    async def bar_feed(self, symbols: Optional[Sequence[str]] = None, maxsize: Optional[int] = None):
+        """
+        Messages for a live bar client (the dashboard's ``/ws/bars``)
+
+        Yields ``{"type": "bar_snapshot", "data": [latest bar per symbol]}`` once,
+        then ``{"type": "bar", "data": event}`` for every new bar. The
+        subscription is taken before the snapshot, so no bar falls in between.
+
+        Args:
+            symbols: Only these symbols (default: all)
+            maxsize: Queue bound (default: ``config.queue_size``)
+        """
+        sub = self.subscribe(["bar"], symbols, maxsize)
+        try:
+            latest = [event for symbol, event in sorted(self.latest_bars.items())
+                      if sub.symbols is None or symbol in sub.symbols]
+            yield {"type": "bar_snapshot", "data": latest}
+            async for event in sub:
+                yield {"type": "bar", "data": event}
+        finally:
+            sub.close()
+
+    def unsubscribe(self, sub: Subscription):
+        if sub in self._subscribers:
+            self._subscribers.remove(sub)
+
+    def add_listener(self, callback: Callable[[Event], Any], kinds: Optional[Sequence[str]] = None,
+                     symbols: Optional[Sequence[str]] = None):
+        """Call ``callback(event)`` on the event loop for each matching event; keep it fast"""
+        self._listeners.append((callback, frozenset(kinds) if kinds else None,
+                                frozenset(s.upper() for s in symbols) if symbols else None))
+
+    def remove_listener(self, callback: Callable[[Event], Any]):
+        self._listeners = [entry for entry in self._listeners if entry[0] is not callback]
+
+    def _publish(self, event: Event):
+        for sub in self._subscribers:
+            if sub.matches(event):
+                sub.put(event)
+        for callback, kinds, symbols in self._listeners:
+            if (kinds is None or event["type"] in kinds) and (symbols is None or event["symbol"] in symbols):
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.error(f"Stream listener {getattr(callback, '__name__', callback)} failed: {e}")
+
+    # Stream symbols
+
+    async def add_symbols(self, bars: Sequence[str] = (), quotes: Sequence[str] = ()):
+        """Subscribe to more symbols now (if connected) and on every reconnect"""
+        bars = sorted({s.upper() for s in bars} - self.bar_symbols)
+        quotes = sorted({s.upper() for s in quotes} - self.quote_symbols)
+        self.bar_symbols.update(bars)
+        self.quote_symbols.update(quotes)
+        if self.connected and (bars or quotes):
+            await self._ws.send(json.dumps({"action": "subscribe", "bars": bars, "quotes": quotes}))
+
+    async def remove_symbols(self, bars: Sequence[str] = (), quotes: Sequence[str] = ()):
+        bars = sorted({s.upper() for s in bars} & self.bar_symbols)
+        quotes = sorted({s.upper() for s in quotes} & self.quote_symbols)
+        self.bar_symbols.difference_update(bars)
+        self.quote_symbols.difference_update(quotes)
+        if self.connected and (bars or quotes):
+            await self._ws.send(json.dumps({"action": "unsubscribe", "bars": bars, "quotes": quotes}))
+
+    # Messages
+
+    def _dispatch(self, msg: Dict[str, Any]):
+        kind = msg.get("T")
+        try:
+            if kind in ("b", "u"):
+                event = bar_event(msg)
+                self.stats["bars"] += 1
+                self.latest_bars[event["symbol"]] = event
+                self._pending.append(event)
+            elif kind == "q":
+                event = quote_event(msg)
+                self.stats["quotes"] += 1
+                self.latest_quotes[event["symbol"]] = event
+            else:
+                if kind == "error":
+                    logger.error(f"Stream error {msg.get('code')}: {msg.get('msg')}")
+                elif kind == "subscription":
+                    logger.info(f"Stream subscriptions: bars={msg.get('bars')} quotes={msg.get('quotes')}")
+                return
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Malformed stream event {msg}: {e}")
+            return
+        self._publish(event)
+
+    def _handle(self, raw: Union[str, bytes]) -> List[Dict[str, Any]]:
+        self.stats["messages"] += 1
+        self.stats["last_message_at"] = time.time()
+        try:
+            msgs = json.loads(raw)
+        except ValueError:
+            logger.warning(f"Unparseable stream message: {raw[:200]!r}")
+            return []
+        msgs = msgs if isinstance(msgs, list) else [msgs]
+        for msg in msgs:
+            if isinstance(msg, dict):
+                self._dispatch(msg)
+        if len(self._pending) >= self.config.flush_rows and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self.flush())
+        return msgs
+
+    async def _expect(self, ws, reply: str):
+        """Read messages until a ``success`` reply of ``reply`` arrives"""
+        while True:
+            raw = await asyncio.wait_for(ws.recv(), self.config.connect_timeout)
+            for msg in self._handle(raw):
+                if not isinstance(msg, dict):
+                    continue
+                if msg.get("T") == "success" and msg.get("msg") == reply:
+                    return
+                if msg.get("T") == "error":
+                    error = StreamAuthError if msg.get("code") in (401, 402, 404) else StreamError
+                    raise error(f"{msg.get('code')}: {msg.get('msg')}")
+
+    async def _session(self) -> bool:
+        """
+        One connection: connect, authenticate, subscribe and consume until it drops
+
+        Returns:
+            Whether the session got as far as subscribing
+        """
+        ws = await connect_websocket(self.config.url, self.config.connect_timeout)
+        self._ws = ws
+        subscribed = False
+        try:
+            await self._expect(ws, "connected")
+            await ws.send(json.dumps({"action": "auth", "key": self.config.key_id,
+                                      "secret": self.config.secret_key}))
+            await self._expect(ws, "authenticated")
+            await ws.send(json.dumps({"action": "subscribe", "bars": sorted(self.bar_symbols),
+                                      "quotes": sorted(self.quote_symbols)}))
+            self.stats["connects"] += 1
+            self.connected = subscribed = True
+            logger.info(f"Streaming {len(self.bar_symbols)} bar / {len(self.quote_symbols)} quote symbols "
+                        f"from {self.config.url}")
+            while not self._stop.is_set():
+                self._handle(await ws.recv())
+        finally:
+            self.connected = False
+            self._ws = None
+            try:
+                await ws.close()
+            except Exception:
+                pass
+        return subscribed
+
+    async def run(self):
+        """Stream until ``stop`` is called; reconnects with backoff on any drop"""
+        self._stop = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        flusher = asyncio.ensure_future(self._flush_loop())
+        delay = self.config.reconnect_initial
+        try:
+            while not self._stop.is_set():
+                try:
+                    if await self._session():
+                        delay = self.config.reconnect_initial
+                except StreamAuthError as e:
+                    logger.error(f"Stream authentication failed: {e}")
+                    raise
+                except Exception as e:
+                    if self._stop.is_set():
+                        break
+                    logger.warning(f"Stream connection lost: {e}; reconnecting in {delay:.1f}s")
+                if self._stop.is_set():
+                    break
+                self.stats["reconnects"] += 1
+                try:
+                    await asyncio.wait_for(self._stop.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, self.config.reconnect_max)
+        finally:
+            flusher.cancel()
+            if self._flush_task is not None:
+                await asyncio.gather(self._flush_task, return_exceptions=True)
+            await self.flush()
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._close_writer)
+
+    async def stop(self):
+        """End ``run`` after writing buffered bars"""
+        if self._stop is not None:
+            self._stop.set()
+        if self._ws is not None:
+            await self._ws.close()
+
+    # Writes
+
+    def _write(self, rows: List[Event]) -> int:
+        if self._writer is None:
+            self._writer = self._writer_factory()
+        written = self._writer.write(rows)
+        if self.rollups is not None:
+            with self._writer.conn:
+                self.rollups.refresh_bars([(row["symbol"], row["ts"]) for row in rows], self._writer.conn)
+        return written
+
+    def _close_writer(self):
+        if self._writer is not None and hasattr(self._writer.conn, "close"):
+            self._writer.conn.close()
+        self._writer = None
+
+    async def flush(self) -> int:
+        """Write buffered bars now; returns the number written"""
+        async with self._flush_lock:
+            rows = self._pending.take()
+            if not rows:
+                return 0
+            try:
+                written = await asyncio.get_running_loop().run_in_executor(self._executor, self._write, rows)
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                self.stats["rows_dropped"] += self._pending.restore(rows)  # retried with the next batch
+                logger.error(f"Stream bar write failed ({len(rows)} rows kept for retry): {e}")
+                return 0
+            self.stats["rows_written"] += written
+            return written
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.config.flush_interval)
+            await self.flush()
+
+    def status(self) -> Dict[str, Any]:
+        """Connection state, subscriptions and counters"""
+        return dict(self.stats, connected=self.connected, pending=len(self._pending),
+                    bar_symbols=sorted(self.bar_symbols), quote_symbols=sorted(self.quote_symbols),
+                    subscribers=len(self._subscribers) + len(self._listeners))
+
+
+_INGESTER: Optional[StreamIngester] = None
+
+
+def get_stream_ingester(config: Optional[StreamConfig] = None) -> StreamIngester:
+    """Process-wide ingester that signals and the dashboard subscribe to (created on first use)"""
+    global _INGESTER
+    if _INGESTER is None:
+        _INGESTER = StreamIngester(config)
+    return _INGESTER
+
+
+def main():
+    """Stream bars into the database until interrupted"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream bars and quotes into the database")
+    parser.add_argument("--url", help="Stream URL (default: ALPACA_STREAM_URL)")
+    parser.add_argument("--bars", help="Comma-separated bar symbols (default: EMO_STREAM_BARS)")
+    parser.add_argument("--quotes", help="Comma-separated quote symbols (default: EMO_STREAM_QUOTES)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    config = StreamConfig()
+    if args.url:
+        config.url = args.url
+    if args.bars is not None:
+        config.bars = [s.strip().upper() for s in args.bars.split(",") if s.strip()]
+    if args.quotes is not None:
+        config.quotes = [s.strip().upper() for s in args.quotes.split(",") if s.strip()]
+    ingester = get_stream_ingester(config)
+    try:
+        asyncio.run(ingester.run())
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(ingester.status(), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ from __future__ import annotations
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from .rollups import timescale_aggregates_sql
+
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS market_bars (
     ts TIMESTAMPTZ NOT NULL,
@@ -77,6 +79,16 @@ class TimescaleDB:
                     # Hypertables might already exist
                     print(f"Hypertable creation note: {e}")
             conn.commit()
+            # 5Min-1Day continuous aggregates of the 1Min bars
+            conn.autocommit = True  # continuous aggregates cannot be created inside a transaction
+            try:
+                with conn.cursor() as cur:
+                    for statement in timescale_aggregates_sql("market_bars"):
+                        cur.execute(statement)
+            except Exception as e:
+                print(f"Continuous aggregate creation note: {e}")
+            finally:
+                conn.autocommit = False
             
     def execute(self, sql: str, params=None):
         with self.connect() as conn:
@@ -0,0 +1,245 @@
+"""
+EMO Options Bot - Ingestion Watermarks
+Per-symbol high-water marks so each ingestion cycle fetches only new bars
+
+A watermark is the timestamp of the newest bar stored for one
+(symbol, timeframe, provider). Each cycle requests bars after it, in windows
+of at most ``chunk_bars`` bars, and advances it only after a window's rows
+are written; a crash between the two just re-requests that window, and since
+bar writes are upserts the retry is harmless. Holes inside the data we did
+receive (a provider outage mid-session, late prints) are recorded as gaps
+and re-requested on later cycles a bounded number of times.
+
+All timestamps are epoch milliseconds (UTC).
+
+Includes:
+- WatermarkStore: watermark and gap tables in SQLite
+- Window: one bounded fetch request planned for a key
+- find_gaps: intraday holes in a sorted timestamp series
+- timeframe_ms: bar length of an Alpaca timeframe string
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_DB = ROOT / "data" / "emo.sqlite"
+
+MIN_GAP_BARS = 5                  # shorter holes are normal for thinly traded symbols
+MAX_GAP_MS = 6 * 3600 * 1000      # longer holes are overnight / weekend closures
+MAX_GAP_ATTEMPTS = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_watermarks (
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    last_ts INTEGER NOT NULL,      -- epoch ms of the newest stored bar
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (symbol, timeframe, provider)
+);
+
+CREATE TABLE IF NOT EXISTS ingest_gaps (
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    start_ts INTEGER NOT NULL,     -- first missing bar
+    end_ts INTEGER NOT NULL,       -- last missing bar
+    status TEXT NOT NULL DEFAULT 'open',   -- open / filled / empty
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (symbol, timeframe, provider, start_ts)
+);
+"""
+
+_UNITS = {"Min": 60_000, "T": 60_000, "Hour": 3_600_000, "H": 3_600_000, "Day": 86_400_000, "D": 86_400_000}
+
+
+def timeframe_ms(timeframe: str) -> int:
+    """Bar length in milliseconds of a timeframe such as ``1Min``, ``15Min``, ``1Hour`` or ``1Day``"""
+    for unit, ms in _UNITS.items():
+        if timeframe.endswith(unit):
+            count = timeframe[:-len(unit)] or "1"
+            if count.isdigit():
+                return int(count) * ms
+    raise ValueError(f"Unknown timeframe: {timeframe}")
+
+
+def find_gaps(ts: Sequence[int], step_ms: int, min_gap_bars: int = MIN_GAP_BARS,
+              max_gap_ms: int = MAX_GAP_MS) -> List[Tuple[int, int]]:
+    """
+    Holes in a sorted series of bar timestamps
+
+    Args:
+        ts: Bar timestamps (epoch ms), ascending
+        step_ms: Bar length
+        min_gap_bars: Ignore holes of fewer missing bars
+        max_gap_ms: Ignore holes spanning more than this (market closures)
+
+    Returns:
+        (first missing bar, last missing bar) pairs
+    """
+    ts = np.asarray(ts, dtype=np.int64)
+    if len(ts) < 2:
+        return []
+    delta = np.diff(ts)
+    missing = delta // step_ms - 1
+    hit = np.flatnonzero((missing >= min_gap_bars) & (delta <= max_gap_ms))
+    return [(int(ts[i] + step_ms), int(ts[i + 1] - step_ms)) for i in hit]
+
+
+@dataclass
+class Window:
+    """Bars to request for one key: ``start_ms`` to ``end_ms`` inclusive"""
+    start_ms: int
+    end_ms: int
+    kind: str = "incremental"     # or "backfill" (re-requesting a recorded gap)
+    final: bool = False           # reaches the present, so an empty answer proves nothing yet
+
+
+class WatermarkStore:
+    """
+    Watermark and gap bookkeeping in a SQLite database
+
+    Every method takes an optional open connection so callers that write their
+    bars to the same database can advance the watermark in the same
+    transaction as the rows.
+    """
+
+    def __init__(self, db_path: Union[str, Path] = DEFAULT_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self.connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _run(self, conn: Optional[sqlite3.Connection], sql: str, params: Sequence = ()) -> List[Tuple]:
+        if conn is not None:
+            return conn.execute(sql, params).fetchall()
+        with closing(self.connect()) as own, own:
+            return own.execute(sql, params).fetchall()
+
+    def get(self, symbol: str, timeframe: str, provider: str,
+            conn: Optional[sqlite3.Connection] = None) -> Optional[int]:
+        """Newest stored bar time, or None if the key was never ingested"""
+        rows = self._run(conn, "SELECT last_ts FROM ingest_watermarks WHERE symbol=? AND timeframe=? AND provider=?",
+                         (symbol, timeframe, provider))
+        return rows[0][0] if rows else None
+
+    def all(self, provider: Optional[str] = None) -> Dict[Tuple[str, str, str], int]:
+        """Every watermark, keyed by (symbol, timeframe, provider)"""
+        sql = "SELECT symbol, timeframe, provider, last_ts FROM ingest_watermarks"
+        rows = self._run(None, sql + " WHERE provider=?", (provider,)) if provider else self._run(None, sql)
+        return {(s, tf, p): ts for s, tf, p, ts in rows}
+
+    def advance(self, symbol: str, timeframe: str, provider: str, last_ts: int,
+                conn: Optional[sqlite3.Connection] = None):
+        """Move the watermark forward to ``last_ts`` (never backwards)"""
+        self._run(conn, """
+            INSERT INTO ingest_watermarks(symbol, timeframe, provider, last_ts, updated_at) VALUES (?,?,?,?,?)
+            ON CONFLICT(symbol, timeframe, provider)
+            DO UPDATE SET last_ts=MAX(last_ts, excluded.last_ts), updated_at=excluded.updated_at
+        """, (symbol, timeframe, provider, int(last_ts), int(time.time() * 1000)))
+
+    def record_gaps(self, symbol: str, timeframe: str, provider: str, gaps: Sequence[Tuple[int, int]],
+                    conn: Optional[sqlite3.Connection] = None) -> int:
+        """Remember holes for later backfill; already known holes are kept as they are"""
+        now = int(time.time() * 1000)
+        for start, end in gaps:
+            self._run(conn, """
+                INSERT OR IGNORE INTO ingest_gaps(symbol, timeframe, provider, start_ts, end_ts, updated_at)
+                VALUES (?,?,?,?,?,?)
+            """, (symbol, timeframe, provider, int(start), int(end), now))
+        return len(gaps)
+
+    def open_gaps(self, symbol: str, timeframe: str, provider: str, max_attempts: int = MAX_GAP_ATTEMPTS,
+                  conn: Optional[sqlite3.Connection] = None) -> List[Tuple[int, int]]:
+        """Holes still worth requesting, oldest first"""
+        rows = self._run(conn, """
+            SELECT start_ts, end_ts FROM ingest_gaps
+            WHERE symbol=? AND timeframe=? AND provider=? AND status='open' AND attempts < ?
+            ORDER BY start_ts
+        """, (symbol, timeframe, provider, max_attempts))
+        return [(s, e) for s, e in rows]
+
+    def resolve_gap(self, symbol: str, timeframe: str, provider: str, start_ts: int, filled: bool,
+                    max_attempts: int = MAX_GAP_ATTEMPTS, conn: Optional[sqlite3.Connection] = None):
+        """
+        Record a backfill attempt
+
+        A gap the provider returned bars for is closed as ``filled``; one it
+        keeps answering empty is closed as ``empty`` after ``max_attempts``.
+        """
+        self._run(conn, """
+            UPDATE ingest_gaps SET attempts=attempts + 1, updated_at=?,
+                status=CASE WHEN ? THEN 'filled' WHEN attempts + 1 >= ? THEN 'empty' ELSE status END
+            WHERE symbol=? AND timeframe=? AND provider=? AND start_ts=?
+        """, (int(time.time() * 1000), int(filled), max_attempts, symbol, timeframe, provider, int(start_ts)))
+
+    def plan(self, symbol: str, timeframe: str, provider: str, now_ms: int, lookback_ms: int,
+             chunk_bars: int = 1000, max_windows: int = 10,
+             conn: Optional[sqlite3.Connection] = None) -> List[Window]:
+        """
+        Fetch windows for one key this cycle
+
+        New bars come first: from just after the watermark (or ``lookback_ms``
+        back for a key never ingested) up to ``now_ms``, split into windows of
+        at most ``chunk_bars`` bars. Open gaps use whatever remains of
+        ``max_windows``. Anything beyond the budget is picked up next cycle
+        from the advanced watermark.
+        """
+        step = timeframe_ms(timeframe)
+        last = self.get(symbol, timeframe, provider, conn)
+        start = last + step if last is not None else now_ms - lookback_ms
+        span = chunk_bars * step
+
+        windows = []
+        while start <= now_ms and len(windows) < max_windows:
+            end = min(start + span - step, now_ms)
+            windows.append(Window(start, end, final=end >= now_ms))
+            start = end + step
+
+        # Gaps are at most MAX_GAP_MS long, so each is one request
+        for gap_start, gap_end in self.open_gaps(symbol, timeframe, provider, conn=conn):
+            if len(windows) >= max_windows:
+                break
+            windows.append(Window(gap_start, gap_end, kind="backfill"))
+        return windows
+
+    def commit(self, symbol: str, timeframe: str, provider: str, window: Window, ts: Sequence[int],
+               conn: Optional[sqlite3.Connection] = None) -> int:
+        """
+        Book a window whose bars (timestamps ``ts``) have been written
+
+        Call after the rows are stored, ideally in the same transaction.
+        Incremental windows advance the watermark (to the window end when a
+        past window came back empty, so quiet periods are not re-requested)
+        and record any holes between the previous watermark and the new bars;
+        backfill windows resolve their gap.
+
+        Returns:
+            Number of new gaps recorded
+        """
+        ts = sorted(int(t) for t in ts)
+        if window.kind == "backfill":
+            self.resolve_gap(symbol, timeframe, provider, window.start_ms, filled=bool(ts), conn=conn)
+            return 0
+
+        previous = self.get(symbol, timeframe, provider, conn)
+        gaps = find_gaps(([previous] if previous is not None else []) + ts, timeframe_ms(timeframe))
+        self.record_gaps(symbol, timeframe, provider, gaps, conn)
+        if ts:
+            self.advance(symbol, timeframe, provider, ts[-1], conn)
+        elif not window.final:
+            self.advance(symbol, timeframe, provider, window.end_ms, conn)
+        return len(gaps)
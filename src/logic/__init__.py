@@ -5,14 +5,31 @@ Professional-grade trading controls and portfolio management
 """
 
 from .risk_manager import RiskManager, PortfolioSnapshot, Position, OrderIntent
-from .position_sizer import equity_size_by_vol, credit_spread_contracts, correlation_scale
+from .allocator import RiskBudgetAllocator, TradeCandidate, AllocationLimits, AllocationResult
+from .position_sizer import (
+    equity_size_by_vol,
+    credit_spread_contracts,
+    correlation_scale,
+    pct_returns_matrix,
+    equity_size_by_vol_batch,
+    credit_spread_contracts_batch,
+    correlation_scale_batch,
+)
 
 __all__ = [
     "RiskManager", 
     "PortfolioSnapshot", 
     "Position", 
     "OrderIntent",
+    "RiskBudgetAllocator",
+    "TradeCandidate",
+    "AllocationLimits",
+    "AllocationResult",
     "equity_size_by_vol", 
     "credit_spread_contracts", 
-    "correlation_scale"
+    "correlation_scale",
+    "pct_returns_matrix",
+    "equity_size_by_vol_batch",
+    "credit_spread_contracts_batch",
+    "correlation_scale_batch"
 ]
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""
+RiskBudgetAllocator: choose which candidate trades to fund, and how many units,
+when the risk budget cannot fund all of them.
+
+Order-by-order approval funds trades in registration order until the heat cap
+binds. The allocator instead sees every candidate in a cycle at once and
+maximizes total expected return subject to:
+- Portfolio heat (sum of worst-case loss, including open positions)
+- Per-position risk cap
+- Max concurrent positions
+- Beta exposure ceiling (same additive proxy RiskManager uses)
+- Net Greek limits (|delta|, |gamma|, |vega|, |theta|, ...)
+- Max correlation to book
+
+Solver: greedy unit-by-unit fill ranked by return per unit of scarce resource,
+followed by a remove-one/refill local search. Both loops are vectorized over
+candidates with NumPy and stop at a fixed time budget, so hundreds of
+candidates resolve in milliseconds and the best feasible answer so far is
+always returned.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+import math
+import time
+
+import numpy as np
+
+from .risk_manager import RiskManager, PortfolioSnapshot
+
+@dataclass
+class TradeCandidate:
+    key: str
+    symbol: str
+    expected_return: float           # $ per unit (contract/share block)
+    max_loss: float                  # $ worst-case loss per unit
+    value: float = 0.0               # $ notional per unit (for beta exposure)
+    beta: float = 1.0
+    max_qty: int = 1
+    greeks: Dict[str, float] = field(default_factory=dict)  # per unit
+    correlation: Optional[float] = None                      # avg corr to book
+
+@dataclass
+class AllocationLimits:
+    heat_cap: float                           # $ remaining worst-case loss budget
+    per_position_cap: float                   # $ max loss per candidate
+    max_new_positions: int
+    beta_budget: float                        # remaining beta exposure (x equity)
+    equity: float
+    greek_limits: Dict[str, float] = field(default_factory=dict)   # abs net limits
+    greek_exposure: Dict[str, float] = field(default_factory=dict) # current net greeks
+    max_correlation: float = 1.0
+
+    @classmethod
+    def from_risk_manager(
+        cls,
+        rm: RiskManager,
+        pf: PortfolioSnapshot,
+        greek_limits: Optional[Dict[str, float]] = None,
+        greek_exposure: Optional[Dict[str, float]] = None,
+    ) -> "AllocationLimits":
+        """Translate RiskManager settings + current portfolio into remaining budgets."""
+        blocked = pf.equity < rm.min_equity or rm.drawdown_breached()
+        heat_left = rm.portfolio_risk_cap * pf.equity - rm._portfolio_risk_used(pf)
+        return cls(
+            heat_cap=0.0 if blocked else max(0.0, heat_left),
+            per_position_cap=rm.per_position_risk * pf.equity,
+            max_new_positions=0 if blocked else max(0, rm.max_positions - len(pf.positions)),
+            beta_budget=max(0.0, rm.max_beta_exposure - rm._portfolio_beta(pf)),
+            equity=pf.equity,
+            greek_limits=dict(greek_limits or {}),
+            greek_exposure=dict(greek_exposure or {}),
+            max_correlation=rm.max_correlation,
+        )
+
+@dataclass
+class AllocationResult:
+    quantities: Dict[str, int]
+    expected_return: float
+    heat_used: float
+    beta_used: float
+    greeks: Dict[str, float]
+    rejected: Dict[str, str]
+    solver: str
+    iterations: int
+    elapsed: float
+    timed_out: bool
+
+class RiskBudgetAllocator:
+    """
+    Typical use:
+        limits = AllocationLimits.from_risk_manager(rm, pf, greek_limits={"delta": 50})
+        result = RiskBudgetAllocator(time_budget=0.05).allocate(candidates, limits)
+    """
+
+    def __init__(self, time_budget: float = 0.05, risk_aversion: float = 0.0, max_local_passes: int = 50):
+        self.time_budget = float(time_budget)
+        self.risk_aversion = float(risk_aversion)
+        self.max_local_passes = int(max_local_passes)
+
+    # -------- internals --------------------------------------------------------
+    def _prepare(self, cands: Sequence[TradeCandidate], lim: AllocationLimits):
+        greek_names = sorted(set(lim.greek_limits))
+        n = len(cands)
+        self._ret = np.array([c.expected_return - self.risk_aversion * c.max_loss for c in cands], dtype=float)
+        self._loss = np.array([max(0.0, c.max_loss) for c in cands], dtype=float)
+        self._beta = np.array(
+            [abs(c.beta * c.value) / max(lim.equity, 1e-9) for c in cands], dtype=float
+        )
+        self._greeks = np.array(
+            [[float(c.greeks.get(g, 0.0)) for g in greek_names] for c in cands], dtype=float
+        ).reshape(n, len(greek_names))
+        self._greek_lim = np.array([lim.greek_limits[g] for g in greek_names], dtype=float)
+        self._greek_start = np.array([lim.greek_exposure.get(g, 0.0) for g in greek_names], dtype=float)
+        self._greek_names = greek_names
+
+        rejected: Dict[str, str] = {}
+        cap = np.zeros(n, dtype=np.int64)
+        for i, c in enumerate(cands):
+            if c.correlation is not None and c.correlation > lim.max_correlation:
+                rejected[c.key] = f"correlation {c.correlation:.2f} > {lim.max_correlation:.2f}"
+            elif self._ret[i] <= 0:
+                rejected[c.key] = "non-positive expected return"
+            elif self._loss[i] > lim.per_position_cap + 1e-9:
+                rejected[c.key] = f"per-unit max loss {self._loss[i]:,.2f} > cap {lim.per_position_cap:,.2f}"
+            else:
+                per_pos = c.max_qty if self._loss[i] <= 0 else math.floor(lim.per_position_cap / self._loss[i] + 1e-9)
+                cap[i] = max(0, min(int(c.max_qty), per_pos))
+        self._cap = cap
+        return rejected
+
+    def _feasible_add(self, q, heat, beta, greeks, positions, lim: AllocationLimits) -> np.ndarray:
+        """Mask of candidates that can take one more unit."""
+        ok = q < self._cap
+        ok &= heat + self._loss <= lim.heat_cap + 1e-9
+        ok &= beta + self._beta <= lim.beta_budget + 1e-9
+        if self._greek_lim.size:
+            after = np.abs(greeks[None, :] + self._greeks)
+            ok &= np.all((after <= self._greek_lim + 1e-9) | (after <= np.abs(greeks)[None, :]), axis=1)
+        if positions >= lim.max_new_positions:
+            ok &= q > 0
+        return ok
+
+    def _scores(self, heat, beta, lim: AllocationLimits) -> np.ndarray:
+        """Return per unit of the scarcest resources (normalized by what is left)."""
+        heat_left = max(lim.heat_cap - heat, 1e-9)
+        beta_left = max(lim.beta_budget - beta, 1e-9)
+        cost = self._loss / heat_left + self._beta / beta_left + 1e-12
+        return self._ret / cost
+
+    def _greedy(self, q, lim, deadline) -> tuple:
+        heat = float(self._loss @ q)
+        beta = float(self._beta @ q)
+        greeks = self._greek_start + (q @ self._greeks if self._greek_lim.size else 0.0)
+        positions = int((q > 0).sum())
+        iters = 0
+        while True:
+            iters += 1
+            if iters % 64 == 0 and time.perf_counter() > deadline:
+                return q, iters, True
+            mask = self._feasible_add(q, heat, beta, greeks, positions, lim)
+            if not mask.any():
+                return q, iters, False
+            scores = np.where(mask, self._scores(heat, beta, lim), -np.inf)
+            i = int(np.argmax(scores))
+            if q[i] == 0:
+                positions += 1
+            q[i] += 1
+            heat += self._loss[i]
+            beta += self._beta[i]
+            if self._greek_lim.size:
+                greeks = greeks + self._greeks[i]
+
+    # -------- public API -------------------------------------------------------
+    def allocate(self, candidates: Sequence[TradeCandidate], limits: AllocationLimits) -> AllocationResult:
+        t0 = time.perf_counter()
+        deadline = t0 + self.time_budget
+        cands = list(candidates)
+        if not cands:
+            return AllocationResult({}, 0.0, 0.0, 0.0, {}, {}, "greedy+local", 0, 0.0, False)
+
+        rejected = self._prepare(cands, limits)
+        q = np.zeros(len(cands), dtype=np.int64)
+        q, iterations, timed_out = self._greedy(q, limits, deadline)
+        best_obj = float(self._ret @ q)
+
+        # Local search: drop one unit of a funded trade, refill greedily, keep if better
+        passes = 0
+        while not timed_out and passes < self.max_local_passes:
+            passes += 1
+            improved = False
+            funded = np.flatnonzero(q > 0)
+            # Try weakest return-per-loss trades first
+            order = funded[np.argsort(self._ret[funded] / np.maximum(self._loss[funded], 1e-9))]
+            for j in order:
+                # Move: drop one unit, or the whole position, of a funded trade
+                for drop in sorted({1, int(q[j])}):
+                    if time.perf_counter() > deadline:
+                        timed_out = True
+                        break
+                    trial = q.copy()
+                    trial[j] -= drop
+                    # Block the removed units from being re-added in this refill
+                    saved = self._cap[j]
+                    self._cap[j] = trial[j]
+                    trial, it, to = self._greedy(trial, limits, deadline)
+                    self._cap[j] = saved
+                    iterations += it
+                    if float(self._ret @ trial) > best_obj + 1e-9:
+                        # Top the winner back up now that j is unblocked
+                        trial, it, to = self._greedy(trial, limits, deadline)
+                        iterations += it
+                        q, best_obj, improved = trial, float(self._ret @ trial), True
+                    if to:
+                        timed_out = True
+                    if improved or timed_out:
+                        break
+                if improved or timed_out:
+                    break
+            if not improved:
+                break
+
+        quantities = {c.key: int(q[i]) for i, c in enumerate(cands) if q[i] > 0}
+        for i, c in enumerate(cands):
+            if q[i] == 0 and c.key not in rejected:
+                rejected[c.key] = "not funded within risk budget"
+        greeks = self._greek_start + (q @ self._greeks if self._greek_lim.size else 0.0)
+        return AllocationResult(
+            quantities=quantities,
+            expected_return=float(sum(c.expected_return * q[i] for i, c in enumerate(cands))),
+            heat_used=float(self._loss @ q),
+            beta_used=float(self._beta @ q),
+            greeks={g: float(v) for g, v in zip(self._greek_names, np.atleast_1d(greeks))},
+            rejected=rejected,
+            solver="greedy+local",
+            iterations=iterations,
+            elapsed=time.perf_counter() - t0,
+            timed_out=timed_out,
+        )
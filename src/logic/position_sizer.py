@@ -5,15 +5,20 @@ Includes:
 - Equity sizing using rolling volatility or ATR-like measure
 - Options credit-spread sizing using (width - credit) max loss
 - Correlation-aware adjustment (scales down if basket is concentrated)
+- Batch (NumPy) versions of all three for sizing many candidates per call
 
 All functions are pure and require callers to supply equity, series, etc.
 """
 
 from __future__ import annotations
-from typing import Iterable, Dict, Optional, List
+from typing import Iterable, Dict, Optional, List, Union
 import math
 import statistics
 
+import numpy as np
+
+ArrayLike = Union[float, Iterable[float], np.ndarray]
+
 def _pct_returns(prices: Iterable[float]) -> List[float]:
     prices = list(prices)
     out = []
@@ -90,4 +95,89 @@ def correlation_scale(
     span = max(1e-6, 1.0 - corr_soft_cap)
     t = min(1.0, max(0.0, (avg_corr_to_book - corr_soft_cap) / span))
     scale = 1.0 - t * (1.0 - min_scale)
-    return max(0, int(math.floor(base_size * scale)))
\ No newline at end of file
+    return max(0, int(math.floor(base_size * scale)))
+
+# ---------------------------------------------------------------------------
+# Batch versions: one NumPy call for many candidates. Each matches its scalar
+# counterpart element-wise.
+# ---------------------------------------------------------------------------
+
+def pct_returns_matrix(prices: np.ndarray) -> np.ndarray:
+    """
+    Simple returns along the last axis of a (n_candidates, n_prices) matrix.
+    Returns where the previous price is 0 are NaN (and ignored downstream).
+    """
+    prices = np.asarray(prices, dtype=float)
+    prev = prices[..., :-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(prev != 0, (prices[..., 1:] - prev) / prev, np.nan)
+
+def equity_size_by_vol_batch(
+    returns: np.ndarray,
+    prices_now: ArrayLike,
+    equity: float,
+    per_position_risk: ArrayLike = 0.01,
+    vol_lookback: int = 20,
+    min_shares: int = 1
+) -> np.ndarray:
+    """
+    Vectorized equity_size_by_vol.
+      returns    : (n_candidates, n_obs) return matrix; the last vol_lookback
+                   columns are used, NaNs ignored
+      prices_now : (n_candidates,) current prices
+    Returns an int array of share counts (0 where sizing is impossible).
+    """
+    r = np.atleast_2d(np.asarray(returns, dtype=float))[:, -vol_lookback:]
+    valid = np.isfinite(r)
+    n = valid.sum(axis=1)
+    r0 = np.where(valid, r, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = r0.sum(axis=1) / n
+        stdev = np.sqrt((np.where(valid, r - mean[:, None], 0.0) ** 2).sum(axis=1) / n)
+    stdev = np.nan_to_num(stdev, nan=0.0)
+
+    px = np.broadcast_to(np.asarray(prices_now, dtype=float), stdev.shape)
+    budget = np.asarray(per_position_risk, dtype=float) * equity
+    ok = (stdev > 0.0) & (px > 0.0) & (n > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw = np.floor(budget / np.maximum(px * stdev, 1e-9))
+    raw = np.where(ok, raw, 0.0).astype(np.int64)
+    return np.where(raw > 0, np.maximum(min_shares, raw), 0)
+
+def credit_spread_contracts_batch(
+    credit_per_contract: ArrayLike,
+    width: ArrayLike,
+    equity: float,
+    per_position_risk: ArrayLike = 0.01,
+    contract_multiplier: int = 100,
+    max_contracts: ArrayLike = 10
+) -> np.ndarray:
+    """
+    Vectorized credit_spread_contracts over broadcastable credit/width arrays.
+    """
+    credit = np.asarray(credit_per_contract, dtype=float)
+    width = np.asarray(width, dtype=float)
+    budget = np.asarray(per_position_risk, dtype=float) * equity
+    max_loss_per = (width - credit) * contract_multiplier
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c = np.floor(budget / max_loss_per)
+    c = np.where(max_loss_per > 0, c, 0.0)
+    return np.clip(c, 0, max_contracts).astype(np.int64)
+
+def correlation_scale_batch(
+    base_sizes: ArrayLike,
+    avg_corr_to_book: ArrayLike,
+    corr_soft_cap: float = 0.80,
+    min_scale: float = 0.25,
+) -> np.ndarray:
+    """
+    Vectorized correlation_scale. NaN correlations mean "unknown" (no scaling).
+    """
+    base = np.asarray(base_sizes, dtype=float)
+    corr = np.broadcast_to(np.asarray(avg_corr_to_book, dtype=float), base.shape)
+    span = max(1e-6, 1.0 - corr_soft_cap)
+    t = np.clip((corr - corr_soft_cap) / span, 0.0, 1.0)
+    scale = 1.0 - t * (1.0 - min_scale)
+    scaled = np.maximum(0, np.floor(base * scale))
+    keep = ~np.isfinite(corr) | (corr <= corr_soft_cap)
+    return np.where(keep, base, scaled).astype(np.int64)
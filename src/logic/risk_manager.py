@@ -27,6 +27,7 @@ class Position:
     max_loss: float              # estimated worst-case loss for the position
     beta: float = 1.0            # beta to market (equities ~1, options ~varies)
     sector: Optional[str] = None # optional metadata
+    greeks: Dict[str, float] = field(default_factory=dict)  # net position greeks (delta, gamma, ...)
 
 @dataclass
 class PortfolioSnapshot:
@@ -103,6 +104,14 @@ class RiskManager:
         gross_beta_value = sum((p.beta * p.value) for p in pf.positions)
         return abs(gross_beta_value) / pf.equity
 
+    def _portfolio_greeks(self, pf: PortfolioSnapshot) -> Dict[str, float]:
+        """Net greeks of the open positions (sum of each position's greeks)."""
+        totals: Dict[str, float] = {}
+        for p in pf.positions:
+            for name, value in (p.greeks or {}).items():
+                totals[name] = totals.get(name, 0.0) + float(value)
+        return totals
+
     # -------- public API -------------------------------------------------------
     def assess_portfolio(self, pf: PortfolioSnapshot) -> Dict:
         heat_used = self._portfolio_risk_used(pf)
@@ -5,7 +5,20 @@ Includes features, models, training, and outlook generation
 """
 
 from .features import add_core_features, build_supervised
+from .incremental import IncrementalFeatureEngine
+from .feature_store import CORE_FEATURE_SET, FeatureSet, FeatureStore
+from .bulk import BarBlock, FeatureTensor, load_bar_block
+from .forest import FlatForest, export_forest
+from .registry import ModelRegistry, get_registry
+from .drift import DriftMonitor, FeatureProfile, get_drift_monitor
+from .scheduler import RetrainScheduler, SharedMatrix, TrainJob
+from .validation import CVReport, PurgedCV, cross_validate
 from .outlook import generate_ml_outlook
 from .models import predict_symbols
 
-__all__ = ["add_core_features", "build_supervised", "generate_ml_outlook", "predict_symbols"]
\ No newline at end of file
+__all__ = ["add_core_features", "build_supervised", "IncrementalFeatureEngine",
+           "FeatureStore", "FeatureSet", "CORE_FEATURE_SET", "BarBlock", "FeatureTensor", "load_bar_block",
+           "FlatForest", "export_forest",
+           "ModelRegistry", "get_registry", "DriftMonitor", "FeatureProfile", "get_drift_monitor",
+           "RetrainScheduler", "SharedMatrix", "TrainJob",
+           "PurgedCV", "CVReport", "cross_validate", "generate_ml_outlook", "predict_symbols"]
\ No newline at end of file
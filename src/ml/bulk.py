@@ -0,0 +1,246 @@
+"""
+EMO Options Bot - Bulk Multi-Symbol Feature Kernels
+One query, one pass: bars for many symbols as contiguous arrays
+
+Loading bars symbol by symbol costs one query per symbol, and computing each
+rolling indicator with its own pandas call allocates a new Series per step.
+BarBlock holds the bars of every symbol back to back in flat NumPy arrays
+(``offsets`` marks where each symbol starts), loaded by a single query.
+Rolling features are then computed over the whole block at once: one
+cumulative sum per input serves every window length, and windows that would
+reach across a symbol boundary come out as NaN, like the leading rows of a
+per-symbol pandas rolling window.
+
+Kernel semantics match pandas ``rolling(w)`` with the default
+``min_periods=w``: a window holding any NaN is NaN.
+
+Includes:
+- BarBlock / load_bar_block: grouped OHLCV arrays from one SQL query
+- Cumulative: shared prefix sums with windowed sum/mean/std
+- lag, rolling_min, rolling_max: boundary-aware shifts and extremes
+- FeatureTensor: (rows, features) matrix with per-symbol frames
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+BAR_FIELDS = ("o", "h", "l", "c", "v")
+MAX_UNION_SYMBOLS = 400  # SQLite caps a compound SELECT at 500 terms
+
+
+@dataclass
+class BarBlock:
+    """
+    Bars of many symbols in flat arrays, grouped by symbol and sorted by time
+
+    Rows ``offsets[k]:offsets[k + 1]`` belong to ``symbols[k]``.
+    """
+    symbols: List[str]
+    offsets: np.ndarray       # int64, len(symbols) + 1
+    t: np.ndarray             # int64 epoch milliseconds
+    o: np.ndarray
+    h: np.ndarray
+    l: np.ndarray
+    c: np.ndarray
+    v: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    @property
+    def position(self) -> np.ndarray:
+        """Row number of every bar within its own symbol (0 for each symbol's first bar)"""
+        counts = np.diff(self.offsets)
+        return np.arange(len(self.t)) - np.repeat(self.offsets[:-1], counts)
+
+    def rows(self, symbol: str) -> slice:
+        k = self.symbols.index(symbol)
+        return slice(int(self.offsets[k]), int(self.offsets[k + 1]))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, symbols: Optional[Sequence[str]] = None) -> "BarBlock":
+        """
+        Build from a long frame with symbol, t, o, h, l, c, v columns
+
+        Args:
+            df: One row per bar, any order
+            symbols: Symbol order of the block (default: sorted symbols in ``df``);
+                symbols without rows get empty groups
+        """
+        symbols = list(symbols) if symbols is not None else sorted(df["symbol"].unique())
+        rank = {s: k for k, s in enumerate(symbols)}
+        group = df["symbol"].map(rank)
+        df = df[group.notna()]
+        group = group[group.notna()].to_numpy(dtype=np.int64)
+        t = df["t"].to_numpy(dtype=np.int64)
+        order = np.lexsort((t, group))
+        counts = np.bincount(group, minlength=len(symbols))
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        cols = {f: np.ascontiguousarray(df[f].to_numpy(dtype=np.float64)[order]) for f in BAR_FIELDS}
+        return cls(symbols, offsets, np.ascontiguousarray(t[order]), **cols)
+
+
+def load_bar_block(conn, symbols: Sequence[str], limit: int = 1000, timeframe: str = "1Min",
+                   table: str = "bars") -> BarBlock:
+    """
+    Latest ``limit`` bars of every symbol with a single query (per 400 symbols)
+
+    Args:
+        conn: sqlite3 (or other qmark-style DB-API) connection
+        symbols: Symbols to load; the block keeps this order
+        limit: Bars per symbol, newest kept
+        timeframe: Value of the ``tf`` column
+        table: Bars table with symbol, tf, t, o, h, l, c, v columns
+
+    Returns:
+        BarBlock with each symbol's bars oldest first
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return BarBlock.from_frame(pd.DataFrame(columns=["symbol", "t", *BAR_FIELDS]), [])
+    # One statement, but each branch is an index-ordered LIMIT scan of one symbol
+    # (a ROW_NUMBER() window over all symbols would read every stored bar)
+    branch = f"SELECT * FROM (SELECT symbol, t, o, h, l, c, v FROM {table} WHERE symbol = ? AND tf = ? ORDER BY t DESC LIMIT ?)"
+    rows = []
+    for i in range(0, len(symbols), MAX_UNION_SYMBOLS):
+        chunk = symbols[i:i + MAX_UNION_SYMBOLS]
+        params = [p for symbol in chunk for p in (symbol, timeframe, int(limit))]
+        rows += conn.execute(" UNION ALL ".join([branch] * len(chunk)), params).fetchall()
+    df = pd.DataFrame.from_records(rows, columns=["symbol", "t", *BAR_FIELDS])
+    return BarBlock.from_frame(df, symbols)
+
+
+class Cumulative:
+    """
+    Prefix sums of one input, shared by every window length computed from it
+
+    With ``squares=True`` the sums of squares are kept too (for std). With
+    ``centre=True`` values are centred on each symbol's first finite value,
+    which keeps the sums small and the variance free of cancellation; leave
+    it off for inputs with runs of exact zeros (so their windows sum to
+    exactly zero).
+    """
+
+    def __init__(self, x: np.ndarray, position: np.ndarray, squares: bool = False, centre: bool = True):
+        x = np.asarray(x, dtype=np.float64)
+        self.position = position
+        nan = np.isnan(x)
+        self.centre = np.zeros(len(x))
+        if centre and len(x):
+            group = np.cumsum(position == 0) - 1
+            finite = np.flatnonzero(~nan)
+            first = np.zeros(group[-1] + 1)
+            seen, at = np.unique(group[finite], return_index=True)
+            first[seen] = x[finite[at]]
+            self.centre = first[group]
+        z = np.where(nan, 0.0, x - self.centre)
+        self._s = np.concatenate(([0.0], np.cumsum(z)))
+        self._sq = np.concatenate(([0.0], np.cumsum(z * z))) if squares else None
+        self._nan = np.concatenate(([0], np.cumsum(nan)))
+
+    def _diff(self, prefix: np.ndarray, w: int) -> np.ndarray:
+        """Window totals of ``prefix``, aligned to the window's last row (NaN where undefined)"""
+        out = np.full(len(self.position), np.nan)
+        if w <= len(out):
+            np.subtract(prefix[w:], prefix[:len(prefix) - w], out=out[w - 1:])
+            out[(self.position < w - 1) | self._has_nan(w)] = np.nan
+        return out
+
+    def _has_nan(self, w: int) -> np.ndarray:
+        bad = np.zeros(len(self.position), dtype=bool)
+        if self._nan[-1]:
+            bad[w - 1:] = self._nan[w:] != self._nan[:len(self._nan) - w]
+        return bad
+
+    def sum(self, w: int) -> np.ndarray:
+        """Rolling sum over ``w`` rows"""
+        out = self._diff(self._s, w)
+        out += w * self.centre
+        return out
+
+    def mean(self, w: int) -> np.ndarray:
+        """Rolling mean over ``w`` rows"""
+        out = self._diff(self._s, w)
+        out /= w
+        out += self.centre
+        return out
+
+    def std(self, w: int, ddof: int = 1) -> np.ndarray:
+        """Rolling standard deviation over ``w`` rows"""
+        if self._sq is None:
+            raise ValueError("Cumulative was built without squares")
+        s = self._diff(self._s, w)
+        var = self._diff(self._sq, w)
+        s *= s
+        s /= w
+        var -= s
+        var /= w - ddof
+        np.maximum(var, 0.0, out=var)  # NaN stays NaN
+        return np.sqrt(var, out=var)
+
+
+def lag(x: np.ndarray, position: np.ndarray, k: int) -> np.ndarray:
+    """``x`` shifted ``k`` rows forward within each symbol (NaN where it would cross a boundary)"""
+    out = np.full(len(x), np.nan)
+    if k < len(x):
+        out[k:] = x[:len(x) - k]
+        out[position < k] = np.nan
+    return out
+
+
+def _rolling_extreme(x: np.ndarray, position: np.ndarray, w: int, reduce) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= w:
+        out[w - 1:] = reduce(sliding_window_view(x, w), axis=1)
+        out[position < w - 1] = np.nan
+    return out
+
+
+def rolling_min(x: np.ndarray, position: np.ndarray, w: int) -> np.ndarray:
+    """Rolling minimum over ``w`` rows within each symbol"""
+    return _rolling_extreme(x, position, w, np.min)
+
+
+def rolling_max(x: np.ndarray, position: np.ndarray, w: int) -> np.ndarray:
+    """Rolling maximum over ``w`` rows within each symbol"""
+    return _rolling_extreme(x, position, w, np.max)
+
+
+@dataclass
+class FeatureTensor:
+    """Feature matrix aligned row for row with a BarBlock"""
+    block: BarBlock
+    names: List[str]
+    values: np.ndarray       # (rows, features), column-major so each feature is contiguous
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, self.names.index(name)]
+
+    def frame(self, symbol: str, dropna: bool = True) -> pd.DataFrame:
+        """
+        One symbol's bars and features as a frame
+
+        Columns are t, o, h, l, c, v, ts and then the features, indexed 0..n-1
+        (rows with a NaN feature dropped unless ``dropna`` is False).
+        """
+        rows = self.block.rows(symbol)
+        t = self.block.t[rows]
+        data: Dict[str, np.ndarray] = {"t": t}
+        for f in BAR_FIELDS:
+            data[f] = getattr(self.block, f)[rows]
+        data["ts"] = pd.to_datetime(t, unit="ms", utc=True)
+        values = self.values[rows]
+        data.update({name: values[:, j] for j, name in enumerate(self.names)})
+        df = pd.DataFrame(data)
+        if dropna:
+            df = df[~np.isnan(values).any(axis=1)]
+        return df
+
+    def frames(self, dropna: bool = True) -> Dict[str, pd.DataFrame]:
+        return {symbol: self.frame(symbol, dropna) for symbol in self.block.symbols}
@@ -0,0 +1,499 @@
+"""
+EMO Options Bot - Online Model Monitoring
+Streaming accuracy, calibration and feature drift for deployed models
+
+Deciding whether a model needs retraining used to mean re-querying its
+prediction history for every symbol/model pair. DriftMonitor instead joins
+each prediction with the realized return once its horizon has elapsed, as
+bars arrive, and keeps rolling statistics that are updated in O(1) per bar
+and per prediction (O(features) for the drift counters):
+
+- hit rate and MAE against the realized signal label (same +/-1% bands as
+  the training targets)
+- calibration: expected calibration error of confidence against hit rate
+- feature drift: population stability index and standardized mean shift of
+  the live features against the model's training distribution
+
+Models whose statistics cross DriftThresholds are flagged, so retraining can
+target them instead of every model every week. The monitor pickles its state
+(pending predictions included) and writes a JSON status file that the health
+server and the retrain job read from other processes.
+
+Includes:
+- FeatureProfile: quantile bins and moments of the training features
+- ModelTracker: rolling statistics of one (symbol, model, horizon)
+- DriftMonitor: joins predictions with bars and flags models to retrain
+- get_drift_monitor / drift_status: process-wide monitor and status reader
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import pickle
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+DEFAULT_ROOT = "data/ml_drift"
+STATE_FILE = "state.pkl"
+STATUS_FILE = "status.json"
+
+_PSI_FLOOR = 1e-4  # bin share floor so empty bins do not make the PSI infinite
+
+
+@dataclass
+class DriftThresholds:
+    """Rolling statistics beyond which a model is flagged for retraining"""
+    min_samples: int = 30                 # resolved directional predictions before judging accuracy
+    min_hit_rate: float = 0.45
+    max_mae: Optional[float] = None       # signal MAE (None: not checked)
+    max_calibration_error: float = 0.25
+    max_psi: float = 0.25                 # per feature; 0.1-0.25 is moderate, above is a major shift
+    min_feature_samples: int = 100        # live feature rows before judging drift
+
+
+@dataclass
+class FeatureProfile:
+    """Training distribution of a model's features: decile bins and moments"""
+    names: List[str]
+    edges: np.ndarray      # (F, bins - 1) inner bin edges
+    expected: np.ndarray   # (F, bins) share of training rows in each bin
+    mean: np.ndarray
+    std: np.ndarray
+
+    @classmethod
+    def fit(cls, X: Any, names: Sequence[str], bins: int = 10) -> "FeatureProfile":
+        """Profile the rows of ``X`` without NaNs"""
+        X = np.asarray(X, dtype=np.float64)
+        X = X[~np.isnan(X).any(axis=1)]
+        if len(X) == 0:
+            raise ValueError("No complete feature rows to profile")
+        edges = np.quantile(X, np.linspace(0, 1, bins + 1)[1:-1], axis=0).T
+        profile = cls(list(names), np.ascontiguousarray(edges), np.zeros((X.shape[1], bins)),
+                      X.mean(axis=0), X.std(axis=0))
+        counts = np.zeros_like(profile.expected)
+        np.add.at(counts, (np.broadcast_to(np.arange(X.shape[1]), X.shape), profile.bin(X)), 1)
+        profile.expected = counts / len(X)
+        return profile
+
+    @property
+    def bins(self) -> int:
+        return self.expected.shape[1]
+
+    def bin(self, X: np.ndarray) -> np.ndarray:
+        """Bin index of every value, shape like ``X`` (NaNs land in the last bin)"""
+        X = np.asarray(X, dtype=np.float64)
+        return (X[..., None] > self.edges).sum(axis=-1)
+
+
+class ModelTracker:
+    """
+    Rolling join of one model's predictions with realized returns
+
+    Predictions wait in a FIFO until ``due`` bars have been observed; every
+    horizon has its own tracker, so the queue is ordered by due bar. Scored
+    samples and feature rows each live in a fixed-length window whose running
+    sums are updated on push and evict.
+    """
+
+    def __init__(self, window: int = 500, calibration_bins: int = 10, neutral_band: float = 0.01,
+                 profile: Optional[FeatureProfile] = None, version: Optional[str] = None,
+                 warmup: int = 200):
+        self.window = int(window)
+        self.calibration_bins = int(calibration_bins)
+        self.neutral_band = float(neutral_band)
+        self.warmup = int(warmup)
+        self.reset(version, profile)
+
+    def reset(self, version: Optional[str] = None, profile: Optional[FeatureProfile] = None):
+        """Start over, e.g. for a newly trained model version"""
+        self.version = version
+        self.profile = profile
+        self.pending: deque = deque()  # (due_bar, entry_close, signal, confidence)
+        self.last_bar = -1
+        self.updated_at: Optional[str] = None
+        self.resolved = 0
+        # Scored samples: (abs_err, hit or -1 when the market did not move, confidence, bucket)
+        self.samples: deque = deque()
+        self.abs_err = 0.0
+        self.directional = 0
+        self.hits = 0
+        self.bucket_n = np.zeros(self.calibration_bins, dtype=np.int64)
+        self.bucket_hits = np.zeros(self.calibration_bins, dtype=np.int64)
+        self.bucket_conf = np.zeros(self.calibration_bins)
+        self._since_resum = 0
+        # Feature window: bin counts and sums of the last ``window`` rows
+        self.features: deque = deque()
+        self._reference: List[np.ndarray] = []  # live rows collected when no training profile is known
+        self.bin_counts = np.zeros((len(profile.names), profile.bins)) if profile is not None else None
+        self.feature_sum = np.zeros(len(profile.names)) if profile is not None else None
+        self._features_since_resum = 0
+
+    # -- predictions ---------------------------------------------------------
+
+    def add_prediction(self, bar: int, due: int, close: float, signal: float, confidence: float) -> bool:
+        """Queue a prediction made at ``bar`` (once per bar) for scoring at ``due``"""
+        if bar <= self.last_bar:
+            return False
+        self.last_bar = bar
+        self.pending.append((due, float(close), float(signal), float(confidence)))
+        self.updated_at = datetime.now(timezone.utc).isoformat()
+        return True
+
+    def resolve(self, bar: int, close: float) -> int:
+        """Score every pending prediction due at or before ``bar``"""
+        n = 0
+        while self.pending and self.pending[0][0] <= bar:
+            _, entry, signal, confidence = self.pending.popleft()
+            if entry > 0:
+                self._score(signal, confidence, close / entry - 1)
+                n += 1
+        return n
+
+    def _score(self, signal: float, confidence: float, realized: float):
+        label = 1 if realized > self.neutral_band else -1 if realized < -self.neutral_band else 0
+        hit = -1 if label == 0 else int(np.sign(signal) == label)
+        bucket = min(int(confidence * self.calibration_bins), self.calibration_bins - 1)
+        sample = (abs(signal - label), hit, confidence, max(bucket, 0))
+        self.samples.append(sample)
+        self._add(sample, 1)
+        if len(self.samples) > self.window:
+            self._add(self.samples.popleft(), -1)
+        self.resolved += 1
+        # Re-sum once per window so floating point drift stays bounded (amortized O(1))
+        self._since_resum += 1
+        if self._since_resum >= self.window:
+            self.abs_err = math.fsum(s[0] for s in self.samples)
+            self.bucket_conf[:] = 0.0
+            for _, hit, conf, bucket in self.samples:
+                if hit >= 0:
+                    self.bucket_conf[bucket] += conf
+            self._since_resum = 0
+
+    def _add(self, sample: Tuple[float, int, float, int], sign: int):
+        abs_err, hit, confidence, bucket = sample
+        self.abs_err += sign * abs_err
+        if hit >= 0:
+            self.directional += sign
+            self.hits += sign * hit
+            self.bucket_n[bucket] += sign
+            self.bucket_hits[bucket] += sign * hit
+            self.bucket_conf[bucket] += sign * confidence
+
+    # -- features ------------------------------------------------------------
+
+    def observe_features(self, x: Any, names: Optional[Sequence[str]] = None):
+        """Add one live feature row (ordered like the profile, or named by ``names``)"""
+        x = np.asarray(x, dtype=np.float64).ravel()
+        if self.profile is None:
+            self._reference.append(x)
+            if len(self._reference) >= self.warmup and names is not None:
+                # No training profile: the first live rows become the reference
+                self.reset_features(FeatureProfile.fit(np.vstack(self._reference), names))
+            return
+        if np.isnan(x).any():
+            x = np.where(np.isnan(x), self.profile.mean, x)
+        idx = self.profile.bin(x)
+        cols = np.arange(len(idx))
+        self.features.append((idx, x))
+        self.bin_counts[cols, idx] += 1
+        self.feature_sum += x
+        if len(self.features) > self.window:
+            old_idx, old_x = self.features.popleft()
+            self.bin_counts[cols, old_idx] -= 1
+            self.feature_sum -= old_x
+        self._features_since_resum += 1
+        if self._features_since_resum >= self.window:
+            self.feature_sum = np.sum([row for _, row in self.features], axis=0)
+            self._features_since_resum = 0
+
+    def reset_features(self, profile: FeatureProfile):
+        self.profile = profile
+        self.features = deque()
+        self._reference = []
+        self.bin_counts = np.zeros((len(profile.names), profile.bins))
+        self.feature_sum = np.zeros(len(profile.names))
+        self._features_since_resum = 0
+
+    def feature_drift(self) -> Dict[str, Any]:
+        """PSI and standardized mean shift of each feature over the window"""
+        n = len(self.features)
+        if self.profile is None or n == 0:
+            return {"samples": n, "psi": {}, "max_psi": None, "mean_shift": {}, "max_mean_shift": None}
+        actual = np.maximum(self.bin_counts / n, _PSI_FLOOR)
+        expected = np.maximum(self.profile.expected, _PSI_FLOOR)
+        psi = ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+        std = np.where(self.profile.std > 0, self.profile.std, 1.0)
+        shift = np.abs(self.feature_sum / n - self.profile.mean) / std
+        names = self.profile.names
+        return {
+            "samples": n,
+            "psi": {name: round(float(v), 4) for name, v in zip(names, psi)},
+            "max_psi": float(psi.max()),
+            "top_feature": names[int(psi.argmax())],
+            "mean_shift": {name: round(float(v), 4) for name, v in zip(names, shift)},
+            "max_mean_shift": float(shift.max()),
+        }
+
+    # -- summary -------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        n = len(self.samples)
+        calibration = []
+        ece = None
+        if self.directional > 0:
+            ece = 0.0
+            for b in np.flatnonzero(self.bucket_n):
+                count = int(self.bucket_n[b])
+                hit_rate = self.bucket_hits[b] / count
+                mean_conf = self.bucket_conf[b] / count
+                ece += count / self.directional * abs(mean_conf - hit_rate)
+                calibration.append({"bucket": [b / self.calibration_bins, (b + 1) / self.calibration_bins],
+                                    "n": count, "confidence": float(mean_conf), "hit_rate": float(hit_rate)})
+        return {
+            "version": self.version,
+            "samples": n,
+            "resolved_total": self.resolved,
+            "pending": len(self.pending),
+            "directional": self.directional,
+            "hit_rate": self.hits / self.directional if self.directional else None,
+            "mae": self.abs_err / n if n else None,
+            "calibration_error": float(ece) if ece is not None else None,
+            "calibration": calibration,
+            "drift": self.feature_drift(),
+            "updated_at": self.updated_at,
+        }
+
+
+def check_thresholds(stats: Dict[str, Any], thresholds: DriftThresholds) -> List[str]:
+    """Reasons a tracker's stats (ModelTracker.stats output) call for retraining"""
+    reasons = []
+    if stats["directional"] >= thresholds.min_samples:
+        if stats["hit_rate"] < thresholds.min_hit_rate:
+            reasons.append(f"hit_rate {stats['hit_rate']:.3f} < {thresholds.min_hit_rate}")
+        if stats["calibration_error"] > thresholds.max_calibration_error:
+            reasons.append(f"calibration_error {stats['calibration_error']:.3f} > {thresholds.max_calibration_error}")
+    if thresholds.max_mae is not None and stats["samples"] >= thresholds.min_samples \
+            and stats["mae"] > thresholds.max_mae:
+        reasons.append(f"mae {stats['mae']:.3f} > {thresholds.max_mae}")
+    drift = stats["drift"]
+    if drift["samples"] >= thresholds.min_feature_samples and drift["max_psi"] > thresholds.max_psi:
+        reasons.append(f"feature drift psi {drift['max_psi']:.3f} > {thresholds.max_psi} ({drift['top_feature']})")
+    return reasons
+
+
+class DriftMonitor:
+    """
+    Online accuracy and drift tracking for every (symbol, model, horizon)
+
+    Feed bars with observe_bars and predictions with record_prediction, in
+    any interleaving; a prediction made at bar k with a horizon of h bars is
+    scored against the close of bar k + h. Thread-safe, so a health server
+    thread can read status() while the engine updates it.
+    """
+
+    def __init__(self, root: Optional[Union[str, Path]] = None, window: int = 500,
+                 thresholds: Optional[DriftThresholds] = None, neutral_band: float = 0.01):
+        self.root = Path(root) if root is not None else None
+        self.window = window
+        self.thresholds = thresholds or DriftThresholds()
+        self.neutral_band = neutral_band
+        self.trackers: Dict[Tuple[str, str, str], ModelTracker] = {}
+        self._by_symbol: Dict[str, List[ModelTracker]] = {}
+        self._bars: Dict[str, Tuple[int, Any, float]] = {}  # symbol -> (bars seen, last ts, last close)
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def observe_bars(self, symbol: str, index: Sequence[Any], close: Sequence[float]) -> int:
+        """
+        Advance ``symbol`` by the bars after the last one already seen
+
+        Args:
+            symbol: Ticker
+            index: Sorted bar timestamps (a DatetimeIndex or anything comparable)
+            close: Close of each bar
+
+        Returns:
+            Number of predictions scored
+        """
+        with self._lock:
+            count, last_ts, last_close = self._bars.get(symbol, (0, None, float("nan")))
+            if last_ts is None:
+                start = 0
+            elif hasattr(index, "searchsorted"):
+                start = int(index.searchsorted(last_ts, side="right"))
+            else:
+                start = int(np.searchsorted(np.asarray(index), last_ts, side="right"))
+            trackers = self._by_symbol.get(symbol, [])
+            scored = 0
+            for ts, price in zip(index[start:], np.asarray(close, dtype=np.float64)[start:]):
+                count += 1
+                last_ts, last_close = ts, float(price)
+                for tracker in trackers:
+                    scored += tracker.resolve(count, last_close)
+            self._bars[symbol] = (count, last_ts, last_close)
+            return scored
+
+    def record_prediction(self, symbol: str, model: str, horizon: str, periods: int, signal: float,
+                          confidence: float, features: Any = None, feature_names: Optional[Sequence[str]] = None,
+                          version: Optional[str] = None, profile: Optional[FeatureProfile] = None) -> bool:
+        """
+        Track a prediction made on the latest observed bar of ``symbol``
+
+        A new ``version`` resets the model's statistics (it is a different
+        model). Repeated predictions on the same bar are ignored.
+
+        Args:
+            periods: Horizon in bars
+            features: Feature row the prediction was made from (optional)
+            feature_names: Names of ``features``
+            profile: Training FeatureProfile of this model version
+
+        Returns:
+            True if the prediction was queued
+        """
+        with self._lock:
+            if symbol not in self._bars:
+                raise ValueError(f"No bars observed for {symbol}")
+            count, _, close = self._bars[symbol]
+            key = (symbol, model, horizon)
+            tracker = self.trackers.get(key)
+            if tracker is None:
+                tracker = ModelTracker(self.window, neutral_band=self.neutral_band, profile=profile, version=version)
+                self.trackers[key] = tracker
+                self._by_symbol.setdefault(symbol, []).append(tracker)
+            elif version != tracker.version:
+                tracker.reset(version, profile)
+            if not tracker.add_prediction(count, count + int(periods), close, signal, confidence):
+                return False
+            if features is not None:
+                if tracker.profile is not None and feature_names is not None \
+                        and list(feature_names) != tracker.profile.names:
+                    features = _reorder(features, feature_names, tracker.profile.names)
+                tracker.observe_features(features, feature_names)
+            return True
+
+    def needs_retraining(self, symbol: str, model: str, horizon: Optional[str] = None) -> List[str]:
+        """Reasons to retrain ``symbol``/``model`` (all horizons unless given); empty if none"""
+        with self._lock:
+            reasons = []
+            for (sym, name, h), tracker in self.trackers.items():
+                if sym == symbol and name == model and horizon in (None, h):
+                    reasons += [f"{h}: {r}" for r in check_thresholds(tracker.stats(), self.thresholds)]
+            return reasons
+
+    def retrain_candidates(self) -> List[Tuple[str, str, List[str]]]:
+        """(symbol, model, reasons) of every flagged model"""
+        with self._lock:
+            pairs = dict.fromkeys((sym, model) for sym, model, _ in self.trackers)
+            out = []
+            for symbol, model in pairs:
+                reasons = self.needs_retraining(symbol, model)
+                if reasons:
+                    out.append((symbol, model, reasons))
+            return out
+
+    def status(self) -> Dict[str, Any]:
+        """JSON-ready statistics of every tracked model, flagged ones listed separately"""
+        with self._lock:
+            models, flagged = {}, {}
+            for (symbol, model, horizon), tracker in self.trackers.items():
+                key = f"{symbol}_{model}_{horizon}"
+                stats = tracker.stats()
+                stats.update(symbol=symbol, model=model, horizon=horizon,
+                             reasons=check_thresholds(stats, self.thresholds))
+                models[key] = stats
+                if stats["reasons"]:
+                    flagged[key] = stats["reasons"]
+            return {
+                "available": True,
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "thresholds": asdict(self.thresholds),
+                "tracked": len(models),
+                "flagged": flagged,
+                "models": models,
+            }
+
+    def save(self, root: Optional[Union[str, Path]] = None) -> Path:
+        """Persist the full state and the status JSON under ``root``"""
+        root = Path(root) if root is not None else self.root
+        if root is None:
+            raise ValueError("No monitor directory configured")
+        root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            _atomic_write(root / STATE_FILE, pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL))
+            _atomic_write(root / STATUS_FILE, json.dumps(self.status(), indent=2, default=str).encode())
+        return root
+
+    @classmethod
+    def load(cls, root: Union[str, Path], **kwargs) -> "DriftMonitor":
+        """Monitor saved under ``root``, or a new one if there is none (or it is unreadable)"""
+        path = Path(root) / STATE_FILE
+        try:
+            with open(path, "rb") as f:
+                monitor = pickle.load(f)
+            if isinstance(monitor, cls):
+                monitor.root = Path(root)
+                for name in ("window", "thresholds", "neutral_band"):
+                    if kwargs.get(name) is not None:
+                        setattr(monitor, name, kwargs[name])
+                return monitor
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+        return cls(root, **kwargs)
+
+
+def _reorder(features: Any, names: Sequence[str], order: Sequence[str]) -> np.ndarray:
+    """Feature row ``features`` (named ``names``) in ``order``; missing names become NaN"""
+    values = dict(zip(names, np.asarray(features, dtype=np.float64).ravel()))
+    return np.array([values.get(name, np.nan) for name in order])
+
+
+def _atomic_write(path: Path, data: bytes):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+_MONITORS: Dict[Path, DriftMonitor] = {}
+_MONITORS_LOCK = threading.Lock()
+
+
+def get_drift_monitor(root: Union[str, Path] = DEFAULT_ROOT) -> DriftMonitor:
+    """Process-wide monitor persisted under ``root`` (loaded on first use)"""
+    key = Path(root).resolve()
+    with _MONITORS_LOCK:
+        if key not in _MONITORS:
+            _MONITORS[key] = DriftMonitor.load(root)
+        return _MONITORS[key]
+
+
+def drift_status(root: Union[str, Path] = DEFAULT_ROOT) -> Dict[str, Any]:
+    """
+    Latest monitor status for ``root``
+
+    Uses the live monitor when this process tracks models, otherwise the
+    status file written by the process that does.
+    """
+    monitor = _MONITORS.get(Path(root).resolve())
+    if monitor is not None and monitor.trackers:
+        return monitor.status()
+    try:
+        return json.loads((Path(root) / STATUS_FILE).read_text())
+    except (OSError, ValueError):
+        return {"available": False, "tracked": 0, "flagged": {}, "models": {}}
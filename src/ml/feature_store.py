@@ -0,0 +1,291 @@
+"""
+EMO Options Bot - Feature Store
+Materialized feature columns per (symbol, timeframe, feature set, version)
+
+Training and inference paths used to re-query raw bars and recompute the same
+rolling features on every run. The store keeps each feature column as a flat
+binary file that can be memory-mapped with NumPy, tracks the high-water
+timestamp of the last stored row, and only computes features for bars newer
+than that mark (with a warmup tail of older bars for the rolling windows).
+
+Layout:
+    <root>/<feature set>/<version>/<timeframe>/<symbol>/
+        meta.json     columns, dtypes, row count, high-water mark
+        ts.i8         int64 UTC epoch nanoseconds
+        c<k>.f8       float64 values of column k
+
+Rows are append-only: meta.json is replaced atomically after the column files
+are extended, so a crash mid-append leaves the previous rows readable and the
+next append truncates the partial tail. Bumping a FeatureSet version writes to
+a fresh directory, so changed feature definitions never mix with old rows.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .features import add_core_features
+from .incremental import CORE_FEATURES
+
+DEFAULT_ROOT = Path("data/features")
+
+
+@dataclass(frozen=True)
+class FeatureSet:
+    """A named, versioned feature computation"""
+    name: str
+    version: str
+    compute: Callable[[pd.DataFrame], pd.DataFrame]
+    warmup: int = 0                        # older bars needed to compute the first new row
+    columns: Optional[Tuple[str, ...]] = None  # stored columns (default: numeric/bool output)
+    dropna: bool = False                   # drop rows with NaN in stored columns
+
+
+# add_core_features output plus close (needed for targets). MACD is EMA based,
+# so a 300 bar warmup keeps incremental values within ~1e-10 of a full recompute.
+CORE_FEATURE_SET = FeatureSet(
+    name="core",
+    version="v1",
+    compute=add_core_features,
+    warmup=300,
+    columns=tuple(['close'] + CORE_FEATURES + ['vix']),
+)
+
+
+def _index_ns(index: pd.Index) -> np.ndarray:
+    """DatetimeIndex -> int64 UTC nanoseconds (naive indexes are taken as UTC)"""
+    idx = pd.DatetimeIndex(index)
+    if idx.tz is not None:
+        idx = idx.tz_convert("UTC").tz_localize(None)
+    return idx.as_unit("ns").asi8
+
+
+def _ts_ns(value: Any) -> int:
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return int(ts.as_unit("ns").value)
+
+
+def _safe(part: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in str(part))
+
+
+class FeatureStore:
+    """
+    Columnar, memory-mappable feature storage with incremental refresh
+
+    Typical use:
+        store = FeatureStore("data/features")
+        store.refresh("SPY", "1Min", CORE_FEATURE_SET, bars_df)   # computes new bars only
+        feats = store.read("SPY", "1Min", CORE_FEATURE_SET, tail=1000)
+    """
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_ROOT):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    # -------- paths / metadata -------------------------------------------------
+    def path(self, symbol: str, timeframe: str, fset: FeatureSet) -> Path:
+        return self.root / _safe(fset.name) / _safe(fset.version) / _safe(timeframe) / _safe(symbol)
+
+    def meta(self, symbol: str, timeframe: str, fset: FeatureSet) -> Optional[Dict[str, Any]]:
+        p = self.path(symbol, timeframe, fset) / "meta.json"
+        if not p.exists():
+            return None
+        return json.loads(p.read_text(encoding="utf-8"))
+
+    def high_water(self, symbol: str, timeframe: str, fset: FeatureSet) -> Optional[pd.Timestamp]:
+        """Timestamp of the last stored row (UTC), or None when nothing is stored"""
+        meta = self.meta(symbol, timeframe, fset)
+        if not meta or not meta.get("rows"):
+            return None
+        return pd.Timestamp(meta["high_water_ns"], unit="ns", tz="UTC")
+
+    def _write_meta(self, d: Path, meta: Dict[str, Any]) -> None:
+        tmp = d / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        os.replace(tmp, d / "meta.json")
+
+    # -------- write ------------------------------------------------------------
+    def append(self, symbol: str, timeframe: str, fset: FeatureSet, features: pd.DataFrame) -> int:
+        """
+        Append feature rows newer than the high-water mark
+
+        Args:
+            symbol: Symbol key
+            timeframe: Bar timeframe key (e.g. "1Min", "1D")
+            fset: Feature set the rows were computed with
+            features: Feature rows indexed by timestamp, oldest first
+
+        Returns:
+            Number of rows written
+        """
+        if features.empty:
+            return 0
+        with self._lock:
+            d = self.path(symbol, timeframe, fset)
+            meta = self.meta(symbol, timeframe, fset)
+            if meta is None:
+                columns = list(fset.columns) if fset.columns else [
+                    c for c in features.columns
+                    if pd.api.types.is_numeric_dtype(features[c]) or pd.api.types.is_bool_dtype(features[c])
+                ]
+                idx = pd.DatetimeIndex(features.index)
+                meta = {
+                    "name": fset.name,
+                    "version": fset.version,
+                    "symbol": symbol,
+                    "timeframe": timeframe,
+                    "columns": columns,
+                    "dtypes": {c: str(features[c].dtype) for c in columns},
+                    "index_name": features.index.name,
+                    "tz": str(idx.tz) if idx.tz is not None else None,
+                    "unit": idx.unit,
+                    "rows": 0,
+                    "high_water_ns": None,
+                }
+            columns = meta["columns"]
+            missing = [c for c in columns if c not in features.columns]
+            if missing:
+                raise ValueError(f"Feature rows for {symbol} missing stored columns: {missing}")
+
+            ts = _index_ns(features.index)
+            keep = np.ones(len(ts), dtype=bool)
+            if meta["high_water_ns"] is not None:
+                keep &= ts > meta["high_water_ns"]
+            if fset.dropna:
+                keep &= ~features[columns].isna().any(axis=1).to_numpy()
+            if not keep.any():
+                return 0
+            ts = ts[keep]
+            if np.any(np.diff(ts) <= 0):
+                raise ValueError(f"Feature rows for {symbol} must have strictly increasing timestamps")
+
+            d.mkdir(parents=True, exist_ok=True)
+            rows = int(meta["rows"])
+            self._append_file(d / "ts.i8", rows * 8, ts.astype("<i8"))
+            for k, col in enumerate(columns):
+                values = features[col].to_numpy(dtype="<f8", na_value=np.nan)[keep]
+                self._append_file(d / f"c{k}.f8", rows * 8, values)
+
+            meta["rows"] = rows + len(ts)
+            meta["high_water_ns"] = int(ts[-1])
+            meta["updated_at"] = datetime.now(timezone.utc).isoformat()
+            self._write_meta(d, meta)
+            return len(ts)
+
+    @staticmethod
+    def _append_file(path: Path, committed_bytes: int, values: np.ndarray) -> None:
+        with open(path, "ab") as fh:
+            # Drop any tail left by an append that never committed its meta.json
+            if fh.tell() != committed_bytes:
+                fh.truncate(committed_bytes)
+                fh.seek(committed_bytes)
+            fh.write(np.ascontiguousarray(values).tobytes())
+
+    def refresh(self, symbol: str, timeframe: str, fset: FeatureSet, bars: pd.DataFrame) -> int:
+        """
+        Compute and store features for bars after the high-water mark
+
+        ``bars`` should include at least ``fset.warmup`` bars before the mark so
+        rolling windows of the first new row are complete.
+
+        Returns:
+            Number of rows written
+        """
+        if bars.empty:
+            return 0
+        hw = self.high_water(symbol, timeframe, fset)
+        start = 0
+        if hw is not None:
+            new_pos = int(np.searchsorted(_index_ns(bars.index), _ts_ns(hw), side="right"))
+            if new_pos >= len(bars):
+                return 0
+            start = max(0, new_pos - fset.warmup)
+        return self.append(symbol, timeframe, fset, fset.compute(bars.iloc[start:]))
+
+    # -------- read -------------------------------------------------------------
+    def arrays(
+        self, symbol: str, timeframe: str, fset: FeatureSet, columns: Optional[Sequence[str]] = None
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Memory-mapped (timestamps_ns, {column: values}) for the stored rows
+
+        Returns empty arrays when nothing is stored.
+        """
+        meta = self.meta(symbol, timeframe, fset)
+        if not meta or not meta.get("rows"):
+            return np.empty(0, dtype=np.int64), {c: np.empty(0) for c in (columns or [])}
+        d = self.path(symbol, timeframe, fset)
+        rows = int(meta["rows"])
+        stored = meta["columns"]
+        wanted = list(columns) if columns is not None else stored
+        unknown = [c for c in wanted if c not in stored]
+        if unknown:
+            raise KeyError(f"Columns not in feature set {fset.name}/{fset.version}: {unknown}")
+        ts = np.memmap(d / "ts.i8", dtype="<i8", mode="r", shape=(rows,))
+        values = {
+            c: np.memmap(d / f"c{stored.index(c)}.f8", dtype="<f8", mode="r", shape=(rows,))
+            for c in wanted
+        }
+        return ts, values
+
+    def read(
+        self,
+        symbol: str,
+        timeframe: str,
+        fset: FeatureSet,
+        start: Any = None,
+        end: Any = None,
+        tail: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Read stored features as a DataFrame indexed by timestamp
+
+        Args:
+            start: Inclusive lower timestamp bound
+            end: Inclusive upper timestamp bound
+            tail: Keep only the last ``tail`` rows of the range
+            columns: Subset of stored columns (default: all)
+        """
+        meta = self.meta(symbol, timeframe, fset)
+        if not meta or not meta.get("rows"):
+            return pd.DataFrame(columns=list(columns or []))
+        ts, values = self.arrays(symbol, timeframe, fset, columns)
+        lo = 0 if start is None else int(np.searchsorted(ts, _ts_ns(start), side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, _ts_ns(end), side="right"))
+        if tail is not None:
+            lo = max(lo, hi - int(tail))
+
+        index = pd.to_datetime(np.asarray(ts[lo:hi]), unit="ns", utc=True)
+        index = index.tz_convert(meta["tz"]) if meta.get("tz") else index.tz_localize(None)
+        index = index.as_unit(meta.get("unit", "ns"))
+        index.name = meta.get("index_name")
+        df = pd.DataFrame({c: np.array(v[lo:hi]) for c, v in values.items()}, index=index)
+        for c in df.columns:
+            dtype = meta["dtypes"].get(c, "float64")
+            if dtype != "float64":
+                try:
+                    df[c] = df[c].astype(dtype)
+                except (TypeError, ValueError):
+                    pass
+        return df
+
+    def drop(self, symbol: str, timeframe: str, fset: FeatureSet) -> None:
+        """Remove stored rows so the next refresh rematerializes from scratch"""
+        d = self.path(symbol, timeframe, fset)
+        if d.exists():
+            for p in d.iterdir():
+                p.unlink()
+            d.rmdir()
@@ -50,7 +50,8 @@ def build_supervised(
     df: pd.DataFrame,
     features: list[str],
     horizon: int,
-    target_name: str | None = None
+    target_name: str | None = None,
+    features_ready: bool = False
 ):
     """
     Create supervised learning dataset from time series data
@@ -60,12 +61,14 @@ def build_supervised(
         features: List of feature column names to use
         horizon: Forward-looking periods for target
         target_name: Name for target variable
+        features_ready: df already has the core features (e.g. from
+            IncrementalFeatureEngine); skip recomputing them
         
     Returns:
         Tuple of (X, y, index) where X is features, y is targets, index is time index
     """
     # Add technical features
-    out = add_core_features(df)
+    out = df if features_ready else add_core_features(df)
     
     # Create forward-looking target (future return)
     fwd = out['close'].shift(-horizon) / out['close'] - 1.0
@@ -82,10 +85,86 @@ def build_supervised(
     
     return X_clean, y_clean, index
 
+def add_core_features_batch(close: np.ndarray, vix: np.ndarray | None = None) -> dict[str, np.ndarray]:
+    """
+    add_core_features for many symbols in one vectorized pass
+    
+    Args:
+        close: (S, T) close prices, one row per symbol; shorter histories are
+            left-padded with NaN so the latest bars line up
+        vix: Optional (S, T) VIX values (default 0.0)
+        
+    Returns:
+        Dict of feature name -> (S, T) array with the values add_core_features
+        produces for each symbol
+    """
+    c = pd.DataFrame(np.asarray(close, dtype=float).T)
+    r1 = c.pct_change(1)
+    feats = {
+        'returns_1': r1,
+        'returns_5': c.pct_change(5),
+        'vol_10': r1.rolling(10).std().fillna(0.0),
+        'realized_vol_20': r1.rolling(20).std().fillna(0.0),
+    }
+    
+    chg = c.diff()
+    gain = chg.clip(lower=0).rolling(14).mean()
+    loss = (-chg.clip(upper=0)).rolling(14).mean()
+    rs = (gain / (loss.replace(0, np.nan))).fillna(0)
+    feats['rsi_14'] = 100 - (100 / (1 + rs))
+    
+    ema12 = c.ewm(span=12, adjust=False).mean()
+    ema26 = c.ewm(span=26, adjust=False).mean()
+    macd = ema12 - ema26
+    feats['macd'] = macd - macd.ewm(span=9, adjust=False).mean()
+    
+    out = {name: frame.to_numpy().T for name, frame in feats.items()}
+    out['vix'] = np.zeros_like(out['macd']) if vix is None else np.asarray(vix, dtype=float)
+    return out
+
+def latest_supervised_rows(
+    feats: dict[str, np.ndarray],
+    close: np.ndarray,
+    features: list[str],
+    horizon: int
+):
+    """
+    Batch equivalent of build_supervised(...) followed by X[-1] per symbol
+    
+    Args:
+        feats: Feature name -> (S, T) array (e.g. from add_core_features_batch)
+        close: (S, T) close prices
+        features: Feature names, in column order
+        horizon: Forward-looking periods for target
+        
+    Returns:
+        Tuple of (X_last, y, n_rows): X_last is (S, F) float32 features of each
+        symbol's last complete row (NaN when it has none), y is (S, T) float32
+        targets with NaN where build_supervised would drop the row, n_rows is
+        the number of complete rows per symbol
+    """
+    close = np.asarray(close, dtype=float)
+    fwd = np.full_like(close, np.nan)
+    fwd[:, :-horizon] = close[:, horizon:] / close[:, :-horizon] - 1.0
+    X = np.stack([np.asarray(feats[f], dtype=float) for f in features], axis=-1)
+    
+    # Same rows dropna() keeps: every feature and the target present
+    valid = ~np.isnan(fwd) & ~np.isnan(X).any(axis=-1)
+    n_rows = valid.sum(axis=1)
+    last = valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    X_last = X[np.arange(len(X)), last].astype(np.float32)
+    X_last[n_rows == 0] = np.nan
+    y = np.where(valid, fwd, np.nan).astype(np.float32)
+    
+    return X_last, y, n_rows
+
 def sliding_windows(X: np.ndarray, y: np.ndarray, lookback: int) -> tuple[np.ndarray, np.ndarray]:
     """
     Convert tabular data to sliding window sequences for time series ML
     
+    The sequences are a read-only strided view over X (no per-window copies),
+    so memory stays O(T*F) instead of O(N*lookback*F).
+    
     Args:
         X: Feature array (T, F) where T is time, F is features
         y: Target array (T,)
@@ -94,13 +173,53 @@ def sliding_windows(X: np.ndarray, y: np.ndarray, lookback: int) -> tuple[np.nda
     Returns:
         Tuple of (sequences, targets) where sequences is (N, lookback, F)
     """
-    seqs, targets = [], []
-    for t in range(lookback, len(X)):
-        seqs.append(X[t-lookback:t])
-        targets.append(y[t])
-    return np.array(seqs), np.array(targets)
+    X = np.asarray(X)
+    y = np.asarray(y)
+    n = len(X) - lookback
+    if n <= 0:
+        return np.array([]), np.array([])
+    windows = np.lib.stride_tricks.sliding_window_view(X, lookback, axis=0)[:n]
+    seqs = np.moveaxis(windows, -1, 1)
+    targets = y[lookback:lookback + n].view()
+    targets.flags.writeable = False
+    return seqs, targets
+
+def iter_window_batches(
+    X: np.ndarray,
+    y: np.ndarray,
+    lookback: int,
+    batch_size: int = 256,
+    shuffle: bool = False,
+    seed: int = 42
+):
+    """
+    Generate training mini-batches of sliding windows
+    
+    Args:
+        X: Feature array (T, F)
+        y: Target array (T,)
+        lookback: Number of timesteps to look back
+        batch_size: Windows per batch
+        shuffle: Shuffle window order (seeded)
+        seed: Random seed for shuffling
+        
+    Yields:
+        Tuples of contiguous (batch, lookback, F) sequences and (batch,) targets
+    """
+    seqs, targets = sliding_windows(X, y, lookback)
+    n = len(targets)
+    order = np.arange(n)
+    if shuffle:
+        np.random.default_rng(seed).shuffle(order)
+    for start in range(0, n, batch_size):
+        idx = order[start:start + batch_size]
+        if shuffle:
+            yield seqs[idx], targets[idx]
+        else:
+            sl = slice(idx[0], idx[-1] + 1)
+            yield np.ascontiguousarray(seqs[sl]), np.array(targets[sl])
 
-def train_val_test_split(n: int, test=0.2, val=0.1, seed=42):
+def train_val_test_split(n: int, test=0.2, val=0.1, seed=42, shuffle=True, gap=0):
     """
     Split data indices into train/validation/test sets
     
@@ -109,17 +228,29 @@ def train_val_test_split(n: int, test=0.2, val=0.1, seed=42):
         test: Fraction for test set
         val: Fraction for validation set
         seed: Random seed for reproducibility
+        shuffle: Random split (default); False gives chronological
+            train -> val -> test blocks
+        gap: Samples dropped before the val and test blocks when not
+            shuffling (set to the label horizon to purge overlapping labels)
         
     Returns:
         Tuple of (train_idx, val_idx, test_idx)
     """
+    n_test = int(n * test)
+    n_val = int(n * val)
+    
+    if not shuffle:
+        test_start = n - n_test
+        val_start = test_start - n_val
+        test_idx = np.arange(test_start, n)
+        val_idx = np.arange(val_start, max(val_start, test_start - gap)) if n_val else np.arange(0)
+        train_idx = np.arange(0, max(0, val_start - gap if n_val else test_start - gap))
+        return train_idx, val_idx, test_idx
+    
     rng = np.random.default_rng(seed)
     idx = np.arange(n)
     rng.shuffle(idx)
     
-    n_test = int(n * test)
-    n_val = int(n * val)
-    
     test_idx = idx[:n_test]
     val_idx = idx[n_test:n_test+n_val]
     train_idx = idx[n_test+n_val:]
@@ -0,0 +1,138 @@
+"""
+EMO Options Bot - Flattened Tree Ensembles
+Array-based inference for trained regression trees and forests
+
+A fitted sklearn forest keeps one Tree object per estimator, each with a
+64-byte node struct, and predict() pays input validation and a thread pool
+dispatch even for a single row. export_forest packs every tree into shared
+NumPy node arrays that need only NumPy to evaluate and pickle as plain
+buffers (so the model registry memory-maps them).
+
+Predictions are bit-identical to sklearn:
+- inputs are cast to float32 as sklearn does, and each float64 split
+  threshold is stored as the largest float32 not above it, so every
+  ``x <= threshold`` decision is unchanged
+- NaN inputs follow the tree's missing-value direction
+- per-tree leaf values are accumulated in estimator order and divided by the
+  number of trees, matching RandomForestRegressor.predict
+
+Includes:
+- FlatForest: packed node arrays with a vectorized traversal
+- export_forest: DecisionTreeRegressor / RandomForestRegressor / ExtraTreesRegressor -> FlatForest
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, List
+
+import numpy as np
+
+
+@dataclass
+class FlatForest:
+    """
+    Every tree of a regression ensemble in one set of node arrays
+
+    Child indices are absolute into the packed arrays. Leaves point to
+    themselves with a +inf threshold, so traversal steps all rows through all
+    trees together until every path has reached a leaf.
+    """
+    feature: np.ndarray        # int32 split feature (0 at leaves)
+    threshold: np.ndarray      # float32 split threshold, rounded down from float64
+    left: np.ndarray           # int32 child for x <= threshold
+    right: np.ndarray          # int32 child otherwise
+    missing_left: np.ndarray   # bool, NaN goes left
+    value: np.ndarray          # float64 node value (used at leaves)
+    roots: np.ndarray          # int32 root node of each tree
+    max_depth: int
+    n_features: int
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in
+                   ("feature", "threshold", "left", "right", "missing_left", "value", "roots"))
+
+    def apply(self, X: Any) -> np.ndarray:
+        """Leaf index reached in each tree, shape (rows, trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = (x <= self.threshold[nodes]) | (np.isnan(x) & self.missing_left[nodes])
+            moved = np.where(go_left, self.left[nodes], self.right[nodes])
+            if np.array_equal(moved, nodes):  # every row is at a leaf in every tree
+                break
+            nodes = moved
+        return nodes
+
+    def predict(self, X: Any) -> np.ndarray:
+        """Ensemble mean prediction, shape (rows,)"""
+        leaf_values = self.value[self.apply(X)]
+        # cumsum adds trees strictly in order, like sklearn's accumulation loop
+        return np.cumsum(leaf_values, axis=1)[:, -1] / self.n_trees
+
+
+def _round_down_f32(threshold: np.ndarray) -> np.ndarray:
+    """Largest float32 <= each float64 value (so float32 x <= t is unchanged)"""
+    t32 = threshold.astype(np.float32)
+    over = t32.astype(np.float64) > threshold
+    t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+    return t32
+
+
+def export_forest(estimator: Any) -> FlatForest:
+    """
+    Flatten a fitted single-output regression tree or forest
+
+    Args:
+        estimator: Fitted DecisionTreeRegressor, RandomForestRegressor or
+            ExtraTreesRegressor (anything exposing ``tree_`` or ``estimators_``)
+
+    Returns:
+        FlatForest with the same predictions
+    """
+    trees = [e.tree_ for e in estimator.estimators_] if hasattr(estimator, "estimators_") else [estimator.tree_]
+    if not trees:
+        raise ValueError("Estimator has no fitted trees")
+    if any(t.n_outputs != 1 or int(np.max(t.n_classes)) != 1 for t in trees):
+        raise ValueError("Only single-output regression trees can be exported")
+
+    parts: List[tuple] = []
+    offset = 0
+    roots = []
+    for t in trees:
+        n = t.node_count
+        idx = np.arange(offset, offset + n, dtype=np.int64)
+        leaf = t.children_left == -1
+        left = np.where(leaf, idx, t.children_left + offset)
+        right = np.where(leaf, idx, t.children_right + offset)
+        threshold = np.where(leaf, np.inf, t.threshold)
+        missing = getattr(t, "missing_go_to_left", np.zeros(n, dtype=np.uint8))
+        parts.append((np.where(leaf, 0, t.feature), threshold, left, right, missing, t.value[:, 0, 0]))
+        roots.append(offset)
+        offset += n
+    if offset >= np.iinfo(np.int32).max:
+        raise ValueError("Forest too large for int32 node indices")
+
+    feature, threshold, left, right, missing, value = (np.concatenate(cols) for cols in zip(*parts))
+    return FlatForest(
+        feature=feature.astype(np.int32),
+        threshold=_round_down_f32(threshold.astype(np.float64)),
+        left=left.astype(np.int32),
+        right=right.astype(np.int32),
+        missing_left=missing.astype(bool),
+        value=np.ascontiguousarray(value, dtype=np.float64),
+        roots=np.asarray(roots, dtype=np.int32),
+        max_depth=int(max(t.max_depth for t in trees)),
+        n_features=int(trees[0].n_features),
+    )
@@ -0,0 +1,238 @@
+"""
+EMO Options Bot - Incremental Features
+Stateful, per-symbol version of add_core_features
+
+The batch function copies the frame and recomputes every rolling window over
+the full history on each call. IncrementalFeatureEngine keeps the rolling state
+(return windows, RSI gain/loss windows, MACD EMAs) per symbol and only processes
+bars it has not seen before, so a prediction loop that re-reads a growing or
+sliding history pays O(1) per new bar instead of O(history).
+
+Each bar's features are those ``add_core_features`` gives over the contiguous
+history the engine has seen for the symbol, so a frame that starts where the
+cache starts gets exactly ``add_core_features(frame)``. The engine reproduces
+the batch quirks: NaN returns, zero-filled vol and RSI of 0 while the windows
+fill, after a missing (NaN) close, or when there were no losses; MACD carries
+across a missing close the way ``ewm(adjust=False)`` does.
+"""
+
+from __future__ import annotations
+
+import math
+from bisect import bisect_right
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..strategies.indicators import MACD, RollingMean, RollingStd
+
+CORE_FEATURES = ['returns_1', 'returns_5', 'vol_10', 'realized_vol_20', 'rsi_14', 'macd']
+
+# Longest rolling window behind the core features (MACD slow EMA span)
+LONGEST_WINDOW = 26
+
+
+@dataclass
+class _SymbolFeatureState:
+    """Rolling state for one symbol plus the feature rows produced so far"""
+    closes: deque = field(default_factory=lambda: deque(maxlen=6))
+    vol_10: RollingStd = field(default_factory=lambda: RollingStd(10))
+    vol_20: RollingStd = field(default_factory=lambda: RollingStd(20))
+    gains: RollingMean = field(default_factory=lambda: RollingMean(14))
+    losses: RollingMean = field(default_factory=lambda: RollingMean(14))
+    macd: MACD = field(default_factory=MACD)
+    index: List[Any] = field(default_factory=list)
+    close: List[float] = field(default_factory=list)
+    rows: Dict[str, List[float]] = field(default_factory=lambda: {c: [] for c in CORE_FEATURES})
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+class IncrementalFeatureEngine:
+    """
+    Keeps add_core_features state per symbol and appends only new bars
+
+    Typical use:
+        engine = IncrementalFeatureEngine()
+        feats = engine.update("SPY", bars_df)   # == add_core_features(bars_df)
+        ...
+        feats = engine.update("SPY", bars_df_with_new_rows)  # only new rows computed
+        feats = engine.update("SPY", bars_df.iloc[1:])        # sliding window, no recompute
+
+    A frame is matched against the cached rows where they overlap: the frame
+    may drop bars from the front and add bars at the back. If it does not line
+    up with the cache (gap, rewritten bar, or bars older than the cache), the
+    symbol is recomputed from scratch. The cached rows are capped at the
+    longest rolling window plus ``retention`` (and never below the frame just
+    served), so memory stays bounded however long the loop runs.
+    """
+
+    def __init__(self, retention: int = 5000):
+        self.retention = int(retention)
+        self._states: Dict[str, _SymbolFeatureState] = {}
+        self.stats = {"appended": 0, "reused": 0, "resets": 0}
+
+    def reset(self, symbol: Optional[str] = None) -> None:
+        """Drop cached state for one symbol (or all symbols)"""
+        if symbol is None:
+            self._states.clear()
+        else:
+            self._states.pop(symbol, None)
+
+    def cached_length(self, symbol: str) -> int:
+        state = self._states.get(symbol)
+        return len(state) if state else 0
+
+    def can_extend(self, symbol: str, df: pd.DataFrame) -> bool:
+        """True when ``symbol`` has cached rows that ``df`` continues (update would not recompute)"""
+        state = self._states.get(symbol)
+        return bool(state) and self._overlap(state, df) is not None
+
+    def append_bar(self, symbol: str, ts: Any, close: float) -> Dict[str, float]:
+        """
+        Push one bar for ``symbol`` and return its feature row
+
+        Args:
+            symbol: Symbol key
+            ts: Bar timestamp (index label used in update output)
+            close: Close price
+
+        Returns:
+            Dict of core feature values for the bar
+        """
+        state = self._states.setdefault(symbol, _SymbolFeatureState())
+        return self._push(state, ts, float(close))
+
+    def update(self, symbol: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Return ``add_core_features(df)`` computing only bars not seen before
+
+        Args:
+            symbol: Symbol key for the cached state
+            df: DataFrame with a ``close`` column, indexed by time, oldest first
+
+        Returns:
+            Copy of df with the core feature columns added
+        """
+        out = df.copy()
+        n = len(df)
+        state = self._states.get(symbol)
+        overlap = self._overlap(state, df) if state is not None else None
+        if state is not None and overlap is None:
+            self.stats["resets"] += 1
+        if overlap is None:
+            state = self._states[symbol] = _SymbolFeatureState()
+            overlap = (0, 0)
+
+        covered, end = overlap
+        if n > covered:
+            closes = df['close'].to_numpy(dtype=float)
+            for ts, close in zip(df.index[covered:], closes[covered:]):
+                self._push(state, ts, float(close))
+            self.stats["appended"] += n - covered
+            end = len(state)
+        self.stats["reused"] += covered
+
+        for col in CORE_FEATURES:
+            out[col] = np.asarray(state.rows[col][end - n:end], dtype=float)
+        self._trim(state, max(n, LONGEST_WINDOW + self.retention))
+        if 'vix' not in out.columns:
+            out['vix'] = 0.0
+        return out
+
+    # -------- internals --------------------------------------------------------
+    @staticmethod
+    def _overlap(state: _SymbolFeatureState, df: pd.DataFrame) -> Optional[Tuple[int, int]]:
+        """
+        Line df up with the cached rows
+
+        Returns:
+            (number of leading df rows already cached, cache position just past
+            the last of them), or None when df does not continue the cache
+        """
+        if not len(state) or not len(df):
+            return 0, len(state)
+        try:
+            last = state.index[-1]
+            if df.index[-1] >= last:
+                # Frame reaches the cached tail: new bars start right after it
+                pos = int(df.index.searchsorted(last))
+                if pos >= len(df) or df.index[pos] != last:
+                    return None
+                covered, end = pos + 1, len(state)
+            else:
+                # Frame ends inside the cache: serve it from the cached rows
+                end = bisect_right(state.index, df.index[-1])
+                if not end or state.index[end - 1] != df.index[-1]:
+                    return None
+                covered = len(df)
+        except TypeError:  # e.g. tz-aware frame against a naive cache
+            return None
+        start = end - covered
+        if start < 0 or state.index[start] != df.index[0]:
+            return None
+        # The anchor close must be the one the rolling state was built from
+        cached, close = state.close[end - 1], float(df['close'].iloc[covered - 1])
+        if cached != close and not (math.isnan(cached) and math.isnan(close)):
+            return None
+        return covered, end
+
+    @staticmethod
+    def _trim(state: _SymbolFeatureState, keep: int) -> None:
+        """Drop all but the last ``keep`` cached rows (the rolling state is unaffected)"""
+        drop = len(state) - keep
+        if drop > 0:
+            del state.index[:drop]
+            del state.close[:drop]
+            for values in state.rows.values():
+                del values[:drop]
+
+    @staticmethod
+    def _push(state: _SymbolFeatureState, ts: Any, close: float) -> Dict[str, float]:
+        prev = state.closes[-1] if state.closes else None
+        state.closes.append(close)
+
+        ret1 = math.nan if prev is None else close / prev - 1.0
+        if math.isfinite(ret1):
+            chg = close - prev
+            state.vol_10.update(ret1)
+            state.vol_20.update(ret1)
+            state.gains.update(max(chg, 0.0))
+            state.losses.update(max(-chg, 0.0))
+        elif prev is not None:
+            # A NaN return poisons every batch window it is in (vol -> 0, RSI -> 0);
+            # once it leaves, the window holds only later bars, i.e. fresh windows
+            state.vol_10, state.vol_20 = RollingStd(10), RollingStd(20)
+            state.gains, state.losses = RollingMean(14), RollingMean(14)
+        ret5 = close / state.closes[0] - 1.0 if len(state.closes) == 6 else math.nan
+
+        vol_10 = state.vol_10.value
+        vol_20 = state.vol_20.value
+        gain, loss = state.gains.value, state.losses.value
+        # Batch version: rs = gain / loss with loss == 0 -> NaN -> 0, so RSI is 0
+        if gain is None or loss is None or not any(state.losses.buf):
+            rsi = 0.0
+        else:
+            rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+        if math.isnan(close):
+            state.macd.skip()
+        else:
+            state.macd.update(close)
+
+        row = {
+            'returns_1': ret1,
+            'returns_5': ret5,
+            'vol_10': 0.0 if vol_10 is None else vol_10,
+            'realized_vol_20': 0.0 if vol_20 is None else vol_20,
+            'rsi_14': rsi,
+            'macd': state.macd.value,
+        }
+        state.index.append(ts)
+        state.close.append(close)
+        for col, value in row.items():
+            state.rows[col].append(value)
+        return row
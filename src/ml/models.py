@@ -12,12 +12,19 @@ import datetime as dt
 from typing import Dict, List, Any, Tuple
 import json
 
-from .features import add_core_features, build_supervised, sliding_windows, train_val_test_split
+from .features import (add_core_features, build_supervised, latest_supervised_rows,
+                       sliding_windows, train_val_test_split)
+from .incremental import IncrementalFeatureEngine
+from .feature_store import CORE_FEATURE_SET
+from .bulk import load_bar_block
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Per-symbol rolling feature state shared across predict_symbols calls
+_feature_engine = IncrementalFeatureEngine()
+
 def get_synthetic_data(symbol: str, days: int = 60) -> pd.DataFrame:
     """
     Generate synthetic market data for testing and demonstration
@@ -29,11 +36,8 @@ def get_synthetic_data(symbol: str, days: int = 60) -> pd.DataFrame:
     Returns:
         DataFrame with OHLCV data indexed by timestamp
     """
-    dates = pd.date_range(
-        start=dt.datetime.now() - dt.timedelta(days=days),
-        end=dt.datetime.now(),
-        freq='D'
-    )
+    # Midnight-anchored so repeated calls on the same day return the same index
+    dates = pd.date_range(end=pd.Timestamp.now().normalize(), periods=days + 1, freq='D')
     
     # Generate realistic price movements with symbol-specific characteristics
     np.random.seed(hash(symbol) % 2**32)  # Consistent seed per symbol
@@ -76,136 +80,238 @@ def get_synthetic_data(symbol: str, days: int = 60) -> pd.DataFrame:
     df.set_index('timestamp', inplace=True)
     return df
 
+FEATURE_COLS = ['returns_1', 'returns_5', 'vol_10', 'rsi_14', 'macd', 'realized_vol_20', 'vix']
+
+def _stack_latest(series: List[np.ndarray], width: int) -> np.ndarray:
+    """Stack the last ``width`` values of each series into (S, width), left-padded with NaN"""
+    out = np.full((len(series), width), np.nan)
+    for i, values in enumerate(series):
+        tail = np.asarray(values, dtype=float)[-width:]
+        if len(tail):
+            out[i, width - len(tail):] = tail
+    return out
+
+def load_feature_batch(symbols: List[str], feature_store=None, timeframe: str = "1D",
+                       days: int = 60, conn=None,
+                       bar_timeframe: str = "1Day") -> Tuple[List[str], Dict[str, np.ndarray], np.ndarray, np.ndarray, Dict[str, str]]:
+    """
+    Load the latest core feature rows for all symbols as stacked arrays
+    
+    Symbols with materialized features in ``feature_store`` are read from it.
+    The bars of all other symbols are loaded with one query when ``conn`` is
+    given (synthetic data otherwise) and featurized through the shared
+    incremental engine, so a later call over the same history only computes
+    bars it has not seen. One standard-normal draw per symbol is taken right
+    after its data is loaded so the noise stream matches the per-symbol loop.
+    
+    Args:
+        symbols: Symbols to load
+        feature_store: Optional FeatureStore with materialized core features
+        timeframe: Feature store timeframe key
+        days: History length in bars
+        conn: Optional sqlite3 connection with a ``bars`` table (see load_bar_block)
+        bar_timeframe: ``tf`` value of the bars read through ``conn``
+    
+    Returns:
+        Tuple of (loaded symbols, feature name -> (S, T) array, (S, T) closes,
+        (S,) noise draws, symbol -> load error)
+    """
+    stored, errors = {}, {}
+    if feature_store is not None:
+        for symbol in symbols:
+            # Ready-made features materialized by the feature store
+            try:
+                df = feature_store.read(symbol, timeframe, CORE_FEATURE_SET, tail=days)
+                if len(df) >= 30:
+                    stored[symbol] = df
+            except Exception as e:
+                errors[symbol] = str(e)
+    
+    block = None
+    if conn is not None:
+        missing = [s for s in symbols if s not in stored and s not in errors]
+        block = load_bar_block(conn, missing, limit=days + 1, timeframe=bar_timeframe)
+    
+    frames, noise, loaded = [], [], []
+    for symbol in symbols:
+        if symbol in errors:
+            continue
+        try:
+            df_features = stored.get(symbol)
+            if df_features is None:
+                if block is not None:
+                    rows = block.rows(symbol)
+                    if rows.start == rows.stop:
+                        raise ValueError(f"no {bar_timeframe} bars")
+                    df = pd.DataFrame({'close': block.c[rows]},
+                                      index=pd.to_datetime(block.t[rows], unit='ms', utc=True))
+                else:
+                    # Get synthetic data (in production, this would come from database)
+                    df = get_synthetic_data(symbol, days=days)
+                # Only bars not seen on a previous call are computed
+                df_features = _feature_engine.update(symbol, df)
+            
+            frames.append(df_features)
+            noise.append(np.random.standard_normal())
+            loaded.append(symbol)
+        except Exception as e:
+            errors[symbol] = str(e)
+    
+    width = max((len(f) for f in frames), default=0)
+    close = _stack_latest([f['close'].to_numpy(dtype=float) for f in frames], width)
+    feats = {col: _stack_latest([f[col].to_numpy() for f in frames], width) for col in FEATURE_COLS}
+    return loaded, feats, close, np.asarray(noise, dtype=float), errors
+
+def score_feature_batch(X_last: np.ndarray, y: np.ndarray, n_rows: np.ndarray, noise: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Vectorized scoring of the latest feature rows of many symbols
+    
+    Args:
+        X_last: (S, F) latest complete feature rows in FEATURE_COLS order
+        y: (S, T) historical 1-period forward returns, NaN where missing
+        n_rows: (S,) number of complete rows per symbol
+        noise: (S,) standard-normal draws used for the noise term
+        
+    Returns:
+        Dict of (S,) arrays: expected_return, confidence, rsi, macd, volatility, momentum
+    """
+    valid = ~np.isnan(y)
+    y0 = np.where(valid, y, 0.0).astype(float)
+    count = np.maximum(n_rows, 1)
+    mean = y0.sum(axis=1) / count
+    var = np.where(valid, (y0 - mean[:, None]) ** 2, 0.0).sum(axis=1) / count
+    volatility = np.where(n_rows > 1, np.sqrt(var), 0.02)
+    
+    # Mean of the last five targets
+    from_end = np.cumsum(valid[:, ::-1], axis=1)[:, ::-1]
+    last5 = valid & (from_end <= 5)
+    momentum = np.where(n_rows >= 5, np.where(last5, y0, 0.0).sum(axis=1) / 5.0, 0.0)
+    
+    # Extract technical indicators
+    rsi = X_last[:, FEATURE_COLS.index('rsi_14')].astype(float)
+    macd = X_last[:, FEATURE_COLS.index('macd')].astype(float)
+    vol_10 = X_last[:, FEATURE_COLS.index('vol_10')].astype(float)
+    
+    # RSI-based signal: overbought / oversold, linear scaling around 50 otherwise
+    rsi_signal = np.where(rsi > 70, -0.003, np.where(rsi < 30, 0.003, (50 - rsi) / 50 * 0.001))
+    
+    # MACD and momentum signals
+    macd_signal = np.clip(macd * 0.05, -0.002, 0.002)
+    momentum_signal = np.clip(momentum * 0.5, -0.004, 0.004)
+    
+    # Volatility adjustment (high vol reduces expected return)
+    vol_adjustment = -np.minimum(0.002, vol_10 * 0.1)
+    
+    # Combine all signals and add some realistic noise
+    expected_return = momentum_signal + rsi_signal + macd_signal + vol_adjustment
+    expected_return = expected_return + noise * (volatility * 0.3)
+    
+    # Confidence from signal strength, volatility penalty and consistency bonus
+    signal_strength = np.abs(rsi_signal) + np.abs(macd_signal) + np.abs(momentum_signal)
+    base_confidence = 0.5 + signal_strength * 20
+    volatility_penalty = np.minimum(0.25, vol_10 * 8)
+    consistency_bonus = np.where((np.abs(rsi_signal) > 0.001) & (np.abs(macd_signal) > 0.0005), 0.1, 0.0)
+    confidence = np.clip(base_confidence - volatility_penalty + consistency_bonus, 0.4, 0.85)
+    
+    return {
+        'expected_return': expected_return,
+        'confidence': confidence,
+        'rsi': rsi,
+        'macd': macd,
+        'volatility': volatility,
+        'momentum': momentum,
+    }
+
 def predict_symbols(symbols: List[str], horizon: str = "1d", **kwargs) -> Dict[str, Dict[str, Any]]:
     """
     Enhanced batch prediction function using ML features
     
+    Latest feature rows for all symbols are stacked into one matrix and scored
+    in a single vectorized pass, so per-symbol cost is just the data load.
+    
     Args:
         symbols: List of symbol strings to predict
         horizon: Time horizon for predictions (e.g., "1d", "1w")
+        feature_store: Optional FeatureStore; when it holds materialized core
+            features for a symbol they are used instead of recomputing
+        timeframe: Feature store timeframe key (default "1D")
+        conn: Optional sqlite3 connection; bars of symbols the feature store
+            does not cover are loaded from its ``bars`` table in one query
         
     Returns:
         Dict mapping symbol -> {'trend': str, 'confidence': float, 'expected_return': float}
     """
     results = {}
+    logger.info(f"Generating ML predictions for {len(symbols)} symbols")
     
-    for symbol in symbols:
-        try:
-            logger.info(f"Generating ML prediction for {symbol}")
-            
-            # Get synthetic data (in production, this would come from database)
-            df = get_synthetic_data(symbol, days=60)
-            
-            # Add technical features
-            df_features = add_core_features(df)
-            
-            # Define feature columns for ML model
-            feature_cols = ['returns_1', 'returns_5', 'vol_10', 'rsi_14', 'macd', 'realized_vol_20', 'vix']
-            
-            # Build supervised dataset
-            X, y, index = build_supervised(df_features, features=feature_cols, horizon=1, target_name="return_1d")
-            
-            if len(X) > 0:
-                # Use recent data for prediction
-                recent_features = X[-1]  # Most recent feature vector
-                
-                # Calculate volatility and momentum from historical data
-                volatility = float(np.std(y)) if len(y) > 1 else 0.02
-                momentum = float(np.mean(y[-5:])) if len(y) >= 5 else 0.0
-                
-                # Extract technical indicators
-                rsi = float(recent_features[3]) if len(recent_features) > 3 else 50.0  # RSI
-                macd = float(recent_features[4]) if len(recent_features) > 4 else 0.0  # MACD
-                vol_10 = float(recent_features[2]) if len(recent_features) > 2 else 0.02  # 10-day volatility
-                
-                # RSI-based signal
-                if rsi > 70:  # Overbought
-                    rsi_signal = -0.003
-                elif rsi < 30:  # Oversold
-                    rsi_signal = 0.003
-                else:
-                    rsi_signal = (50 - rsi) / 50 * 0.001  # Linear scaling around 50
-                
-                # MACD-based signal
-                macd_signal = float(np.clip(macd * 0.05, -0.002, 0.002))
-                
-                # Momentum signal
-                momentum_signal = float(np.clip(momentum * 0.5, -0.004, 0.004))
-                
-                # Volatility adjustment (high vol reduces expected return)
-                vol_adjustment = -min(0.002, vol_10 * 0.1)
-                
-                # Combine all signals
-                expected_return = (momentum_signal + rsi_signal + macd_signal + vol_adjustment)
-                
-                # Add some realistic noise
-                noise = np.random.normal(0, volatility * 0.3)
-                expected_return += noise
-                expected_return = float(expected_return)
-                
-                # Calculate confidence based on signal strength and consistency
-                signal_strength = abs(rsi_signal) + abs(macd_signal) + abs(momentum_signal)
-                base_confidence = 0.5 + signal_strength * 20  # Scale signal strength
-                
-                # Penalize high volatility and inconsistent signals
-                volatility_penalty = min(0.25, vol_10 * 8)
-                consistency_bonus = 0.1 if abs(rsi_signal) > 0.001 and abs(macd_signal) > 0.0005 else 0.0
-                
-                confidence = base_confidence - volatility_penalty + consistency_bonus
-                confidence = float(max(0.4, min(0.85, confidence)))
-                
-                method = "ml_enhanced"
-                
-            else:
-                # Fallback if insufficient data
-                expected_return = float(np.random.normal(0.0, 0.015))
-                confidence = 0.5
-                method = "fallback"
-            
-            # Determine trend based on expected return with deadband
-            if expected_return > 0.001:
-                trend = 'UP'
-            elif expected_return < -0.001:
-                trend = 'DOWN'
-            else:
-                trend = 'FLAT'
-            
-            # Market hours confidence adjustment
-            current_hour = dt.datetime.now().hour
-            if 9 <= current_hour <= 16:  # Market hours
-                confidence *= 1.05
-            
-            # Final confidence bounds
-            confidence = max(0.4, min(0.9, confidence))
-            
-            results[symbol] = {
-                'trend': trend,
-                'confidence': round(confidence, 3),
-                'expected_return': round(expected_return, 6),
-                'method': method,
-                'timestamp': dt.datetime.now().isoformat(),
-                'features': {
-                    'rsi': round(rsi, 1) if len(X) > 0 else None,
-                    'macd': round(macd, 4) if len(X) > 0 else None,
-                    'volatility': round(volatility, 4),
-                    'momentum': round(momentum, 4)
-                }
-            }
-            
-            logger.info(f"Predicted {symbol}: {trend} (conf: {confidence:.3f}, ret: {expected_return:.6f}) [{method}]")
-            
-        except Exception as e:
-            logger.error(f"Failed to predict {symbol}: {e}")
-            results[symbol] = {
-                'trend': 'UNKNOWN',
-                'confidence': 0.5,
-                'expected_return': 0.0,
-                'error': str(e),
-                'method': 'error',
-                'timestamp': dt.datetime.now().isoformat()
+    loaded, feats, close, noise, errors = load_feature_batch(
+        symbols, kwargs.get("feature_store"), kwargs.get("timeframe", "1D"),
+        conn=kwargs.get("conn"), bar_timeframe=kwargs.get("bar_timeframe", "1Day")
+    )
+    
+    scores = {}
+    if loaded:
+        X_last, y, n_rows = latest_supervised_rows(feats, close, FEATURE_COLS, horizon=1)
+        scores = score_feature_batch(X_last, y, n_rows, noise)
+    
+    # Market hours confidence adjustment
+    current_hour = dt.datetime.now().hour
+    market_boost = 1.05 if 9 <= current_hour <= 16 else 1.0
+    now = dt.datetime.now().isoformat()
+    
+    for i, symbol in enumerate(loaded):
+        if n_rows[i] > 0:
+            expected_return = float(scores['expected_return'][i])
+            confidence = float(scores['confidence'][i])
+            method = "ml_enhanced"
+            features = {
+                'rsi': round(float(scores['rsi'][i]), 1),
+                'macd': round(float(scores['macd'][i]), 4),
+                'volatility': round(float(scores['volatility'][i]), 4),
+                'momentum': round(float(scores['momentum'][i]), 4)
             }
+        else:
+            # Fallback if insufficient data
+            expected_return = float(noise[i] * 0.015)
+            confidence = 0.5
+            method = "fallback"
+            features = {'rsi': None, 'macd': None, 'volatility': None, 'momentum': None}
+        
+        # Determine trend based on expected return with deadband
+        if expected_return > 0.001:
+            trend = 'UP'
+        elif expected_return < -0.001:
+            trend = 'DOWN'
+        else:
+            trend = 'FLAT'
+        
+        # Final confidence bounds
+        confidence = max(0.4, min(0.9, confidence * market_boost))
+        
+        results[symbol] = {
+            'trend': trend,
+            'confidence': round(confidence, 3),
+            'expected_return': round(expected_return, 6),
+            'method': method,
+            'timestamp': now,
+            'features': features
+        }
+        
+        logger.info(f"Predicted {symbol}: {trend} (conf: {confidence:.3f}, ret: {expected_return:.6f}) [{method}]")
+    
+    for symbol, error in errors.items():
+        logger.error(f"Failed to predict {symbol}: {error}")
+        results[symbol] = {
+            'trend': 'UNKNOWN',
+            'confidence': 0.5,
+            'expected_return': 0.0,
+            'error': error,
+            'method': 'error',
+            'timestamp': now
+        }
     
-    return results
+    # Preserve request order
+    return {symbol: results[symbol] for symbol in symbols if symbol in results}
 
 def predict_single_symbol(symbol: str, horizon: str = "1d") -> Dict[str, Any]:
     """
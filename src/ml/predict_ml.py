@@ -2,185 +2,97 @@
 """
 Enhanced ML Prediction Service for EMO Options Bot
 Provides forecasting capabilities with proper ML infrastructure.
+
+Usage: python -m src.ml.predict_ml --action batch --symbols SPY QQQ
 """
 
-import os
-import sys
 import logging
 import numpy as np
-import pandas as pd
 import datetime as dt
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any
 import json
 
-# Add local ML modules to path
-ml_dir = os.path.join(os.path.dirname(__file__), 'ml')
-sys.path.insert(0, ml_dir)
+from .features import latest_supervised_rows
+from .models import FEATURE_COLS, load_feature_batch, score_feature_batch
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_synthetic_data(symbol: str, days: int = 60) -> pd.DataFrame:
-    """Generate synthetic market data for testing."""
-    dates = pd.date_range(
-        start=dt.datetime.now() - dt.timedelta(days=days),
-        end=dt.datetime.now(),
-        freq='D'
-    )
-    
-    # Generate realistic price movements
-    np.random.seed(hash(symbol) % 2**32)  # Consistent seed per symbol
-    returns = np.random.normal(0.0005, 0.02, len(dates))
-    prices = [100.0]
-    
-    for ret in returns[1:]:
-        prices.append(prices[-1] * (1 + ret))
-    
-    volumes = np.random.randint(1000000, 10000000, len(dates))
-    
-    df = pd.DataFrame({
-        'timestamp': dates,
-        'symbol': symbol,
-        'open': prices,
-        'high': [p * (1 + abs(np.random.normal(0, 0.01))) for p in prices],
-        'low': [p * (1 - abs(np.random.normal(0, 0.01))) for p in prices],
-        'close': prices,
-        'volume': volumes
-    })
-    df.set_index('timestamp', inplace=True)
-    
-    return df
-
 def predict_symbols(symbols: List[str], horizon: str = "1d", **kwargs) -> Dict[str, Dict[str, Any]]:
     """
     Enhanced batch prediction function using ML features.
     
+    Loading, featurizing and scoring are the shared batch helpers of
+    ``src.ml.models``: all symbols are stacked into one matrix and scored in
+    a single vectorized pass.
+    
     Args:
         symbols: List of symbol strings to predict
         horizon: Time horizon for predictions (e.g., "1d", "1w")
+        feature_store: Optional FeatureStore with materialized core features
+        timeframe: Feature store timeframe key (default "1D")
+        conn: Optional sqlite3 connection with a ``bars`` table
     
     Returns:
         Dict mapping symbol -> {'trend': str, 'confidence': float, 'expected_return': float}
     """
     results = {}
     
-    try:
-        # Try to import ML components
-        from features.pipeline import add_core_features, build_supervised
-        from data.window import sliding_windows, train_val_test_split
-        ml_available = True
-        logger.info("Using enhanced ML prediction pipeline")
-    except ImportError as e:
-        logger.warning(f"ML components not available: {e}")
-        ml_available = False
+    loaded, feats, close, noise, errors = load_feature_batch(
+        symbols, kwargs.get("feature_store"), kwargs.get("timeframe", "1D"),
+        conn=kwargs.get("conn"), bar_timeframe=kwargs.get("bar_timeframe", "1Day")
+    )
     
-    for symbol in symbols:
-        try:
-            if ml_available:
-                # Use ML-enhanced prediction
-                df = get_synthetic_data(symbol, days=60)
-                
-                # Add technical features
-                df_features = add_core_features(df)
-                
-                # Define feature columns
-                feature_cols = ['returns_1', 'returns_5', 'vol_10', 'rsi_14', 'macd', 'realized_vol_20', 'vix']
-                
-                # Build supervised dataset
-                X, y, index = build_supervised(df_features, features=feature_cols, horizon=1, target_name="return_1d")
-                
-                if len(X) > 0:
-                    # Use recent data for prediction
-                    recent_features = X[-1]  # Most recent feature vector
-                    recent_return = y[-1] if len(y) > 0 else 0.0
-                    
-                    # Simple prediction based on recent patterns
-                    volatility = float(np.std(y)) if len(y) > 1 else 0.02
-                    momentum = float(np.mean(y[-5:])) if len(y) >= 5 else 0.0
-                    
-                    # Calculate expected return with technical analysis
-                    rsi = float(recent_features[3]) if len(recent_features) > 3 else 50  # RSI index
-                    macd = float(recent_features[4]) if len(recent_features) > 4 else 0  # MACD index
-                    
-                    # RSI-based adjustment
-                    if rsi > 70:  # Overbought
-                        rsi_adjustment = -0.002
-                    elif rsi < 30:  # Oversold
-                        rsi_adjustment = 0.002
-                    else:
-                        rsi_adjustment = 0.0
-                    
-                    # MACD-based adjustment
-                    macd_adjustment = float(np.clip(macd * 0.1, -0.003, 0.003))
-                    
-                    # Combine signals
-                    expected_return = momentum + rsi_adjustment + macd_adjustment
-                    expected_return += np.random.normal(0, volatility * 0.5)  # Add some noise
-                    expected_return = float(expected_return)  # Ensure float type
-                    
-                    # Calculate confidence based on volatility and signal strength
-                    signal_strength = abs(rsi_adjustment) + abs(macd_adjustment)
-                    base_confidence = 0.6 + signal_strength * 10  # Scale signal strength
-                    volatility_penalty = min(0.3, volatility * 5)  # Penalize high volatility
-                    confidence = float(max(0.4, min(0.9, base_confidence - volatility_penalty)))
-                    
-                    method = "ml_enhanced"
-                    
-                else:
-                    # Fallback if no data
-                    expected_return = np.random.normal(0.0, 0.015)
-                    confidence = 0.5
-                    method = "fallback"
-            
+    predictions = {}  # symbol -> (expected_return, confidence, method)
+    if loaded:
+        X_last, y, n_rows = latest_supervised_rows(feats, close, FEATURE_COLS, horizon=1)
+        scores = score_feature_batch(X_last, y, n_rows, noise)
+        for i, symbol in enumerate(loaded):
+            if n_rows[i] > 0:
+                predictions[symbol] = (float(scores['expected_return'][i]),
+                                       float(scores['confidence'][i]), "ml_enhanced")
             else:
-                # Use simple heuristic prediction
-                if symbol in ['SPY', 'QQQ']:
-                    expected_return = np.random.normal(0.0005, 0.015)
-                    confidence = 0.65
-                elif symbol.endswith('Y'):
-                    expected_return = np.random.normal(0.0002, 0.018)
-                    confidence = 0.58
-                else:
-                    expected_return = np.random.normal(0.0, 0.025)
-                    confidence = 0.52
-                
-                method = "statistical_heuristic"
-            
-            # Determine trend based on expected return
-            if expected_return > 0.002:
-                trend = 'up'
-            elif expected_return < -0.002:
-                trend = 'down'
-            else:
-                trend = 'flat'
-            
-            # Market hours confidence boost
-            current_hour = dt.datetime.now().hour
-            if 9 <= current_hour <= 16:
-                confidence *= 1.05
-            
-            confidence = max(0.4, min(0.9, confidence))
-            
-            results[symbol] = {
-                'trend': trend,
-                'confidence': round(confidence, 3),
-                'expected_return': round(expected_return, 6),
-                'method': method,
-                'timestamp': dt.datetime.now().isoformat()
-            }
-            
-            logger.info(f"Predicted {symbol}: {trend} (conf: {confidence:.3f}, ret: {expected_return:.6f}) [{method}]")
-            
-        except Exception as e:
-            logger.error(f"Failed to predict {symbol}: {e}")
+                # Fallback if no data
+                predictions[symbol] = (float(noise[i] * 0.015), 0.5, "fallback")
+    
+    # Market hours confidence boost
+    current_hour = dt.datetime.now().hour
+    market_boost = 1.05 if 9 <= current_hour <= 16 else 1.0
+    
+    for symbol in symbols:
+        if symbol in errors or symbol not in predictions:
+            logger.error(f"Failed to predict {symbol}: {errors.get(symbol)}")
             results[symbol] = {
                 'trend': 'unknown',
                 'confidence': 0.5,
                 'expected_return': 0.0,
-                'error': str(e),
+                'error': errors.get(symbol, 'prediction_failed'),
                 'method': 'error'
             }
+            continue
+        
+        expected_return, confidence, method = predictions[symbol]
+        
+        # Determine trend based on expected return
+        if expected_return > 0.002:
+            trend = 'up'
+        elif expected_return < -0.002:
+            trend = 'down'
+        else:
+            trend = 'flat'
+        
+        confidence = max(0.4, min(0.9, confidence * market_boost))
+        
+        results[symbol] = {
+            'trend': trend,
+            'confidence': round(confidence, 3),
+            'expected_return': round(expected_return, 6),
+            'method': method,
+            'timestamp': dt.datetime.now().isoformat()
+        }
+        
+        logger.info(f"Predicted {symbol}: {trend} (conf: {confidence:.3f}, ret: {expected_return:.6f}) [{method}]")
     
     return results
 
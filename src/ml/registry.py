@@ -0,0 +1,346 @@
+"""
+EMO Options Bot - Model Registry
+Versioned model storage with a manifest and a warm in-process cache
+
+Trained models used to be pickled to one file per key and unpickled on every
+load. The registry keeps every trained version of a model key next to a
+manifest (metrics, feature schema hash, training window) that names the
+production version, and keeps recently used models deserialized in an LRU.
+
+Layout:
+    <root>/<model key>/
+        manifest.json      production version, promotion history, version metadata
+        <version>/
+            model.pkl      pickle (protocol 5) with array data stored out-of-band
+            buffers.bin    array buffers, 64-byte aligned, memory-mapped on load
+            meta.json      buffer offsets plus the version metadata
+
+Array data (forest node tables, scaler statistics) is not copied on load: the
+pickle is rebuilt on read-only views of the memory-mapped buffer file, so the
+OS page cache is shared by every process serving the same version. Versions
+are written to a temporary directory and renamed into place, and the manifest
+is replaced atomically, so promotion and rollback never expose a partial model.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = Path("data/models/registry")
+_ALIGN = 64
+
+
+def feature_schema_hash(feature_names: Sequence[str]) -> str:
+    """Stable short hash of an ordered feature list"""
+    payload = json.dumps(list(feature_names), separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def _json_safe(value: Any) -> Any:
+    """Metrics as plain JSON types (numpy scalars -> float/int, drop the rest)"""
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class ModelRegistry:
+    """
+    Versioned, memory-mapped model storage with an LRU of loaded models
+
+    Typical use:
+        registry = ModelRegistry("data/models/registry")
+        version = registry.register("SPY_rf_1d", model, metrics={"mae": 0.2},
+                                    feature_names=model.feature_names)
+        model = registry.load("SPY_rf_1d")          # production version, cached
+        registry.rollback("SPY_rf_1d")              # previous production version
+    """
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_ROOT, cache_size: int = 64):
+        self.root = Path(root)
+        self.cache_size = max(0, int(cache_size))
+        self._cache: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._manifests: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Any]]] = {}
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "registered": 0}
+
+    # -------- manifest ---------------------------------------------------------
+    def path(self, model_key: str, version: Optional[str] = None) -> Path:
+        d = self.root / model_key
+        return d / version if version else d
+
+    def manifest(self, model_key: str) -> Optional[Dict[str, Any]]:
+        """Manifest for a model key (re-read only when the file changed)"""
+        p = self.path(model_key) / "manifest.json"
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            return None
+        # The manifest is replaced (new inode) on every write
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._manifests.get(model_key)
+            if cached and cached[0] == stamp:
+                return cached[1]
+            manifest = json.loads(p.read_text(encoding="utf-8"))
+            self._manifests[model_key] = (stamp, manifest)
+            return manifest
+
+    def _write_manifest(self, model_key: str, manifest: Dict[str, Any]) -> None:
+        d = self.path(model_key)
+        tmp = d / f"manifest.json.{uuid.uuid4().hex}.tmp"
+        tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(tmp, d / "manifest.json")
+        self._manifests.pop(model_key, None)
+
+    def production_version(self, model_key: str) -> Optional[str]:
+        manifest = self.manifest(model_key)
+        return manifest.get("production") if manifest else None
+
+    def versions(self, model_key: str) -> List[str]:
+        """Registered versions, oldest first"""
+        manifest = self.manifest(model_key)
+        return list(manifest["versions"]) if manifest else []
+
+    def info(self, model_key: str, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Metadata of a version (default: production)"""
+        manifest = self.manifest(model_key)
+        if not manifest:
+            return None
+        version = version or manifest.get("production")
+        return manifest["versions"].get(version) if version else None
+
+    # -------- write ------------------------------------------------------------
+    def register(
+        self,
+        model_key: str,
+        model: Any,
+        metrics: Optional[Dict[str, Any]] = None,
+        feature_names: Optional[Sequence[str]] = None,
+        training_window: Optional[Dict[str, Any]] = None,
+        promote: bool = True,
+    ) -> str:
+        """
+        Store a trained model as a new version
+
+        Args:
+            model_key: Model key (e.g. "SPY_rf_1d")
+            model: Picklable model object
+            metrics: Training metrics recorded in the manifest
+            feature_names: Ordered input features (hashed into the feature schema)
+            training_window: Start/end/rows of the training data
+            promote: Make the new version the production version
+
+        Returns:
+            The new version id
+        """
+        feature_names = list(feature_names if feature_names is not None else getattr(model, "feature_names", []))
+        buffers: List[pickle.PickleBuffer] = []
+        payload = pickle.dumps(model, protocol=5, buffer_callback=buffers.append)
+
+        self.path(model_key).mkdir(parents=True, exist_ok=True)
+        tmp = self.path(model_key) / f".tmp-{uuid.uuid4().hex}"
+        tmp.mkdir()
+        try:
+            layout = []
+            with open(tmp / "buffers.bin", "wb") as fh:
+                for buf in buffers:
+                    raw = buf.raw()
+                    pad = -fh.tell() % _ALIGN
+                    if pad:
+                        fh.write(b"\0" * pad)
+                    layout.append([fh.tell(), raw.nbytes])
+                    fh.write(raw)
+            (tmp / "model.pkl").write_bytes(payload)
+            entry = {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "model_version": getattr(model, "model_version", None),
+                "metrics": _json_safe({k: v for k, v in (metrics or {}).items() if k != "feature_importance"}),
+                "feature_names": feature_names,
+                "feature_schema_hash": feature_schema_hash(feature_names),
+                "training_window": _json_safe(training_window or {}),
+                "bytes": len(payload) + sum(n for _, n in layout),
+            }
+            (tmp / "meta.json").write_text(json.dumps({**entry, "buffers": layout}, indent=2), encoding="utf-8")
+
+            with self._lock:
+                manifest = self.manifest(model_key) or {
+                    "model_key": model_key, "production": None, "history": [], "versions": {}, "next": 1,
+                }
+                version = f"v{manifest['next']:04d}"
+                while self.path(model_key, version).exists():  # written by another process
+                    manifest["next"] += 1
+                    version = f"v{manifest['next']:04d}"
+                os.rename(tmp, self.path(model_key, version))
+                manifest = json.loads(json.dumps(manifest))  # never mutate the cached copy
+                manifest["next"] += 1
+                manifest["versions"][version] = entry
+                if promote:
+                    self._set_production(manifest, version)
+                self._write_manifest(model_key, manifest)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        self.stats["registered"] += 1
+        if promote:
+            self._remember(model_key, version, model)
+        return version
+
+    @staticmethod
+    def _set_production(manifest: Dict[str, Any], version: str) -> None:
+        current = manifest.get("production")
+        if current and current != version:
+            manifest["history"].append(current)
+        manifest["production"] = version
+        manifest["promoted_at"] = datetime.now(timezone.utc).isoformat()
+
+    def promote(self, model_key: str, version: str) -> None:
+        """Make ``version`` the production version"""
+        with self._lock:
+            manifest = self.manifest(model_key)
+            if not manifest or version not in manifest["versions"]:
+                raise KeyError(f"Unknown version {version} for {model_key}")
+            manifest = json.loads(json.dumps(manifest))
+            self._set_production(manifest, version)
+            self._write_manifest(model_key, manifest)
+
+    def rollback(self, model_key: str) -> Optional[str]:
+        """
+        Restore the previous production version
+
+        Returns:
+            The version now in production, or None when there is nothing to roll back to
+        """
+        with self._lock:
+            manifest = self.manifest(model_key)
+            if not manifest or not manifest["history"]:
+                return None
+            manifest = json.loads(json.dumps(manifest))
+            manifest["production"] = manifest["history"].pop()
+            manifest["promoted_at"] = datetime.now(timezone.utc).isoformat()
+            self._write_manifest(model_key, manifest)
+            return manifest["production"]
+
+    def prune(self, model_key: str, keep: int = 5) -> List[str]:
+        """
+        Delete old versions, keeping the newest ``keep`` plus production
+
+        Pruned versions are also dropped from the rollback history.
+
+        Returns:
+            Removed version ids
+        """
+        with self._lock:
+            manifest = self.manifest(model_key)
+            if not manifest:
+                return []
+            manifest = json.loads(json.dumps(manifest))
+            protected = set(list(manifest["versions"])[-keep:] if keep > 0 else [])
+            protected.add(manifest.get("production"))
+            removed = [v for v in manifest["versions"] if v not in protected]
+            for version in removed:
+                del manifest["versions"][version]
+                self._cache.pop((model_key, version), None)
+            manifest["history"] = [v for v in manifest["history"] if v in manifest["versions"]]
+            self._write_manifest(model_key, manifest)
+        for version in removed:
+            shutil.rmtree(self.path(model_key, version), ignore_errors=True)
+        return removed
+
+    # -------- read -------------------------------------------------------------
+    def load(self, model_key: str, version: Optional[str] = None,
+             schema_hash: Optional[str] = None) -> Optional[Any]:
+        """
+        Load a model version (default: production), from the LRU when warm
+
+        Args:
+            model_key: Model key
+            version: Version id (default: production)
+            schema_hash: When given, return None unless the version was trained
+                on the same feature schema
+
+        Returns:
+            The model, or None when no such version exists
+        """
+        manifest = self.manifest(model_key)
+        if not manifest:
+            return None
+        version = version or manifest.get("production")
+        entry = manifest["versions"].get(version) if version else None
+        if entry is None:
+            return None
+        if schema_hash is not None and entry.get("feature_schema_hash") != schema_hash:
+            logger.warning(f"{model_key} {version} was trained on a different feature schema")
+            return None
+
+        with self._lock:
+            model = self._cache.get((model_key, version))
+            if model is not None:
+                self._cache.move_to_end((model_key, version))
+                self.stats["hits"] += 1
+                return model
+        self.stats["misses"] += 1
+        model = self._read(self.path(model_key, version))
+        self._remember(model_key, version, model)
+        return model
+
+    @staticmethod
+    def _read(d: Path) -> Any:
+        meta = json.loads((d / "meta.json").read_text(encoding="utf-8"))
+        buffers = []
+        if meta["buffers"]:
+            blob = np.memmap(d / "buffers.bin", dtype=np.uint8, mode="r")
+            buffers = [blob[offset:offset + nbytes] for offset, nbytes in meta["buffers"]]
+        return pickle.loads((d / "model.pkl").read_bytes(), buffers=buffers)
+
+    def _remember(self, model_key: str, version: str, model: Any) -> None:
+        if not self.cache_size:
+            return
+        with self._lock:
+            self._cache[(model_key, version)] = model
+            self._cache.move_to_end((model_key, version))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def evict(self, model_key: Optional[str] = None) -> None:
+        """Drop cached models for one key (or all keys)"""
+        with self._lock:
+            if model_key is None:
+                self._cache.clear()
+            else:
+                for key in [k for k in self._cache if k[0] == model_key]:
+                    del self._cache[key]
+
+
+_REGISTRIES: Dict[Path, ModelRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_registry(root: Union[str, Path] = DEFAULT_ROOT) -> ModelRegistry:
+    """Process-wide registry for ``root``, so every caller shares one warm cache"""
+    key = Path(root).resolve()
+    with _REGISTRIES_LOCK:
+        if key not in _REGISTRIES:
+            _REGISTRIES[key] = ModelRegistry(root)
+        return _REGISTRIES[key]
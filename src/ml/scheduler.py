@@ -0,0 +1,239 @@
+"""
+EMO Options Bot - Retrain Scheduler
+Runs model training jobs across a process pool
+
+Training matrices are published once into shared memory and attached
+read-only by every worker, so a symbol's features are not pickled per job.
+Jobs run highest priority first (e.g. models flagged by the performance
+monitor), and a memory budget caps how many run at the same time in addition
+to the worker count.
+
+Includes:
+- SharedMatrix: numpy array published through multiprocessing.shared_memory
+- TrainJob / JobResult: job description and outcome
+- RetrainScheduler: priority + memory-budget aware process pool runner
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# (shared memory name, shape, dtype) - what a worker needs to attach an array
+SharedHandle = Tuple[str, Tuple[int, ...], str]
+
+
+class SharedMatrix:
+    """Publishes an array into shared memory for the lifetime of a schedule"""
+
+    def __init__(self, values: np.ndarray):
+        values = np.ascontiguousarray(values)
+        self.shape = values.shape
+        self.dtype = values.dtype.str
+        self.nbytes = values.nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+        np.ndarray(self.shape, dtype=values.dtype, buffer=self.shm.buf)[:] = values
+
+    @property
+    def handle(self) -> SharedHandle:
+        return (self.shm.name, self.shape, self.dtype)
+
+    def close(self) -> None:
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SharedMatrix":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+@dataclass
+class TrainJob:
+    """
+    One unit of training work
+
+    ``fn`` must be a module-level function (picklable). It is called as
+    ``fn(arrays, **kwargs)`` where ``arrays`` maps the names in ``shared`` to
+    read-only numpy arrays attached from shared memory.
+    """
+    key: str
+    fn: Callable[..., Any]
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    shared: Dict[str, SharedHandle] = field(default_factory=dict)
+    priority: int = 0               # higher runs first
+    memory_mb: float = 256.0        # private working memory estimate for the budget
+
+
+@dataclass
+class JobResult:
+    key: str
+    success: bool
+    result: Any = None
+    error: str = ""
+    seconds: float = 0.0
+    pid: int = 0
+
+
+# Per-worker cache of attached segments, so jobs on the same matrix attach once
+_ATTACHED: Dict[str, Tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+
+
+def _attach(handle: SharedHandle) -> np.ndarray:
+    name, shape, dtype = handle
+    if name not in _ATTACHED:
+        shm = shared_memory.SharedMemory(name=name)
+        arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        arr.flags.writeable = False
+        _ATTACHED[name] = (shm, arr)
+    return _ATTACHED[name][1]
+
+
+def _detach_all() -> None:
+    """Release segments attached by this process (inline runs)"""
+    while _ATTACHED:
+        _, (shm, arr) = _ATTACHED.popitem()
+        del arr
+        try:
+            shm.close()
+        except BufferError:  # a caller still holds a view; the OS reclaims it at exit
+            pass
+
+
+def _execute(key: str, fn: Callable[..., Any], kwargs: Dict[str, Any],
+             shared: Dict[str, SharedHandle]) -> JobResult:
+    """Run one job (in a worker, or inline); never raises"""
+    t0 = time.perf_counter()
+    try:
+        arrays = {name: _attach(h) for name, h in shared.items()}
+        result = fn(arrays, **kwargs)
+        return JobResult(key, True, result, seconds=time.perf_counter() - t0, pid=os.getpid())
+    except Exception as e:
+        return JobResult(key, False, error=f"{type(e).__name__}: {e}",
+                         seconds=time.perf_counter() - t0, pid=os.getpid())
+
+
+def default_memory_budget_mb(fraction: float = 0.7) -> Optional[float]:
+    """A fraction of currently available memory, or None (unlimited) without psutil"""
+    if not PSUTIL_AVAILABLE:
+        return None
+    return psutil.virtual_memory().available / 2**20 * fraction
+
+
+class RetrainScheduler:
+    """
+    Priority-ordered process pool for training jobs
+
+    Typical use:
+        with SharedMatrix(X) as sx:
+            jobs = [TrainJob(f"{sym}_{h}", train_fn, {"horizon": h}, {"X": sx.handle}, priority=1)]
+            results = RetrainScheduler(max_workers=4, memory_budget_mb=4096).run(jobs)
+
+    ``max_workers=1`` runs jobs inline in the calling process (same ordering and
+    results, no pool), which is handy for debugging.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, memory_budget_mb: Optional[float] = None,
+                 progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.max_workers = max(1, int(max_workers or os.cpu_count() or 1))
+        self.memory_budget_mb = memory_budget_mb
+        self.progress = progress or self._log_progress
+        self.stats: Dict[str, Any] = {}
+
+    @staticmethod
+    def _log_progress(event: Dict[str, Any]) -> None:
+        r = event["result"]
+        status = "ok" if r.success else f"FAILED ({r.error})"
+        logger.info(f"[retrain] {event['done']}/{event['total']} {r.key} {status} in {r.seconds:.1f}s "
+                    f"(running {event['running']}, queued {event['queued']}, eta {event['eta_seconds']:.0f}s)")
+
+    def _order(self, jobs: Sequence[TrainJob]) -> List[TrainJob]:
+        # Stable: equal priorities keep submission order
+        return [j for _, j in sorted(enumerate(jobs), key=lambda p: (-p[1].priority, p[0]))]
+
+    def _report(self, result: JobResult, done: int, total: int, running: int, queued: int, t0: float) -> None:
+        elapsed = time.perf_counter() - t0
+        eta = elapsed / done * (total - done) if done else 0.0
+        self.progress({"result": result, "done": done, "total": total, "running": running,
+                       "queued": queued, "elapsed_seconds": elapsed, "eta_seconds": eta})
+
+    def run(self, jobs: Sequence[TrainJob]) -> Dict[str, JobResult]:
+        """
+        Run all jobs and return results keyed by job key (in completion order)
+
+        A job whose memory estimate exceeds the whole budget still runs, but alone.
+        """
+        t0 = time.perf_counter()
+        queue = self._order(jobs)
+        total = len(queue)
+        results: Dict[str, JobResult] = {}
+        budget = self.memory_budget_mb
+
+        if self.max_workers == 1 or total <= 1:
+            for i, job in enumerate(queue, 1):
+                res = _execute(job.key, job.fn, job.kwargs, job.shared)
+                results[job.key] = res
+                self._report(res, i, total, 0, total - i, t0)
+            _detach_all()
+            self.stats["peak_concurrency"] = 1 if total else 0
+        else:
+            running: Dict[Future, TrainJob] = {}
+            in_use = 0.0
+            peak = 0
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, total)) as pool:
+                while queue or running:
+                    # Fill free workers in priority order while the memory budget allows
+                    while queue and len(running) < self.max_workers:
+                        job = queue[0]
+                        fits = budget is None or in_use + job.memory_mb <= budget
+                        if running and not fits:
+                            break
+                        queue.pop(0)
+                        fut = pool.submit(_execute, job.key, job.fn, job.kwargs, job.shared)
+                        running[fut] = job
+                        in_use += job.memory_mb
+                    peak = max(peak, len(running))
+
+                    finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        job = running.pop(fut)
+                        in_use -= job.memory_mb
+                        try:
+                            res = fut.result()
+                        except Exception as e:  # worker crashed (e.g. killed by the OS)
+                            res = JobResult(job.key, False, error=f"{type(e).__name__}: {e}")
+                        results[job.key] = res
+                        self._report(res, len(results), total, len(running), len(queue), t0)
+            self.stats["peak_concurrency"] = peak
+
+        wall = time.perf_counter() - t0
+        busy = sum(r.seconds for r in results.values())
+        self.stats.update({
+            "jobs": total,
+            "failed": sum(1 for r in results.values() if not r.success),
+            "workers": self.max_workers,
+            "memory_budget_mb": budget,
+            "wall_seconds": wall,
+            "job_seconds": busy,
+            "speedup": busy / wall if wall > 0 else 0.0,
+        })
+        return results
@@ -0,0 +1,265 @@
+"""
+EMO Options Bot - Purged Time-Series Cross-Validation
+Out-of-sample evaluation for models trained on overlapping forward returns
+
+A sample at bar t is labelled with the return over (t, t + horizon], so a
+random split, or a chronological one without a gap, lets training labels
+overlap the test period and overstates accuracy. PurgedCV builds
+chronological folds and drops ("purges") every training sample whose label
+window reaches into the test window, plus an optional embargo of extra bars.
+
+Folds are run as RetrainScheduler jobs. The feature and target matrices are
+published to shared memory once and every fold (and every target evaluated
+on the same features) slices the same cached matrix instead of receiving its
+own copy.
+
+Includes:
+- PurgedCV: expanding / rolling walk-forward and blocked k-fold splits
+- fold_job: picklable fit/predict/score job for the scheduler
+- cross_validate: run all folds of one or more targets on a process pool
+- CVReport: per-fold timing and metrics plus their summary
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .scheduler import JobResult, RetrainScheduler, SharedMatrix, TrainJob
+
+CV_MODES = ("expanding", "rolling", "blocked")
+
+
+@dataclass
+class PurgedCV:
+    """
+    Chronological folds with purging and embargo
+
+    Modes:
+        expanding: train on everything before each test block
+        rolling:   train on a fixed-length window before each test block
+        blocked:   k contiguous blocks, train on all other blocks (both sides)
+
+    ``embargo`` drops that many extra bars next to the test block: before it
+    for walk-forward modes, after it (past the purge) for blocked folds.
+    """
+    n_splits: int = 5
+    horizon: int = 1
+    embargo: int = 0
+    mode: str = "expanding"
+    test_size: Optional[int] = None        # walk-forward test block length (default n // (n_splits + 1))
+    max_train_size: Optional[int] = None   # rolling window (default: size of the first fold's train set)
+    min_train_size: int = 1
+
+    def __post_init__(self):
+        if self.mode not in CV_MODES:
+            raise ValueError(f"Unknown CV mode {self.mode!r}; expected one of {CV_MODES}")
+        if self.n_splits < 2 and self.mode == "blocked":
+            raise ValueError("Blocked CV needs at least 2 splits")
+
+    def split(self, times: Any, horizon: Optional[int] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Fold indices for samples at bar positions ``times``
+
+        Args:
+            times: Sorted bar position of each sample (``len(times)`` or an
+                int is accepted for consecutive bars)
+            horizon: Label horizon in bars (default: self.horizon)
+
+        Returns:
+            List of (train_idx, test_idx) arrays indexing into ``times``
+        """
+        times = np.arange(times) if np.isscalar(times) else np.asarray(times, dtype=np.int64)
+        h = self.horizon if horizon is None else int(horizon)
+        n = len(times)
+        folds = []
+        for test_lo, test_hi in self._test_blocks(n):
+            t_start, t_end = times[test_lo], times[test_hi - 1]
+            idx = np.arange(n)
+            train = (idx < test_lo) | (idx >= test_hi)
+            if self.mode == "blocked":
+                # Label windows [t, t + h] overlapping the test labels, then the embargo after them
+                train &= ~((times <= t_end + h + self.embargo) & (times + h >= t_start))
+            else:
+                train &= idx < test_lo
+                train &= times + h + self.embargo < t_start
+            train_idx = np.flatnonzero(train)
+            if self.mode == "rolling":
+                window = self.max_train_size or self._first_train_size(n)
+                train_idx = train_idx[-window:]
+            if len(train_idx) >= max(1, self.min_train_size):
+                folds.append((train_idx, np.arange(test_lo, test_hi)))
+        return folds
+
+    def _test_blocks(self, n: int) -> List[Tuple[int, int]]:
+        if self.mode == "blocked":
+            edges = np.linspace(0, n, self.n_splits + 1).astype(int)
+            return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+        size = self.test_size or n // (self.n_splits + 1)
+        if size <= 0:
+            return []
+        first = n - self.n_splits * size
+        return [(first + k * size, first + (k + 1) * size) for k in range(self.n_splits) if first + k * size > 0]
+
+    def _first_train_size(self, n: int) -> int:
+        blocks = self._test_blocks(n)
+        return max(1, blocks[0][0]) if blocks else n
+
+
+def fold_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+    """MAE, MSE and directional hit rate of out-of-sample predictions"""
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    err = y_pred - y_true
+    moved = y_true != 0
+    hits = np.sign(y_pred[moved]) == np.sign(y_true[moved])
+    return {
+        "mae": float(np.mean(np.abs(err))) if len(err) else float("nan"),
+        "mse": float(np.mean(err ** 2)) if len(err) else float("nan"),
+        "hit_rate": float(np.mean(hits)) if hits.size else float("nan"),
+        "n": int(len(err)),
+    }
+
+
+def fold_job(arrays: Dict[str, np.ndarray], factory: Callable[[], Any], train: np.ndarray,
+             test: np.ndarray, y_col: int = 0, fold: int = 0) -> Dict[str, Any]:
+    """
+    Fit one fold and score it (runs in a scheduler worker)
+
+    ``arrays`` holds the shared feature matrix "X" and target matrix "y"
+    (one column per target); ``factory`` returns a fresh estimator with
+    sklearn-style fit/predict.
+    """
+    X, Y = arrays["X"], arrays["y"]
+    y = Y[:, y_col] if Y.ndim == 2 else Y
+    t0 = time.perf_counter()
+    estimator = factory()
+    estimator.fit(X[train], y[train])
+    t1 = time.perf_counter()
+    pred = np.asarray(estimator.predict(X[test]), dtype=float)
+    t2 = time.perf_counter()
+    return {
+        "fold": fold,
+        "train_size": int(len(train)),
+        "test_size": int(len(test)),
+        "train_rows": [int(train[0]), int(train[-1])],
+        "test_rows": [int(test[0]), int(test[-1])],
+        "fit_seconds": t1 - t0,
+        "predict_seconds": t2 - t1,
+        **fold_metrics(y[test], pred),
+    }
+
+
+@dataclass
+class CVReport:
+    """Per-fold results of one cross-validated target"""
+    name: str
+    folds: List[Dict[str, Any]] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, float]:
+        """Mean and std of each metric across folds, plus total fold seconds"""
+        out: Dict[str, float] = {"folds": len(self.folds)}
+        for metric in ("mae", "mse", "hit_rate"):
+            values = np.array([f[metric] for f in self.folds], dtype=float)
+            values = values[~np.isnan(values)]
+            out[f"{metric}_mean"] = float(values.mean()) if values.size else float("nan")
+            out[f"{metric}_std"] = float(values.std()) if values.size else float("nan")
+        out["fit_seconds"] = float(sum(f["fit_seconds"] for f in self.folds))
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "summary": self.summary()}
+
+
+def build_fold_jobs(name: str, factory: Callable[[], Any], handles: Dict[str, Any],
+                    folds: Sequence[Tuple[np.ndarray, np.ndarray]], rows: Optional[np.ndarray] = None,
+                    y_col: int = 0, priority: int = 0, memory_mb: float = 256.0) -> List[TrainJob]:
+    """
+    Scheduler jobs for the folds of one target
+
+    Args:
+        name: Report name; job keys are ``"{name}/cv{k}"``
+        factory: Picklable callable returning a fresh estimator
+        handles: SharedMatrix handles for "X" and "y"
+        folds: Output of PurgedCV.split
+        rows: Matrix row of each sample the folds index (default: identity)
+        y_col: Target column in the shared "y" matrix
+    """
+    jobs = []
+    for k, (train, test) in enumerate(folds):
+        if rows is not None:
+            train, test = rows[train], rows[test]
+        jobs.append(TrainJob(
+            key=f"{name}/cv{k}",
+            fn=fold_job,
+            kwargs={"factory": factory, "train": train.astype(np.int64), "test": test.astype(np.int64),
+                    "y_col": y_col, "fold": k},
+            shared=handles,
+            priority=priority,
+            memory_mb=memory_mb,
+        ))
+    return jobs
+
+
+def collect_reports(results: Dict[str, JobResult]) -> Dict[str, CVReport]:
+    """Group fold job results (keys ``"{name}/cv{k}"``) into one CVReport per name"""
+    reports: Dict[str, CVReport] = {}
+    for key, res in results.items():
+        name, sep, _ = key.rpartition("/cv")
+        if not sep:
+            continue
+        report = reports.setdefault(name, CVReport(name))
+        if res.success:
+            report.folds.append({**res.result, "seconds": res.seconds})
+        else:
+            report.errors.append(res.error)
+    for report in reports.values():
+        report.folds.sort(key=lambda f: f["fold"])
+    return reports
+
+
+def cross_validate(factory: Callable[[], Any], X: np.ndarray, Y: Any, cv: PurgedCV,
+                   horizons: Optional[Dict[str, int]] = None,
+                   scheduler: Optional[RetrainScheduler] = None) -> Dict[str, CVReport]:
+    """
+    Purged cross-validation of one or more targets over the same features
+
+    Rows with NaN features or a NaN target are left out of that target's folds.
+
+    Args:
+        factory: Picklable callable returning a fresh estimator (fit/predict)
+        X: (n, F) feature matrix, oldest row first
+        Y: (n,) target, (n, k) targets, or {name: (n,) target}
+        cv: Fold definition
+        horizons: Label horizon in bars per target name (default: cv.horizon)
+        scheduler: Pool to run folds on (default: one worker, inline)
+
+    Returns:
+        CVReport per target name ("y" for a single unnamed target)
+    """
+    if isinstance(Y, dict):
+        names, columns = list(Y), [np.asarray(v, dtype=float) for v in Y.values()]
+    else:
+        Y = np.asarray(Y, dtype=float)
+        columns = [Y] if Y.ndim == 1 else list(Y.T)
+        names = ["y"] if Y.ndim == 1 else [f"y{k}" for k in range(len(columns))]
+    X = np.asarray(X, dtype=float)
+    Ymat = np.column_stack(columns)
+    scheduler = scheduler or RetrainScheduler(max_workers=1, progress=lambda event: None)
+
+    with SharedMatrix(X) as sx, SharedMatrix(Ymat) as sy:
+        handles = {"X": sx.handle, "y": sy.handle}
+        clean = ~np.isnan(X).any(axis=1)
+        jobs = []
+        for k, name in enumerate(names):
+            rows = np.flatnonzero(clean & ~np.isnan(Ymat[:, k]))
+            folds = cv.split(rows, horizon=(horizons or {}).get(name))
+            jobs += build_fold_jobs(name, factory, handles, folds, rows=rows, y_col=k,
+                                    memory_mb=64.0 + 3 * X.nbytes / 2**20)
+        results = scheduler.run(jobs)
+    reports = collect_reports(results)
+    return {name: reports.get(name, CVReport(name)) for name in names}
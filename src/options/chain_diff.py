@@ -0,0 +1,386 @@
+"""
+EMO Options Bot - Options Chain Diffs
+Contract-level change sets between consecutive chain snapshots
+
+Consecutive fetches of a chain differ in a small fraction of contracts, yet
+every consumer handled the full chain. ``diff_chains`` compares two chain
+frames by contract and returns a ChainDiff holding only what moved: new
+contracts, removed contracts, and for changed ones just the fields that
+changed (bid/ask/last, IV and Greeks, volume, open interest) with a bit
+mask naming them. ``apply_diff`` turns the old chain into the new one, so
+a replica that applies every diff stays identical to its source.
+
+ChainCache keeps the latest chain per underlying and turns every full
+fetch into a diff for its listeners: the snapshot recorder persists diffs
+(with periodic keyframes), and websocket subscribers receive one full
+chain followed by diffs only.
+
+A fetch covers the (expiry, right) pairs it returned; contracts of other
+expiries, or the calls of a puts-only fetch, are left as they are.
+
+Includes:
+- ChainDiff: added / removed / changed contracts, with a JSON payload form
+- diff_chains / apply_diff: compute and apply change sets
+- ChainCache: latest chains per underlying, publishing a diff per update
+- ChainSubscription: asyncio queue of diffs for one subscriber
+- get_chain_cache: process-wide cache fed by OptionsChainProvider
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .chain_providers import OptionQuote
+from .chain_snapshots import (CATEGORY_COLUMNS, CHAIN_COLUMNS, COUNT_COLUMNS, GREEK_COLUMNS, OP_REMOVE, OP_UPSERT,
+                              _concat, _to_ms, _typed, chain_frame, frame_quotes)
+
+VALUE_COLUMNS = ("bid", "ask", "last") + GREEK_COLUMNS + COUNT_COLUMNS
+FIELD_BITS = {c: 1 << i for i, c in enumerate(VALUE_COLUMNS)}
+
+Listener = Callable[["ChainDiff"], None]
+
+
+def _empty_chain() -> pd.DataFrame:
+    return chain_frame([])
+
+
+def _contracts(frame: pd.DataFrame) -> pd.Index:
+    return pd.Index(frame["contract"].astype(str).to_numpy(object))
+
+
+def _records(frame: pd.DataFrame, columns: Sequence[str]) -> List[Dict[str, Any]]:
+    """JSON-safe row dicts (NaN -> None, numpy scalars -> Python)"""
+    out = []
+    cols = {c: frame[c].to_numpy() for c in columns}
+    for i in range(len(frame)):
+        row = {}
+        for c in columns:
+            v = cols[c][i]
+            if isinstance(v, (float, np.floating)):
+                row[c] = None if np.isnan(v) else float(v)
+            elif isinstance(v, np.integer):
+                row[c] = int(v)
+            else:
+                row[c] = str(v)
+        out.append(row)
+    return out
+
+
+@dataclass
+class ChainDiff:
+    """
+    Change set taking one chain snapshot of an underlying to the next
+
+    ``changed`` holds the contract, the new value of every VALUE_COLUMN and a
+    ``fields`` bit mask (FIELD_BITS) of the columns that actually changed;
+    only those are meaningful and only those are sent in ``to_dict``.
+    """
+    underlying: str
+    ts: int
+    base_ts: Optional[int]                  # snapshot the diff applies to (None: no prior chain)
+    expiries: List[str]
+    added: pd.DataFrame
+    removed: pd.DataFrame                   # old rows (only ``contract`` when rebuilt from a payload)
+    changed: pd.DataFrame
+    spot: Optional[float] = None
+    chain: Optional[pd.DataFrame] = field(default=None, repr=False)  # full new chain of ``expiries``
+
+    @property
+    def empty(self) -> bool:
+        return not (len(self.added) or len(self.removed) or len(self.changed))
+
+    @property
+    def size(self) -> int:
+        """Contracts in the change set"""
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def rows(self) -> pd.DataFrame:
+        """
+        Full chain rows of the change set with an ``op`` column, for storage
+
+        Added and changed contracts are upserts (whole new rows) and removed
+        contracts deletions; needs ``chain`` and full ``removed`` rows.
+        """
+        upserts = self.chain[_contracts(self.chain).isin(
+            list(_contracts(self.added)) + list(self.changed["contract"].astype(str)))]
+        parts = [upserts.assign(op=np.int8(OP_UPSERT))]
+        if len(self.removed):
+            parts.append(self.removed[list(CHAIN_COLUMNS)].assign(op=np.int8(OP_REMOVE)))
+        return _concat(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact JSON payload: only the changed fields of changed contracts"""
+        changed = []
+        masks = self.changed["fields"].to_numpy()
+        values = _records(self.changed, ("contract",) + VALUE_COLUMNS)
+        for mask, row in zip(masks, values):
+            changed.append({c: v for c, v in row.items() if c == "contract" or mask & FIELD_BITS[c]})
+        return {
+            "underlying": self.underlying,
+            "ts": self.ts,
+            "base_ts": self.base_ts,
+            "spot": self.spot,
+            "expiries": list(self.expiries),
+            "added": _records(self.added, CHAIN_COLUMNS),
+            "removed": [str(c) for c in self.removed["contract"]],
+            "changed": changed,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "ChainDiff":
+        """Rebuild a diff from ``to_dict`` output (``removed`` keeps only contract names)"""
+        added = _typed(pd.DataFrame(payload["added"], columns=list(CHAIN_COLUMNS)))
+        rows = payload["changed"]
+        changed = pd.DataFrame({
+            "contract": [r["contract"] for r in rows],
+            **{c: [np.nan if r.get(c) is None else r[c] for r in rows] for c in VALUE_COLUMNS},
+            "fields": [sum(FIELD_BITS[c] for c in r if c in FIELD_BITS) for r in rows],
+        })
+        changed = changed.astype({**{c: "float64" for c in VALUE_COLUMNS}, "fields": "int32"})
+        return cls(payload["underlying"], int(payload["ts"]), payload["base_ts"], list(payload["expiries"]),
+                   added, pd.DataFrame({"contract": pd.Series(payload["removed"], dtype=object)}), changed,
+                   payload.get("spot"))
+
+
+def diff_chains(old: Optional[pd.DataFrame], new: pd.DataFrame, underlying: str = "", ts: Optional[int] = None,
+                base_ts: Optional[int] = None, spot: Optional[float] = None) -> ChainDiff:
+    """
+    Change set from chain frame ``old`` to ``new``, matched by contract
+
+    Args:
+        old: Previous chain frame (None: everything in ``new`` is added)
+        new: Current chain frame (CHAIN_COLUMNS; see chain_frame)
+        underlying: Underlying symbol
+        ts: Time of ``new`` (epoch ms; default now)
+        base_ts: Time of ``old``
+        spot: Underlying price at ``ts``
+
+    Returns:
+        ChainDiff with ``chain`` set to ``new``; a value counts as changed
+        unless it is equal in both (NaN equals NaN)
+    """
+    ts = int(time.time() * 1000) if ts is None else int(ts)
+    expiries = sorted(str(e) for e in pd.unique(new["expiry"].astype(str)))
+    old = _empty_chain() if old is None else old
+    old_keys, new_keys = _contracts(old), _contracts(new)
+    in_old = new_keys.isin(old_keys)
+    added = new[~in_old].reset_index(drop=True)
+    removed = old[~old_keys.isin(new_keys)].reset_index(drop=True)
+
+    common = new_keys[in_old]
+    before = old.iloc[old_keys.get_indexer(common)]
+    after = new[in_old]
+    fields = np.zeros(len(common), dtype=np.int32)
+    for c in VALUE_COLUMNS:
+        a, b = before[c].to_numpy(), after[c].to_numpy()
+        differs = a != b
+        if a.dtype.kind == "f":
+            differs &= ~(np.isnan(a) & np.isnan(b))
+        fields |= np.where(differs, FIELD_BITS[c], 0).astype(np.int32)
+    moved = fields != 0
+    changed = pd.DataFrame({"contract": common[moved].to_numpy(object),
+                            **{c: after[c].to_numpy()[moved] for c in VALUE_COLUMNS},
+                            "fields": fields[moved]})
+    return ChainDiff(underlying, ts, base_ts, expiries, added, removed, changed, spot, new)
+
+
+def apply_diff(frame: Optional[pd.DataFrame], diff: ChainDiff) -> pd.DataFrame:
+    """
+    Apply a change set to the chain it was computed from
+
+    Returns:
+        The new chain frame, sorted by (expiry, right, strike)
+    """
+    state = _empty_chain() if frame is None else frame.reset_index(drop=True).copy()
+    keys = _contracts(state)
+    if len(diff.changed):
+        pos = keys.get_indexer(diff.changed["contract"].astype(str))
+        hit = pos >= 0
+        masks = diff.changed["fields"].to_numpy()[hit]
+        for c in VALUE_COLUMNS:
+            sel = (masks & FIELD_BITS[c]) != 0
+            if sel.any():
+                column = state[c].to_numpy().copy()
+                column[pos[hit][sel]] = diff.changed[c].to_numpy()[hit][sel]
+                state[c] = column
+    if len(diff.removed):
+        state = state[~keys.isin(diff.removed["contract"].astype(str))]
+    if len(diff.added):
+        state = state[~_contracts(state).isin(_contracts(diff.added))]
+        state = _concat([state, _typed(diff.added[list(CHAIN_COLUMNS)])])
+    state = _typed(state)
+    return state.sort_values(["expiry", "right", "strike"], kind="mergesort").reset_index(drop=True)
+
+
+class ChainSubscription:
+    """
+    Diffs of a ChainCache for one asyncio consumer
+
+    ``get`` returns ChainDiffs in order. If the consumer falls behind by
+    ``maxsize`` diffs, the backlog is dropped and ``get`` returns None once:
+    the consumer must then resend the full chain (``ChainCache.snapshot``).
+    """
+
+    def __init__(self, cache: "ChainCache", symbols: Optional[Iterable[str]], maxsize: int,
+                 loop: asyncio.AbstractEventLoop):
+        self.cache = cache
+        self.symbols = frozenset(s.upper() for s in symbols) if symbols else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.loop = loop
+        self.resyncs = 0
+
+    def _put(self, diff: ChainDiff):
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.resyncs += 1
+            diff = None
+        self.queue.put_nowait(diff)
+
+    def __call__(self, diff: ChainDiff):
+        if self.symbols is None or diff.underlying in self.symbols:
+            self.loop.call_soon_threadsafe(self._put, diff)
+
+    async def get(self) -> Optional[ChainDiff]:
+        return await self.queue.get()
+
+    def close(self):
+        self.cache.remove_listener(self)
+
+
+class ChainCache:
+    """
+    Latest chain per underlying; every update is published as a ChainDiff
+
+    Usage:
+        cache = ChainCache()
+        cache.add_listener(lambda diff: print(diff.size))
+        diff = cache.update("SPY", quotes)
+    """
+
+    def __init__(self):
+        self._chains: Dict[str, pd.DataFrame] = {}
+        self._ts: Dict[str, int] = {}
+        self._listeners: List[Listener] = []
+        self._lock = threading.Lock()
+        self.contracts_seen = 0     # contracts in the full chains received
+        self.contracts_sent = 0     # contracts in the diffs published
+
+    def get(self, underlying: str, expiry: Optional[str] = None) -> pd.DataFrame:
+        """Current chain frame of an underlying (empty if unknown)"""
+        with self._lock:
+            frame = self._chains.get(underlying.upper())
+        if frame is None:
+            return _empty_chain()
+        if expiry is not None:
+            frame = frame[frame["expiry"].astype(str) == expiry].reset_index(drop=True)
+        return frame
+
+    def quotes(self, underlying: str, expiry: Optional[str] = None) -> List[OptionQuote]:
+        return frame_quotes(self.get(underlying, expiry), underlying.upper())
+
+    def add_listener(self, listener: Listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def subscribe(self, symbols: Optional[Iterable[str]] = None, maxsize: int = 100) -> ChainSubscription:
+        """Queue of diffs for the running event loop (close it when done)"""
+        sub = ChainSubscription(self, symbols, maxsize, asyncio.get_running_loop())
+        self.add_listener(sub)
+        return sub
+
+    def _publish(self, diff: ChainDiff):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(diff)
+
+    def update(self, underlying: str, chain: Union[Sequence[OptionQuote], pd.DataFrame],
+               ts: Optional[Union[int, dt.datetime]] = None, spot: Optional[float] = None) -> ChainDiff:
+        """
+        Replace the fetched (expiry, right) pairs of an underlying's chain and publish the diff
+
+        Args:
+            underlying: Underlying symbol
+            chain: Fetched quotes or chain frame
+            ts: Fetch time (default: now)
+            spot: Underlying price at the fetch
+
+        Returns:
+            The published diff (published even when empty)
+        """
+        underlying = underlying.upper()
+        new = _typed(chain[list(CHAIN_COLUMNS)].copy()) if isinstance(chain, pd.DataFrame) else chain_frame(chain)
+        new = new.sort_values(["expiry", "right", "strike"], kind="mergesort").reset_index(drop=True)
+        ts_ms = int(time.time() * 1000) if ts is None else _to_ms(ts)
+        with self._lock:
+            current = self._chains.get(underlying)
+            base_ts = self._ts.get(underlying)
+            if current is None:
+                old, rest = None, _empty_chain()
+            else:
+                fetched = pd.MultiIndex.from_arrays([new["expiry"].astype(str), new["right"].astype(str)])
+                scope = pd.MultiIndex.from_arrays([current["expiry"].astype(str),
+                                                   current["right"].astype(str)]).isin(fetched)
+                old, rest = current[scope], current[~scope]
+            diff = diff_chains(old, new, underlying, ts_ms, base_ts if old is not None and len(old) else None, spot)
+            merged = _concat([rest, new]) if len(rest) else new
+            merged = merged.sort_values(["expiry", "right", "strike"], kind="mergesort").reset_index(drop=True)
+            self._chains[underlying] = merged
+            # Keyframes need whole expiries, also after a calls- or puts-only fetch
+            diff.chain = merged[merged["expiry"].astype(str).isin(diff.expiries).to_numpy()].reset_index(drop=True)
+            self._ts[underlying] = ts_ms
+            self.contracts_seen += len(new)
+            self.contracts_sent += diff.size
+        self._publish(diff)
+        return diff
+
+    def apply(self, diff: ChainDiff) -> pd.DataFrame:
+        """Apply a diff received from another cache (a replica); returns the new chain"""
+        with self._lock:
+            current = self._chains.get(diff.underlying)
+            frame = apply_diff(current, diff)
+            self._chains[diff.underlying] = frame
+            self._ts[diff.underlying] = diff.ts
+        self._publish(diff)
+        return frame
+
+    def snapshot(self, underlying: str) -> Dict[str, Any]:
+        """Full-chain payload (what a new subscriber gets before diffs)"""
+        underlying = underlying.upper()
+        with self._lock:
+            ts = self._ts.get(underlying)
+        return {"underlying": underlying, "ts": ts, "contracts": _records(self.get(underlying), CHAIN_COLUMNS)}
+
+    def stats(self) -> Dict[str, Any]:
+        """Contracts received in full chains vs. sent in diffs"""
+        with self._lock:
+            seen, sent = self.contracts_seen, self.contracts_sent
+        return {"underlyings": len(self._chains), "contracts_seen": seen, "contracts_sent": sent,
+                "diff_ratio": round(sent / seen, 4) if seen else None}
+
+
+_cache: Optional[ChainCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_chain_cache() -> ChainCache:
+    """The process-wide chain cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ChainCache()
+        return _cache
@@ -505,15 +505,27 @@ class OptionsChainProvider:
     Supports Alpaca, Polygon, YFinance with intelligent provider selection
     """
     
-    def __init__(self, provider_order: Optional[List[str]] = None):
+    def __init__(self, provider_order: Optional[List[str]] = None, recorder=None, chain_cache=None):
         """
         Initialize with provider preference order
         
         Args:
             provider_order: List of provider names in preference order
                           ["alpaca", "polygon", "yfinance", "mock"]
+            recorder: ChainRecorder for fetched chains (default: the shared
+                      one when EMO_CHAIN_SNAPSHOTS=1, else none)
+            chain_cache: ChainCache fetched chains are diffed into (default:
+                      the recorder's, else the shared one)
         """
         self.provider_order = provider_order or ["alpaca", "polygon", "yfinance", "mock"]
+        if recorder is None:
+            from .chain_snapshots import get_chain_recorder
+            recorder = get_chain_recorder()
+        self.recorder = recorder
+        if chain_cache is None:
+            from .chain_diff import get_chain_cache
+            chain_cache = recorder.cache if recorder is not None else get_chain_cache()
+        self.chain_cache = chain_cache
         self.providers = {
             "yfinance": YFinanceProvider(),
             "mock": MockProvider()
@@ -578,6 +590,7 @@ class OptionsChainProvider:
                     
                     if quotes:
                         logger.info(f"Successfully retrieved {len(quotes)} quotes from {provider_name}")
+                        self._record(symbol, quotes)
                         return quotes
                     else:
                         logger.warning(f"No quotes returned from {provider_name}")
@@ -599,6 +612,17 @@ class OptionsChainProvider:
         
         return []
     
+    def _record(self, symbol: str, quotes: List[OptionQuote]):
+        """Diff a fetched chain into the chain cache (and so the recorder); this never fails a fetch"""
+        try:
+            if self.recorder is not None and self.recorder.cache is self.chain_cache:
+                self.recorder.record(symbol, quotes)
+            else:
+                stamps = [q.timestamp for q in quotes if q.timestamp is not None]
+                self.chain_cache.update(symbol, quotes, max(stamps) if stamps else None)
+        except Exception as e:
+            logger.warning(f"Could not record chain snapshot for {symbol}: {e}")
+    
     def get_spot_price(self, symbol: str) -> Optional[float]:
         """Get current spot price with provider fallback"""
         for provider_name in self.provider_order:
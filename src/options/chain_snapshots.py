@@ -0,0 +1,646 @@
+"""
+EMO Options Bot - Options Chain Snapshots
+Append-only columnar history of fetched option chains, with as-of reads
+
+Chains were fetched live for every synthesis and then thrown away, so a
+backtest or post-trade review could not see the chain a decision was made
+on. ChainRecorder buffers each fetched chain and appends it, in columnar
+form, to a ChainSnapshotStore; ``as_of`` rebuilds the chain of any past
+moment from the latest snapshot of each expiry at or before it.
+
+Most contracts do not change between fetches, so the recorder stores the
+full chain of an expiry only as a keyframe (first fetch, then every
+``keyframe_every`` snapshots) and otherwise just the contracts a ChainDiff
+reports as added, changed or removed. A fetch that changes no contract of an
+expiry still writes one heartbeat row for it, so ``as_of`` reports the time and
+spot of the latest fetch. ``as_of`` replays an expiry from its last keyframe:
+the newest row per contract wins and removals drop out.
+
+Layout:
+    <root>/<UNDERLYING>/<YYYY-MM-DD>/<first_ts>-<last_ts>-<tag>.parquet
+                                                (zstd; ``.npz`` without pyarrow)
+        snapshot_ts   int64 UTC epoch ms of the fetch
+        spot          float64 underlying price at the fetch (NaN if unknown)
+        op            int8 OP_KEYFRAME (full chain), OP_UPSERT, OP_REMOVE or
+                      OP_HEARTBEAT (unchanged fetch; empty contract)
+        contract, expiry, right   dictionary-encoded strings
+        strike, bid, ask, last    float64
+        iv, delta, gamma, theta, vega   float32
+        volume, open_interest     int64 (0 = not reported)
+
+Rows are sorted by (snapshot_ts, expiry, right, strike), so a snapshot is
+keyed by (underlying, snapshot_ts, expiry). Segments are written once
+(temp file + rename) and never modified; ``compact`` merges a day's small
+segments into one.
+
+Includes:
+- chain_frame / frame_quotes: OptionQuote lists to/from columnar frames
+- ChainSnapshotStore: segment files per underlying and day: append, read, as_of
+- ChainRecorder: buffered, thread-safe recording of fetched chains as diffs
+- HistoricalChainProvider: chain provider that serves chains as of a past time
+- get_chain_recorder: process-wide recorder (EMO_CHAIN_SNAPSHOTS=1)
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .chain_providers import OptionQuote
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_COLUMNS = ("contract", "expiry", "right")
+PRICE_COLUMNS = ("strike", "bid", "ask", "last")
+GREEK_COLUMNS = ("iv", "delta", "gamma", "theta", "vega")
+COUNT_COLUMNS = ("volume", "open_interest")
+CHAIN_COLUMNS = CATEGORY_COLUMNS + PRICE_COLUMNS + GREEK_COLUMNS + COUNT_COLUMNS
+STORED_COLUMNS = ("snapshot_ts", "spot", "op") + CHAIN_COLUMNS
+SORT_KEY = ["snapshot_ts", "expiry", "right", "strike"]
+
+DEFAULT_ROOT = Path(__file__).resolve().parents[2] / "data" / "chain_snapshots"
+DEFAULT_MAX_AGE_MS = 86_400_000  # as_of ignores snapshots older than a day
+ROW_GROUP_ROWS = 8192
+
+OP_KEYFRAME, OP_UPSERT, OP_REMOVE, OP_HEARTBEAT = 0, 1, 2, 3
+
+_DTYPES = {**{c: "float64" for c in PRICE_COLUMNS}, **{c: "float32" for c in GREEK_COLUMNS},
+           **{c: "int64" for c in COUNT_COLUMNS}}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _to_ms(ts: Union[int, float, dt.datetime, pd.Timestamp, str]) -> int:
+    """Epoch ms of a timestamp (naive datetimes are UTC, as OptionQuote uses)"""
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    stamp = pd.Timestamp(ts)
+    if stamp.tzinfo is None:
+        stamp = stamp.tz_localize("UTC")
+    return int(stamp.value // 1_000_000)
+
+
+def _day(ms: int) -> str:
+    return dt.datetime.fromtimestamp(ms / 1000, dt.timezone.utc).strftime("%Y-%m-%d")
+
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Chain column dtypes: categories for strings, float32 Greeks"""
+    df = df.astype(_DTYPES)
+    for c in CATEGORY_COLUMNS:
+        if not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype(str).astype("category")
+    return df
+
+
+def _concat(frames: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate frames, first giving each category column one shared dictionary"""
+    frames = list(frames)
+    for c in CATEGORY_COLUMNS:
+        if c not in frames[0]:
+            continue
+        frames = [f if isinstance(f[c].dtype, pd.CategoricalDtype) else f.assign(**{c: f[c].astype("category")})
+                  for f in frames]
+        categories = frames[0][c].cat.categories
+        for f in frames[1:]:
+            categories = categories.union(f[c].cat.categories)
+        frames = [f.assign(**{c: f[c].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _heartbeat(expiry: str) -> pd.DataFrame:
+    """One OP_HEARTBEAT row: ``expiry`` was fetched and no contract of it changed"""
+    row = {c: [""] for c in CATEGORY_COLUMNS}
+    row["expiry"] = [expiry]
+    row.update({c: [np.nan] for c in PRICE_COLUMNS + GREEK_COLUMNS})
+    row.update({c: [0] for c in COUNT_COLUMNS})
+    return _typed(pd.DataFrame(row)).assign(op=np.int8(OP_HEARTBEAT))
+
+
+def chain_frame(quotes: Sequence[OptionQuote]) -> pd.DataFrame:
+    """
+    Columnar form of a chain
+
+    Args:
+        quotes: Option quotes (any mix of expiries and rights)
+
+    Returns:
+        DataFrame with CHAIN_COLUMNS sorted by (expiry, right, strike);
+        missing Greeks are NaN and missing volume / open interest 0
+    """
+    df = pd.DataFrame({
+        "contract": [q.symbol for q in quotes],
+        "expiry": [q.expiry for q in quotes],
+        "right": [q.right for q in quotes],
+        "strike": [q.strike for q in quotes],
+        "bid": [q.bid for q in quotes],
+        "ask": [q.ask for q in quotes],
+        "last": [np.nan if q.last is None else q.last for q in quotes],
+        **{g: [np.nan if getattr(q, g) is None else getattr(q, g) for q in quotes] for g in GREEK_COLUMNS},
+        "volume": [q.volume or 0 for q in quotes],
+        "open_interest": [q.open_interest or 0 for q in quotes],
+    }, columns=list(CHAIN_COLUMNS))
+    df = _typed(df)
+    return df.sort_values(["expiry", "right", "strike"], kind="mergesort").reset_index(drop=True)
+
+
+def frame_quotes(frame: pd.DataFrame, underlying: str) -> List[OptionQuote]:
+    """OptionQuotes of a chain frame (``snapshot_ts`` becomes the quote timestamp when present)"""
+    quotes = []
+    stamps = frame["snapshot_ts"].to_numpy() if "snapshot_ts" in frame else None
+
+    def opt(value):
+        return None if pd.isna(value) else float(value)
+
+    for i, row in enumerate(frame[list(CHAIN_COLUMNS)].itertuples(index=False)):
+        ts = None
+        if stamps is not None:
+            ts = dt.datetime.fromtimestamp(int(stamps[i]) / 1000, dt.timezone.utc).replace(tzinfo=None)
+        quotes.append(OptionQuote(
+            symbol=str(row.contract), underlying=underlying, expiry=str(row.expiry), strike=float(row.strike),
+            right=str(row.right), bid=float(row.bid), ask=float(row.ask), mid=0.0, iv=opt(row.iv),
+            delta=opt(row.delta), gamma=opt(row.gamma), theta=opt(row.theta), vega=opt(row.vega),
+            last=opt(row.last), volume=int(row.volume) or None, open_interest=int(row.open_interest) or None,
+            timestamp=ts))
+    return quotes
+
+
+class ChainSnapshotStore:
+    """
+    Append-only chain snapshot segments per underlying and UTC day
+
+    Args:
+        root: Directory holding ``<UNDERLYING>/<YYYY-MM-DD>/`` segments
+        fmt: ``parquet`` (default when pyarrow is installed) or ``npz``
+    """
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_ROOT, fmt: Optional[str] = None):
+        self.root = Path(root)
+        self.fmt = fmt or ("parquet" if PARQUET_AVAILABLE else "npz")
+        if self.fmt == "parquet" and not PARQUET_AVAILABLE:
+            raise ImportError("pyarrow is required for Parquet chain snapshots")
+        self._index: Dict[str, List[Tuple[int, int, Path]]] = {}
+        self._keys: Dict[Path, pd.DataFrame] = {}  # segments never change, so their keys are cached
+        self._lock = threading.Lock()
+
+    def underlyings(self) -> List[str]:
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir()) if self.root.is_dir() else []
+
+    def segments(self, underlying: str) -> List[Tuple[int, int, Path]]:
+        """(first_ts, last_ts, path) of an underlying's segments, oldest first"""
+        with self._lock:
+            if underlying not in self._index:
+                found = []
+                base = self.root / underlying
+                for path in base.glob("*/*") if base.is_dir() else []:
+                    if path.suffix in (".parquet", ".npz"):
+                        first, last, _ = path.stem.split("-", 2)
+                        found.append((int(first), int(last), path))
+                self._index[underlying] = sorted(found)
+            return list(self._index[underlying])
+
+    def _save(self, underlying: str, frame: pd.DataFrame) -> Path:
+        first, last = int(frame["snapshot_ts"].iloc[0]), int(frame["snapshot_ts"].iloc[-1])
+        path = self.root / underlying / _day(first) / f"{first}-{last}-{uuid.uuid4().hex[:8]}.{self.fmt}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as fh:
+            if self.fmt == "parquet":
+                # Row groups of a few snapshots each: the snapshot_ts statistics let reads skip the rest
+                frame.to_parquet(fh, index=False, compression="zstd", row_group_size=ROW_GROUP_ROWS)
+            else:
+                arrays = {}
+                for c in STORED_COLUMNS:
+                    if c in CATEGORY_COLUMNS:
+                        arrays[c] = frame[c].cat.codes.to_numpy(np.int32)
+                        arrays[c + "__dict"] = frame[c].cat.categories.to_numpy(str)
+                    else:
+                        arrays[c] = frame[c].to_numpy()
+                np.savez_compressed(fh, **arrays)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+        with self._lock:
+            if underlying in self._index:
+                self._index[underlying] = sorted(self._index[underlying] + [(first, last, path)])
+        return path
+
+    def append(self, underlying: str, snapshots: Sequence[Tuple[int, float, pd.DataFrame]]) -> List[Path]:
+        """
+        Write snapshots of one underlying as new segments (one per UTC day)
+
+        Args:
+            underlying: Underlying symbol
+            snapshots: (snapshot_ts ms, spot, chain frame) tuples; a frame
+                without an ``op`` column is a keyframe
+
+        Returns:
+            Paths of the segments written
+        """
+        frames = [f.assign(snapshot_ts=np.int64(ts), spot=np.float64(np.nan if spot is None else spot),
+                           op=f["op"].astype(np.int8) if "op" in f else np.int8(OP_KEYFRAME))
+                  for ts, spot, f in snapshots if len(f)]
+        if not frames:
+            return []
+        frame = _concat([_typed(f) for f in frames])[list(STORED_COLUMNS)]
+        frame = frame.sort_values(SORT_KEY, kind="mergesort").reset_index(drop=True)
+        days = frame["snapshot_ts"].map(_day)
+        return [self._save(underlying, part.reset_index(drop=True)) for _, part in frame.groupby(days, sort=True)]
+
+    def _load(self, path: Path, columns: Optional[List[str]] = None, start_ms: Optional[int] = None,
+              end_ms: Optional[int] = None, snapshot_ts: Optional[Sequence[int]] = None,
+              expiry: Optional[str] = None) -> pd.DataFrame:
+        columns = columns or list(STORED_COLUMNS)
+        if path.suffix == ".parquet":
+            filters = [("snapshot_ts", ">=", int(start_ms))] if start_ms is not None else []
+            filters += [("snapshot_ts", "<", int(end_ms))] if end_ms is not None else []
+            filters += [("snapshot_ts", "in", [int(t) for t in snapshot_ts])] if snapshot_ts is not None else []
+            filters += [("expiry", "=", expiry)] if expiry is not None else []
+            return pd.read_parquet(path, columns=columns, filters=filters or None)
+        with np.load(path) as data:
+            ts = data["snapshot_ts"]
+            lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, side="left"))
+            hi = len(ts) if end_ms is None else int(np.searchsorted(ts, end_ms, side="left"))
+            mask = np.ones(hi - lo, dtype=bool)
+            if snapshot_ts is not None:
+                mask &= np.isin(ts[lo:hi], np.asarray(list(snapshot_ts), dtype=np.int64))
+            out = {}
+            for c in set(columns) | ({"expiry"} if expiry is not None else set()):
+                if c in CATEGORY_COLUMNS:
+                    out[c] = pd.Categorical.from_codes(data[c][lo:hi], categories=data[c + "__dict"])
+                else:
+                    out[c] = data[c][lo:hi]
+            df = pd.DataFrame(out)
+            if expiry is not None:
+                mask &= (df["expiry"] == expiry).to_numpy()
+            return df.loc[mask, columns].reset_index(drop=True)
+
+    def read(self, underlying: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+             expiry: Optional[str] = None, columns: Optional[List[str]] = None,
+             snapshot_ts: Optional[Sequence[int]] = None) -> pd.DataFrame:
+        """
+        Stored rows with snapshot_ts in [start_ms, end_ms), oldest first
+
+        These are the recorded rows (keyframes and diffs, see ``op``); use
+        ``as_of`` for whole chains. Only segments overlapping the range are
+        opened, and only ``columns`` are read from them.
+        """
+        columns = columns or list(STORED_COLUMNS)
+        frames = []
+        for first, last, path in self.segments(underlying):
+            if (start_ms is not None and last < start_ms) or (end_ms is not None and first >= end_ms):
+                continue
+            if snapshot_ts is not None and not any(first <= t <= last for t in snapshot_ts):
+                continue
+            df = self._load(path, columns, start_ms, end_ms, snapshot_ts, expiry)
+            if len(df):
+                frames.append(df)
+        if not frames:
+            empty = pd.DataFrame({c: pd.Series(dtype={"snapshot_ts": "int64", "op": "int8"}.get(c, "float64"))
+                                  for c in STORED_COLUMNS})
+            return _typed(empty)[columns]
+        df = _concat(frames)
+        return df.sort_values([c for c in SORT_KEY if c in df], kind="mergesort").reset_index(drop=True)
+
+    def _segment_keys(self, path: Path) -> pd.DataFrame:
+        """Distinct (snapshot_ts, expiry) pairs of a segment, expiry as str, and whether each is a keyframe"""
+        keys = self._keys.get(path)
+        if keys is None:
+            rows = self._load(path, ["snapshot_ts", "expiry", "op"])
+            rows = rows.assign(expiry=rows["expiry"].astype(str), keyframe=rows["op"] == OP_KEYFRAME)
+            keys = rows.groupby(["snapshot_ts", "expiry"], sort=True)["keyframe"].any().reset_index()
+            with self._lock:
+                self._keys[path] = keys
+        return keys
+
+    def snapshot_times(self, underlying: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                       expiry: Optional[str] = None) -> List[int]:
+        """Distinct snapshot times in [start_ms, end_ms)"""
+        ts = self.read(underlying, start_ms, end_ms, expiry, columns=["snapshot_ts"])["snapshot_ts"]
+        return [int(t) for t in ts.unique()]
+
+    def as_of(self, underlying: str, ts: Union[int, dt.datetime, str], expiry: Optional[str] = None,
+              max_age_ms: int = DEFAULT_MAX_AGE_MS) -> pd.DataFrame:
+        """
+        The chain as it was known at ``ts``
+
+        Each expiry comes from its latest snapshot at or before ``ts`` (and no
+        older than ``max_age_ms``); expiries already past at ``ts`` are left out.
+        A snapshot stored as a diff is rebuilt from the expiry's last keyframe
+        and the diffs since. The snapshots are chosen from the (snapshot_ts,
+        expiry) keys of the segments, read once per segment and cached, and
+        only the rows from each keyframe on are then loaded.
+
+        Args:
+            underlying: Underlying symbol
+            ts: Point in time (epoch ms, datetime or ISO string; naive = UTC)
+            expiry: Only this expiry (YYYY-MM-DD)
+            max_age_ms: Oldest snapshot considered, relative to ``ts``
+
+        Returns:
+            Chain rows as of the chosen snapshots, sorted by (expiry, right, strike)
+        """
+        ts_ms = _to_ms(ts)
+        start_ms = ts_ms - max_age_ms
+        found: List[pd.DataFrame] = []
+        latest = keyframes = None
+        # Newest segments first: all that reach into the window, then older ones until each expiry has a keyframe
+        for first, last, path in reversed(self.segments(underlying)):
+            if first > ts_ms:
+                continue
+            if last < start_ms:
+                if latest is None:
+                    latest = self._latest(found, start_ms)
+                    keyframes = self._keyframes(found, latest)
+                if len(keyframes) == len(latest):
+                    break
+            keys = self._segment_keys(path)
+            keys = keys[(keys["snapshot_ts"] <= ts_ms) & (keys["expiry"] >= _day(ts_ms))]
+            found.append(keys if expiry is None else keys[keys["expiry"] == expiry])
+            if latest is not None:
+                keyframes = self._keyframes(found, latest)
+        if latest is None:
+            latest = self._latest(found, start_ms)
+            keyframes = self._keyframes(found, latest)
+        if keyframes is None or keyframes.empty:
+            return self.read(underlying, 0, 0).drop(columns=["op"])
+        latest = latest[keyframes.index]  # an expiry without a keyframe (partial history) cannot be rebuilt
+
+        rows = self.read(underlying, int(keyframes.min()), int(latest.max()) + 1, expiry)
+        categories = rows["expiry"].cat.categories
+        codes = rows["expiry"].cat.codes.to_numpy()
+        t = rows["snapshot_ts"].to_numpy()
+        lo = keyframes.reindex(categories).fillna(-1).to_numpy(np.int64)[codes]
+        hi = latest.reindex(categories).fillna(-2).to_numpy(np.int64)[codes]
+        rows = rows[(t >= lo) & (t <= hi)]
+        spots = rows[rows["snapshot_ts"].to_numpy() == hi[(t >= lo) & (t <= hi)]]
+        spots = spots.groupby("expiry", observed=True)["spot"].first()
+        rows = rows[rows["op"] != OP_HEARTBEAT]
+        rows = rows.drop_duplicates("contract", keep="last")  # rows are in time order: the newest state wins
+        rows = rows[rows["op"] != OP_REMOVE].drop(columns=["op"])
+        expiries = rows["expiry"].astype(object)
+        rows = rows.assign(snapshot_ts=expiries.map(latest).astype(np.int64),
+                           spot=expiries.map(spots).astype(np.float64))
+        return rows.sort_values(["expiry", "right", "strike"], kind="mergesort").reset_index(drop=True)
+
+    @staticmethod
+    def _latest(found: List[pd.DataFrame], start_ms: int) -> pd.Series:
+        """Newest snapshot_ts per expiry at or after start_ms"""
+        keys = pd.concat(found, ignore_index=True) if found else pd.DataFrame(
+            {"snapshot_ts": pd.Series(dtype="int64"), "expiry": pd.Series(dtype=object)})
+        return keys[keys["snapshot_ts"] >= start_ms].groupby("expiry")["snapshot_ts"].max()
+
+    @staticmethod
+    def _keyframes(found: List[pd.DataFrame], latest: pd.Series) -> pd.Series:
+        """Newest keyframe snapshot_ts per expiry at or before its latest snapshot"""
+        keys = pd.concat(found, ignore_index=True) if found else pd.DataFrame(
+            {"snapshot_ts": pd.Series(dtype="int64"), "expiry": pd.Series(dtype=object),
+             "keyframe": pd.Series(dtype=bool)})
+        keys = keys[keys["keyframe"] & keys["expiry"].isin(latest.index)]
+        keys = keys[keys["snapshot_ts"].to_numpy() <= latest.reindex(keys["expiry"]).to_numpy()]
+        return keys.groupby("expiry")["snapshot_ts"].max()
+
+    def compact(self, underlying: str, day: str) -> Optional[Path]:
+        """Merge one day's segments into a single segment; returns its path (None if nothing to merge)"""
+        parts = [p for _, _, p in self.segments(underlying) if p.parent.name == day]
+        if len(parts) < 2:
+            return None
+        frame = _concat([self._load(p) for p in parts])
+        frame = frame.sort_values(SORT_KEY, kind="mergesort").reset_index(drop=True)
+        merged = self._save(underlying, frame)
+        for p in parts:
+            p.unlink()
+        with self._lock:
+            self._index.pop(underlying, None)
+            for p in parts:
+                self._keys.pop(p, None)
+        return merged
+
+
+class ChainRecorder:
+    """
+    Buffers fetched chains and appends them to a ChainSnapshotStore
+
+    The recorder listens to a ChainCache: each fetched expiry is written
+    as a keyframe the first time and every ``keyframe_every`` snapshots,
+    and otherwise as the rows of its diff (a heartbeat row carrying the
+    fetch time and spot when it did not change).
+
+    Args:
+        store: Snapshot store (default: ``DEFAULT_ROOT``)
+        flush_snapshots: Buffered snapshots that trigger a write
+        flush_interval: Seconds after which a non-empty buffer is written on the next record
+        keyframe_every: Snapshots of an expiry between full-chain keyframes (1 = no diffs)
+        cache: ChainCache to record the updates of (default: a private one)
+    """
+
+    def __init__(self, store: Optional[ChainSnapshotStore] = None, flush_snapshots: int = 50,
+                 flush_interval: float = 300.0, keyframe_every: int = 30, cache=None):
+        from .chain_diff import ChainCache
+
+        self.store = store or ChainSnapshotStore()
+        self.flush_snapshots = flush_snapshots
+        self.flush_interval = flush_interval
+        self.keyframe_every = max(1, keyframe_every)
+        self.cache = cache if cache is not None else ChainCache()
+        self.recorded = 0
+        self.rows_seen = 0          # contracts in the recorded chains
+        self.rows_written = 0       # rows buffered for the store (keyframes + diffs)
+        self._pending: Dict[str, List[Tuple[int, float, pd.DataFrame]]] = {}
+        self._since_keyframe: Dict[Tuple[str, str], int] = {}
+        self._count = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.cache.add_listener(self._on_diff)
+
+    def record(self, underlying: str, quotes: Union[Sequence[OptionQuote], pd.DataFrame],
+               ts: Optional[Union[int, dt.datetime]] = None, spot: Optional[float] = None) -> int:
+        """
+        Record one fetched chain (through the cache, which hands back its diff)
+
+        Args:
+            underlying: Underlying symbol
+            quotes: OptionQuotes or a chain frame
+            ts: Fetch time (default: the newest quote timestamp, else now)
+            spot: Underlying price at the fetch
+
+        Returns:
+            Contracts recorded
+        """
+        if not isinstance(quotes, pd.DataFrame):
+            if not quotes:
+                return 0
+            if ts is None:
+                stamps = [q.timestamp for q in quotes if q.timestamp is not None]
+                ts = max(stamps) if stamps else None
+        elif quotes.empty:
+            return 0
+        self.cache.update(underlying, quotes, _now_ms() if ts is None else ts, spot)
+        return len(quotes)
+
+    def _on_diff(self, diff) -> None:
+        """Buffer a published diff: keyframe rows or change rows per expiry"""
+        parts = []
+        expiries = diff.chain["expiry"].astype(str) if diff.chain is not None else None
+        rows = None
+        with self._lock:
+            for expiry in diff.expiries:
+                key = (diff.underlying, expiry)
+                n = self._since_keyframe.get(key)
+                if n is None or n + 1 >= self.keyframe_every:
+                    self._since_keyframe[key] = 0
+                    parts.append(diff.chain[(expiries == expiry).to_numpy()])
+                else:
+                    self._since_keyframe[key] = n + 1
+                    if rows is None:
+                        rows = diff.rows() if not diff.empty else diff.chain.iloc[:0].assign(op=np.int8(OP_UPSERT))
+                    changed = rows[(rows["expiry"].astype(str) == expiry).to_numpy()]
+                    parts.append(changed if len(changed) else _heartbeat(expiry))
+            parts = [p.assign(op=p["op"] if "op" in p else np.int8(OP_KEYFRAME)) for p in parts if len(p)]
+            frame = _concat(parts) if parts else None
+            self.recorded += 1
+            self.rows_seen += 0 if diff.chain is None else len(diff.chain)
+            if frame is not None:
+                self.rows_written += len(frame)
+                self._pending.setdefault(diff.underlying, []).append((diff.ts, diff.spot, frame))
+                self._count += 1
+            due = (self._count >= self.flush_snapshots
+                   or (self._count and time.monotonic() - self._last_flush >= self.flush_interval))
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write buffered snapshots; returns the number written"""
+        with self._lock:
+            pending, self._pending, self._count = self._pending, {}, 0
+            self._last_flush = time.monotonic()
+        written = 0
+        for underlying, snapshots in pending.items():
+            self.store.append(underlying, snapshots)
+            written += len(snapshots)
+        return written
+
+    def close(self):
+        self.flush()
+        self.cache.remove_listener(self._on_diff)
+
+    def __enter__(self) -> "ChainRecorder":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HistoricalChainProvider:
+    """
+    Chain provider over recorded snapshots, frozen at one point in time
+
+    Implements ChainProviderProtocol, so it can stand in for the live
+    provider (e.g. ``OptionsChainIntegrator(chain_provider=...)``) in
+    backtests and post-trade analysis.
+
+    Args:
+        store: Snapshot store
+        as_of: Point in time the chains are served as of (movable via ``as_of`` attribute)
+        max_age_ms: Oldest snapshot considered
+    """
+
+    def __init__(self, store: ChainSnapshotStore, as_of: Union[int, dt.datetime, str],
+                 max_age_ms: int = DEFAULT_MAX_AGE_MS):
+        self.store = store
+        self.as_of = _to_ms(as_of)
+        self.max_age_ms = max_age_ms
+
+    def is_available(self) -> bool:
+        return True
+
+    def get_chain(self, symbol: str, expiry: Optional[str] = None, right: Optional[str] = None) -> List[OptionQuote]:
+        """Chain of ``symbol`` as of ``self.as_of``; an unrecorded expiry falls back to the nearest recorded one"""
+        frame = self.store.as_of(symbol.upper(), self.as_of, max_age_ms=self.max_age_ms)
+        if frame.empty:
+            return []
+        expiries = sorted(frame["expiry"].astype(str).unique())
+        if expiry is None:
+            target = expiries[0]
+        elif expiry in expiries:
+            target = expiry
+        else:
+            wanted = pd.Timestamp(expiry)
+            target = min(expiries, key=lambda e: abs((pd.Timestamp(e) - wanted).days))
+        frame = frame[frame["expiry"].astype(str) == target]
+        if right is not None:
+            frame = frame[frame["right"].astype(str) == right]
+        return frame_quotes(frame, symbol.upper())
+
+    def get_spot_price(self, symbol: str) -> Optional[float]:
+        """Underlying price recorded with the newest snapshot at ``self.as_of``"""
+        frame = self.store.as_of(symbol.upper(), self.as_of, max_age_ms=self.max_age_ms)
+        frame = frame.dropna(subset=["spot"])
+        if frame.empty:
+            return None
+        return float(frame.loc[frame["snapshot_ts"].idxmax(), "spot"])
+
+
+_recorder: Optional[ChainRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_chain_recorder() -> Optional[ChainRecorder]:
+    """The process-wide recorder, or None unless EMO_CHAIN_SNAPSHOTS is enabled"""
+    global _recorder
+    if os.getenv("EMO_CHAIN_SNAPSHOTS", "0").lower() not in ("1", "true", "yes", "on"):
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            import atexit
+            root = os.getenv("EMO_CHAIN_SNAPSHOT_DIR")
+            from .chain_diff import get_chain_cache
+            _recorder = ChainRecorder(ChainSnapshotStore(root) if root else None, cache=get_chain_cache())
+            atexit.register(_recorder.close)
+        return _recorder
+
+
+def main():
+    """Print a recorded chain as of a point in time, or compact a day"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Read recorded options chain snapshots")
+    parser.add_argument("underlying")
+    parser.add_argument("--as-of", help="UTC time (ISO); default now")
+    parser.add_argument("--expiry", help="Only this expiry (YYYY-MM-DD)")
+    parser.add_argument("--root", default=os.getenv("EMO_CHAIN_SNAPSHOT_DIR", str(DEFAULT_ROOT)))
+    parser.add_argument("--compact", metavar="DAY", help="Merge the segments of a day (YYYY-MM-DD) instead")
+    args = parser.parse_args()
+
+    store = ChainSnapshotStore(args.root)
+    underlying = args.underlying.upper()
+    if args.compact:
+        merged = store.compact(underlying, args.compact)
+        print(f"{underlying} {args.compact}: {'merged into ' + str(merged) if merged else 'nothing to merge'}")
+        return
+    chain = store.as_of(underlying, args.as_of or _now_ms(), args.expiry)
+    if chain.empty:
+        print(f"No snapshots of {underlying} at {args.as_of or 'now'}")
+        return
+    print(chain.drop(columns=["spot"]).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -219,7 +219,8 @@ def stage_trade(
     trade_plan: Dict[str, Any], 
     meta: Optional[Dict[str, Any]] = None,
     validate: bool = True,
-    backup: bool = True
+    backup: bool = True,
+    staging_dir: Optional[pathlib.Path] = None
 ) -> pathlib.Path:
     """
     Enhanced trade staging with validation and metadata
@@ -229,6 +230,7 @@ def stage_trade(
         meta: Additional metadata
         validate: Whether to validate trade plan
         backup: Whether to create backup copy
+        staging_dir: Override staging directory (default: DEFAULT_DIR)
     
     Returns:
         Path to staged trade file
@@ -247,16 +249,18 @@ def stage_trade(
                 raise ValueError(error_msg)
         
         # Ensure staging directory exists
-        ensure_dir(DEFAULT_DIR)
+        target_dir = pathlib.Path(staging_dir) if staging_dir else DEFAULT_DIR
+        backup_dir = target_dir / "backup" if staging_dir else BACKUP_DIR
+        ensure_dir(target_dir)
         if backup:
-            ensure_dir(BACKUP_DIR)
+            ensure_dir(backup_dir)
         
         # Generate unique filename
         uid = uuid.uuid4().hex[:8]
         symbol = trade_plan.get("symbol", "UNKNOWN").replace("/", "_")
         timestamp = int(time.time())
         filename = f"{timestamp}_{symbol}_{uid}.json"
-        filepath = DEFAULT_DIR / filename
+        filepath = target_dir / filename
         
         # Create enhanced metadata
         now = datetime.utcnow()
@@ -301,7 +305,7 @@ def stage_trade(
         
         # Create backup if requested
         if backup:
-            backup_path = BACKUP_DIR / filename
+            backup_path = backup_dir / filename
             with open(backup_path, "w", encoding="utf-8") as f:
                 json.dump(payload, f, indent=2, default=str)
             logger.debug(f"Created backup: {backup_path}")
@@ -1,6 +1,8 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Mapping, Tuple
+
+from .indicators import DEFAULT_INDICATOR_SPECS, IndicatorBank, IndicatorStateStore, trend_from_zscore
 
 @dataclass
 class Order:
@@ -26,9 +28,12 @@ class Order:
 
 class Strategy:
     name: str = "base"
+    indicator_specs: Dict[str, Tuple[str, Dict[str, Any]]] = DEFAULT_INDICATOR_SPECS
 
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         self.config = config or {}
+        self.indicators = IndicatorBank(self.indicator_specs)
+        self._state_store: Optional[IndicatorStateStore] = None
         self.performance_metrics = {
             "total_trades": 0,
             "winning_trades": 0,
@@ -36,9 +41,38 @@ class Strategy:
             "max_drawdown": 0.0
         }
 
-    def warmup(self, market_data: Any) -> None:
-        """Optional pre-compute indicators."""
-        return
+    def warmup(self, market_data: Any = None, state_store: Optional[IndicatorStateStore] = None) -> None:
+        """
+        Build streaming indicator state once, before per-bar updates begin.
+
+        Args:
+            market_data: Mapping of symbol -> bar history (list of bar dicts or
+                DataFrame). Bars already covered by persisted state are skipped.
+            state_store: Optional store to resume from and persist to
+        """
+        if state_store is not None:
+            self._state_store = state_store
+            self.indicators.load(state_store, self.name)
+        if isinstance(market_data, Mapping):
+            self.indicators.warmup(market_data)
+        self.save_indicator_state()
+
+    def on_bar(self, symbol: str, bar: Mapping[str, Any]) -> Dict[str, Optional[float]]:
+        """Update indicators for ``symbol`` with one new bar and return current values."""
+        return self.indicators.update(symbol, bar)
+
+    def indicator_values(self, symbol: str) -> Dict[str, Optional[float]]:
+        """Latest indicator values for ``symbol`` (None while warming up)."""
+        return self.indicators.values(symbol)
+
+    def indicator_trend(self, symbol: str) -> Optional[str]:
+        """Trend label from the streaming zscore_20 (None until warmed up; see trend_from_zscore)."""
+        return trend_from_zscore(self.indicator_values(symbol).get("zscore_20"))
+
+    def save_indicator_state(self) -> None:
+        """Persist indicator state if a store was provided at warmup."""
+        if self._state_store is not None and self.indicators.sets:
+            self.indicators.save(self._state_store, self.name)
 
     def generate(self, snapshot: Dict[str, Any]) -> List[Order]:
         """
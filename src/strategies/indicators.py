@@ -0,0 +1,692 @@
+"""
+Streaming Indicators
+O(1)-per-bar technical indicators with serializable state.
+
+Each indicator keeps just enough state (running sums, EMA values, a bounded
+window deque) to update from a single new bar, and can round-trip its state
+through plain JSON so strategies can resume after a restart without replaying
+history.
+
+Includes:
+- EMA, RollingMean, RollingStd
+- RSI (simple-average variant, matching src/ml/features.add_core_features)
+- MACD (histogram = macd - signal, matching the ML ``macd`` feature)
+- ATR, ZScore, RealizedVol
+- IndicatorSet: named indicators for one symbol
+- IndicatorBank: per-symbol indicator sets with warmup/update/persist
+- IndicatorStateStore: JSON file store for bank state
+- trend_from_zscore / SIGNAL_TRENDS: trend labels strategies read from zscore_20
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple, Type
+
+# Name -> (kind, params); used when a strategy does not define its own specs
+DEFAULT_INDICATOR_SPECS: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    "ema_20": ("ema", {"span": 20}),
+    "rsi_14": ("rsi", {"period": 14}),
+    "macd": ("macd", {}),
+    "atr_14": ("atr", {"period": 14}),
+    "zscore_20": ("zscore", {"window": 20}),
+    "realized_vol_20": ("realized_vol", {"window": 20}),
+}
+
+_BAR_FIELDS = {
+    "close": ("close", "c", "price", "current_price"),
+    "high": ("high", "h"),
+    "low": ("low", "l"),
+    "ts": ("ts", "t", "timestamp", "time"),
+}
+
+
+# Labels of trend_from_zscore as used by the signals strategies (md["trend"])
+SIGNAL_TRENDS = {
+    "strong_bullish": "up",
+    "bullish": "mixed",
+    "neutral": "sideways",
+    "bearish": "mixed",
+    "strong_bearish": "down",
+}
+
+
+def trend_from_zscore(z: Optional[float], weak: float = 0.5, strong: float = 1.5) -> Optional[str]:
+    """
+    Trend label from the close's z-score against its rolling mean
+
+    Returns:
+        "strong_bullish", "bullish", "neutral", "bearish" or "strong_bearish";
+        None while the z-score is still warming up
+    """
+    if z is None:
+        return None
+    if z > strong:
+        return "strong_bullish"
+    if z < -strong:
+        return "strong_bearish"
+    if abs(z) < weak:
+        return "neutral"
+    return "bullish" if z > 0 else "bearish"
+
+
+def bar_field(bar: Mapping[str, Any], field: str, default: Any = None) -> Any:
+    """Read a bar field accepting the short (c/h/l/t) and long column names"""
+    for key in _BAR_FIELDS.get(field, (field,)):
+        if key in bar and bar[key] is not None:
+            return bar[key]
+    return default
+
+
+def ts_key(ts: Any) -> Optional[float]:
+    """Normalize a bar timestamp (datetime, ISO string, epoch s/ms) to epoch seconds"""
+    if ts is None:
+        return None
+    if hasattr(ts, "timestamp"):
+        if getattr(ts, "tzinfo", None) is None and isinstance(ts, datetime):
+            ts = ts.replace(tzinfo=timezone.utc)
+        return float(ts.timestamp())
+    if isinstance(ts, (int, float)):
+        # Millisecond epochs (enhanced_bars.t) are far larger than second epochs
+        return float(ts) / 1000.0 if ts > 1e11 else float(ts)
+    try:
+        dt = datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class StreamingIndicator:
+    """Base class: ``update`` consumes one value, ``value`` is None until ready"""
+
+    kind: str = "base"
+    source: str = "close"
+
+    def update(self, x: float) -> Optional[float]:
+        raise NotImplementedError
+
+    def update_bar(self, bar: Mapping[str, Any]) -> Optional[float]:
+        x = bar_field(bar, self.source)
+        if x is None:
+            return self.value
+        return self.update(float(x))
+
+    @property
+    def value(self) -> Optional[float]:
+        raise NotImplementedError
+
+    @property
+    def ready(self) -> bool:
+        return self.value is not None
+
+    def params(self) -> Dict[str, Any]:
+        return {}
+
+    def get_state(self) -> Dict[str, Any]:
+        return {}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        return
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "params": self.params(), "state": self.get_state()}
+
+    @staticmethod
+    def from_state(payload: Dict[str, Any]) -> "StreamingIndicator":
+        ind = make_indicator(payload["kind"], payload.get("params", {}))
+        ind.set_state(payload.get("state", {}))
+        return ind
+
+
+class EMA(StreamingIndicator):
+    """Exponential moving average, equivalent to pandas ``ewm(span, adjust=False)``"""
+
+    kind = "ema"
+
+    def __init__(self, span: int = 20):
+        self.span = int(span)
+        self.alpha = 2.0 / (self.span + 1.0)
+        self._value: Optional[float] = None
+        self.count = 0
+        self._gap = 0  # missing observations since the last update
+
+    def update(self, x: float) -> Optional[float]:
+        if self._value is None:
+            self._value = x
+        elif self._gap:
+            # pandas (ignore_na=False) keeps decaying the old mean across missing values
+            old_wt = (1.0 - self.alpha) ** (self._gap + 1)
+            self._value = (old_wt * self._value + self.alpha * x) / (old_wt + self.alpha)
+        else:
+            self._value = self.alpha * x + (1.0 - self.alpha) * self._value
+        self._gap = 0
+        self.count += 1
+        return self._value
+
+    def skip(self) -> Optional[float]:
+        """Record a missing observation (NaN input); the value carries forward"""
+        if self._value is not None:
+            self._gap += 1
+        return self._value
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._value
+
+    def params(self) -> Dict[str, Any]:
+        return {"span": self.span}
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"value": self._value, "count": self.count, "gap": self._gap}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self._value = state.get("value")
+        self.count = int(state.get("count", 0))
+        self._gap = int(state.get("gap", 0))
+
+
+class RollingMean(StreamingIndicator):
+    """Simple moving average over a fixed window (None until the window is full)"""
+
+    kind = "rolling_mean"
+
+    def __init__(self, window: int = 20):
+        self.window = int(window)
+        self.buf: deque = deque(maxlen=self.window)
+        self.total = 0.0
+        self._since_resum = 0
+
+    def update(self, x: float) -> Optional[float]:
+        if len(self.buf) == self.window:
+            self.total -= self.buf[0]
+        self.buf.append(x)
+        self.total += x
+        # Re-sum once per window so floating point drift stays bounded (amortized O(1))
+        self._since_resum += 1
+        if self._since_resum >= self.window:
+            self.total = math.fsum(self.buf)
+            self._since_resum = 0
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        if len(self.buf) < self.window:
+            return None
+        return self.total / self.window
+
+    def params(self) -> Dict[str, Any]:
+        return {"window": self.window}
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"buf": list(self.buf)}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.buf = deque(state.get("buf", []), maxlen=self.window)
+        self.total = math.fsum(self.buf)
+        self._since_resum = 0
+
+
+class RollingStd(StreamingIndicator):
+    """Rolling standard deviation (Welford add/remove), pandas ``rolling(window).std(ddof)``"""
+
+    kind = "rolling_std"
+
+    def __init__(self, window: int = 20, ddof: int = 1):
+        self.window = int(window)
+        self.ddof = int(ddof)
+        self.buf: deque = deque(maxlen=self.window)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._same = 0  # trailing run of identical values
+
+    def update(self, x: float) -> Optional[float]:
+        self._same = self._same + 1 if self.buf and x == self.buf[-1] else 1
+        if len(self.buf) == self.window:
+            old = self.buf[0]
+            n = len(self.buf)
+            if n == 1:
+                self.mean, self.m2 = 0.0, 0.0
+            else:
+                old_mean = self.mean
+                self.mean = (n * old_mean - old) / (n - 1)
+                self.m2 -= (old - old_mean) * (old - self.mean)
+        self.buf.append(x)
+        n = len(self.buf)
+        delta = x - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (x - self.mean)
+        return self.value
+
+    @property
+    def variance(self) -> Optional[float]:
+        n = len(self.buf)
+        if n < self.window or n - self.ddof <= 0:
+            return None
+        # Constant window: exactly 0 like pandas, not the add/remove residue
+        if self._same >= n:
+            return 0.0
+        return max(0.0, self.m2 / (n - self.ddof))
+
+    @property
+    def value(self) -> Optional[float]:
+        var = self.variance
+        return None if var is None else math.sqrt(var)
+
+    def params(self) -> Dict[str, Any]:
+        return {"window": self.window, "ddof": self.ddof}
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"buf": list(self.buf)}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.buf = deque(maxlen=self.window)
+        self.mean, self.m2 = 0.0, 0.0
+        self._same = 0
+        for x in state.get("buf", []):
+            self.update(float(x))
+
+
+class RSI(StreamingIndicator):
+    """
+    Relative Strength Index using simple averages of gains and losses
+
+    This is the same definition add_core_features uses, so strategy and ML
+    views of RSI agree. Returns 100 when there were no losses in the window.
+    """
+
+    kind = "rsi"
+
+    def __init__(self, period: int = 14):
+        self.period = int(period)
+        self.gains = RollingMean(self.period)
+        self.losses = RollingMean(self.period)
+        self.prev: Optional[float] = None
+
+    def update(self, x: float) -> Optional[float]:
+        if self.prev is not None:
+            chg = x - self.prev
+            self.gains.update(max(chg, 0.0))
+            self.losses.update(max(-chg, 0.0))
+        self.prev = x
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        gain, loss = self.gains.value, self.losses.value
+        if gain is None or loss is None:
+            return None
+        if loss == 0:
+            return 100.0 if gain > 0 else 50.0
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+    def params(self) -> Dict[str, Any]:
+        return {"period": self.period}
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"prev": self.prev, "gains": self.gains.get_state(), "losses": self.losses.get_state()}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.prev = state.get("prev")
+        self.gains.set_state(state.get("gains", {}))
+        self.losses.set_state(state.get("losses", {}))
+
+
+class MACD(StreamingIndicator):
+    """MACD line, signal line and histogram; ``value`` is the histogram"""
+
+    kind = "macd"
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast, self.slow, self.signal_span = int(fast), int(slow), int(signal)
+        self.ema_fast = EMA(self.fast)
+        self.ema_slow = EMA(self.slow)
+        self.ema_signal = EMA(self.signal_span)
+
+    def update(self, x: float) -> Optional[float]:
+        line = self.ema_fast.update(x) - self.ema_slow.update(x)
+        self.ema_signal.update(line)
+        return self.value
+
+    def skip(self) -> Optional[float]:
+        """Record a missing price; the signal EMA still sees the carried MACD line"""
+        self.ema_fast.skip()
+        self.ema_slow.skip()
+        if self.macd is not None:
+            self.ema_signal.update(self.macd)
+        return self.value
+
+    @property
+    def macd(self) -> Optional[float]:
+        if self.ema_fast.value is None:
+            return None
+        return self.ema_fast.value - self.ema_slow.value
+
+    @property
+    def signal(self) -> Optional[float]:
+        return self.ema_signal.value
+
+    @property
+    def value(self) -> Optional[float]:
+        if self.macd is None:
+            return None
+        return self.macd - self.signal
+
+    @property
+    def ready(self) -> bool:
+        return self.ema_slow.count >= self.slow
+
+    def params(self) -> Dict[str, Any]:
+        return {"fast": self.fast, "slow": self.slow, "signal": self.signal_span}
+
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            "fast": self.ema_fast.get_state(),
+            "slow": self.ema_slow.get_state(),
+            "signal": self.ema_signal.get_state(),
+        }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.ema_fast.set_state(state.get("fast", {}))
+        self.ema_slow.set_state(state.get("slow", {}))
+        self.ema_signal.set_state(state.get("signal", {}))
+
+
+class ATR(StreamingIndicator):
+    """Average True Range (simple average of true range over ``period`` bars)"""
+
+    kind = "atr"
+
+    def __init__(self, period: int = 14):
+        self.period = int(period)
+        self.tr = RollingMean(self.period)
+        self.prev_close: Optional[float] = None
+
+    def update_hlc(self, high: float, low: float, close: float) -> Optional[float]:
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.tr.update(tr)
+        self.prev_close = close
+        return self.value
+
+    def update(self, x: float) -> Optional[float]:
+        # Close-only feeds degrade to average absolute close-to-close change
+        return self.update_hlc(x, x, x)
+
+    def update_bar(self, bar: Mapping[str, Any]) -> Optional[float]:
+        close = bar_field(bar, "close")
+        if close is None:
+            return self.value
+        close = float(close)
+        high = float(bar_field(bar, "high", close))
+        low = float(bar_field(bar, "low", close))
+        return self.update_hlc(high, low, close)
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.tr.value
+
+    def params(self) -> Dict[str, Any]:
+        return {"period": self.period}
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"prev_close": self.prev_close, "tr": self.tr.get_state()}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.prev_close = state.get("prev_close")
+        self.tr.set_state(state.get("tr", {}))
+
+
+class ZScore(StreamingIndicator):
+    """Distance of the latest value from its rolling mean, in rolling std units"""
+
+    kind = "zscore"
+
+    def __init__(self, window: int = 20):
+        self.window = int(window)
+        self.std = RollingStd(self.window)
+        self.last: Optional[float] = None
+
+    def update(self, x: float) -> Optional[float]:
+        self.std.update(x)
+        self.last = x
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        sd = self.std.value
+        if sd is None or self.last is None:
+            return None
+        if sd == 0:
+            return 0.0
+        return (self.last - self.std.mean) / sd
+
+    def params(self) -> Dict[str, Any]:
+        return {"window": self.window}
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"last": self.last, "std": self.std.get_state()}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.last = state.get("last")
+        self.std.set_state(state.get("std", {}))
+
+
+class RealizedVol(StreamingIndicator):
+    """Rolling std of simple returns; optionally annualized by sqrt(periods_per_year)"""
+
+    kind = "realized_vol"
+
+    def __init__(self, window: int = 20, annualize: bool = False, periods_per_year: int = 252):
+        self.window = int(window)
+        self.annualize = bool(annualize)
+        self.periods_per_year = int(periods_per_year)
+        self.std = RollingStd(self.window)
+        self.prev: Optional[float] = None
+
+    def update(self, x: float) -> Optional[float]:
+        if self.prev is not None and self.prev != 0:
+            self.std.update(x / self.prev - 1.0)
+        self.prev = x
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        sd = self.std.value
+        if sd is None:
+            return None
+        return sd * math.sqrt(self.periods_per_year) if self.annualize else sd
+
+    def params(self) -> Dict[str, Any]:
+        return {"window": self.window, "annualize": self.annualize,
+                "periods_per_year": self.periods_per_year}
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"prev": self.prev, "std": self.std.get_state()}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.prev = state.get("prev")
+        self.std.set_state(state.get("std", {}))
+
+
+INDICATORS: Dict[str, Type[StreamingIndicator]] = {
+    cls.kind: cls for cls in (EMA, RollingMean, RollingStd, RSI, MACD, ATR, ZScore, RealizedVol)
+}
+
+
+def make_indicator(kind: str, params: Optional[Dict[str, Any]] = None) -> StreamingIndicator:
+    """Instantiate an indicator by kind name"""
+    if kind not in INDICATORS:
+        raise KeyError(f"Unknown indicator: {kind}. Available: {', '.join(INDICATORS)}")
+    return INDICATORS[kind](**(params or {}))
+
+
+class IndicatorSet:
+    """Named indicators for a single symbol plus the timestamp of the last bar seen"""
+
+    def __init__(self, specs: Optional[Mapping[str, Tuple[str, Dict[str, Any]]]] = None):
+        specs = DEFAULT_INDICATOR_SPECS if specs is None else specs
+        self.indicators: Dict[str, StreamingIndicator] = {
+            name: make_indicator(kind, params) for name, (kind, params) in specs.items()
+        }
+        self.last_ts: Optional[float] = None
+        self.bars = 0
+
+    def update(self, bar: Mapping[str, Any]) -> Dict[str, Optional[float]]:
+        """Feed one bar; bars at or before ``last_ts`` are ignored"""
+        ts = ts_key(bar_field(bar, "ts"))
+        if ts is not None and self.last_ts is not None and ts <= self.last_ts:
+            return self.values()
+        for ind in self.indicators.values():
+            ind.update_bar(bar)
+        if ts is not None:
+            self.last_ts = ts
+        self.bars += 1
+        return self.values()
+
+    def values(self) -> Dict[str, Optional[float]]:
+        return {name: ind.value for name, ind in self.indicators.items()}
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "last_ts": self.last_ts,
+            "bars": self.bars,
+            "indicators": {name: ind.to_state() for name, ind in self.indicators.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "IndicatorSet":
+        inst = cls(specs={})
+        inst.indicators = {
+            name: StreamingIndicator.from_state(payload)
+            for name, payload in state.get("indicators", {}).items()
+        }
+        inst.last_ts = state.get("last_ts")
+        inst.bars = int(state.get("bars", 0))
+        return inst
+
+
+def _iter_bars(history: Any) -> Iterable[Mapping[str, Any]]:
+    """Accept a list of bar dicts or a pandas DataFrame (index used as ts when needed)"""
+    if hasattr(history, "to_dict") and hasattr(history, "columns"):
+        df = history
+        if not any(c in df.columns for c in _BAR_FIELDS["ts"]):
+            df = df.assign(ts=df.index)
+        return df.to_dict("records")
+    return history
+
+
+class IndicatorBank:
+    """Per-symbol IndicatorSets sharing one spec"""
+
+    def __init__(self, specs: Optional[Mapping[str, Tuple[str, Dict[str, Any]]]] = None):
+        self.specs = dict(DEFAULT_INDICATOR_SPECS if specs is None else specs)
+        self.sets: Dict[str, IndicatorSet] = {}
+
+    def _get(self, symbol: str) -> IndicatorSet:
+        if symbol not in self.sets:
+            self.sets[symbol] = IndicatorSet(self.specs)
+        return self.sets[symbol]
+
+    def warmup(self, history: Mapping[str, Any]) -> Dict[str, int]:
+        """
+        Replay history per symbol, skipping bars already reflected in loaded state
+
+        Args:
+            history: Mapping of symbol -> list of bar dicts or DataFrame
+
+        Returns:
+            Number of new bars applied per symbol
+        """
+        applied = {}
+        for symbol, bars in history.items():
+            iset = self._get(symbol)
+            before = iset.bars
+            for bar in _iter_bars(bars):
+                iset.update(bar)
+            applied[symbol] = iset.bars - before
+        return applied
+
+    def update(self, symbol: str, bar: Mapping[str, Any]) -> Dict[str, Optional[float]]:
+        return self._get(symbol).update(bar)
+
+    def values(self, symbol: str) -> Dict[str, Optional[float]]:
+        if symbol not in self.sets:
+            return {name: None for name in self.specs}
+        return self.sets[symbol].values()
+
+    def to_state(self) -> Dict[str, Any]:
+        return {symbol: iset.to_state() for symbol, iset in self.sets.items()}
+
+    def load_state(self, state: Mapping[str, Any]) -> None:
+        for symbol, payload in state.items():
+            iset = IndicatorSet.from_state(payload)
+            # Spec changed since the state was written: rebuild from history instead
+            if set(iset.indicators) != set(self.specs):
+                continue
+            self.sets[symbol] = iset
+
+    def save(self, store: "IndicatorStateStore", key: str) -> None:
+        store.save(key, self.to_state())
+
+    def load(self, store: "IndicatorStateStore", key: str) -> bool:
+        state = store.load(key)
+        if state:
+            self.load_state(state)
+        return bool(state)
+
+
+class IndicatorStateStore:
+    """JSON file holding indicator bank state per key (usually the strategy name)"""
+
+    def __init__(self, path: str | Path = "data/indicator_state.json"):
+        self.path = Path(path)
+
+    def _read(self) -> Dict[str, Any]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, key: str) -> Dict[str, Any]:
+        return self._read().get(key, {})
+
+    def save(self, key: str, state: Dict[str, Any]) -> None:
+        data = self._read()
+        data[key] = state
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+__all__ = [
+    "DEFAULT_INDICATOR_SPECS",
+    "StreamingIndicator",
+    "EMA",
+    "RollingMean",
+    "RollingStd",
+    "RSI",
+    "MACD",
+    "ATR",
+    "ZScore",
+    "RealizedVol",
+    "INDICATORS",
+    "make_indicator",
+    "IndicatorSet",
+    "IndicatorBank",
+    "IndicatorStateStore",
+    "bar_field",
+    "ts_key",
+]
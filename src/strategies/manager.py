@@ -1,7 +1,10 @@
 from __future__ import annotations
 import json
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable, Sequence
 from datetime import datetime
+
+import numpy as np
+
 from .base import Strategy, Order
 
 # Import risk management
@@ -11,14 +14,39 @@ ROOT = Path(__file__).resolve().parents[2]
 sys.path.append(str(ROOT))
 
 from src.logic.risk_manager import RiskManager, OrderIntent, PortfolioSnapshot
+from src.logic.allocator import RiskBudgetAllocator, TradeCandidate, AllocationLimits, AllocationResult
+from src.logic.position_sizer import (
+    equity_size_by_vol_batch,
+    credit_spread_contracts_batch,
+    correlation_scale_batch,
+)
+
+CREDIT_SPREAD_TYPES = ("iron_condor_open", "put_credit_spread_open")
 
 class StrategyManager:
-    def __init__(self, risk_manager: Optional[RiskManager] = None):
+    def __init__(
+        self,
+        risk_manager: Optional[RiskManager] = None,
+        allocator: Optional[RiskBudgetAllocator] = None,
+        greek_limits: Optional[Dict[str, float]] = None,
+    ):
         self._strategies: Dict[str, Strategy] = {}
         self._alloc: Dict[str, float] = {}  # weights 0..1 per strategy
         self.risk_manager = risk_manager or RiskManager()
+        # When set, decide() funds the best subset of the cycle's orders instead
+        # of approving them one by one in registration order
+        self.allocator = allocator
+        self.greek_limits: Dict[str, float] = dict(greek_limits or {})
+        self.last_allocation: Optional[AllocationResult] = None
         self.order_history: List[Dict[str, Any]] = []
+        self.max_contracts = 10
+        self.vol_lookback = 20
+        self._returns: Dict[str, np.ndarray] = {}
         
+    def update_returns(self, symbol: str, returns: Sequence[float]) -> None:
+        """Set the recent return series used for volatility sizing of stock orders."""
+        self._returns[symbol] = np.asarray(returns, dtype=float)[-self.vol_lookback:]
+
     def register(self, name: str, strat: Strategy, weight: float = 1.0):
         """Register a strategy with allocation weight."""
         self._strategies[name] = strat
@@ -73,28 +101,33 @@ class StrategyManager:
         
         # Apply risk management if portfolio provided
         if portfolio is not None:
-            filtered_orders = self._apply_risk_management(all_orders, portfolio)
+            if self.allocator is not None:
+                filtered_orders = self._allocate_orders(all_orders, portfolio)
+            else:
+                filtered_orders = self._apply_risk_management(all_orders, portfolio)
             print(f"[StrategyManager] Risk filtering: {len(all_orders)} -> {len(filtered_orders)} orders")
             return filtered_orders
         
         return all_orders
     
     def _apply_risk_management(self, orders: List[Order], portfolio: PortfolioSnapshot) -> List[Order]:
-        """Apply risk management to filter orders."""
+        """Size all orders in one batch, then filter them through the risk manager."""
         approved_orders = []
+        sized = self._size_orders(orders, portfolio)
         
-        for order in orders:
-            # Convert Order to OrderIntent for risk validation
-            order_intent = OrderIntent(
-                symbol=order.symbol,
-                side=order.side,
-                est_max_loss=self._estimate_max_loss(order),
-                est_value=self._estimate_order_value(order),
-                beta=order.meta.get("beta", 1.0) if order.meta else 1.0
-            )
+        for order, qty in zip(orders, sized):
+            if qty is not None and qty < order.qty:
+                if qty <= 0:
+                    violations = [f"Position sizing: no {order.type} size fits per-position risk budget"]
+                    self._log_order("REJECTED", order, violations)
+                    print(f"[StrategyManager] REJECTED {order.symbol} {order.side}: {violations[0]}")
+                    continue
+                order.meta = order.meta or {}
+                order.meta["requested_qty"] = order.qty
+                order.qty = int(qty)
             
             # Validate with risk manager
-            success, violations = self.risk_manager.validate_order(order_intent, portfolio)
+            success, violations = self.risk_manager.validate_order(self._order_intent(order), portfolio)
             
             if success:
                 approved_orders.append(order)
@@ -105,6 +138,152 @@ class StrategyManager:
         
         return approved_orders
     
+    def _order_intent(self, order: Order) -> OrderIntent:
+        """Convert an Order to the OrderIntent the risk manager validates."""
+        return OrderIntent(
+            symbol=order.symbol,
+            side=order.side,
+            est_max_loss=self._estimate_max_loss(order),
+            est_value=self._estimate_order_value(order),
+            beta=order.meta.get("beta", 1.0) if order.meta else 1.0
+        )
+    
+    def _allocate_orders(self, orders: List[Order], portfolio: PortfolioSnapshot) -> List[Order]:
+        """Choose the best subset and sizes of this cycle's orders under the risk budget."""
+        caps = self._size_orders(orders, portfolio)
+        candidates: List[TradeCandidate] = []
+        for i, (order, cap) in enumerate(zip(orders, caps)):
+            qty = int(order.qty) if cap is None else min(int(order.qty), cap)
+            if qty <= 0:
+                continue
+            per_unit = 1.0 / max(int(order.qty), 1)
+            meta = order.meta or {}
+            candidates.append(TradeCandidate(
+                key=str(i),
+                symbol=order.symbol,
+                expected_return=self._expected_return(order),
+                max_loss=self._estimate_max_loss(order) * per_unit,
+                value=self._estimate_order_value(order) * per_unit,
+                beta=float(meta.get("beta", 1.0)),
+                max_qty=qty,
+                greeks={k: float(v) for k, v in (meta.get("greeks") or {}).items()},
+                correlation=meta.get("avg_corr_to_book"),
+            ))
+        
+        limits = AllocationLimits.from_risk_manager(
+            self.risk_manager, portfolio, self.greek_limits,
+            greek_exposure=self.risk_manager._portfolio_greeks(portfolio),
+        )
+        result = self.allocator.allocate(candidates, limits)
+        self.last_allocation = result
+        
+        approved_orders = []
+        for i, order in enumerate(orders):
+            qty = result.quantities.get(str(i), 0)
+            if qty <= 0:
+                reason = result.rejected.get(str(i), "no size fits per-position risk budget")
+                self._log_order("REJECTED", order, [f"Allocator: {reason}"])
+                continue
+            if qty != order.qty:
+                order.meta = order.meta or {}
+                order.meta["requested_qty"] = order.qty
+                order.qty = qty
+            # The allocator plans against the same budgets, but the risk manager
+            # stays the final gate for every order that goes out
+            success, violations = self.risk_manager.validate_order(self._order_intent(order), portfolio)
+            if not success:
+                self._log_order("REJECTED", order, violations)
+                print(f"[StrategyManager] REJECTED {order.symbol} {order.side}: {'; '.join(violations)}")
+                continue
+            self._log_order("APPROVED", order, [])
+            approved_orders.append(order)
+        
+        print(f"[StrategyManager] Allocator funded {len(approved_orders)}/{len(orders)} orders, "
+              f"expected return ${result.expected_return:,.2f}, heat ${result.heat_used:,.2f} "
+              f"({result.elapsed * 1000:.1f} ms)")
+        return approved_orders
+    
+    def _expected_return(self, order: Order) -> float:
+        """Expected $ return per unit: explicit meta value, else credit received, else 10% of value."""
+        meta = order.meta or {}
+        if meta.get("expected_return") is not None:
+            return float(meta["expected_return"])
+        if order.type in CREDIT_SPREAD_TYPES and meta.get("expected_credit") is not None:
+            return float(meta["expected_credit"]) * 100.0
+        return 0.1 * self._estimate_order_value(order) / max(int(order.qty), 1)
+    
+    def _size_orders(self, orders: List[Order], portfolio: PortfolioSnapshot) -> List[Optional[int]]:
+        """
+        Risk-budget quantity caps for every order in the cycle, computed with the
+        batch sizers. Returns None for orders the sizers do not cover.
+        """
+        caps: List[Optional[int]] = [None] * len(orders)
+        if not orders:
+            return caps
+        equity = float(portfolio.equity)
+        per_position_risk = self.risk_manager.per_position_risk
+        
+        # Credit spreads: contracts from width/credit arrays
+        spread_idx = [i for i, o in enumerate(orders) if o.type in CREDIT_SPREAD_TYPES]
+        if spread_idx:
+            widths = np.array([self._spread_width(orders[i]) for i in spread_idx])
+            credits = np.array([float((orders[i].meta or {}).get("expected_credit", 0.0)) for i in spread_idx])
+            contracts = credit_spread_contracts_batch(
+                credits, widths, equity, per_position_risk, max_contracts=self.max_contracts
+            )
+            for i, c in zip(spread_idx, contracts):
+                caps[i] = int(c)
+        
+        # Stock orders: volatility sizing from the stored return matrix
+        stock_idx = [
+            i for i, o in enumerate(orders)
+            if not o.type.endswith("_open") and o.symbol in self._returns and self._order_price(o) > 0
+        ]
+        if stock_idx:
+            matrix = np.full((len(stock_idx), self.vol_lookback), np.nan)
+            for row, i in enumerate(stock_idx):
+                r = self._returns[orders[i].symbol]
+                if len(r):
+                    matrix[row, -len(r):] = r
+            prices = np.array([self._order_price(orders[i]) for i in stock_idx])
+            shares = equity_size_by_vol_batch(
+                matrix, prices, equity, per_position_risk, vol_lookback=self.vol_lookback
+            )
+            for i, n in zip(stock_idx, shares):
+                caps[i] = int(n)
+        
+        # Correlation scaling for orders that carry a correlation-to-book estimate
+        corr = np.array([self._order_correlation(o) for o in orders])
+        if np.isfinite(corr).any():
+            base = np.array([o.qty if c is None else min(o.qty, c) for o, c in zip(orders, caps)])
+            scaled = correlation_scale_batch(base, corr)
+            for i in np.flatnonzero(np.isfinite(corr)):
+                caps[i] = int(scaled[i])
+        
+        return caps
+    
+    @staticmethod
+    def _spread_width(order: Order) -> float:
+        """Spread width from order meta (strategies use different key names)."""
+        meta = order.meta or {}
+        for key in ("width", "wing_width", "spread_width"):
+            if meta.get(key) is not None:
+                return float(meta[key])
+        return 5.0
+    
+    @staticmethod
+    def _order_price(order: Order) -> float:
+        price = order.price if order.price is not None else (order.meta or {}).get("price")
+        try:
+            return float(price) if price is not None else 0.0
+        except (TypeError, ValueError):
+            return 0.0
+    
+    @staticmethod
+    def _order_correlation(order: Order) -> float:
+        value = (order.meta or {}).get("avg_corr_to_book")
+        return float(value) if value is not None else float("nan")
+    
     def _estimate_max_loss(self, order: Order) -> float:
         """Estimate maximum loss for an order."""
         # Simple estimation - in practice this would be more sophisticated
@@ -112,7 +291,7 @@ class StrategyManager:
         
         if order.type in ["iron_condor_open", "put_credit_spread_open"]:
             # Credit spreads: max loss is usually the width minus credit
-            width = order.meta.get("width", 5) if order.meta else 5
+            width = self._spread_width(order)
             return float(width * order.qty * 100 * 0.8)  # Assume 80% of width as max loss
         elif order.type in ["long_straddle_open", "covered_call_open"]:
             # Debit strategies: max loss is premium paid
@@ -31,7 +31,8 @@ class IronCondor(Strategy):
         sym = snapshot.get("symbol", "SPY")
         ivr = float(snapshot.get("ivr", 0.0))
         dte = snapshot.get("dte", 30)  # Days to expiration
-        market_trend = snapshot.get("market_trend", "neutral")
+        # An explicit snapshot trend wins; streaming indicators (fed via on_bar) fill the gap
+        market_trend = snapshot.get("market_trend") or self.indicator_trend(sym) or "neutral"
         
         # Iron Condor conditions:
         # 1. High IV Rank (expensive options)
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from ..base import Strategy, Order
 
 class PutCreditSpread(Strategy):
@@ -17,8 +17,21 @@ class PutCreditSpread(Strategy):
 
     def validate_snapshot(self, snapshot: Dict[str, Any]) -> bool:
         """Validate snapshot has required fields for Put Credit Spread."""
-        required_fields = ["symbol", "ivr", "bias"]
-        return all(field in snapshot for field in required_fields)
+        required_fields = ["symbol", "ivr"]
+        if not all(field in snapshot for field in required_fields):
+            return False
+        return "bias" in snapshot or self.indicator_bias(snapshot["symbol"]) is not None
+
+    def indicator_bias(self, symbol: str) -> Optional[str]:
+        """Directional bias from the streaming indicators (None until warmed up)."""
+        trend = self.indicator_trend(symbol)
+        if trend is None:
+            return None
+        if trend in ("bullish", "strong_bullish"):
+            return "bullish"
+        if trend in ("bearish", "strong_bearish"):
+            return "bearish"
+        return "neutral_bullish" if self.indicator_values(symbol)["zscore_20"] >= 0 else "neutral"
 
     def generate(self, snapshot: Dict[str, Any]) -> List[Order]:
         """
@@ -30,7 +43,7 @@ class PutCreditSpread(Strategy):
             
         sym = snapshot.get("symbol", "SPY")
         ivr = float(snapshot.get("ivr", 0.0))
-        bias = snapshot.get("bias", "neutral")
+        bias = snapshot.get("bias") or self.indicator_bias(sym) or "neutral"
         dte = snapshot.get("dte", 30)
         support_level = snapshot.get("support_level", None)
         current_price = snapshot.get("current_price", 0)
@@ -3,9 +3,12 @@ Base classes for signals-based strategy framework.
 """
 
 from dataclasses import dataclass
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Mapping, Optional, Tuple
 import datetime as dt
 
+from ..indicators import (DEFAULT_INDICATOR_SPECS, SIGNAL_TRENDS, IndicatorBank, IndicatorStateStore,
+                          trend_from_zscore)
+
 
 @dataclass
 class Signal:
@@ -50,6 +53,7 @@ class BaseStrategy:
     """
     
     name: str = "base"
+    indicator_specs: Dict[str, Tuple[str, Dict[str, Any]]] = DEFAULT_INDICATOR_SPECS
 
     def __init__(self, config: Dict[str, Any] | None = None):
         """
@@ -60,6 +64,8 @@ class BaseStrategy:
         """
         self.config = config or {}
         self._initialized = False
+        self.indicators = IndicatorBank(self.indicator_specs)
+        self._state_store: Optional[IndicatorStateStore] = None
 
     def warmup(self, **kwargs) -> None:
         """
@@ -67,9 +73,57 @@ class BaseStrategy:
         
         This method is called once before strategy evaluation begins.
         Override in subclasses to implement strategy-specific setup.
+        
+        Keyword Args:
+            history: Mapping of symbol -> bar history used to build indicator state
+            state_store: IndicatorStateStore to resume from and persist to
         """
+        state_store = kwargs.get("state_store")
+        if state_store is not None:
+            self._state_store = state_store
+            self.indicators.load(state_store, self.name)
+        history = kwargs.get("history")
+        if isinstance(history, Mapping):
+            self.indicators.warmup(history)
+        self.save_indicator_state()
         self._initialized = True
 
+    def on_bar(self, symbol: str, bar: Mapping[str, Any]) -> Dict[str, Optional[float]]:
+        """
+        Update streaming indicators for a symbol with one new bar.
+        
+        Args:
+            symbol: Trading symbol
+            bar: Bar dict (ts/close/high/low, short names accepted)
+            
+        Returns:
+            Current indicator values for the symbol
+        """
+        return self.indicators.update(symbol, bar)
+
+    def indicator_values(self, symbol: str) -> Dict[str, Optional[float]]:
+        """Get latest indicator values for a symbol (None while warming up)."""
+        return self.indicators.values(symbol)
+
+    def indicator_trend(self, symbol: str) -> Optional[str]:
+        """
+        Trend of a symbol from its streaming indicators.
+        
+        Args:
+            symbol: Trading symbol
+            
+        Returns:
+            "up", "down", "sideways" or "mixed" from zscore_20, or None
+            while the indicators are still warming up
+        """
+        label = trend_from_zscore(self.indicator_values(symbol).get("zscore_20"))
+        return SIGNAL_TRENDS.get(label) if label else None
+
+    def save_indicator_state(self) -> None:
+        """Persist indicator state if a state store was provided at warmup."""
+        if self._state_store is not None and self.indicators.sets:
+            self.indicators.save(self._state_store, self.name)
+
     def evaluate(self, md: Dict[str, Any]) -> List[Signal]:
         """
         Evaluate market data and return trading signals.
@@ -46,7 +46,8 @@ class IronCondor(BaseStrategy):
             md: Market data dict with keys:
                 - symbol: Trading symbol
                 - ivr: IV rank (0.0 to 1.0)
-                - trend: Market trend ("up", "down", "sideways", "mixed")
+                - trend: Market trend ("up", "down", "sideways", "mixed"); only
+                  used until the streaming indicators for the symbol are warm
                 - Optional: price, volume, etc.
                 
         Returns:
@@ -57,7 +58,7 @@ class IronCondor(BaseStrategy):
 
         symbol = md.get("symbol", "SPY")
         ivr = float(md.get("ivr", 0.0))
-        trend = md.get("trend", "mixed")
+        trend = md.get("trend") or self.indicator_trend(symbol) or "mixed"
         
         # Get configuration parameters
         min_ivr = float(self.get_config("min_ivr", 0.25))
@@ -112,7 +113,9 @@ class IronCondor(BaseStrategy):
         """
         Validate market data for Iron Condor strategy.
         
-        Required fields: symbol, ivr, trend
+        Required fields: symbol, ivr, and trend unless the symbol's indicators are warm
         """
-        required_fields = ["symbol", "ivr", "trend"]
-        return all(field in md for field in required_fields)
\ No newline at end of file
+        required_fields = ["symbol", "ivr"]
+        if not all(field in md for field in required_fields):
+            return False
+        return "trend" in md or self.indicator_trend(md["symbol"]) is not None
\ No newline at end of file
@@ -9,6 +9,7 @@ from pathlib import Path
 from typing import Dict, Any, List, Iterable, Tuple, Callable, Optional
 from datetime import datetime
 
+from ..indicators import bar_field
 from .base import BaseStrategy, Signal
 from .iron_condor import IronCondor
 from .put_credit_spread import PutCreditSpread
@@ -78,6 +79,25 @@ class StrategyManager:
             except Exception as e:
                 print(f"[StrategyManager] Warning: {strategy_name} warmup failed: {e}")
 
+    def on_bar(self, symbol: str, bar: Dict[str, Any]) -> None:
+        """
+        Feed one new bar to every enabled strategy's streaming indicators.
+        
+        Args:
+            symbol: Trading symbol
+            bar: Bar dict (ts/close/high/low)
+        """
+        for strategy in self.enabled.values():
+            strategy.on_bar(symbol, bar)
+
+    def save_state(self) -> None:
+        """Persist indicator state for all enabled strategies."""
+        for strategy_name, strategy in self.enabled.items():
+            try:
+                strategy.save_indicator_state()
+            except Exception as e:
+                print(f"[StrategyManager] Warning: {strategy_name} state save failed: {e}")
+
     def _ensure_header(self) -> None:
         """Ensure CSV file exists with proper header."""
         if not self.out_csv.exists():
@@ -115,12 +135,20 @@ class StrategyManager:
         self._total_signals_generated += signal_count
         return signal_count
 
-    def run_once(self, md_stream: Iterable[Dict[str, Any]]) -> List[Signal]:
+    def run_once(self, md_stream: Iterable[Dict[str, Any]], write: bool = True,
+                 update_indicators: bool = True) -> List[Signal]:
         """
         Run one evaluation cycle across all enabled strategies.
         
         Args:
             md_stream: Iterable of market data dictionaries (one per symbol)
+            write: Write generated signals to the CSV (callers that stage or
+                timestamp signals themselves can call write_signals later)
+            update_indicators: Feed each market data dict that carries a
+                timestamped bar (``bar`` dict, or close/price/current_price
+                plus ts/t/timestamp/time) to on_bar before evaluating; pass
+                False if the caller already did. Snapshots without a ts are
+                polls, not new bars, and never advance the indicators
             
         Returns:
             List of all generated signals
@@ -130,6 +158,14 @@ class StrategyManager:
         # Convert to list to allow multiple iterations
         market_data_list = list(md_stream)
         
+        # Streaming indicators advance one bar per cycle (bars already seen are skipped by ts)
+        if update_indicators:
+            for md in market_data_list:
+                bar = md.get("bar") or md
+                if ("symbol" in md and bar_field(bar, "close") is not None
+                        and bar_field(bar, "ts") is not None):
+                    self.on_bar(md["symbol"], bar)
+        
         # Evaluate each strategy against each market data point
         for strategy_name, strategy in self.enabled.items():
             strategy_signals = []
@@ -162,7 +198,7 @@ class StrategyManager:
                 print(f"[StrategyManager] {strategy_name}: {enter_count} enter, {exit_count} exit, {hold_count} hold")
 
         # Write signals to CSV if any were generated
-        if all_signals:
+        if all_signals and write:
             written_count = self.write_signals(all_signals)
             print(f"[StrategyManager] Generated {len(all_signals)} signals, wrote {written_count} to {self.out_csv}")
         
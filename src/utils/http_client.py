@@ -0,0 +1,429 @@
+"""
+EMO Options Bot - Shared HTTP Client
+One pooled, keep-alive HTTP layer for every collector and broker call
+
+Each host gets its own ``requests.Session`` with a bounded connection pool, so
+repeated calls to the same API reuse open TCP/TLS connections instead of
+paying a handshake per request, and a burst of workers can never open more
+than ``pool_maxsize`` sockets to one host (extra callers wait for a free
+connection).
+
+All requests share one policy: connect/read timeouts, retries on connection
+errors and on 429/5xx answers with capped exponential backoff (a server's
+``Retry-After`` wins), and no automatic retry of non-idempotent methods such
+as POST. Every attempt is recorded against an endpoint label, so latency and
+error rates can be read per API route.
+
+Includes:
+- HttpPolicy: timeouts, retry/backoff and pool limits (EMO_HTTP_* overrides)
+- HttpClient: per-host pooled sessions with retries and metrics
+- PooledSession: requests.Session facade over the client, for third-party SDKs
+- AsyncHttpClient: asyncio variant (aiohttp when installed, else worker threads)
+- get_http_client / http_metrics: the process-wide client and its metrics
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+@dataclass
+class HttpPolicy:
+    """Timeout, retry and pooling policy shared by all requests"""
+    connect_timeout: float = field(default_factory=lambda: _env_float("EMO_HTTP_CONNECT_TIMEOUT", 5.0))
+    read_timeout: float = field(default_factory=lambda: _env_float("EMO_HTTP_TIMEOUT", 30.0))
+    retries: int = field(default_factory=lambda: int(_env_float("EMO_HTTP_RETRIES", 3)))
+    backoff: float = 0.5                    # first retry delay; doubles per attempt
+    backoff_max: float = 30.0               # cap on one backoff (and on a server's Retry-After)
+    jitter: float = 0.25                    # +/- fraction of each delay, to spread retries out
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+    pool_maxsize: int = field(default_factory=lambda: int(_env_float("EMO_HTTP_POOL_SIZE", 10)))
+    pool_block: bool = True                 # wait for a free connection rather than open extra ones
+    latency_window: int = 1000              # recent latencies kept per endpoint for percentiles
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retry number ``attempt + 1``"""
+        if retry_after is not None:
+            return min(max(retry_after, 0.0), self.backoff_max)
+        base = min(self.backoff * (2 ** attempt), self.backoff_max)
+        return base * (1 + self.jitter * (2 * random.random() - 1))
+
+
+def host_key(url: str) -> str:
+    """``scheme://host:port`` a URL's connection pool is keyed on"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def retry_after_seconds(response) -> Optional[float]:
+    """A response's ``Retry-After`` header in seconds (delta or HTTP date), or None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+
+class EndpointStats:
+    """Counters and a rolling latency window for one endpoint"""
+
+    def __init__(self, window: int):
+        self.requests = 0       # attempts, including retries
+        self.retries = 0
+        self.errors = 0         # attempts that raised or answered >= 400
+        self.statuses: Dict[int, int] = {}
+        self.exceptions: Dict[str, int] = {}
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float, status: Optional[int], error: Optional[str], retry: bool):
+        self.requests += 1
+        self.retries += retry
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.latencies.append(seconds)
+        if status is not None:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        if error is not None:
+            self.exceptions[error] = self.exceptions.get(error, 0) + 1
+        if error is not None or (status is not None and status >= 400):
+            self.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def pct(q: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "statuses": dict(self.statuses),
+            "exceptions": dict(self.exceptions),
+            "avg_ms": round(self.total_seconds / self.requests * 1000, 2) if self.requests else None,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+
+
+class HttpMetrics:
+    """Thread-safe per-endpoint request metrics"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._stats: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, status: Optional[int] = None,
+               error: Optional[str] = None, retry: bool = False):
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats(self.window)
+            stats.record(seconds, status, error, retry)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in sorted(self._stats.items())}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class HttpClient:
+    """
+    Pooled HTTP client: one keep-alive session per host, shared retry policy
+
+    Usage:
+        http = get_http_client()
+        r = http.get(url, endpoint="alpaca.bars", headers=headers, params=params)
+    """
+
+    def __init__(self, policy: Optional[HttpPolicy] = None, metrics: Optional[HttpMetrics] = None):
+        self.policy = policy or HttpPolicy()
+        self.metrics = metrics or HttpMetrics(self.policy.latency_window)
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def session(self, url: str) -> requests.Session:
+        """
+        The pooled session for a URL's host, created on first use
+
+        Args:
+            url: Any URL on the host (only scheme, host and port are used)
+
+        Returns:
+            A keep-alive session limited to ``policy.pool_maxsize`` connections
+        """
+        key = host_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.policy.pool_maxsize,
+                                      pool_block=self.policy.pool_block, max_retries=0)
+                session.mount(key + "/", adapter)
+                self._sessions[key] = session
+            return session
+
+    def request(self, method: str, url: str, *, endpoint: Optional[str] = None, timeout: Optional[Timeout] = None,
+                retries: Optional[int] = None, idempotent: Optional[bool] = None,
+                raise_for_status: bool = False, **kwargs) -> requests.Response:
+        """
+        Send a request through the host's pool, retrying per the policy
+
+        Args:
+            method: HTTP method
+            url: Full URL
+            endpoint: Metrics label (default: "<METHOD> <host>")
+            timeout: Seconds, or (connect, read); default from the policy
+            retries: Override the policy's retry count (0 = single attempt)
+            idempotent: Whether a retry is safe (default: by method, so POST is not retried)
+            raise_for_status: Raise ``requests.HTTPError`` on a final 4xx/5xx answer
+            **kwargs: Passed to ``requests.Session.request`` (headers, params, json, ...)
+
+        Returns:
+            The last response (a retryable status is returned once retries run out)
+        """
+        method = method.upper()
+        endpoint = endpoint or f"{method} {host_key(url)}"
+        timeout = self.policy.timeout if timeout is None else timeout
+        retries = self.policy.retries if retries is None else retries
+        if not (method in IDEMPOTENT_METHODS if idempotent is None else idempotent):
+            retries = 0
+        session = self.session(url)
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.metrics.record(endpoint, time.perf_counter() - started, error=type(e).__name__,
+                                    retry=attempt > 0)
+                if attempt >= retries:
+                    raise
+                wait = self.policy.delay(attempt)
+            else:
+                self.metrics.record(endpoint, time.perf_counter() - started, status=response.status_code,
+                                    retry=attempt > 0)
+                if response.status_code not in self.policy.retry_statuses or attempt >= retries:
+                    if raise_for_status:
+                        response.raise_for_status()
+                    return response
+                wait = self.policy.delay(attempt, retry_after_seconds(response))
+                response.close()
+            time.sleep(wait)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def as_session(self, endpoint: Optional[str] = None) -> "PooledSession":
+        """A ``requests.Session`` stand-in that sends through this client (for SDKs that own a session)"""
+        return PooledSession(self, endpoint)
+
+    def close(self):
+        """Close every pooled connection"""
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+
+class PooledSession(requests.Session):
+    """Session facade whose requests go through an HttpClient's pools, retries and metrics"""
+
+    def __init__(self, client: HttpClient, endpoint: Optional[str] = None):
+        super().__init__()
+        self.client = client
+        self.endpoint = endpoint
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        kwargs.setdefault("endpoint", self.endpoint)
+        return self.client.request(method, url, **kwargs)
+
+    def close(self):
+        pass  # the pooled connections belong to the client
+
+
+class AsyncResponse:
+    """Body-loaded response returned by AsyncHttpClient, whichever transport served it"""
+
+    def __init__(self, url: str, status_code: int, headers: Dict[str, str], content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class AsyncHttpClient:
+    """
+    asyncio variant of HttpClient with the same policy and metrics
+
+    Uses one aiohttp session (``limit_per_host`` = pool size) when aiohttp is
+    installed; otherwise runs the shared synchronous client in worker threads,
+    which still reuses its pooled connections.
+    """
+
+    def __init__(self, client: Optional[HttpClient] = None):
+        self.client = client or get_http_client()
+        self.policy = self.client.policy
+        self.metrics = self.client.metrics
+        self._session = None
+
+    async def _aiohttp_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.policy.pool_maxsize)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def request(self, method: str, url: str, *, endpoint: Optional[str] = None,
+                      timeout: Optional[Timeout] = None, retries: Optional[int] = None,
+                      idempotent: Optional[bool] = None, raise_for_status: bool = False,
+                      **kwargs) -> AsyncResponse:
+        """Async ``HttpClient.request``; see there for the arguments"""
+        if not AIOHTTP_AVAILABLE:
+            response = await asyncio.to_thread(
+                self.client.request, method, url, endpoint=endpoint, timeout=timeout, retries=retries,
+                idempotent=idempotent, raise_for_status=raise_for_status, **kwargs)
+            return AsyncResponse(response.url, response.status_code, dict(response.headers), response.content)
+
+        method = method.upper()
+        endpoint = endpoint or f"{method} {host_key(url)}"
+        timeout = self.policy.timeout if timeout is None else timeout
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        client_timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        retries = self.policy.retries if retries is None else retries
+        if not (method in IDEMPOTENT_METHODS if idempotent is None else idempotent):
+            retries = 0
+        session = await self._aiohttp_session()
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                async with session.request(method, url, timeout=client_timeout, **kwargs) as r:
+                    response = AsyncResponse(str(r.url), r.status, dict(r.headers), await r.read())
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self.metrics.record(endpoint, time.perf_counter() - started, error=type(e).__name__,
+                                    retry=attempt > 0)
+                if attempt >= retries:
+                    raise
+                wait = self.policy.delay(attempt)
+            else:
+                self.metrics.record(endpoint, time.perf_counter() - started, status=response.status_code,
+                                    retry=attempt > 0)
+                if response.status_code not in self.policy.retry_statuses or attempt >= retries:
+                    if raise_for_status:
+                        response.raise_for_status()
+                    return response
+                wait = self.policy.delay(attempt, retry_after_seconds(response))
+            await asyncio.sleep(wait)
+            attempt += 1
+
+    async def get(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """The process-wide HTTP client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def http_metrics() -> Dict[str, Dict[str, Any]]:
+    """Per-endpoint metrics of the process-wide client"""
+    return get_http_client().metrics.snapshot()
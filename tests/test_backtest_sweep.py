@@ -0,0 +1,64 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from src.backtest import SweepConfig, expand_grid, run_backtest, run_sweep, walk_forward_windows
+from src.backtest.sweep import DEFAULT_SPACES
+
+
+def _closes(n=700, seed=1):
+    rng = np.random.default_rng(seed)
+    return 400 * np.exp(np.cumsum(rng.normal(0.0003, 0.011, n)))
+
+
+def test_walk_forward_windows_do_not_overlap_test_periods():
+    folds = walk_forward_windows(700, train_bars=300, test_bars=100)
+    assert folds[0] == (0, 300, 400)
+    assert all(b[1] >= a[2] for a, b in zip(folds, folds[1:]))
+
+
+def test_expand_grid():
+    grid = expand_grid({"a": [1, 2], "b": [3, 4, 5]})
+    assert len(grid) == 6
+    assert {"a": 2, "b": 5} in grid
+    with pytest.raises(ValueError):
+        expand_grid({"a": [1, 2], "b": (0.1, 0.3)})  # ranges are sampled, not gridded
+
+
+def test_dte_is_a_tuned_parameter():
+    closes = _closes()
+    assert all("dte" in space for space in DEFAULT_SPACES.values())
+    params = {"target_delta": 0.20, "spread_width": 5, "min_iv_rank": 0}
+    short = run_backtest("put_credit_spread", {**params, "dte": 14}, closes)
+    long = run_backtest("put_credit_spread", {**params, "dte": 45}, closes)
+    assert short.trades > long.trades > 0 and short.total_pnl != long.total_pnl
+    assert run_backtest("put_credit_spread", {**params, "dte": 60}, closes).trades == 0  # beyond max_dte
+
+
+def test_sweep_ranks_and_resumes(tmp_path):
+    db = tmp_path / "sweep.sqlite"
+    cfg = SweepConfig(
+        strategy="put_credit_spread",
+        space={"target_delta": [0.15, 0.30], "spread_width": [5], "min_iv_rank": [0]},
+        train_bars=300, test_bars=100, max_workers=2, db_path=db,
+    )
+    ranked = run_sweep(_closes(), cfg)
+    assert [r["rank"] for r in ranked] == [1, 2]
+    assert ranked[0]["mean_train_score"] >= ranked[1]["mean_train_score"]  # chosen in-sample
+
+    with sqlite3.connect(db) as conn:
+        n_jobs = conn.execute("SELECT COUNT(*) FROM sweep_results").fetchone()[0]
+        picks = conn.execute("SELECT fold, train_score, test_score FROM sweep_selections ORDER BY fold").fetchall()
+        for fold, train, test in picks:
+            best_train, = conn.execute("SELECT MAX(train_score) FROM sweep_results WHERE fold = ?", (fold,)).fetchone()
+            assert train == best_train
+    assert n_jobs == 2 * len(walk_forward_windows(700, 300, 100)) and len(picks) == n_jobs // 2
+
+    # Second run resumes from the checkpoint and returns the same ranking
+    assert run_sweep(_closes(), cfg) == ranked
+
+
+def test_run_id_changes_with_the_metric():
+    cfg = SweepConfig(strategy="put_credit_spread")
+    assert cfg.resolved_run_id() != SweepConfig(strategy="put_credit_spread", metric="win_rate").resolved_run_id()
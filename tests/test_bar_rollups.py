@@ -0,0 +1,131 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.ingestion.mock_bar_server import MockBarServer
+from src.database import enhanced_data_collector as edc
+from src.database.rollups import BARS, RollupEngine, bucket_start, timescale_aggregates_sql
+
+MIN = 60_000
+
+
+def _minute_bars(seed=0):
+    """Regular and extended-hours 1Min bars over the March 2024 DST change, with missing minutes"""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range("2024-03-07", "2024-03-12", freq="D", tz="America/New_York")
+    ts = np.concatenate([pd.date_range(d + pd.Timedelta(hours=4), d + pd.Timedelta(hours=20), freq="min",
+                                       inclusive="left").tz_convert("UTC").as_unit("ms").asi8 for d in days])
+    ts = np.sort(rng.choice(ts, int(len(ts) * 0.9), replace=False))
+    close = 100 + rng.normal(0, 0.05, len(ts)).cumsum()
+    return pd.DataFrame({"t": ts, "o": close + rng.normal(0, 0.02, len(ts)), "h": close + 0.1, "l": close - 0.1,
+                         "c": close, "v": rng.integers(1, 1000, len(ts))})
+
+
+def _expected(df, tf):
+    idx = pd.to_datetime(df["t"], unit="ms", utc=True)
+    if tf == "1Day":
+        idx = idx.dt.tz_convert("America/New_York")
+    rule = {"5Min": "5min", "15Min": "15min", "1Hour": "1h", "1Day": "D"}[tf]
+    out = df.set_index(idx).resample(rule).agg({"o": "first", "h": "max", "l": "min", "c": "last", "v": "sum",
+                                                "t": "count"}).rename(columns={"t": "n"})
+    out = out[out["n"] > 0]
+    out.index = out.index.tz_convert("UTC").as_unit("ms").asi8
+    return out
+
+
+def _write(conn, df, tf="1Min"):
+    conn.executemany("INSERT OR REPLACE INTO enhanced_bars(symbol, t, o, h, l, c, v, tf) VALUES ('SPY',?,?,?,?,?,?,?)",
+                     [(int(t), o, h, l, c, int(v), tf)
+                      for t, o, h, l, c, v in df[["t", "o", "h", "l", "c", "v"]].itertuples(index=False)])
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "emo.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE enhanced_bars (symbol TEXT NOT NULL, t INTEGER NOT NULL, o REAL, h REAL, l REAL,"
+                     " c REAL, v INTEGER, tf TEXT NOT NULL, PRIMARY KEY(symbol, t, tf))")
+    return path
+
+
+def test_daily_buckets_follow_new_york_midnight():
+    # 2024-03-10 (23 hours) starts at 05:00Z, 2024-03-11 at 04:00Z
+    day = lambda s: int(pd.Timestamp(s).value // 1_000_000)
+    assert bucket_start([day("2024-03-10T12:00Z"), day("2024-03-11T03:59Z"), day("2024-03-11T04:00Z")],
+                        "1Day").tolist() == [day("2024-03-10T05:00Z"), day("2024-03-10T05:00Z"), day("2024-03-11T04:00Z")]
+    assert bucket_start(day("2024-03-11T14:37Z"), "15Min") == day("2024-03-11T14:30Z")
+
+
+def test_incremental_refresh_matches_a_full_resample(db):
+    bars = _minute_bars()
+    engine = RollupEngine(db)
+    rng = np.random.default_rng(1)
+    with sqlite3.connect(db) as conn:
+        # Live-sized batches, then a late batch of corrected and duplicate bars
+        cuts = np.sort(rng.choice(np.arange(1, len(bars)), 300, replace=False))
+        for lo, hi in zip(np.r_[0, cuts], np.r_[cuts, len(bars)]):
+            chunk = bars.iloc[lo:hi]
+            with conn:
+                _write(conn, chunk)
+                engine.refresh("SPY", chunk["t"].min(), chunk["t"].max(), conn)
+        late = bars.sample(200, random_state=2).sort_values("t")
+        late = late.assign(h=late["h"] + 5, v=late["v"] + 1)
+        bars = bars.set_index("t")
+        bars.loc[late["t"], ["h", "v"]] = late.set_index("t")[["h", "v"]]
+        bars = bars.reset_index()
+        with conn:
+            _write(conn, late)
+            engine.refresh_bars([("SPY", t) for t in late["t"]], conn)
+
+    for tf in ("5Min", "15Min", "1Hour", "1Day"):
+        got = engine.read("SPY", tf).set_index("t")
+        want = _expected(bars, tf)
+        assert got.index.tolist() == want.index.tolist(), tf
+        np.testing.assert_allclose(got[["o", "h", "l", "c", "v", "n"]].to_numpy(),
+                                   want[["o", "h", "l", "c", "v", "n"]].to_numpy(), err_msg=tf)
+    assert len(engine.read("SPY", "1D")) == 6
+    assert len(engine.read("SPY", "1Hour", limit=10)) == 10
+
+
+def test_backfill_on_demand_and_iso_text_source(tmp_path, db):
+    bars = _minute_bars(seed=3)
+    with sqlite3.connect(db) as conn:
+        _write(conn, bars)
+    engine = RollupEngine(db)
+    assert engine.backfill(chunk_days=2)["SPY"] > 0
+    daily = engine.read("SPY", "1Day")
+    assert daily["n"].sum() == len(bars) and daily["v"].sum() == bars["v"].sum()
+
+    path = tmp_path / "bars.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE bars (symbol TEXT NOT NULL, ts TEXT NOT NULL, open REAL, high REAL, low REAL,"
+                     " close REAL, volume INTEGER, PRIMARY KEY(symbol, ts))")
+        iso = pd.to_datetime(bars["t"], unit="ms", utc=True).dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+        conn.executemany("INSERT INTO bars VALUES ('SPY',?,?,?,?,?,?)",
+                         zip(iso, bars["o"], bars["h"], bars["l"], bars["c"], bars["v"].astype(int).tolist()))
+    text_engine = RollupEngine(path, BARS)
+    text_engine.backfill()
+    pd.testing.assert_frame_equal(text_engine.read("SPY", "15Min"), engine.read("SPY", "15Min"))
+    assert len(text_engine.read("SPY", "1Min", start_ms=int(bars["t"].iloc[0]), end_ms=int(bars["t"].iloc[10]))) == 10
+
+
+def test_collector_maintains_rollups(tmp_path, monkeypatch):
+    monkeypatch.setattr(edc, "DATA", tmp_path)
+    monkeypatch.setattr(edc, "DB", tmp_path / "emo.sqlite")
+    with MockBarServer() as server:
+        monkeypatch.setenv("ALPACA_DATA_URL", server.url)
+        monkeypatch.setenv("ALPACA_KEY_ID", "key")
+        monkeypatch.setenv("ALPACA_SECRET_KEY", "secret")
+        collector = edc.EnhancedDataCollector()
+        stored = collector.ingest_market_data(["SPY"], limit=120)
+    five = collector.rollups.read("SPY", "5Min")
+    assert five["n"].sum() == stored and 24 <= len(five) <= 26
+    assert collector.rollups.read("SPY", "1Hour")["v"].sum() == collector.rollups.read("SPY", "1Min")["v"].sum()
+
+
+def test_timescale_aggregates_are_real_time_views():
+    sql = timescale_aggregates_sql("market_bars")
+    assert len(sql) == 8 and "market_bars_1day" in sql[6] and "'America/New_York'" in sql[6]
+    assert "materialized_only = false" in sql[0] and "INTERVAL '15 minutes'" in sql[1]
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ml.features import add_core_features, add_core_features_batch, build_supervised, latest_supervised_rows
+from src.ml import models
+from src.ml.models import FEATURE_COLS, predict_symbols
+
+
+def _reference(symbol):
+    """Per-symbol path the batch code replaced: full build_supervised, take the last row."""
+    df = models.get_synthetic_data(symbol, days=60)
+    z = np.random.standard_normal()
+    X, y, _ = build_supervised(add_core_features(df), FEATURE_COLS, horizon=1, target_name="r", features_ready=True)
+    rsi, macd, vol_10 = float(X[-1][3]), float(X[-1][4]), float(X[-1][2])
+    volatility, momentum = float(np.std(y)), float(np.mean(y[-5:]))
+    rsi_signal = -0.003 if rsi > 70 else 0.003 if rsi < 30 else (50 - rsi) / 50 * 0.001
+    macd_signal = float(np.clip(macd * 0.05, -0.002, 0.002))
+    momentum_signal = float(np.clip(momentum * 0.5, -0.004, 0.004))
+    expected = momentum_signal + rsi_signal + macd_signal - min(0.002, vol_10 * 0.1) + z * volatility * 0.3
+    return {"rsi": rsi, "macd": macd, "volatility": volatility, "momentum": momentum, "expected_return": expected}
+
+
+def test_latest_rows_match_build_supervised_on_ragged_histories():
+    rng = np.random.default_rng(7)
+    lengths = [80, 45, 60, 3]
+    width = max(lengths)
+    close = np.full((len(lengths), width), np.nan)
+    for i, n in enumerate(lengths):
+        close[i, width - n:] = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+
+    feats = add_core_features_batch(close)
+    X_last, y, n_rows = latest_supervised_rows(feats, close, FEATURE_COLS, horizon=1)
+
+    for i, n in enumerate(lengths):
+        df = pd.DataFrame({"close": close[i, width - n:]})
+        X, yy, _ = build_supervised(df, FEATURE_COLS, horizon=1)
+        assert n_rows[i] == len(X)
+        if len(X):
+            np.testing.assert_allclose(X_last[i], X[-1], rtol=1e-6)
+            np.testing.assert_allclose(y[i][~np.isnan(y[i])], yy, rtol=1e-6)
+        else:
+            assert np.isnan(X_last[i]).all()
+
+
+def test_predict_symbols_batch_matches_per_symbol_results():
+    symbols = ["SPY", "QQQ", "TSLA", "AAPL"]
+    result = predict_symbols(symbols)
+    assert list(result) == symbols
+
+    for symbol in symbols:
+        ref = _reference(symbol)
+        got = result[symbol]
+        assert got["method"] == "ml_enhanced"
+        assert got["features"]["rsi"] == pytest.approx(round(ref["rsi"], 1))
+        assert got["features"]["macd"] == pytest.approx(round(ref["macd"], 4))
+        assert got["features"]["volatility"] == pytest.approx(ref["volatility"], abs=1e-4)
+        assert got["features"]["momentum"] == pytest.approx(ref["momentum"], abs=1e-4)
+        assert got["expected_return"] == pytest.approx(ref["expected_return"], abs=2e-6)
+        assert set(got) == {"trend", "confidence", "expected_return", "method", "timestamp", "features"}
+
+
+def test_load_errors_are_reported_per_symbol(monkeypatch):
+    real = models.get_synthetic_data
+
+    def flaky(symbol, days=60):
+        if symbol == "BAD":
+            raise RuntimeError("no data")
+        return real(symbol, days)
+
+    monkeypatch.setattr(models, "get_synthetic_data", flaky)
+    result = predict_symbols(["SPY", "BAD"])
+    assert result["BAD"]["method"] == "error" and result["BAD"]["error"] == "no data"
+    assert result["SPY"]["method"] == "ml_enhanced"
+
+
+def test_repeat_calls_reuse_the_incremental_engine(monkeypatch):
+    engine = models.IncrementalFeatureEngine()
+    monkeypatch.setattr(models, "_feature_engine", engine)
+    first = predict_symbols(["SPY", "QQQ"])
+    assert engine.stats == {"appended": 122, "reused": 0, "resets": 0}
+    second = predict_symbols(["SPY", "QQQ"])
+    assert engine.stats == {"appended": 122, "reused": 122, "resets": 0}
+    for symbol in first:
+        assert second[symbol]["features"] == first[symbol]["features"]
+
+
+def test_bars_for_all_symbols_come_from_one_query(monkeypatch):
+    import sqlite3
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE bars (symbol TEXT, tf TEXT, t INTEGER, o REAL, h REAL, l REAL, c REAL, v REAL)")
+    day = 86_400_000
+    for symbol in ("SPY", "QQQ"):
+        close = models.get_synthetic_data(symbol)["close"].to_numpy()
+        conn.executemany("INSERT INTO bars VALUES (?, '1Day', ?, ?, ?, ?, ?, 0)",
+                         [(symbol, i * day, c, c, c, c) for i, c in enumerate(close)])
+    statements = []
+    conn.set_trace_callback(statements.append)
+    monkeypatch.setattr(models, "_feature_engine", models.IncrementalFeatureEngine())
+
+    result = predict_symbols(["SPY", "QQQ", "NONE"], conn=conn)
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 1
+    assert result["NONE"]["method"] == "error"
+    for symbol in ("SPY", "QQQ"):
+        assert result[symbol]["features"]["rsi"] == pytest.approx(round(_reference(symbol)["rsi"], 1))
+
+
+def test_window_shifted_by_one_bar_reuses_cached_features(monkeypatch):
+    import sqlite3
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE bars (symbol TEXT, tf TEXT, t INTEGER, o REAL, h REAL, l REAL, c REAL, v REAL)")
+    day = 86_400_000
+    history = {s: models.get_synthetic_data(s, days=70)["close"].to_numpy() for s in ("SPY", "QQQ")}
+
+    def insert(bars):
+        conn.executemany("INSERT INTO bars VALUES (?, '1Day', ?, ?, ?, ?, ?, 0)",
+                         [(s, i * day, c, c, c, c) for s, i, c in bars])
+
+    insert([(s, i, c) for s, close in history.items() for i, c in enumerate(close[:-1])])
+    engine = models.IncrementalFeatureEngine()
+    monkeypatch.setattr(models, "_feature_engine", engine)
+    predict_symbols(["SPY", "QQQ"], conn=conn)
+    assert engine.stats == {"appended": 122, "reused": 0, "resets": 0}
+
+    # One new bar per symbol: the 61-bar window drops its oldest bar
+    insert([(s, len(close) - 1, close[-1]) for s, close in history.items()])
+    result = predict_symbols(["SPY", "QQQ"], conn=conn)
+    assert engine.stats["reused"] > 0
+    assert engine.stats == {"appended": 124, "reused": 120, "resets": 0}
+    for symbol, close in history.items():
+        # Latest complete supervised row: the bar before the last (horizon=1)
+        expected = add_core_features(pd.DataFrame({"close": close})).iloc[-2]
+        assert result[symbol]["features"]["rsi"] == pytest.approx(round(expected["rsi_14"], 1))
@@ -0,0 +1,113 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.enhanced_retrain import compute_enhanced_features, enhanced_feature_tensor
+from src.ml.bulk import BarBlock, Cumulative, lag, load_bar_block, rolling_max, rolling_min
+
+
+def _bars(symbol, n, seed):
+    rng = np.random.default_rng(seed)
+    c = 100 * np.cumprod(1 + rng.normal(0, 0.003, n))
+    return pd.DataFrame({
+        "symbol": symbol,
+        "tf": "1Min",
+        "t": 1_704_205_800_000 + 60_000 * np.arange(n),
+        "o": c * (1 + rng.normal(0, 0.001, n)),
+        "h": c * 1.002,
+        "l": c * 0.998,
+        "c": c,
+        "v": rng.integers(1_000, 5_000, n).astype(float),
+    })
+
+
+@pytest.fixture
+def bars_db(tmp_path):
+    df = pd.concat([_bars("SPY", 400, 1), _bars("QQQ", 250, 2), _bars("IWM", 40, 3)])
+    daily = _bars("SPY", 30, 4).assign(tf="1Day")
+    conn = sqlite3.connect(tmp_path / "bars.sqlite")
+    pd.concat([df, daily]).sample(frac=1, random_state=0).to_sql("bars", conn, index=False)
+    yield conn, df
+    conn.close()
+
+
+def test_single_query_block_matches_per_symbol_queries(bars_db):
+    conn, _ = bars_db
+    block = load_bar_block(conn, ["SPY", "QQQ", "IWM", "NONE"], limit=300)
+    assert block.symbols == ["SPY", "QQQ", "IWM", "NONE"]
+    assert np.diff(block.offsets).tolist() == [300, 250, 40, 0]
+
+    for symbol in ("SPY", "QQQ"):
+        expected = pd.read_sql_query("SELECT t, c FROM bars WHERE symbol=? AND tf='1Min' ORDER BY t DESC LIMIT 300",
+                                     conn, params=[symbol]).sort_values("t")
+        rows = block.rows(symbol)
+        np.testing.assert_array_equal(block.t[rows], expected["t"])
+        np.testing.assert_array_equal(block.c[rows], expected["c"])
+
+
+def test_feature_tensor_matches_pandas_features(bars_db):
+    conn, df = bars_db
+    tensor = enhanced_feature_tensor(load_bar_block(conn, ["SPY", "QQQ", "IWM"], limit=1000))
+    assert tensor.values.flags.f_contiguous
+
+    for symbol, bars in df.groupby("symbol"):
+        bars = bars.drop(columns=["symbol", "tf"]).sort_values("t").reset_index(drop=True)
+        bars["ts"] = pd.to_datetime(bars["t"], unit="ms", utc=True)
+        expected = compute_enhanced_features(bars)
+        got = tensor.frame(symbol, dropna=False)
+        pd.testing.assert_frame_equal(got, expected, check_dtype=False, rtol=1e-9, atol=1e-12)
+        pd.testing.assert_frame_equal(tensor.frame(symbol), expected.dropna(), check_dtype=False,
+                                      rtol=1e-9, atol=1e-12)
+    assert tensor.frame("IWM").empty  # 40 bars never fill the 50-bar SMA
+
+
+def test_kernels_match_grouped_pandas_rolling_with_gaps():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "symbol": np.repeat(["A", "B", "C"], [30, 3, 50]),
+        "t": np.concatenate([np.arange(30), np.arange(3), np.arange(50)]),
+        **{f: rng.normal(100, 5, 83) for f in ("o", "h", "l", "c", "v")},
+    })
+    df.loc[[7, 40], "c"] = np.nan
+    block = BarBlock.from_frame(df.sample(frac=1, random_state=1))
+    pos = block.position
+    grouped = pd.Series(block.c).groupby(np.repeat(np.arange(3), np.diff(block.offsets)))
+
+    cum = Cumulative(block.c, pos, squares=True)
+    for w in (1, 4, 10):
+        np.testing.assert_allclose(cum.mean(w), grouped.transform(lambda s: s.rolling(w).mean()), rtol=1e-12)
+        np.testing.assert_allclose(cum.sum(w), grouped.transform(lambda s: s.rolling(w).sum()), rtol=1e-12)
+        np.testing.assert_allclose(rolling_min(block.c, pos, w), grouped.transform(lambda s: s.rolling(w).min()))
+        np.testing.assert_allclose(rolling_max(block.c, pos, w), grouped.transform(lambda s: s.rolling(w).max()))
+    np.testing.assert_allclose(cum.std(5), grouped.transform(lambda s: s.rolling(5).std()), rtol=1e-9)
+    np.testing.assert_allclose(lag(block.c, pos, 2), grouped.shift(2))
+
+
+def test_bulk_refresh_fills_the_feature_store_like_per_symbol_loads(bars_db, tmp_path, monkeypatch):
+    from scripts import enhanced_retrain
+    from src.ml.feature_store import FeatureStore
+
+    conn, df = bars_db
+    monkeypatch.setattr(enhanced_retrain, "DB", tmp_path / "bars.sqlite")
+    monkeypatch.setattr(enhanced_retrain, "RiskManager", lambda: None)
+    monkeypatch.setattr(enhanced_retrain, "EnhancedDataCollector", lambda: None)
+    bulk = enhanced_retrain.EnhancedMLTrainer(FeatureStore(tmp_path / "bulk"))
+    single = enhanced_retrain.EnhancedMLTrainer(FeatureStore(tmp_path / "single"))
+
+    conn.execute("DELETE FROM bars WHERE symbol='SPY' AND tf='1Min' AND t >= ?", [int(df["t"].iloc[380])])
+    conn.commit()
+    frames = bulk.refresh_feature_store(["SPY", "QQQ", "IWM"], limit=300)
+    assert sorted(frames) == ["QQQ", "SPY"]  # IWM never fills the warmup
+    for symbol in frames:
+        pd.testing.assert_frame_equal(frames[symbol], single._load_stored_features(symbol, 300),
+                                      check_dtype=False, rtol=1e-9)
+
+    # New bars are appended past the high-water mark
+    spy = df[df["symbol"] == "SPY"]
+    spy.iloc[380:].to_sql("bars", conn, index=False, if_exists="append")
+    conn.commit()
+    frames = bulk.refresh_feature_store(["SPY"], limit=300)
+    pd.testing.assert_frame_equal(frames["SPY"], single._load_stored_features("SPY", 300), check_dtype=False, rtol=1e-9)
+    assert frames["SPY"]["t"].iloc[-1] == spy["t"].iloc[-1]
@@ -0,0 +1,136 @@
+import sqlite3
+
+import pytest
+
+from src.database.bulk_writer import (BarBuffer, BulkWriter, PostgresBulkWriter, SQLiteBulkWriter, bulk_writer,
+                                       tune_sqlite)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "bars.sqlite")
+    conn.execute("""CREATE TABLE bars (symbol TEXT NOT NULL, ts TEXT NOT NULL, open REAL, high REAL, low REAL,
+                    close REAL, volume INTEGER, PRIMARY KEY(symbol, ts))""")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _bar(symbol, minute, close):
+    return (symbol, f"2024-01-02T14:{minute:02d}:00Z", close, close, close, close, 100)
+
+
+def test_sqlite_writer_upserts_one_batch_with_last_row_winning(conn):
+    writer = bulk_writer(conn)
+    assert isinstance(writer, SQLiteBulkWriter)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    assert writer.write([_bar("SPY", 30, 1.0), _bar("SPY", 31, 2.0), _bar("SPY", 30, 3.0)]) == 3
+    dict_row = dict(zip(writer.columns, _bar("QQQ", 30, 4.0)), data_source="ignored")
+    writer.write([dict_row, _bar("SPY", 31, 5.0)])
+    assert conn.execute("SELECT symbol, close FROM bars ORDER BY symbol, ts").fetchall() == [
+        ("QQQ", 4.0), ("SPY", 3.0), ("SPY", 5.0)]
+
+
+def test_uncommitted_batch_joins_the_callers_transaction(conn):
+    writer = SQLiteBulkWriter(conn)
+    writer.write([_bar("SPY", 30, 1.0)], commit=False)
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM bars").fetchone()[0] == 0
+
+    with pytest.raises(sqlite3.IntegrityError):
+        writer.write([_bar("SPY", 30, 1.0), (None, "x", 1, 1, 1, 1, 1)])
+    assert conn.execute("SELECT COUNT(*) FROM bars").fetchone()[0] == 0  # the whole batch rolled back
+
+
+def test_buffer_flushes_in_fixed_size_batches(conn):
+    writer = SQLiteBulkWriter(conn)
+    batches = []
+    write = writer.write
+    writer.write = lambda rows, commit=True: batches.append(len(rows)) or write(rows, commit)
+
+    with BarBuffer(writer, max_rows=4) as buffer:
+        buffer.extend(_bar("SPY", m, m) for m in range(6))
+        buffer.append(_bar("SPY", 6, 6.0))
+        buffer.append(_bar("SPY", 7, 7.0))
+        buffer.append(_bar("SPY", 8, 8.0))
+        assert len(buffer) == 1
+    assert batches == [4, 4, 1] and buffer.rows_written == 9
+    assert conn.execute("SELECT COUNT(*) FROM bars").fetchone()[0] == 9
+
+
+class _Cursor:
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.log.append(("execute", sql))
+
+    def copy_expert(self, sql, file):
+        self.log.append(("copy", sql, file.read()))
+
+
+class _PgConnection:
+    def __init__(self):
+        self.log = []
+
+    def cursor(self):
+        return _Cursor(self.log)
+
+    def commit(self):
+        self.log.append(("commit",))
+
+
+def test_postgres_writer_copies_into_staging_then_merges():
+    pg = _PgConnection()
+    writer = bulk_writer(pg, kind="timescale")
+    assert isinstance(writer, PostgresBulkWriter)
+    writer.write([_bar("SPY", 30, 1.5), ("QQQ", "2024-01-02T14:30:00Z", None, 2.0, 2.0, 2.0, 7)])
+
+    steps = [entry[0] for entry in pg.log]
+    assert steps == ["execute", "copy", "execute", "execute", "commit"]
+    assert "CREATE TEMP TABLE IF NOT EXISTS _stage_bars (LIKE bars" in pg.log[0][1]
+    assert pg.log[1][1].startswith("COPY _stage_bars (symbol, ts, open")
+    assert pg.log[1][2].splitlines()[1] == "QQQ,2024-01-02T14:30:00Z,,2.0,2.0,2.0,7"  # None -> NULL
+    merge = pg.log[2][1]
+    assert "SELECT DISTINCT ON (symbol, ts)" in merge and "ORDER BY symbol, ts, _seq DESC" in merge
+    assert "ON CONFLICT (symbol, ts) DO UPDATE SET open=EXCLUDED.open" in merge
+
+
+def test_buffer_keeps_a_failed_batch_for_the_next_flush(conn):
+    writer = SQLiteBulkWriter(conn)
+    buffer = BarBuffer(writer, max_rows=None, max_pending=3)
+    buffer.extend([_bar("SPY", 30, 1.0), (None, "x", 1, 1, 1, 1, 1)])
+    with pytest.raises(sqlite3.IntegrityError):
+        buffer.flush()
+    assert len(buffer) == 2 and buffer.rows_written == 0
+
+    buffer.rows[1] = _bar("SPY", 31, 2.0)
+    buffer.append(_bar("SPY", 32, 3.0))
+    assert buffer.restore([_bar("SPY", 29, 0.5)]) == 1 and buffer.rows_dropped == 1  # oldest dropped
+    assert buffer.flush() == 3 and len(buffer) == 0
+    assert conn.execute("SELECT close FROM bars ORDER BY ts").fetchall() == [(1.0,), (2.0,), (3.0,)]
+
+
+def test_bulk_writer_is_abstract(conn):
+    with pytest.raises(TypeError):
+        BulkWriter(conn)
+
+
+def test_tune_sqlite_reports_when_wal_was_not_applied(tmp_path, caplog):
+    conn = sqlite3.connect(tmp_path / "other.sqlite")
+    conn.execute("CREATE TABLE t (a)")
+    conn.execute("INSERT INTO t VALUES (1)")  # implicit transaction stays open
+    with caplog.at_level("WARNING", logger="src.database.bulk_writer"):
+        assert tune_sqlite(conn) == "delete"
+    assert "open transaction" in caplog.text
+    conn.commit()
+    assert tune_sqlite(conn) == "wal"
+    conn.close()
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.options.chain_diff import FIELD_BITS, ChainCache, ChainDiff, apply_diff, diff_chains
+from src.options.chain_providers import MockProvider, OptionsChainProvider
+from src.options.chain_snapshots import ChainRecorder, ChainSnapshotStore, chain_frame
+
+T0 = int(pd.Timestamp("2024-03-01T14:30Z").value // 1_000_000)
+MIN = 60_000
+EXPIRIES = ["2024-03-15", "2024-03-22", "2024-04-19"]
+
+
+def _tick(i):
+    """Chain at minute i: a few contracts move each minute and one strike is listed at minute 3"""
+    quotes = [q for e in EXPIRIES for q in MockProvider().get_chain("SPY", e)]
+    for k, q in enumerate(quotes):
+        if k % 10 == i % 10:
+            q.bid, q.ask, q.volume = round(q.bid + i / 100, 2), round(q.ask + i / 100, 2), 100 + i
+    if i < 3:
+        quotes = [q for q in quotes if q.strike != 500.0]
+    return quotes
+
+
+def test_diff_applied_to_the_old_chain_gives_the_new_one():
+    old, new = chain_frame(_tick(2)), chain_frame(_tick(3))
+    new = new[new["contract"] != new["contract"].iloc[0]]
+    diff = diff_chains(old, new, "SPY", T0 + 3 * MIN, T0 + 2 * MIN, spot=451.0)
+    assert len(diff.added) == 6 and len(diff.removed) == 1
+    assert set(diff.changed["fields"]) == {FIELD_BITS["bid"] | FIELD_BITS["ask"] | FIELD_BITS["volume"]}
+    pd.testing.assert_frame_equal(apply_diff(old, diff), new.reset_index(drop=True), check_categorical=False)
+
+    # The JSON payload carries only what changed, and rebuilds the same chain
+    payload = json.dumps(diff.to_dict())
+    again = ChainDiff.from_dict(json.loads(payload))
+    pd.testing.assert_frame_equal(apply_diff(old, again), new.reset_index(drop=True), check_categorical=False)
+    full = ChainCache()
+    full.update("SPY", new)
+    assert len(payload) * 4 < len(json.dumps(full.snapshot("SPY")))
+    assert diff_chains(new, new).empty
+
+
+def test_cache_diffs_only_the_fetched_part_and_replicas_follow():
+    cache, replica = ChainCache(), ChainCache()
+    seen = []
+    cache.add_listener(seen.append)
+    cache.add_listener(replica.apply)
+    assert cache.update("SPY", _tick(0), ts=T0).size == 120
+    diff = cache.update("SPY", [q for q in _tick(1) if q.expiry == "2024-03-22" and q.right == "put"], ts=T0 + MIN)
+    assert diff.expiries == ["2024-03-22"] and diff.removed.empty and 0 < diff.size < 10
+    assert len(diff.chain) == 40  # whole expiry, calls included
+    assert len(cache.get("SPY")) == 120 and len(cache.get("SPY", "2024-03-22")) == 40
+    pd.testing.assert_frame_equal(replica.get("SPY"), cache.get("SPY"), check_categorical=False)
+    assert [d.size for d in seen] == [120, diff.size]
+    assert cache.stats()["contracts_sent"] == 120 + diff.size
+
+    # The provider feeds the cache it is given
+    provider = OptionsChainProvider(provider_order=["mock"], recorder=None, chain_cache=cache)
+    provider.get_chain("QQQ", "2099-01-15")
+    assert len(cache.get("QQQ")) == 42 and len(seen) == 3
+
+
+def test_recorded_diffs_rebuild_the_same_chains_as_full_snapshots(tmp_path):
+    full = ChainSnapshotStore(tmp_path / "full", "npz")
+    diffs = ChainSnapshotStore(tmp_path / "diffs", "npz")
+    with ChainRecorder(full, keyframe_every=1) as a, ChainRecorder(diffs, keyframe_every=8) as b:
+        for i in range(20):
+            for recorder in (a, b):
+                recorder.record("SPY", _tick(i), ts=T0 + i * MIN, spot=450 + i)
+        assert b.rows_seen == a.rows_seen and b.rows_written * 3 < a.rows_written
+
+    assert len(diffs.read("SPY")) * 3 < len(full.read("SPY"))
+    for i in (0, 2, 3, 7, 8, 9, 19):
+        at = T0 + i * MIN + 1_000
+        expected, rebuilt = full.as_of("SPY", at), diffs.as_of("SPY", at)
+        pd.testing.assert_frame_equal(rebuilt, expected, check_categorical=False)
+        assert set(rebuilt["snapshot_ts"]) == {T0 + i * MIN} and set(rebuilt["spot"]) == {450 + i}
+    np.testing.assert_array_equal(diffs.as_of("SPY", T0 + 19 * MIN, expiry="2024-03-22")["bid"],
+                                  chain_frame([q for q in _tick(19) if q.expiry == "2024-03-22"])["bid"])
+
+
+def test_subscribers_get_diffs_and_a_resync_marker_when_behind():
+    cache = ChainCache()
+
+    async def run():
+        sub = cache.subscribe(["SPY"], maxsize=3)
+        cache.update("QQQ", _tick(0), ts=T0)
+        cache.update("SPY", _tick(0), ts=T0)
+        cache.update("SPY", _tick(1), ts=T0 + MIN)
+        await asyncio.sleep(0)
+        first, second = await sub.get(), await sub.get()
+        for i in range(2, 7):
+            cache.update("SPY", _tick(i), ts=T0 + i * MIN)
+        await asyncio.sleep(0)
+        marker = await sub.get()
+        sub.close()
+        return first, second, marker, sub
+
+    first, second, marker, sub = asyncio.run(run())
+    assert (first.underlying, first.size, second.base_ts) == ("SPY", 120, T0)
+    assert marker is None and sub.resyncs == 1 and sub not in cache._listeners
+
+
+def test_unchanged_refetches_keep_as_of_current(tmp_path):
+    store = ChainSnapshotStore(tmp_path, "npz")
+    day = 24 * 60 * MIN
+    with ChainRecorder(store, keyframe_every=30) as recorder:
+        recorder.record("SPY", _tick(5), ts=T0, spot=450.0)
+        rows = recorder.rows_written
+        recorder.record("SPY", _tick(5), ts=T0 + MIN, spot=451.5)  # same chain, new spot
+        recorder.record("SPY", _tick(5), ts=T0 + day + MIN, spot=452.0)  # a day later, still unchanged
+        assert recorder.rows_written - rows == 2 * len(EXPIRIES)  # one heartbeat row per expiry and fetch
+
+    chain = store.as_of("SPY", T0 + MIN)
+    assert set(chain["snapshot_ts"]) == {T0 + MIN} and set(chain["spot"]) == {451.5}
+    pd.testing.assert_frame_equal(chain.drop(columns=["snapshot_ts", "spot"]),
+                                  store.as_of("SPY", T0).drop(columns=["snapshot_ts", "spot"]))
+    later = store.as_of("SPY", T0 + day + 2 * MIN)
+    assert len(later) == len(chain) and set(later["snapshot_ts"]) == {T0 + day + MIN}
+    assert set(later["spot"]) == {452.0}
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.options.chain_providers import MockProvider, OptionsChainProvider
+from src.options.chain_snapshots import (ChainRecorder, ChainSnapshotStore, HistoricalChainProvider, chain_frame,
+                                         frame_quotes)
+
+T0 = int(pd.Timestamp("2024-03-01T14:30Z").value // 1_000_000)
+MIN = 60_000
+
+
+def _chain(expiry, bump=0.0):
+    quotes = MockProvider().get_chain("SPY", expiry)
+    for q in quotes:
+        q.bid, q.ask = round(q.bid + bump, 2), round(q.ask + bump, 2)
+    return quotes
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "npz"])
+def test_as_of_rebuilds_each_expiry_from_its_latest_snapshot(tmp_path, fmt):
+    store = ChainSnapshotStore(tmp_path, fmt)
+    with ChainRecorder(store, flush_snapshots=3) as recorder:
+        for i in range(10):  # the near expiry every minute, the far one every 5 minutes
+            recorder.record("SPY", _chain("2024-03-15", bump=i / 100), ts=T0 + i * MIN, spot=450 + i)
+            if i % 5 == 0:
+                recorder.record("SPY", _chain("2024-04-19", bump=i / 10), ts=T0 + i * MIN + 1)
+        recorder.record("SPY", _chain("2024-02-29"), ts=T0)  # already expired at T0
+    assert len(store.segments("SPY")) == 5 and store.underlyings() == ["SPY"]
+
+    chain = store.as_of("SPY", T0 + 7 * MIN + 30_000)
+    near, far = chain[chain["expiry"] == "2024-03-15"], chain[chain["expiry"] == "2024-04-19"]
+    assert len(chain) == 84 and set(near["snapshot_ts"]) == {T0 + 7 * MIN} and set(far["snapshot_ts"]) == {T0 + 5 * MIN + 1}
+    expected = chain_frame(_chain("2024-03-15", bump=0.07))
+    np.testing.assert_array_equal(near["bid"].to_numpy(), expected["bid"].to_numpy())
+    assert near["delta"].dtype == np.float32 and isinstance(chain["contract"].dtype, pd.CategoricalDtype)
+    assert near["spot"].iloc[0] == 457
+
+    assert store.as_of("SPY", T0 - 1).empty
+    assert set(store.as_of("SPY", pd.Timestamp(T0 + 3 * MIN, unit="ms"), expiry="2024-04-19")["snapshot_ts"]) == {T0 + 1}
+    assert store.as_of("SPY", T0 + 2 * 86_400_000).empty  # older than max_age
+    assert len(store.snapshot_times("SPY", T0, T0 + 10 * MIN, expiry="2024-03-15")) == 10
+
+    # Compaction leaves reads unchanged
+    before = store.read("SPY")
+    assert store.compact("SPY", "2024-03-01") is not None and len(store.segments("SPY")) == 1
+    pd.testing.assert_frame_equal(ChainSnapshotStore(tmp_path, fmt).read("SPY"), before)
+
+
+def test_fetched_chains_are_recorded_and_served_back_as_of_the_fetch(tmp_path):
+    store = ChainSnapshotStore(tmp_path)
+    recorder = ChainRecorder(store, flush_snapshots=100)
+    provider = OptionsChainProvider(provider_order=["mock"], recorder=recorder)
+    live = provider.get_chain("SPY", "2099-01-15")
+    assert recorder.recorded == 1 and store.segments("SPY") == []
+    recorder.flush()
+
+    fetched_at = max(q.timestamp for q in live)
+    history = HistoricalChainProvider(store, fetched_at)
+    replayed = history.get_chain("SPY", "2099-01-20", right="put")  # nearest recorded expiry
+    puts = [q for q in live if q.right == "put"]
+    assert [(q.symbol, q.strike, q.bid, q.ask, q.mid, q.volume) for q in replayed] == \
+           [(q.symbol, q.strike, q.bid, q.ask, q.mid, q.volume) for q in puts]
+    np.testing.assert_allclose([q.delta for q in replayed], [q.delta for q in puts], rtol=1e-6)
+    assert history.get_spot_price("SPY") is None
+    assert HistoricalChainProvider(store, fetched_at - pd.Timedelta(seconds=1)).get_chain("SPY") == []
+
+    quotes = frame_quotes(chain_frame(live), "SPY")
+    assert [q.symbol for q in quotes] == [q.symbol for q in sorted(live, key=lambda q: (q.right, q.strike))]
@@ -0,0 +1,92 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtest.sweep import load_closes
+from src.database.cold_storage import ColdStore, TieredBarReader, default_cold_root, tier_bars
+
+DAY = 86_400_000
+NOW = int(pd.Timestamp("2024-04-15T00:00Z").value // 1_000_000)
+
+
+def _bars(symbol="SPY", start="2024-01-20", end="2024-04-14", seed=0):
+    ts = pd.date_range(start, end, freq="30min", tz="UTC")
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.normal(0, 0.1, len(ts)).cumsum()
+    return pd.DataFrame({"t": ts.as_unit("ms").asi8, "open": close, "high": close + 0.2, "low": close - 0.2,
+                         "close": close, "volume": rng.integers(100, 1000, len(ts))})
+
+
+def _db(path, frames):
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE bars (symbol TEXT NOT NULL, ts TEXT NOT NULL, open REAL, high REAL, low REAL,"
+                     " close REAL, volume INTEGER, PRIMARY KEY(symbol, ts))")
+        for symbol, df in frames.items():
+            iso = pd.to_datetime(df["t"], unit="ms", utc=True).dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+            conn.executemany("INSERT INTO bars VALUES (?,?,?,?,?,?,?)",
+                             [(symbol, ts, o, h, l, c, int(v)) for ts, o, h, l, c, v in
+                              zip(iso, df["open"], df["high"], df["low"], df["close"], df["volume"])])
+    return path
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "npz"])
+def test_tiering_moves_old_months_and_reader_merges_both_tiers(tmp_path, fmt):
+    spy, qqq = _bars(), _bars("QQQ", seed=1)
+    db = _db(tmp_path / "emo.sqlite", {"SPY": spy, "QQQ": qqq})
+    store = ColdStore(default_cold_root(db), fmt)
+
+    moved = tier_bars(db, store, older_than_days=30, now_ms=NOW)
+    cutoff = NOW - 30 * DAY
+    assert moved == {"SPY": int((spy["t"] < cutoff).sum()), "QQQ": int((qqq["t"] < cutoff).sum())}
+    assert sorted(store.months("bars", "SPY")) == ["2024-01", "2024-02", "2024-03"]
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT MIN(ts) FROM bars").fetchone()[0] >= "2024-03-16"
+
+    reader = TieredBarReader(db)
+    pd.testing.assert_frame_equal(reader.read("SPY"), spy)
+    lo, hi = int(spy["t"].iloc[100]), int(spy["t"].iloc[-100])  # spans cold months and the hot table
+    pd.testing.assert_frame_equal(reader.read("SPY", lo, hi), spy[(spy["t"] >= lo) & (spy["t"] < hi)]
+                                  .reset_index(drop=True))
+    assert reader.symbols() == ["QQQ", "SPY"]
+
+    # A later run tops up the partly tiered month; nothing is lost or duplicated
+    assert tier_bars(db, store, older_than_days=30, now_ms=NOW)["SPY"] == 0
+    tier_bars(db, store, older_than_days=10, now_ms=NOW)
+    assert sorted(store.months("bars", "SPY")) == ["2024-01", "2024-02", "2024-03", "2024-04"]
+    pd.testing.assert_frame_equal(TieredBarReader(db).read("QQQ"), qqq)
+
+
+def test_hot_rows_win_when_a_bar_is_in_both_tiers(tmp_path):
+    spy = _bars(end="2024-02-10")
+    db = _db(tmp_path / "emo.sqlite", {"SPY": spy})
+    store = ColdStore(default_cold_root(db))
+    # As after a crash between writing the month file and deleting the rows
+    jan = spy[spy["t"] < int(pd.Timestamp("2024-02-01T00:00Z").value // 1_000_000)]
+    store.merge("bars", "SPY", jan.assign(close=jan["close"] - 1))
+
+    reader = TieredBarReader(db)
+    pd.testing.assert_frame_equal(reader.read("SPY"), spy)
+    days = pd.to_datetime(spy["t"], unit="ms", utc=True).dt.tz_convert("America/New_York").dt.date
+    daily = load_closes(str(db), "SPY")
+    np.testing.assert_allclose(daily, spy.groupby(days)["close"].last())  # one close per session day
+    assert len(daily) == days.nunique() < len(spy)
+    with pytest.raises(ValueError):
+        store.merge("bars", "SPY", spy)  # spans two months
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "npz"])
+def test_null_volume_is_tiered_as_zero(tmp_path, fmt):
+    spy = _bars(end="2024-02-10")
+    db = _db(tmp_path / "emo.sqlite", {"SPY": spy})
+    with sqlite3.connect(db) as conn:
+        conn.execute("UPDATE bars SET volume = NULL WHERE ts < '2024-01-21'")
+    expected = spy.assign(volume=spy["volume"].where(spy["t"] >= int(pd.Timestamp("2024-01-21T00:00Z").value
+                                                                    // 1_000_000), 0))
+    assert (expected["volume"] == 0).any()
+
+    store = ColdStore(default_cold_root(db), fmt)
+    pd.testing.assert_frame_equal(TieredBarReader(db).read("SPY"), expected)  # hot rows
+    assert tier_bars(db, store, older_than_days=30, now_ms=NOW)["SPY"] == len(spy)
+    pd.testing.assert_frame_equal(TieredBarReader(db).read("SPY"), expected)  # cold rows
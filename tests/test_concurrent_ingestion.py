@@ -0,0 +1,85 @@
+import sys
+import time
+
+import pytest
+
+from scripts.ingestion.mock_bar_server import MockBarServer
+
+
+@pytest.fixture
+def ingestion(monkeypatch):
+    monkeypatch.setattr(sys, "path", list(sys.path))  # the script module prepends the repo root
+    from scripts.ingestion import enhanced_ingestion
+    return enhanced_ingestion
+
+
+def test_token_bucket_bursts_then_refills_at_the_limit(ingestion):
+    limiter = ingestion.RateLimiter(max_calls=5, time_window=1)
+    assert all(limiter.acquire() for _ in range(5))
+    assert not limiter.acquire()
+    assert 0 < limiter.wait_time() <= 0.2
+
+    start = time.monotonic()
+    assert limiter.wait()
+    assert 0.1 < time.monotonic() - start < 0.5
+    assert not limiter.wait(timeout=0.01)
+
+
+def test_hundred_symbols_fetched_concurrently_within_one_window(ingestion, monkeypatch, tmp_path):
+    symbols = [f"S{i:03d}" for i in range(100)]
+    stored = []
+
+    with MockBarServer(latency=0.05, rate_limit=200) as server:
+        monkeypatch.setenv("ALPACA_DATA_URL", server.url)
+        monkeypatch.setenv("ALPACA_KEY_ID", "key")
+        monkeypatch.setenv("ALPACA_SECRET_KEY", "secret")
+        config = ingestion.IngestionConfig(provider=ingestion.DataProvider.ALPACA, symbols=symbols,
+                                           timeframes=["1Min"], lookback_hours=1, max_concurrency=8,
+                                           watermark_db=str(tmp_path / "w.sqlite"))
+        engine = ingestion.DataIngestionEngine(config)
+        monkeypatch.setattr(engine, "_upsert_bars", lambda df: stored.append(df) or len(df))
+
+        result = engine.run_ingestion()
+
+    assert server.requests == 100 and server.throttled == 0
+    assert 1 < server.max_in_flight <= 8
+    assert result["duration_seconds"] < 100 * 0.05 / 2  # well under the serial time
+    assert [r["symbol"] for r in result["results"]] == symbols
+    assert all(r["success"] and r["rows"] >= 59 for r in result["results"])
+    assert result["stats"]["successful_ingestions"] == 100
+    assert {df["symbol"].iloc[0] for df in stored} == set(symbols)
+
+
+def test_sqlite_bars_use_the_shared_utc_text_format(ingestion, monkeypatch, tmp_path):
+    import pandas as pd
+    import sqlalchemy as sa
+
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'bars.sqlite'}")
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE bars (ts TEXT, symbol TEXT, open REAL, high REAL, low REAL, close REAL, "
+                             "volume REAL, timeframe TEXT, created_at TEXT, PRIMARY KEY (symbol, ts, timeframe))"))
+        conn.execute(sa.text("INSERT INTO bars VALUES ('2024-03-01T14:30:00Z', 'SPY', 1, 1, 1, 1, 1, '1Min', NULL)"))
+    monkeypatch.setattr(ingestion.DBRouter, "_engine", engine)
+
+    bars = pd.DataFrame({"ts": pd.to_datetime(["2024-03-01T14:30:00Z", "2024-03-01T14:31:00Z"], utc=True),
+                         "symbol": "SPY", "open": 2.0, "high": 2.0, "low": 2.0, "close": 2.0, "volume": 10,
+                         "timeframe": "1Min"})
+    ingestor = ingestion.DataIngestionEngine.__new__(ingestion.DataIngestionEngine)
+    assert ingestor._upsert_bars(bars) == 2
+    with engine.connect() as conn:
+        rows = conn.execute(sa.text("SELECT ts, close, created_at FROM bars ORDER BY ts")).fetchall()
+    assert [(ts, close) for ts, close, _ in rows] == [("2024-03-01T14:30:00Z", 2.0), ("2024-03-01T14:31:00Z", 2.0)]
+    assert rows[0][2].endswith("Z")
+
+
+def test_mock_provider_is_deterministic_per_symbol_across_threads(ingestion):
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime, timezone
+
+    provider = ingestion.MockProvider(ingestion.IngestionConfig(provider=ingestion.DataProvider.MOCK, symbols=["SPY"]))
+    start = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+    symbols = ["SPY", "QQQ", "AAPL", "MSFT"] * 8
+    expected = {s: provider.fetch_bars(s, start)["close"].tolist() for s in set(symbols)}
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        frames = list(pool.map(lambda s: provider.fetch_bars(s, start), symbols))
+    assert all(df["close"].tolist() == expected[s] for s, df in zip(symbols, frames))
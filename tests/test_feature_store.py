@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from src.ml.features import add_core_features
+from src.ml.feature_store import CORE_FEATURE_SET, FeatureSet, FeatureStore
+from src.ml.models import predict_symbols
+
+
+def _bars(n=600, seed=5, tz="UTC"):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    idx = pd.date_range("2024-03-01", periods=n, freq="min", tz=tz, name="ts")
+    return pd.DataFrame({"close": close, "volume": rng.integers(100, 1000, n), "symbol": "SPY"}, index=idx)
+
+
+def _sma_set(version="v1"):
+    def compute(df):
+        out = df.copy()
+        out["sma_10"] = out["close"].rolling(10).mean()
+        out["up"] = out["close"].diff() > 0
+        return out
+    return FeatureSet("sma", version, compute, warmup=10, dropna=True, columns=("close", "sma_10", "up"))
+
+
+def test_refresh_appends_incrementally(tmp_path):
+    store = FeatureStore(tmp_path)
+    bars = _bars()
+    fset = _sma_set()
+
+    assert store.refresh("SPY", "1Min", fset, bars.iloc[:300]) == 291  # first 9 rows are NaN
+    assert store.high_water("SPY", "1Min", fset) == bars.index[299]
+    assert store.refresh("SPY", "1Min", fset, bars.iloc[:300]) == 0
+    assert store.refresh("SPY", "1Min", fset, bars.iloc[250:]) == 300
+
+    got = store.read("SPY", "1Min", fset)
+    expected = fset.compute(bars).dropna()[["close", "sma_10", "up"]]
+    pd.testing.assert_frame_equal(got, expected, check_freq=False)
+    assert got["up"].dtype == bool
+
+    tail = store.read("SPY", "1Min", fset, start=bars.index[100], tail=5, columns=["sma_10"])
+    assert list(tail.columns) == ["sma_10"]
+    assert tail.index[-1] == bars.index[-1] and len(tail) == 5
+
+    ts, cols = store.arrays("SPY", "1Min", fset, ["close"])
+    assert isinstance(cols["close"], np.memmap) and len(ts) == 591
+
+
+def test_versions_are_isolated_and_partial_appends_recover(tmp_path):
+    store = FeatureStore(tmp_path)
+    bars = _bars(tz=None)
+    store.refresh("SPY", "1Min", _sma_set("v1"), bars.iloc[:100])
+    assert store.high_water("SPY", "1Min", _sma_set("v2")) is None
+
+    # Simulate a crash after column bytes were written but before meta.json
+    d = store.path("SPY", "1Min", _sma_set("v1"))
+    with open(d / "c1.f8", "ab") as fh:
+        fh.write(b"\x00" * 24)
+    store.refresh("SPY", "1Min", _sma_set("v1"), bars)
+    got = store.read("SPY", "1Min", _sma_set("v1"))
+    assert got.index.tz is None
+    np.testing.assert_allclose(got["sma_10"].to_numpy(), bars["close"].rolling(10).mean().dropna().to_numpy())
+
+
+def test_core_features_served_to_predict_symbols(tmp_path):
+    store = FeatureStore(tmp_path)
+    bars = _bars()
+    store.refresh("SPY", "1D", CORE_FEATURE_SET, bars.iloc[:400])
+    store.refresh("SPY", "1D", CORE_FEATURE_SET, bars)
+    got = store.read("SPY", "1D", CORE_FEATURE_SET)
+    expected = add_core_features(bars)[list(CORE_FEATURE_SET.columns)]
+    pd.testing.assert_frame_equal(got, expected, check_freq=False, rtol=1e-9, atol=1e-9)
+
+    result = predict_symbols(["SPY"], feature_store=store)
+    assert result["SPY"]["method"] == "ml_enhanced"
@@ -0,0 +1,68 @@
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("sklearn")
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from src.ml.forest import export_forest
+from src.ml.registry import ModelRegistry
+
+
+def _data(n=3000, f=12, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n, f))
+    X[:, 2] = np.round(X[:, 2])        # ties on thresholds
+    X[:, 3] = 1.0                      # constant feature
+    X[:, 4] = X[:, 4] * 1e-7 + 0.1     # thresholds that do not round-trip through float32
+    y = 2 * X[:, 0] - X[:, 1] * X[:, 4] + rng.standard_normal(n)
+    return X, y
+
+
+@pytest.mark.parametrize("estimator", [
+    RandomForestRegressor(n_estimators=40, max_depth=10, min_samples_leaf=5, random_state=42),
+    ExtraTreesRegressor(n_estimators=20, random_state=1),
+    DecisionTreeRegressor(random_state=0),
+])
+def test_flat_forest_is_bit_identical_to_sklearn(estimator):
+    X, y = _data()
+    estimator.fit(X, y)
+    flat = export_forest(estimator)
+
+    X_test = np.vstack([X[:500], _data(seed=1)[0] * 3])
+    assert np.array_equal(flat.predict(X_test), estimator.predict(X_test))
+    assert np.array_equal(flat.predict(X_test[0]), estimator.predict(X_test[:1]))
+    assert flat.nbytes < len(pickle.dumps(estimator))
+
+
+def test_export_rejects_multi_output():
+    X, y = _data(n=200)
+    model = DecisionTreeRegressor(max_depth=3).fit(X, np.column_stack([y, y]))
+    with pytest.raises(ValueError):
+        export_forest(model)
+
+
+def test_compact_outlook_model_matches_and_loads_without_sklearn(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "path", list(sys.path))  # the script module prepends the repo root
+    from scripts.ml.enhanced_ml_outlook import MLOutlookConfig, RandomForestModel
+
+    X, y = _data(n=800)
+    features = pd.DataFrame(X, columns=[f"f{i}" for i in range(X.shape[1])])
+    targets = pd.DataFrame({"target_1h": np.sign(y)})
+    model = RandomForestModel(MLOutlookConfig(symbols=["SPY"]))
+    model.train(features, targets, "target_1h")
+    compact = model.compact()
+
+    for end in range(600, 800, 7):
+        assert compact.predict(features.iloc[:end]) == model.predict(features.iloc[:end])
+
+    registry = ModelRegistry(tmp_path)
+    version = registry.register("SPY_rf_1h", compact)
+    assert b"sklearn" not in (tmp_path / "SPY_rf_1h" / version / "model.pkl").read_bytes()
+    loaded = ModelRegistry(tmp_path).load("SPY_rf_1h")
+    assert not loaded.forest.threshold.flags.writeable  # memory-mapped from the registry
+    assert loaded.predict(features) == model.predict(features)
@@ -0,0 +1,113 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+import requests
+
+from scripts.ingestion.mock_bar_server import MockBarServer
+from src.database import enhanced_data_collector as edc
+from src.utils import http_client
+from src.utils.http_client import AsyncHttpClient, HttpClient, HttpPolicy, host_key, http_metrics
+
+START = {"timeframe": "1Min", "start": "2024-01-02T14:30:00Z", "limit": 5}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(http_client.time, "sleep", calls.append)
+    return calls
+
+
+def _closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}/v2"
+
+
+def test_requests_reuse_one_keep_alive_connection_per_host(tmp_path, monkeypatch):
+    client = HttpClient()
+    with MockBarServer() as server:
+        for _ in range(20):
+            r = client.get(f"{server.url}/stocks/SPY/bars", endpoint="bars", params=START, raise_for_status=True)
+            assert len(r.json()["bars"]) == 5
+        assert server.connections == 1 and client.session(server.url) is client.session(server.url + "/x")
+
+        # The collectors share the process-wide client
+        monkeypatch.setattr(edc, "DATA", tmp_path)
+        monkeypatch.setattr(edc, "DB", tmp_path / "emo.sqlite")
+        monkeypatch.setenv("ALPACA_DATA_URL", server.url)
+        monkeypatch.setenv("ALPACA_KEY_ID", "key")
+        monkeypatch.setenv("ALPACA_SECRET_KEY", "secret")
+        before = http_metrics().get("alpaca.bars", {}).get("requests", 0)
+        for symbol in ("QQQ", "IWM"):
+            assert len(edc.EnhancedDataCollector()._request_bars(symbol, "1Min", 10, start_ms=1704205800000)) == 10
+        assert http_metrics()["alpaca.bars"]["requests"] == before + 2
+        assert server.connections == 2  # one more pool: the shared client's
+
+    stats = client.metrics.snapshot()["bars"]
+    assert stats["requests"] == 20 and stats["errors"] == 0 and stats["statuses"] == {200: 20}
+    assert 0 < stats["p50_ms"] <= stats["p95_ms"] <= stats["max_ms"]
+
+
+def test_throttled_gets_retry_after_the_servers_delay(sleeps):
+    client = HttpClient(HttpPolicy(retries=2))
+    with MockBarServer(rate_limit=1) as server:
+        url = f"{server.url}/stocks/SPY/bars"
+        assert client.get(url, endpoint="bars", params=START).status_code == 200
+        r = client.get(url, endpoint="bars", params=START)
+        assert r.status_code == 429 and server.throttled == 3 and sleeps == [1, 1]
+        with pytest.raises(requests.HTTPError):
+            client.get(url, endpoint="bars", params=START, retries=0, raise_for_status=True)
+        assert sleeps == [1, 1] and server.connections == 1
+
+    stats = client.metrics.snapshot()["bars"]
+    assert (stats["requests"], stats["retries"], stats["errors"]) == (5, 2, 4)
+    assert stats["statuses"] == {200: 1, 429: 4}
+
+
+def test_connection_errors_back_off_but_posts_are_not_retried(sleeps):
+    client = HttpClient(HttpPolicy(retries=3, backoff=0.5, jitter=0))
+    url = _closed_port_url()
+    with pytest.raises(requests.ConnectionError):
+        client.get(url, endpoint="down")
+    assert sleeps == [0.5, 1.0, 2.0]
+    with pytest.raises(requests.ConnectionError):
+        client.post(url, endpoint="down", json={})
+    assert len(sleeps) == 3
+
+    stats = client.metrics.snapshot()["down"]
+    assert stats["requests"] == 5 and stats["errors"] == 5 and stats["exceptions"] == {"ConnectionError": 5}
+
+
+def test_pool_limits_connections_per_host():
+    client = HttpClient(HttpPolicy(pool_maxsize=2))
+    with MockBarServer(latency=0.05) as server:
+        threads = [threading.Thread(target=client.get, args=(f"{server.url}/stocks/S{i}/bars",),
+                                    kwargs={"params": START}) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert server.requests == 8 and server.max_in_flight <= 2 and server.connections <= 2
+
+
+def test_async_client_and_sdk_session_share_the_pool():
+    client = HttpClient()
+    with MockBarServer() as server:
+        url = f"{server.url}/stocks/SPY/bars"
+
+        async def fetch():
+            async with AsyncHttpClient(client) as http:
+                return await asyncio.gather(*(http.get(url, endpoint="async", params=START) for _ in range(3)))
+
+        assert [len(r.json()["bars"]) for r in asyncio.run(fetch())] == [5, 5, 5]
+        session = client.as_session()
+        assert session.get(url, params=START).json()["symbol"] == "SPY"
+        session.close()
+        assert client.get(url, params=START).ok
+
+    metrics = client.metrics.snapshot()
+    assert metrics["async"]["requests"] == 3
+    assert metrics[f"GET {host_key(url)}"]["requests"] == 2
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ml.features import add_core_features
+from src.ml.incremental import CORE_FEATURES, IncrementalFeatureEngine
+
+
+def _bars(n=400, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    close[120:140] = close[120]  # flat stretch: zero vol, no losses
+    idx = pd.date_range("2024-01-01", periods=n, freq="min")
+    return pd.DataFrame({"open": close, "close": close, "volume": 1000}, index=idx)
+
+
+def _assert_same(a, b):
+    assert list(a.columns) == list(b.columns)
+    pd.testing.assert_frame_equal(a, b, check_exact=False, rtol=1e-9, atol=1e-12)
+
+
+def test_matches_batch_features():
+    df = _bars()
+    _assert_same(IncrementalFeatureEngine().update("SPY", df), add_core_features(df))
+
+
+def test_appends_only_new_bars():
+    df = _bars()
+    engine = IncrementalFeatureEngine()
+    for cut in (1, 10, 30, 200, 201, 400):
+        _assert_same(engine.update("SPY", df.iloc[:cut]), add_core_features(df.iloc[:cut]))
+    assert engine.stats["appended"] == 400
+    assert engine.stats["resets"] == 0
+
+    # Shorter prefix is served from the cache
+    _assert_same(engine.update("SPY", df.iloc[:50]), add_core_features(df.iloc[:50]))
+    assert engine.stats["appended"] == 400
+
+
+def test_sliding_window_appends_only_new_bars():
+    df = _bars()
+    engine = IncrementalFeatureEngine()
+    engine.update("SPY", df.iloc[:200])
+
+    # Front bars dropped, new bars added: features continue the full history
+    shifted = df.iloc[20:300]
+    _assert_same(engine.update("SPY", shifted), add_core_features(df.iloc[:300]).iloc[20:])
+    for start in range(21, 40):
+        window = df.iloc[start:start + 280]
+        _assert_same(engine.update("SPY", window), add_core_features(df.iloc[:start + 280]).iloc[start:])
+    assert engine.stats["resets"] == 0
+    assert engine.stats["appended"] == 200 + 100 + 19
+
+
+def test_inconsistent_history_recomputes():
+    df = _bars()
+    engine = IncrementalFeatureEngine()
+    engine.update("SPY", df.iloc[:200])
+
+    rewritten = df.iloc[20:300].copy()
+    rewritten.iloc[179, rewritten.columns.get_loc("close")] *= 1.01  # the cached last bar
+    _assert_same(engine.update("SPY", rewritten), add_core_features(rewritten))
+
+    gap = df.iloc[400 - 50:]  # does not reach back to the cached tail
+    _assert_same(engine.update("SPY", gap), add_core_features(gap))
+    older = df.iloc[:100]  # starts before the cached rows
+    _assert_same(engine.update("SPY", older), add_core_features(older))
+    assert engine.stats["resets"] == 3
+
+
+def test_nan_close_matches_batch_features():
+    df = _bars()
+    df.iloc[[150, 151, 260], df.columns.get_loc("close")] = np.nan
+    _assert_same(IncrementalFeatureEngine().update("SPY", df), add_core_features(df))
+
+    engine = IncrementalFeatureEngine()
+    for cut in (150, 152, 200, 261, 400):
+        out = engine.update("SPY", df.iloc[:cut])
+    _assert_same(out, add_core_features(df))
+    assert np.isfinite(out["macd"].iloc[-1]) and out["vol_10"].iloc[-1] > 0
+    assert engine.stats["resets"] == 0
+
+
+def test_cached_rows_stay_bounded():
+    df = _bars()
+    engine = IncrementalFeatureEngine(retention=50)
+    for start in range(0, 300, 10):
+        window = df.iloc[start:start + 60]
+        _assert_same(engine.update("SPY", window), add_core_features(df.iloc[:start + 60]).iloc[start:])
+        assert engine.cached_length("SPY") <= 26 + 50
+    assert engine.stats["resets"] == 0
+
+    # A frame longer than the bound is still served whole
+    _assert_same(engine.update("SPY", df.iloc[280:]), add_core_features(df).iloc[280:])
+    assert engine.cached_length("SPY") == 120 and engine.stats["resets"] == 0
+
+
+def test_append_bar_and_symbols_are_independent():
+    a, b = _bars(seed=1), _bars(seed=2)
+    engine = IncrementalFeatureEngine()
+    for ts, close in a["close"].items():
+        row = engine.append_bar("A", ts, close)
+    engine.update("B", b)
+    expected = add_core_features(a).iloc[-1]
+    assert row["rsi_14"] == pytest.approx(expected["rsi_14"])
+    assert row["macd"] == pytest.approx(expected["macd"])
+    _assert_same(engine.update("A", a), add_core_features(a))
+    _assert_same(engine.update("B", b), add_core_features(b))
+
+
+def test_outlook_market_data_reads_only_new_bars_and_stays_bounded(tmp_path, monkeypatch):
+    import sys
+    from datetime import datetime, timezone
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "path", list(sys.path))  # the script module prepends the repo root
+    from scripts.ml import enhanced_ml_outlook as outlook
+
+    now = pd.Timestamp(datetime.now(timezone.utc)).floor("min")
+    idx = pd.date_range(now - pd.Timedelta(days=3), now, freq="5min")
+    close = 100 + np.arange(len(idx)) * 0.01
+    table = pd.DataFrame({"ts": idx, "symbol": "SPY", "open": close, "high": close, "low": close,
+                          "close": close, "volume": 1000})
+    queries = []
+
+    def fetch_df(sql, symbol, start_date=None, after=None):
+        queries.append("after" if after is not None else "range")
+        ts = table["ts"]
+        return table[ts > pd.Timestamp(after)] if after is not None else table[ts >= pd.Timestamp(start_date)]
+
+    monkeypatch.setattr(outlook.DBRouter, "fetch_df", staticmethod(fetch_df), raising=False)
+    engine = outlook.MLOutlookEngine(outlook.MLOutlookConfig(symbols=["SPY"], feature_store_dir=None,
+                                                             model_registry_dir=None, drift_dir=None))
+    first = engine.get_market_data("SPY", days=1)
+    assert list(first.columns) == ["symbol", "open", "high", "low", "close", "volume"] + CORE_FEATURES
+    table = pd.concat([table, table.tail(1).assign(ts=now + pd.Timedelta(minutes=5), close=200.0)])
+    second = engine.get_market_data("SPY", days=1)
+    assert queries == ["range", "after"] and len(second) == len(first) + 1 and second["close"].iloc[-1] == 200
+    assert len(engine._bars["SPY"][1]) <= len(second)  # trimmed to the window, not all history
+
+    # The window slid forward; only the new bar's features were computed
+    stats = engine.feature_engine.stats
+    assert stats["appended"] == len(first) + 1 and stats["resets"] == 0
+    history = table.set_index("ts")
+    expected = add_core_features(history[history.index >= first.index[0]])
+    pd.testing.assert_frame_equal(second[CORE_FEATURES], expected.loc[second.index, CORE_FEATURES],
+                                  rtol=1e-9, atol=1e-12)
@@ -0,0 +1,135 @@
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from scripts.ingestion.mock_bar_server import MockBarServer
+from src.database import enhanced_data_collector as edc
+from src.database.watermarks import Window, WatermarkStore, find_gaps
+
+MIN = 60_000
+
+
+def _minute(offset=0):
+    return (int(time.time() * 1000) // MIN + offset) * MIN
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockBarServer() as srv:
+        monkeypatch.setenv("ALPACA_DATA_URL", srv.url)
+        monkeypatch.setenv("ALPACA_KEY_ID", "key")
+        monkeypatch.setenv("ALPACA_SECRET_KEY", "secret")
+        yield srv
+
+
+@pytest.fixture
+def collector(tmp_path, monkeypatch):
+    monkeypatch.setattr(edc, "DATA", tmp_path)
+    monkeypatch.setattr(edc, "DB", tmp_path / "emo.sqlite")
+    return edc.EnhancedDataCollector()
+
+
+def _stored(symbol):
+    with sqlite3.connect(edc.DB) as conn:
+        return [t for (t,) in conn.execute("SELECT t FROM enhanced_bars WHERE symbol=? ORDER BY t", (symbol,))]
+
+
+def test_find_gaps_ignores_short_holes_and_closures():
+    ts = np.array([0, 1, 2, 9, 10, 11, 12, 13, 2000]) * MIN
+    assert find_gaps(ts, MIN, min_gap_bars=5, max_gap_ms=600 * MIN) == [(3 * MIN, 8 * MIN)]
+    assert find_gaps(ts, MIN, min_gap_bars=1, max_gap_ms=10_000 * MIN)[-1] == (14 * MIN, 1999 * MIN)
+
+
+def test_plan_chunks_from_watermark_and_backfills_gaps(tmp_path):
+    store = WatermarkStore(tmp_path / "w.sqlite")
+    now = 10_000 * MIN
+    assert store.plan("SPY", "1Min", "p", now, 30 * MIN, chunk_bars=100) == [Window(now - 30 * MIN, now, final=True)]
+
+    store.advance("SPY", "1Min", "p", now - 250 * MIN)
+    store.advance("SPY", "1Min", "p", now - 900 * MIN)  # never moves backwards
+    store.record_gaps("SPY", "1Min", "p", [(5000 * MIN, 5010 * MIN)])
+    windows = store.plan("SPY", "1Min", "p", now, 30 * MIN, chunk_bars=100)
+    assert [(w.start_ms // MIN, w.end_ms // MIN, w.kind, w.final) for w in windows] == [
+        (9751, 9850, "incremental", False), (9851, 9950, "incremental", False),
+        (9951, 10000, "incremental", True), (5000, 5010, "backfill", False)]
+    assert len(store.plan("SPY", "1Min", "p", now, 30 * MIN, chunk_bars=100, max_windows=2)) == 2
+
+    store.commit("SPY", "1Min", "p", windows[-1], [])
+    store.commit("SPY", "1Min", "p", windows[-1], [])
+    assert store.open_gaps("SPY", "1Min", "p") == []  # given up after two empty attempts
+
+
+def test_collector_requests_only_new_bars(server, collector):
+    first = collector.ingest_market_data(["SPY"], limit=100)
+    assert 99 <= first <= 101 and server.requests == 1
+
+    requests = server.requests
+    assert collector.ingest_market_data(["SPY"], limit=100) <= 1  # at most the bar that just closed
+    assert server.requests - requests <= 1
+
+    # An outage of 250 minutes is caught up in bounded windows of at most 100 bars
+    store = collector.watermarks
+    with sqlite3.connect(edc.DB) as conn:
+        conn.execute("DELETE FROM enhanced_bars")
+        conn.execute("UPDATE ingest_watermarks SET last_ts=?", (_minute(-250),))
+    requests = server.requests
+    assert collector.ingest_market_data(["SPY"], limit=100) >= 249
+    assert server.requests - requests == 3
+    assert all(int(entry["limit"]) == 100 for entry in server.log)
+    stored = _stored("SPY")
+    assert np.all(np.diff(stored) == MIN)
+    assert store.get("SPY", "1Min", "alpaca") == stored[-1]
+
+
+def test_gap_is_recorded_and_backfilled(server, collector):
+    store = collector.watermarks
+    now = _minute()
+    store.advance("QQQ", "1Min", "alpaca", now - 60 * MIN)
+    gap = (now - 40 * MIN, now - 31 * MIN)
+    outage = tuple(datetime.fromtimestamp(ms / 1000, timezone.utc) for ms in gap)
+    server.holes.append(outage)
+
+    collector.ingest_market_data(["QQQ"], limit=100)
+    assert store.open_gaps("QQQ", "1Min", "alpaca") == [gap]
+    assert not set(range(gap[0], gap[1] + 1, MIN)) & set(_stored("QQQ"))
+
+    server.holes.clear()
+    requests = server.requests
+    collector.ingest_market_data(["QQQ"], limit=100)
+    assert server.log[-1]["start"] == outage[0].strftime("%Y-%m-%dT%H:%M:%SZ")
+    assert server.requests - requests <= 2
+    assert store.open_gaps("QQQ", "1Min", "alpaca") == []
+    assert np.all(np.diff(_stored("QQQ")) == MIN)
+
+
+def test_engine_resumes_after_a_failed_write(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "path", list(sys.path))  # the script module prepends the repo root
+    from scripts.ingestion import enhanced_ingestion as ingestion
+
+    config = ingestion.IngestionConfig(provider=ingestion.DataProvider.ALPACA, symbols=["SPY"], timeframes=["1Min"],
+                                       batch_size=100, watermark_db=str(tmp_path / "w.sqlite"))
+    engine = ingestion.DataIngestionEngine(config)
+    engine.watermarks.advance("SPY", "1Min", "alpaca", _minute(-250))
+
+    stored = []
+    def crash_on_second_window(df):
+        if stored:
+            raise RuntimeError("disk full")
+        stored.append(df)
+        return len(df)
+    monkeypatch.setattr(engine, "_upsert_bars", crash_on_second_window)
+    result = engine.run_ingestion()
+    assert not result["results"][0]["success"] and result["results"][0]["rows"] == 100
+    first_window = stored[0]["ts"].dt.as_unit("ms").astype("int64")
+    assert engine.watermarks.get("SPY", "1Min", "alpaca") == first_window.iloc[-1]
+
+    monkeypatch.setattr(engine, "_upsert_bars", lambda df: stored.append(df) or len(df))
+    result = engine.run_ingestion()
+    assert result["results"][0]["success"]
+    ts = np.concatenate([df["ts"].dt.as_unit("ms").astype("int64").to_numpy() for df in stored])
+    assert np.all(np.diff(ts) == MIN)  # resumed right after the stored window, no duplicates
+    assert engine.watermarks.get("SPY", "1Min", "alpaca") == ts[-1]
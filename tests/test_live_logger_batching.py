@@ -0,0 +1,56 @@
+import sys
+
+import pytest
+
+from scripts.ingestion.mock_bar_server import MockBarServer
+
+
+@pytest.fixture
+def live_logger(monkeypatch):
+    monkeypatch.setattr(sys, "path", list(sys.path))  # the module prepends the repo root and src/
+    from data import live_logger as module
+
+    monkeypatch.setattr(module, "KEY", "k" * 20)
+    monkeypatch.setattr(module, "SEC", "s" * 40)
+    monkeypatch.setattr(module, "RATE_LIMIT_DELAY", 0)
+    monkeypatch.setattr(module, "RETRY_COUNT", 2)
+    monkeypatch.setattr(module, "DB", None)
+    monkeypatch.setattr(module, "_session", None)
+    module.reset_metrics()
+    return module
+
+
+def test_watchlist_is_fetched_in_multi_symbol_requests(live_logger, monkeypatch):
+    symbols = [f"S{i:03d}" for i in range(250)]
+    with MockBarServer() as server:
+        server.unknown_symbols = {"S007", "S201"}
+        monkeypatch.setattr(live_logger, "ALPACA_DATA_URL", server.url)
+        monkeypatch.setattr(live_logger, "SYMBOLS", symbols)
+
+        result = live_logger.main_once()
+
+        assert server.requests == 3
+        assert [len(entry["symbols"]) for entry in server.log] == [100, 100, 50]
+        assert result["failed_symbols"] == ["S007", "S201"]
+        assert result["symbols_processed"] == 248
+        bar = live_logger.fetch_latest_bars(["S123"])["S123"]
+        expected = server.latest_bar("S123")
+        assert bar["symbol"] == "S123" and bar["close"] == expected["c"] and bar["ts"] == expected["t"]
+
+    metrics = live_logger.get_performance_metrics()
+    assert metrics["total_requests"] == 4 and metrics["success_rate"] == 100.0
+    assert metrics["symbols_failed"] == 2
+
+
+def test_rate_limited_batch_is_retried(live_logger, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(live_logger.time, "sleep", sleeps.append)
+    with MockBarServer(rate_limit=1) as server:
+        monkeypatch.setattr(live_logger, "ALPACA_DATA_URL", server.url)
+        latest = live_logger.fetch_latest_bars(["SPY", "QQQ", "IWM"], batch_size=2)
+
+        assert latest["SPY"] and latest["QQQ"] and latest["IWM"] is None
+        assert server.throttled == 3 and sleeps == [1, 1, 1]  # Retry-After, then out of retries
+
+    metrics = live_logger.get_performance_metrics()
+    assert (metrics["total_requests"], metrics["successful_requests"], metrics["failed_requests"]) == (4, 1, 1)
@@ -0,0 +1,156 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ml.drift import DriftMonitor, DriftThresholds, FeatureProfile, ModelTracker, drift_status
+
+
+def _bars(closes, start="2024-01-02 14:30"):
+    return pd.date_range(start, periods=len(closes), freq="min", tz="UTC"), np.asarray(closes, dtype=float)
+
+
+def test_predictions_are_scored_after_their_horizon():
+    monitor = DriftMonitor()
+    index, close = _bars(100 * 1.02 ** np.arange(10))  # +2% per bar
+    monitor.observe_bars("SPY", index[:3], close[:3])
+    assert monitor.record_prediction("SPY", "rf", "2b", 2, signal=0.8, confidence=0.9)
+    assert not monitor.record_prediction("SPY", "rf", "2b", 2, signal=0.8, confidence=0.9)  # same bar
+
+    assert monitor.observe_bars("SPY", index[:4], close[:4]) == 0
+    assert monitor.observe_bars("SPY", index[:5], close[:5]) == 1  # two bars after the prediction
+    assert monitor.observe_bars("SPY", index[:5], close[:5]) == 0  # already seen
+
+    stats = monitor.trackers[("SPY", "rf", "2b")].stats()
+    assert stats["hit_rate"] == 1.0
+    assert stats["mae"] == pytest.approx(0.2)  # |0.8 - 1|
+    assert stats["pending"] == 0
+
+
+def test_rolling_statistics_match_recomputation_over_the_window():
+    rng = np.random.default_rng(0)
+    tracker = ModelTracker(window=50)
+    scored = []
+    for i in range(400):
+        signal, confidence = rng.uniform(-1, 1), rng.uniform(0, 1)
+        realized = rng.normal(0, 0.02)
+        tracker.add_prediction(i, i + 1, 100.0, signal, confidence)
+        tracker.resolve(i + 1, 100.0 * (1 + realized))
+        scored.append((signal, confidence, realized))
+
+    last = scored[-50:]
+    labels = np.array([1 if r > 0.01 else -1 if r < -0.01 else 0 for _, _, r in last])
+    signals = np.array([s for s, _, _ in last])
+    conf = np.array([c for _, c, _ in last])
+    moved = labels != 0
+    hits = np.sign(signals[moved]) == labels[moved]
+    buckets = np.minimum((conf[moved] * 10).astype(int), 9)
+    ece = sum(np.sum(buckets == b) / moved.sum() * abs(conf[moved][buckets == b].mean() - hits[buckets == b].mean())
+              for b in np.unique(buckets))
+
+    stats = tracker.stats()
+    assert stats["samples"] == 50 and stats["resolved_total"] == 400
+    assert stats["hit_rate"] == pytest.approx(hits.mean())
+    assert stats["mae"] == pytest.approx(np.abs(signals - labels).mean())
+    assert stats["calibration_error"] == pytest.approx(ece)
+
+
+def test_feature_drift_flags_shifted_inputs():
+    rng = np.random.default_rng(1)
+    names = ["a", "b"]
+    profile = FeatureProfile.fit(rng.standard_normal((5000, 2)), names)
+    assert profile.expected.sum(axis=1) == pytest.approx([1.0, 1.0])
+
+    monitor = DriftMonitor(window=300, thresholds=DriftThresholds(min_feature_samples=200))
+    index, close = _bars(np.full(600, 100.0))
+    for i in range(600):
+        monitor.observe_bars("SPY", index[:i + 1], close[:i + 1])
+        x = rng.standard_normal(2)
+        if i >= 300:
+            x[1] += 2.0  # feature b shifts half way
+        monitor.record_prediction("SPY", "rf", "1h", 60, 0.0, 0.5, features=x[::-1], feature_names=names[::-1],
+                                  version="v0001", profile=profile)
+        if i == 299:
+            assert monitor.needs_retraining("SPY", "rf") == []
+
+    drift = monitor.trackers[("SPY", "rf", "1h")].feature_drift()
+    assert drift["top_feature"] == "b" and drift["psi"]["a"] < 0.1
+    assert drift["mean_shift"]["b"] == pytest.approx(2.0, abs=0.2)
+    assert any("feature drift" in reason for reason in monitor.needs_retraining("SPY", "rf"))
+    assert [(s, m) for s, m, _ in monitor.retrain_candidates()] == [("SPY", "rf")]
+
+
+def test_new_model_version_resets_and_state_round_trips(tmp_path):
+    monitor = DriftMonitor(tmp_path, thresholds=DriftThresholds(min_samples=5))
+    index, close = _bars(100 * 0.98 ** np.arange(40))  # falling market
+    for i in range(20):
+        monitor.observe_bars("QQQ", index[:i + 1], close[:i + 1])
+        monitor.record_prediction("QQQ", "rf", "1b", 1, signal=0.9, confidence=0.9, version="v0001")
+    monitor.save()
+
+    status = drift_status(tmp_path)  # not registered in this process: read from the status file
+    assert status["models"]["QQQ_rf_1b"]["hit_rate"] == 0.0
+    assert status["flagged"]["QQQ_rf_1b"][0].startswith("hit_rate 0.000")
+
+    restored = DriftMonitor.load(tmp_path)
+    restored.observe_bars("QQQ", index[:21], close[:21])  # resolves the prediction pending at save time
+    tracker = restored.trackers[("QQQ", "rf", "1b")]
+    assert tracker.stats()["resolved_total"] == 20
+
+    restored.record_prediction("QQQ", "rf", "1b", 1, signal=0.9, confidence=0.9, version="v0002")
+    assert tracker.stats()["resolved_total"] == 0 and tracker.version == "v0002"
+    assert restored.needs_retraining("QQQ", "rf") == []
+
+
+def test_weekly_retrain_uses_monitor_instead_of_prediction_history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "path", list(sys.path))  # the script module prepends the repo root
+    from scripts.automation import enhanced_weekly_retrain as weekly
+
+    monitor = DriftMonitor(tmp_path / "drift", thresholds=DriftThresholds(min_samples=5))
+    index, close = _bars(100 * 0.98 ** np.arange(20))
+    for i in range(20):
+        monitor.observe_bars("SPY", index[:i + 1], close[:i + 1])
+        monitor.record_prediction("SPY", "rf", "1b", 1, signal=0.9, confidence=0.9, version="v0001")
+        monitor.record_prediction("SPY", "lstm", "1b", 1, signal=-0.9, confidence=0.9, version="v0001")
+    monitor.save()
+
+    def no_db(*args, **kwargs):
+        raise AssertionError("prediction history should not be queried")
+    monkeypatch.setattr(weekly.ModelPerformanceMonitor, "get_model_performance", no_db)
+
+    config = weekly.RetrainConfig(symbols=["SPY"], models=["rf", "lstm"], drift_dir=str(tmp_path / "drift"),
+                                  targeted=True, email_notifications=False)
+    engine = weekly.WeeklyRetrainEngine(config)
+    assert engine.performance_monitor.needs_retraining("SPY", "rf")
+    assert not engine.performance_monitor.needs_retraining("SPY", "lstm")
+    assert engine._plan_retrains() == [("SPY", "rf", 1)]
+    assert engine.performance_monitor.get_online_status()["SPY_rf_1b"]["needs_retraining"]
+
+
+def test_targeted_plan_reads_the_configured_registry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "path", list(sys.path))  # the script module prepends the repo root
+    from scripts.automation import enhanced_weekly_retrain as weekly
+    from src.ml.registry import get_registry
+
+    monitor = DriftMonitor(tmp_path / "drift", thresholds=DriftThresholds(min_samples=5))
+    index, close = _bars(100 * 0.98 ** np.arange(20))
+    for i in range(20):
+        monitor.observe_bars("SPY", index[:i + 1], close[:i + 1])
+        monitor.record_prediction("SPY", "rf", "1b", 1, signal=0.9, confidence=0.9, version="v0001")
+    monitor.save()
+
+    config = weekly.RetrainConfig(symbols=["SPY"], models=["rf"], drift_dir=str(tmp_path / "drift"),
+                                  model_registry_dir=str(tmp_path / "registry"),
+                                  targeted=True, email_notifications=False)
+    engine = weekly.WeeklyRetrainEngine(config)
+    assert engine._plan_targeted() == [("SPY", "rf", 1)]
+
+    # Retrained into the configured registry since the monitor flagged v0001
+    registry = get_registry(tmp_path / "registry")
+    registry.register("SPY_rf_1b", {"w": 1})
+    registry.register("SPY_rf_1b", {"w": 2})
+    assert registry.production_version("SPY_rf_1b") == "v0002"
+    assert engine._plan_targeted() == []
@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.ml.registry import ModelRegistry, feature_schema_hash
+
+
+class _LinearModel:
+    def __init__(self, coef, model_version="lin_v1"):
+        self.coef = np.asarray(coef, dtype=float)
+        self.feature_names = [f"f{i}" for i in range(len(self.coef))]
+        self.model_version = model_version
+
+    def predict(self, X):
+        return X @ self.coef
+
+
+def test_register_and_load_round_trip_with_manifest(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    model = _LinearModel(np.arange(1000))
+    version = registry.register("SPY_lin_1d", model, metrics={"mae": np.float64(0.25), "n_samples": np.int64(10)},
+                                training_window={"start": "2024-01-02", "end": "2024-02-01", "rows": 10})
+
+    manifest = json.loads((tmp_path / "SPY_lin_1d" / "manifest.json").read_text())
+    entry = manifest["versions"][version]
+    assert manifest["production"] == version
+    assert entry["metrics"] == {"mae": 0.25, "n_samples": 10}
+    assert entry["feature_schema_hash"] == feature_schema_hash(model.feature_names)
+    assert entry["training_window"]["rows"] == 10
+
+    cold = ModelRegistry(tmp_path)
+    loaded = cold.load("SPY_lin_1d")
+    np.testing.assert_array_equal(loaded.coef, model.coef)
+    # Array data is a read-only view of the memory-mapped buffer file
+    assert not loaded.coef.flags.writeable and not loaded.coef.flags.owndata
+
+    assert cold.load("SPY_lin_1d") is loaded
+    assert cold.stats["hits"] == 1 and cold.stats["misses"] == 1
+    assert cold.load("SPY_lin_1d", schema_hash=feature_schema_hash(["other"])) is None
+
+
+def test_promote_and_rollback(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    v1 = registry.register("k", _LinearModel([1.0]))
+    v2 = registry.register("k", _LinearModel([2.0]))
+    v3 = registry.register("k", _LinearModel([3.0]), promote=False)
+    assert registry.production_version("k") == v2
+    assert registry.load("k").coef[0] == 2.0
+
+    registry.promote("k", v3)
+    assert registry.load("k").coef[0] == 3.0
+    assert registry.rollback("k") == v2
+    assert registry.rollback("k") == v1
+    assert registry.load("k").coef[0] == 1.0
+    assert registry.rollback("k") is None
+
+    with pytest.raises(KeyError):
+        registry.promote("k", "v9999")
+
+
+def test_lru_evicts_oldest_and_prune_keeps_production(tmp_path):
+    registry = ModelRegistry(tmp_path, cache_size=2)
+    for key in ("a", "b", "c"):
+        registry.register(key, _LinearModel([1.0]))
+    registry.load("a")
+    assert registry.stats["misses"] == 1  # evicted by b and c
+
+    for i in range(4):
+        registry.register("d", _LinearModel([float(i)]))
+    registry.promote("d", "v0001")
+    removed = registry.prune("d", keep=1)
+    assert removed == ["v0002", "v0003"]
+    assert registry.versions("d") == ["v0001", "v0004"]
+    assert not (tmp_path / "d" / "v0002").exists()
+    assert registry.rollback("d") == "v0004"
+
+
+def test_unfinished_version_directory_is_ignored(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    registry.register("k", _LinearModel([1.0]))
+    (tmp_path / "k" / ".tmp-crashed").mkdir()
+    assert registry.versions("k") == ["v0001"]
+    assert registry.register("k", _LinearModel([2.0])) == "v0002"
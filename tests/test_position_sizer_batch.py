@@ -0,0 +1,47 @@
+import numpy as np
+
+from src.logic import (
+    PortfolioSnapshot,
+    correlation_scale,
+    correlation_scale_batch,
+    credit_spread_contracts,
+    credit_spread_contracts_batch,
+    equity_size_by_vol,
+    equity_size_by_vol_batch,
+    pct_returns_matrix,
+)
+from src.strategies.base import Order
+from src.strategies.manager import StrategyManager
+
+
+def test_batch_sizers_match_scalar_versions():
+    rng = np.random.default_rng(0)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (200, 21)), axis=1))
+    shares = equity_size_by_vol_batch(pct_returns_matrix(prices), prices[:, -1], 100_000, 0.01, 20)
+    assert list(shares) == [equity_size_by_vol(p, 100_000, 0.01, 20) for p in prices]
+
+    credit = rng.uniform(0, 3, 200)
+    width = rng.choice([1, 2, 5, 10], 200)
+    contracts = credit_spread_contracts_batch(credit, width, 50_000, 0.02)
+    assert list(contracts) == [credit_spread_contracts(c, w, 50_000, 0.02) for c, w in zip(credit, width)]
+
+    base = rng.integers(0, 20, 200)
+    corr = rng.uniform(0.5, 1.0, 200)
+    scaled = correlation_scale_batch(base, corr)
+    assert list(scaled) == [correlation_scale(int(b), c) for b, c in zip(base, corr)]
+    assert list(correlation_scale_batch([7, 7], [np.nan, 0.1])) == [7, 7]
+
+
+def test_apply_risk_management_caps_quantities():
+    sm = StrategyManager()
+    pf = PortfolioSnapshot(equity=100_000, cash=100_000, positions=[])
+    orders = [
+        # (5 - 0.5) * 100 = 450 max loss per contract vs 2,000 budget -> 4 contracts
+        Order("SPY", "sell", 9, type="put_credit_spread_open",
+              meta={"spread_width": 5, "expected_credit": 0.5}),
+        Order("QQQ", "sell", 2, type="iron_condor_open",
+              meta={"wing_width": 5, "expected_credit": 0.3, "avg_corr_to_book": 1.0}),
+    ]
+    approved = sm._apply_risk_management(orders, pf)
+    assert [o.qty for o in approved] == [4]
+    assert approved[0].meta["requested_qty"] == 9
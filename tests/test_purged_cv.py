@@ -0,0 +1,104 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ml.features import train_val_test_split
+from src.ml.scheduler import RetrainScheduler
+from src.ml.validation import PurgedCV, cross_validate
+
+
+class _MeanModel:
+    """Predicts the training mean; picklable stand-in estimator"""
+
+    def fit(self, X, y):
+        self.mean_ = float(np.mean(y))
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.mean_)
+
+
+@pytest.mark.parametrize("mode", ["expanding", "rolling"])
+def test_walk_forward_folds_purge_overlapping_labels(mode):
+    cv = PurgedCV(n_splits=4, horizon=3, embargo=2, mode=mode)
+    folds = cv.split(200)
+    assert len(folds) == 4
+    for train, test in folds:
+        assert train.max() + 3 + 2 < test.min()
+        assert np.all(np.diff(test) == 1)
+    sizes = [len(train) for train, _ in folds]
+    if mode == "expanding":
+        assert sizes == sorted(sizes) and sizes[0] < sizes[-1]
+    else:
+        assert len(set(sizes[1:])) == 1
+
+
+def test_blocked_folds_purge_and_embargo_on_both_sides():
+    h, embargo = 4, 3
+    for train, test in PurgedCV(n_splits=5, horizon=h, embargo=embargo, mode="blocked").split(100):
+        before, after = train[train < test.min()], train[train > test.max()]
+        if len(before):
+            assert before.max() + h < test.min()
+        if len(after):
+            assert after.min() > test.max() + h + embargo
+
+
+def test_purge_uses_bar_positions_not_row_numbers():
+    times = np.array([0, 1, 2, 10, 11, 12, 13, 14, 15, 16, 17, 18])
+    train, test = PurgedCV(n_splits=1, horizon=5, test_size=3).split(times)[0]
+    # Rows 0..8 precede the test rows, but only bars 0..10 have labels that end before bar 16
+    assert times[test].tolist() == [16, 17, 18]
+    assert times[train].tolist() == [0, 1, 2, 10]
+
+
+def test_cross_validate_pool_matches_inline_and_skips_nan_rows():
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((400, 3))
+    y = rng.standard_normal(400)
+    X[10, 1] = np.nan
+    y2 = y.copy()
+    y2[-20:] = np.nan
+    cv = PurgedCV(n_splits=4, horizon=2)
+
+    inline = cross_validate(_MeanModel, X, {"a": y, "b": y2}, cv)
+    pooled = cross_validate(_MeanModel, X, {"a": y, "b": y2}, cv,
+                            scheduler=RetrainScheduler(max_workers=2, progress=lambda e: None))
+    for name in ("a", "b"):
+        assert len(inline[name].folds) == 4 and not inline[name].errors
+        for f_in, f_pool in zip(inline[name].folds, pooled[name].folds):
+            assert f_in["mae"] == f_pool["mae"] and f_in["test_rows"] == f_pool["test_rows"]
+    assert inline["b"].folds[-1]["test_rows"][1] < 380
+    summary = inline["a"].summary()
+    assert summary["folds"] == 4 and 0 <= summary["hit_rate_mean"] <= 1
+
+
+def test_chronological_split_has_gap():
+    train, val, test = train_val_test_split(100, test=0.2, val=0.1, shuffle=False, gap=3)
+    assert train.max() + 3 < val.min() and val.max() + 3 < test.min()
+    assert test.max() == 99
+
+
+def test_engine_cross_validation_reports_each_rf_horizon(tmp_path, monkeypatch):
+    pytest.importorskip("sklearn")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "path", list(sys.path))  # the script module prepends the repo root
+    from scripts.ml.enhanced_ml_outlook import MLOutlookConfig, MLOutlookEngine
+
+    rng = np.random.default_rng(5)
+    n = 1200
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.004, n))
+    bars = pd.DataFrame({
+        "open": close, "high": close * 1.001, "low": close * 0.999, "close": close,
+        "volume": rng.integers(1_000, 5_000, n),
+    }, index=pd.date_range("2024-01-02 14:30", periods=n, freq="min", tz="UTC"))
+    engine = MLOutlookEngine(MLOutlookConfig(symbols=["SPY"], forecast_horizons=["1h", "5h"],
+                                             models=["rf", "lstm"], feature_store_dir=None))
+    monkeypatch.setattr(engine, "get_market_data", lambda symbol, days=None: bars)
+
+    reports = engine.cross_validate("SPY", cv=PurgedCV(n_splits=3, min_train_size=100))
+    assert set(reports) == {"SPY_rf_1h", "SPY_rf_5h"}
+    for report in reports.values():
+        assert len(report.folds) == 3 and not report.errors
+        assert all(f["fit_seconds"] > 0 for f in report.folds)
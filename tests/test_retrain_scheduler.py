@@ -0,0 +1,92 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ml.scheduler import RetrainScheduler, SharedMatrix, TrainJob
+
+
+# Job functions must be module level so worker processes can unpickle them
+def _column_sum(arrays, col):
+    assert not arrays["X"].flags.writeable
+    return float(arrays["X"][:, col].sum())
+
+
+def _sleep(arrays, seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _fail(arrays):
+    raise RuntimeError("boom")
+
+
+def test_inline_runs_priority_jobs_first_and_keeps_submission_order():
+    seen = []
+    jobs = [TrainJob(f"j{i}", _sleep, {"seconds": 0}, priority=p) for i, p in enumerate([0, 1, 0, 2, 1])]
+    RetrainScheduler(max_workers=1, progress=lambda e: seen.append(e["result"].key)).run(jobs)
+    assert seen == ["j3", "j1", "j4", "j0", "j2"]
+
+
+def test_pool_workers_read_shared_matrix():
+    X = np.arange(40, dtype=float).reshape(10, 4)
+    with SharedMatrix(X) as sx:
+        jobs = [TrainJob(f"c{k}", _column_sum, {"col": k}, {"X": sx.handle}) for k in range(4)]
+        results = RetrainScheduler(max_workers=2, progress=lambda e: None).run(jobs)
+    assert {k: r.result for k, r in results.items()} == {f"c{k}": X[:, k].sum() for k in range(4)}
+    assert all(r.success for r in results.values())
+
+
+def test_memory_budget_limits_concurrency():
+    jobs = [TrainJob(f"s{i}", _sleep, {"seconds": 0.2}, memory_mb=100) for i in range(4)]
+    scheduler = RetrainScheduler(max_workers=4, memory_budget_mb=250, progress=lambda e: None)
+    scheduler.run(jobs)
+    assert scheduler.stats["peak_concurrency"] == 2
+
+    # A job larger than the whole budget still runs, alone
+    big = [TrainJob("big", _sleep, {"seconds": 0}, memory_mb=1000), TrainJob("small", _sleep, {"seconds": 0})]
+    assert all(r.success for r in RetrainScheduler(2, memory_budget_mb=250, progress=lambda e: None).run(big).values())
+
+
+def test_failures_are_captured_per_job():
+    jobs = [TrainJob("bad", _fail), TrainJob("good", _sleep, {"seconds": 0})]
+    scheduler = RetrainScheduler(max_workers=2, progress=lambda e: None)
+    results = scheduler.run(jobs)
+    assert not results["bad"].success and "boom" in results["bad"].error
+    assert results["good"].success
+    assert scheduler.stats["failed"] == 1
+
+
+def test_scheduled_training_matches_serial(tmp_path, monkeypatch):
+    pytest.importorskip("sklearn")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "path", list(sys.path))  # the script module prepends the repo root
+    from scripts.ml.enhanced_ml_outlook import MLOutlookConfig, MLOutlookEngine
+
+    rng = np.random.default_rng(3)
+    n = 1500
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.002, n))
+    bars = pd.DataFrame({
+        "open": close, "high": close * 1.001, "low": close * 0.999, "close": close,
+        "volume": rng.integers(1_000, 5_000, n),
+    }, index=pd.date_range("2024-01-02 14:30", periods=n, freq="min", tz="UTC"))
+
+    def make_engine():
+        config = MLOutlookConfig(symbols=["SPY"], forecast_horizons=["1h", "5h"], models=["rf", "lstm"],
+                                 feature_store_dir=None)
+        engine = MLOutlookEngine(config)
+        monkeypatch.setattr(engine, "get_market_data", lambda symbol, days=None: bars)
+        return engine
+
+    serial = make_engine()
+    expected = serial.train_models("SPY")
+    pooled = make_engine()
+    got = pooled.train_models("SPY", scheduler=RetrainScheduler(max_workers=2, progress=lambda e: None))
+
+    assert set(got) == set(expected) == {f"SPY_{m}_{h}" for m in ("rf", "lstm") for h in ("1h", "5h")}
+    features = serial.feature_engineer.create_features(bars)
+    for key in expected:
+        assert got[key]["mae"] == pytest.approx(expected[key]["mae"])
+        assert pooled.models[key].predict(features) == serial.models[key].predict(features)
@@ -0,0 +1,53 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.ml.features import iter_window_batches, sliding_windows
+
+# Other tests put src/ on sys.path, which shadows the top-level ml package
+_spec = importlib.util.spec_from_file_location(
+    "ml_data_window", Path(__file__).resolve().parents[1] / "ml" / "data" / "window.py"
+)
+_window = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_window)
+legacy_path_windows = _window.sliding_windows
+
+
+def _reference(X, y, lookback):
+    seqs, targets = [], []
+    for t in range(lookback, len(X)):
+        seqs.append(X[t - lookback:t])
+        targets.append(y[t])
+    return np.array(seqs), np.array(targets)
+
+
+@pytest.mark.parametrize("fn", [sliding_windows, legacy_path_windows])
+@pytest.mark.parametrize("rows,lookback", [(200, 10), (11, 10), (10, 10), (3, 10)])
+def test_sliding_windows_match_reference(fn, rows, lookback):
+    rng = np.random.default_rng(rows)
+    X = rng.standard_normal((rows, 5)).astype(np.float32)
+    y = rng.standard_normal(rows).astype(np.float32)
+    seqs, targets = fn(X, y, lookback)
+    ref_seqs, ref_targets = _reference(X, y, lookback)
+    assert seqs.shape == ref_seqs.shape and seqs.dtype == ref_seqs.dtype
+    assert np.array_equal(seqs, ref_seqs) and np.array_equal(targets, ref_targets)
+
+
+def test_sliding_windows_are_read_only_views():
+    X = np.arange(400, dtype=np.float64).reshape(100, 4)
+    seqs, targets = sliding_windows(X, np.arange(100.0), 20)
+    assert np.shares_memory(seqs, X)
+    assert not seqs.flags.writeable and not targets.flags.writeable
+
+
+def test_iter_window_batches_cover_all_windows():
+    X = np.random.default_rng(0).standard_normal((1000, 3))
+    y = np.arange(1000.0)
+    batches = list(iter_window_batches(X, y, 30, batch_size=128))
+    assert all(len(b[1]) <= 128 for b in batches)
+    assert np.array_equal(np.concatenate([b[0] for b in batches]), _reference(X, y, 30)[0])
+
+    shuffled = list(iter_window_batches(X, y, 30, batch_size=128, shuffle=True, seed=1))
+    assert sorted(np.concatenate([b[1] for b in shuffled])) == list(y[30:])
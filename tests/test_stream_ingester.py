@@ -0,0 +1,160 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from scripts.ingestion.mock_stream_server import MockStreamServer
+from src.database.bulk_writer import SQLiteBulkWriter
+from src.database.rollups import BARS, RollupEngine
+from src.database.stream_ingester import (MiniWebSocket, StreamAuthError, StreamConfig, StreamIngester,
+                                          encode_frame, read_frame)
+
+T0 = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+
+def _writer(path):
+    def factory():
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE IF NOT EXISTS bars (symbol TEXT NOT NULL, ts TEXT NOT NULL, open REAL, high REAL,"
+                     " low REAL, close REAL, volume INTEGER, PRIMARY KEY(symbol, ts))")
+        return SQLiteBulkWriter(conn)
+    return factory
+
+
+def _config(server, **kwargs):
+    kwargs.setdefault("bars", ["SPY", "QQQ"])
+    kwargs.setdefault("quotes", [])
+    return StreamConfig(url=server.url, key_id="key", secret_key="secret", reconnect_initial=0.05,
+                        flush_interval=0.05, **kwargs)
+
+
+async def _until(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def _reader(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+def test_frames_round_trip_fragmented_and_large_messages():
+    async def scenario():
+        reader = asyncio.StreamReader()
+        big = b"x" * 70_000
+        reader.feed_data(encode_frame(0x1, b"hel", mask=True, fin=False) + encode_frame(0x0, b"lo", mask=True)
+                         + encode_frame(0x2, big, mask=False))
+        reader.feed_eof()
+        ws = MiniWebSocket(reader, writer=None, client=False)
+        assert await ws.recv() == "hello"
+        assert await ws.recv() == big
+        assert (await read_frame(_reader(encode_frame(0x1, b"abc", mask=True))))[1:] == (0x1, b"abc")
+    asyncio.run(scenario())
+
+
+def test_bars_are_batched_into_the_bulk_writer_and_published(tmp_path):
+    db = tmp_path / "stream.sqlite"
+
+    async def scenario():
+        async with MockStreamServer() as server:
+            ingester = StreamIngester(_config(server, quotes=["SPY"], flush_rows=50), _writer(db),
+                                      rollups=RollupEngine(db, BARS))
+            queue = ingester.subscribe(kinds=["bar"], symbols=["QQQ"])
+            seen = []
+            ingester.add_listener(seen.append)
+            task = asyncio.ensure_future(ingester.run())
+            await server.wait_subscribed(bars=["SPY", "QQQ"], quotes=["SPY"])
+
+            for i in range(60):
+                await server.push_bar("SPY", T0 + timedelta(minutes=i))
+                await server.push_bar("QQQ", T0 + timedelta(minutes=i))
+            await server.push_quote("SPY", 470.01, 470.03)
+            await server.push_raw("not json")
+            await _until(lambda: ingester.stats["rows_written"] == 120)
+
+            assert (await queue.get())["ts"] == "2024-01-02T14:30:00Z"
+            assert queue.queue.qsize() == 59 and all(e["symbol"] == "QQQ" for e in queue.queue._queue)
+            assert len(seen) == 121 and seen[-1]["type"] == "quote" and seen[-1]["ask"] == 470.03
+            assert ingester.latest_bars["SPY"]["ts"] == "2024-01-02T15:29:00Z"
+            await ingester.stop()
+            await task
+            return ingester
+
+    ingester = asyncio.run(scenario())
+    assert ingester.stats["bars"] == 120 and ingester.stats["quotes"] == 1
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT symbol) FROM bars").fetchone() == (120, 2)
+        assert conn.execute("SELECT tf, SUM(n) FROM bars_rollups WHERE symbol='QQQ' GROUP BY tf ORDER BY tf").fetchall() \
+            == [("15Min", 60), ("1Day", 60), ("1Hour", 60), ("5Min", 60)]
+
+
+def test_reconnects_and_resubscribes_after_a_drop(tmp_path):
+    db = tmp_path / "stream.sqlite"
+
+    async def scenario():
+        async with MockStreamServer() as server:
+            ingester = StreamIngester(_config(server, bars=["SPY"]), _writer(db))
+            task = asyncio.ensure_future(ingester.run())
+            await server.wait_subscribed(bars=["SPY"])
+            await server.push_bar("SPY", T0)
+
+            server.drop()
+            await ingester.add_symbols(bars=["IWM"])  # while disconnected: sent on resubscription
+            await server.wait_subscribed(bars=["SPY", "IWM"])
+            assert server.connections == 2 and ingester.stats["reconnects"] >= 1
+            assert [m["bars"] for m in server.log if m["action"] == "subscribe"] == [["SPY"], ["IWM", "SPY"]]
+
+            await server.push_bar("IWM", T0 + timedelta(minutes=1))
+            await server.push_bar("SPY", T0 + timedelta(minutes=1), correction=True)
+            await _until(lambda: ingester.stats["bars"] == 3)
+            await ingester.remove_symbols(bars=["SPY"])
+            await server.wait_for(lambda s: s.clients and s.clients[0].bars == {"IWM"})
+            await ingester.stop()
+            await task
+
+    asyncio.run(scenario())
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT symbol, ts FROM bars ORDER BY ts, symbol").fetchall() == [
+            ("SPY", "2024-01-02T14:30:00Z"), ("IWM", "2024-01-02T14:31:00Z"), ("SPY", "2024-01-02T14:31:00Z")]
+
+
+def test_rejected_credentials_stop_the_ingester(tmp_path):
+    async def scenario():
+        async with MockStreamServer(secret="other") as server:
+            ingester = StreamIngester(_config(server), _writer(tmp_path / "s.sqlite"))
+            with pytest.raises(StreamAuthError):
+                await asyncio.wait_for(ingester.run(), 5)
+            assert server.connections == 1
+
+    asyncio.run(scenario())
+
+
+def test_bar_feed_sends_the_latest_bars_then_new_ones(tmp_path):
+    async def scenario():
+        async with MockStreamServer() as server:
+            ingester = StreamIngester(_config(server), _writer(tmp_path / "s.sqlite"))
+            task = asyncio.ensure_future(ingester.run())
+            await server.wait_subscribed(bars=["SPY", "QQQ"], quotes=[])
+            for minute, symbol in enumerate(("SPY", "QQQ", "SPY")):
+                await server.push_bar(symbol, T0 + timedelta(minutes=minute))
+            await _until(lambda: ingester.stats["bars"] == 3)
+
+            feed = ingester.bar_feed(["spy"])
+            snapshot = await feed.__anext__()
+            assert snapshot["type"] == "bar_snapshot" and [b["symbol"] for b in snapshot["data"]] == ["SPY"]
+            assert snapshot["data"][0]["ts"] == "2024-01-02T14:32:00Z"  # latest SPY bar
+            await server.push_bar("QQQ", T0 + timedelta(minutes=3))
+            await server.push_bar("SPY", T0 + timedelta(minutes=4))
+            message = await asyncio.wait_for(feed.__anext__(), 5)
+            assert message["type"] == "bar" and message["data"]["ts"] == "2024-01-02T14:34:00Z"
+            await feed.aclose()
+            assert ingester.status()["subscribers"] == 0
+            await ingester.stop()
+            await task
+
+    asyncio.run(scenario())
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+from src.strategies.indicators import (
+    EMA, MACD, RSI, ATR, RealizedVol, RollingStd, ZScore,
+    IndicatorBank, IndicatorStateStore, StreamingIndicator,
+)
+from src.strategies.options import IronCondor
+
+
+def _bars(n=120, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    high = close * (1 + rng.uniform(0, 0.01, n))
+    low = close * (1 - rng.uniform(0, 0.01, n))
+    ts = pd.date_range("2024-01-01", periods=n, freq="D")
+    return [{"ts": t.isoformat(), "close": c, "high": h, "low": l}
+            for t, c, h, l in zip(ts, close, high, low)]
+
+
+def test_streaming_matches_pandas():
+    bars = _bars()
+    close = pd.Series([b["close"] for b in bars])
+    ema, std, macd, vol = EMA(12), RollingStd(10), MACD(), RealizedVol(20)
+    for b in bars:
+        for ind in (ema, std, macd, vol):
+            ind.update_bar(b)
+
+    assert np.isclose(ema.value, close.ewm(span=12, adjust=False).mean().iloc[-1])
+    assert np.isclose(std.value, close.rolling(10).std().iloc[-1])
+    line = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    assert np.isclose(macd.value, (line - line.ewm(span=9, adjust=False).mean()).iloc[-1])
+    assert np.isclose(vol.value, close.pct_change().rolling(20).std().iloc[-1])
+
+
+def test_indicator_state_round_trip():
+    bars = _bars()
+    inds = [RSI(14), ATR(14), ZScore(20), MACD()]
+    restored = []
+    for ind in inds:
+        for b in bars[:60]:
+            ind.update_bar(b)
+        restored.append(StreamingIndicator.from_state(ind.to_state()))
+    for b in bars[60:]:
+        for a, r in zip(inds, restored):
+            a.update_bar(b)
+            r.update_bar(b)
+    for a, r in zip(inds, restored):
+        assert np.isclose(a.value, r.value)
+
+
+def test_strategy_warmup_resumes_from_store(tmp_path):
+    bars = _bars()
+    store = IndicatorStateStore(tmp_path / "state.json")
+
+    first = IronCondor()
+    first.warmup({"SPY": bars[:100]}, state_store=store)
+
+    second = IronCondor()
+    second.warmup({"SPY": bars}, state_store=store)
+    # Only bars newer than the persisted state are replayed
+    assert second.indicators.sets["SPY"].bars == 120
+
+    full = IndicatorBank()
+    full.warmup({"SPY": bars})
+    for name, value in full.values("SPY").items():
+        assert np.isclose(second.indicator_values("SPY")[name], value)
+
+
+def test_signal_manager_feeds_bars_and_strategies_read_indicator_trend(tmp_path):
+    from src.strategies.signals.manager import StrategyManager
+
+    bars = _bars()
+    rally = [dict(b, close=b["close"] * (1 + 0.02 * i), ts=f"2024-06-{i + 1:02d}T00:00:00")
+             for i, b in enumerate(bars[:25])]
+    manager = StrategyManager(tmp_path / "signals.csv")
+    manager.register("PutCreditSpread")
+    manager.register("IronCondor")
+    manager.warmup(history={"SPY": bars})
+
+    signals = []
+    for bar in rally:
+        # No trend in the snapshot; the warm indicators see the rally
+        signals = manager.run_once([{"symbol": "SPY", "ivr": 0.5, "bar": bar}], write=False)
+    for strategy in manager.enabled.values():
+        assert strategy.indicators.sets["SPY"].bars == len(bars) + len(rally)
+        assert strategy.indicator_trend("SPY") == "up"
+    assert all("trend=up" in s.notes for s in signals)
+
+    # Same bars again (same ts) are not double counted; no trend needed once warm
+    manager.run_once([{"symbol": "SPY", "ivr": 0.5, "bar": rally[-1]}], write=False)
+    assert manager.enabled["IronCondor"].indicators.sets["SPY"].bars == len(bars) + len(rally)
+
+    options = IronCondor({"min_iv_rank": 0})
+    assert options.indicator_trend("SPY") is None and options.generate({"symbol": "SPY", "ivr": 50, "dte": 30})
+    options.warmup({"SPY": bars + rally})
+    assert options.indicator_trend("SPY") == "strong_bullish"
+    assert options.generate({"symbol": "SPY", "ivr": 50, "dte": 30}) == []
+    # An explicit snapshot trend still wins over the indicators
+    assert options.generate({"symbol": "SPY", "ivr": 50, "dte": 30, "market_trend": "neutral"})
+
+
+def test_signal_manager_keeps_explicit_trend_and_skips_ts_less_polls(tmp_path):
+    from src.strategies.signals.manager import StrategyManager
+
+    bars = _bars()
+    rally = [dict(b, close=b["close"] * (1 + 0.02 * i), ts=f"2024-06-{i + 1:02d}T00:00:00")
+             for i, b in enumerate(bars[:25])]
+    manager = StrategyManager(tmp_path / "signals.csv")
+    manager.register("PutCreditSpread")
+    manager.warmup(history={"SPY": bars + rally})
+    strategy = manager.enabled["PutCreditSpread"]
+    assert strategy.indicator_trend("SPY") == "up"
+
+    signals = manager.run_once([{"symbol": "SPY", "ivr": 0.5, "trend": "down", "bar": rally[-1]}], write=False)
+    assert signals and all("trend=down" in s.notes for s in signals)
+
+    # Polled quotes without a ts are not bars
+    for price in (500.0, 501.0, 502.0):
+        manager.run_once([{"symbol": "SPY", "ivr": 0.5, "current_price": price}], write=False)
+    assert strategy.indicators.sets["SPY"].bars == len(bars) + len(rally)
@@ -0,0 +1,86 @@
+import itertools
+
+import numpy as np
+
+from src.logic import PortfolioSnapshot, Position, RiskManager
+from src.logic.allocator import AllocationLimits, RiskBudgetAllocator, TradeCandidate
+from src.strategies.base import Order
+from src.strategies.manager import StrategyManager
+
+
+def _random_candidates(n, seed=1):
+    rng = np.random.default_rng(seed)
+    return [
+        TradeCandidate(
+            key=f"c{i}", symbol="SPY",
+            expected_return=float(rng.uniform(-20, 200)),
+            max_loss=float(rng.uniform(100, 2000)),
+            max_qty=int(rng.integers(1, 4)),
+        )
+        for i in range(n)
+    ]
+
+
+def test_allocator_matches_brute_force_on_small_problem():
+    cands = _random_candidates(8)
+    limits = AllocationLimits(heat_cap=5_000, per_position_cap=4_000, max_new_positions=4,
+                              beta_budget=10, equity=100_000)
+    result = RiskBudgetAllocator(time_budget=1.0).allocate(cands, limits)
+
+    best = 0.0
+    for qs in itertools.product(*[range(c.max_qty + 1) for c in cands]):
+        if (sum(q * c.max_loss for q, c in zip(qs, cands)) <= 5_000
+                and sum(q > 0 for q in qs) <= 4
+                and all(q * c.max_loss <= 4_000 for q, c in zip(qs, cands))):
+            best = max(best, sum(q * c.expected_return for q, c in zip(qs, cands)))
+    assert result.expected_return >= 0.95 * best
+    assert result.heat_used <= 5_000
+
+
+def test_allocator_respects_greek_limits_and_time_budget():
+    rng = np.random.default_rng(2)
+    cands = _random_candidates(500)
+    for c in cands:
+        c.greeks = {"delta": float(rng.normal(0, 20))}
+    limits = AllocationLimits(heat_cap=20_000, per_position_cap=4_000, max_new_positions=12,
+                              beta_budget=2.5, equity=100_000, greek_limits={"delta": 50})
+    result = RiskBudgetAllocator(time_budget=0.05).allocate(cands, limits)
+    assert abs(result.greeks["delta"]) <= 50
+    assert result.elapsed < 0.5
+
+
+def test_manager_funds_better_trade_when_heat_binds():
+    # Heat cap 20% of 20k = 4,000; each contract risks 400, so 10 contracts fit
+    rm = RiskManager(per_position_risk=0.20, portfolio_risk_cap=0.20, min_equity=0)
+    sm = StrategyManager(risk_manager=rm, allocator=RiskBudgetAllocator())
+    pf = PortfolioSnapshot(equity=20_000, cash=20_000, positions=[])
+    orders = [
+        Order("SPY", "sell", 8, type="put_credit_spread_open",
+              meta={"width": 5, "expected_credit": 0.5, "expected_return": 10}),
+        Order("QQQ", "sell", 8, type="put_credit_spread_open",
+              meta={"width": 5, "expected_credit": 0.5, "expected_return": 40}),
+    ]
+    approved = sm._allocate_orders(orders, pf)
+    assert [(o.symbol, o.qty) for o in approved] == [("SPY", 2), ("QQQ", 8)]
+    assert sm.last_allocation.heat_used <= 4_000
+
+
+def test_manager_counts_open_position_greeks_and_revalidates_orders():
+    rm = RiskManager(per_position_risk=0.20, portfolio_risk_cap=0.50, min_equity=0)
+    sm = StrategyManager(risk_manager=rm, allocator=RiskBudgetAllocator(), greek_limits={"delta": 50})
+    pf = PortfolioSnapshot(equity=20_000, cash=20_000, positions=[
+        Position(symbol="IWM", qty=1, mark=200.0, value=200.0, max_loss=100.0, beta=1.0,
+                 greeks={"delta": 40.0}),
+    ])
+    orders = [
+        Order("SPY", "sell", 8, type="put_credit_spread_open",
+              meta={"width": 5, "expected_credit": 0.5, "expected_return": 40, "greeks": {"delta": 5.0}}),
+        Order("QQQ", "sell", 2, type="put_credit_spread_open",
+              meta={"width": 5, "expected_credit": 0.5, "expected_return": 10}),
+    ]
+    # Only 10 delta of room is left on top of the open position's 40
+    rm.validate_order = lambda intent, pf: (intent.symbol != "QQQ", ["blocked by risk manager"])
+    approved = sm._allocate_orders(orders, pf)
+    assert [(o.symbol, o.qty) for o in approved] == [("SPY", 2)]
+    assert sm.last_allocation.greeks["delta"] == 50.0
+    assert sm.order_history[-1]["status"] == "REJECTED"
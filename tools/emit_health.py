@@ -9,6 +9,7 @@ Provides comprehensive health endpoints and HTML order viewing for EMO Options B
 - /orders.json: Orders API endpoint
 - /ready: Readiness probe for containers
 - /config: Configuration health check
+- /models: Online ML model accuracy, calibration and feature drift
 
 Features:
 - Professional HTML interface with auto-refresh
@@ -199,6 +200,15 @@ def _get_institutional_status() -> Dict[str, Any]:
         logger.debug(f"Institutional integration not available: {e}")
         return {"available": False, "error": str(e)}
 
+def _get_model_monitor_status() -> Dict[str, Any]:
+    """Online ML model accuracy/drift status (published by the ML outlook engine)."""
+    try:
+        from src.ml.drift import drift_status
+        return drift_status(os.getenv("EMO_ML_DRIFT_DIR", "data/ml_drift"))
+    except Exception as e:
+        logger.debug(f"Model monitor not available: {e}")
+        return {"available": False, "error": str(e)}
+
 def _render_orders_html(rows: List[Dict[str, Any]]) -> bytes:
     """
     Render enhanced orders HTML page with professional styling and institutional features.
@@ -538,6 +548,15 @@ class EnhancedHealthHandler(BaseHTTPRequestHandler):
         if inst_status.get("available"):
             health_data["institutional"] = inst_status
         
+        # Add ML model monitor summary if available
+        models = _get_model_monitor_status()
+        if models.get("available"):
+            health_data["models"] = {
+                "tracked": models.get("tracked", 0),
+                "flagged": sorted(models.get("flagged", {})),
+                "generated_at": models.get("generated_at")
+            }
+        
         return health_data
     
     def _get_metrics_data(self):
@@ -728,6 +747,11 @@ class EnhancedHealthHandler(BaseHTTPRequestHandler):
             elif self.path.startswith("/config"):
                 self._send_json(200, self._get_config_data())
                 
+            elif self.path.startswith("/models"):
+                # Online model accuracy / drift endpoint
+                models = _get_model_monitor_status()
+                self._send_json(200 if models.get("available") else 503, models)
+                
             elif self.path.startswith("/performance"):
                 # Performance monitoring endpoint
                 try:
@@ -822,7 +846,7 @@ class EnhancedHealthHandler(BaseHTTPRequestHandler):
                 
             else:
                 # Default endpoint with available routes
-                endpoints = ["/health", "/metrics", "/orders.html", "/orders.json", "/ready", "/config", "/performance"]
+                endpoints = ["/health", "/metrics", "/orders.html", "/orders.json", "/ready", "/config", "/performance", "/models"]
                 if _TRADING_DB_READY:
                     endpoints.extend(["/positions.json", "/orders", "/analytics", "/risk"])
                 